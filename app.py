@@ -5,37 +5,211 @@
 # Documentación Flask: https://flask.palletsprojects.com/
 # Documentación oficial Python: https://docs.python.org/3/
 #
-# Este archivo es el punto de entrada de la app. Aquí se inicializa la base de datos y se definen los endpoints principales.
+# Este archivo es el punto de entrada de la app. create_app(config) crea la aplicación y los servicios
+# que comparten sus peticiones sin abrir conexiones ni hilos, así se puede usar con gunicorn --preload;
+# `app` (la de gunicorn app:app) se crea con la configuración de config.py al pedirla por primera vez.
 #
 # Referencias:
 # - https://flask.palletsprojects.com/en/2.3.x/tutorial/
+# - https://flask.palletsprojects.com/en/stable/patterns/appfactories/
+# - https://docs.gunicorn.org/en/stable/settings.html#preload-app
 # - https://docs.python.org/3/library/sqlite3.html
 #
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, Response
+from flask import (Blueprint, Flask, current_app, render_template, request, jsonify, Response,
+                   stream_with_context, g)
+from jinja2 import FileSystemBytecodeCache
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from auth import BasicAuthenticator
 from models.task import Task
-from models.database import Database
+from models.archive import Archiver
+from models.cache import CachedDatabase, LRUCache
+from models.events import ChangeHub
+from models.metrics import InstrumentedDatabase, MetricsRegistry
+from models.query import TaskQuery
+from models.recurrence import normalize_rule, parse_rule
+from models.repository import open_repository
+from models.retention import ChangeLogPruner
+from models.scheduler import Scheduler
+from models.search import strip_markers
+from models.write_behind import WRITE_BEHIND_MODES, WriteBehindQueue
 from config import Config
+from json_provider import init_json
+from datetime import date, datetime, timezone
+from functools import partial
+from werkzeug.http import quote_etag
+from werkzeug.local import LocalProxy
+from werkzeug.security import generate_password_hash
+import atexit
+import click
+import cProfile
+import hashlib
+import hmac
+import logging
 import os
+import random
+import threading
+import time
 
-app = Flask(__name__)
-app.config.from_object(Config)
+# Nombre con el que create_app guarda los servicios de la aplicación en app.extensions
+EXTENSION = 'algoritmo'
 
-# Configuración de la base de datos
-# Se crea una instancia de la clase Database, que gestiona la conexión y operaciones con SQLite.
-database = Database(app.config['DATABASE_PATH'])
+# Rutas, filtros, hooks y comandos: create_app los registra en cada aplicación que crea
+views = Blueprint('tasks', __name__, cli_group=None)
 
-# Inicializar la base de datos al crear la aplicación
-# Esto asegura que la tabla 'tasks' exista antes de cualquier operación.
-with app.app_context():
-    database.init_database()
+class Services:
+    """
+    Objetos que comparten las peticiones de una aplicación (app.extensions['algoritmo']).
+    Crearlos no abre conexiones ni arranca hilos: nada queda abierto antes del fork de
+    gunicorn --preload. El esquema se aplica con ensure_schema() y los hilos de ChangeHub,
+    Scheduler y WriteBehindQueue arrancan con la primera petición de cada proceso.
+    """
+    
+    def __init__(self, config):
+        """
+        Crea los servicios a partir de la configuración.
+        
+        Args:
+            config (Mapping): Configuración de la aplicación (app.config)
+        
+        Raises:
+            ValueError: Si STORAGE_BACKEND, WRITE_BEHIND_MODE o SCHEDULER_ENABLED no son válidos
+        """
+        # Registro de métricas del proceso (ver /metrics)
+        self.metrics = MetricsRegistry(
+            directory=config['METRICS_DIR'],
+            flush_interval=config['METRICS_FLUSH_INTERVAL']
+        )
+        atexit.register(self.metrics.flush, True)
+        
+        # Configuración de la base de datos
+        # STORAGE_BACKEND elige el motor: Database (SQLite, por defecto), MemoryDatabase o PostgresDatabase.
+        # Con METRICS_ENABLED se mide cada llamada y con CACHE_ENABLED se envuelve en CachedDatabase
+        # para servir lecturas desde memoria (solo se miden las que llegan al motor). Con
+        # WRITE_BEHIND_MODE los toggles y cambios parciales pasan por una cola que los escribe en lotes.
+        self.storage = open_repository(config)
+        database = self.storage
+        if config['METRICS_ENABLED']:
+            database = InstrumentedDatabase(database, self.metrics)
+        if config['CACHE_ENABLED']:
+            database = CachedDatabase(
+                database,
+                max_entries=config['CACHE_MAX_ENTRIES'],
+                ttl=config['CACHE_TTL']
+            )
+        if config['WRITE_BEHIND_MODE'] not in WRITE_BEHIND_MODES:
+            raise ValueError(f'WRITE_BEHIND_MODE inválido: {config["WRITE_BEHIND_MODE"]}')
+        if config['WRITE_BEHIND_MODE'] != 'off':
+            database = WriteBehindQueue(
+                database,
+                flush_interval=config['WRITE_BEHIND_INTERVAL'],
+                max_batch=config['WRITE_BEHIND_MAX_BATCH'],
+                durable=config['WRITE_BEHIND_MODE'] == 'sync'
+            )
+            atexit.register(database.close)
+        self.database = database
+        
+        # Cambios en vivo (/api/tasks/stream): cada worker sigue el registro de cambios con un hilo
+        # y reparte los eventos a sus conexiones. Lee el motor directamente, sin caché ni métricas
+        self.change_hub = ChangeHub(
+            self.storage,
+            poll_interval=config['SSE_POLL_INTERVAL'],
+            buffer_size=config['SSE_BUFFER_SIZE'],
+            batch_size=config['CHANGES_PAGE_SIZE']
+        )
+        
+        # Avisos de vencimiento y tareas repetidas: un hilo por worker, creado con su primera petición
+        # (después del fork de gunicorn); solo trabaja el worker que tiene la concesión en la base de datos.
+        # Escribe a través de la caché, así las ocurrencias nuevas invalidan los listados de este worker
+        self.scheduler = Scheduler.from_config(database, config)
+        atexit.register(self.scheduler.stop)
+        # SCHEDULER_ENABLED: 'true' lo arranca siempre, 'false' nunca y 'auto' solo si tiene trabajo
+        self.scheduler_mode = str(config['SCHEDULER_ENABLED']).lower()
+        if self.scheduler_mode not in ('auto', 'true', 'false'):
+            raise ValueError(f'SCHEDULER_ENABLED inválido: {config["SCHEDULER_ENABLED"]}')
+        self._next_scheduler_check = 0.0
+        
+        # Archivo de tareas completadas: un lote por tick del programador, en el worker con la concesión
+        self.archiver = Archiver.from_config(database, config)
+        if self.archiver.enabled:
+            self.scheduler.add_job(self.archiver.step)
+        
+        # Poda del registro de cambios: tras una escritura, como mucho una vez por intervalo y proceso
+        self.change_log_pruner = ChangeLogPruner.from_config(database, config)
+        
+        # Autenticación Basic: hashes de contraseña por usuario (APP_USERS, APP_USER + APP_PASSWORD_HASH
+        # o APP_PASSWORD) con una caché de verificaciones correctas para no repetir el hash en cada petición
+        self.authenticator = BasicAuthenticator.from_config(config)
+        
+        # Fragmentos de la página principal ya renderizados (ver render_index_page)
+        self.fragment_cache = LRUCache(
+            max_entries=config['FRAGMENT_CACHE_SIZE'],
+            ttl=config['FRAGMENT_CACHE_TTL']
+        )
+        
+        self.json_backend = None
+        # Milisegundos de create_app y de la primera petición de este proceso (ver STARTUP_TIMING)
+        self.startup = {}
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+    
+    def ensure_schema(self):
+        """
+        Aplica las migraciones pendientes la primera vez que este proceso usa la base de datos.
+        Después solo cuesta leer un atributo; con SCHEMA_INIT=eager ya se aplicaron en create_app.
+        """
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                self.database.init_database()
+                self._schema_ready = True
+
+    def scheduler_check_due(self):
+        """Si hay que decidir ahora si arrancar el programador (no consulta la base de datos)"""
+        if self.scheduler_mode == 'false' or self.scheduler.running:
+            return False
+        return self.scheduler_mode == 'true' or time.monotonic() >= self._next_scheduler_check
+    
+    def start_scheduler_if_needed(self):
+        """
+        Arranca el programador de este proceso según SCHEDULER_ENABLED. En 'auto' arranca cuando
+        tiene trabajo (Scheduler.has_work): así una instalación sin archivo, sin vencimientos
+        próximos ni tareas repetidas no tiene un hilo escribiendo la concesión cada segundo.
+        Se comprueba como mucho una vez cada SCHEDULER_LEASE_TTL segundos por proceso.
+        """
+        if not self.scheduler_check_due():
+            return
+        if self.scheduler_mode == 'auto':
+            self._next_scheduler_check = time.monotonic() + self.scheduler.lease_ttl
+            if not self.scheduler.has_work():
+                return
+        self.scheduler.start()
 
-# Variables de entorno seguras para autenticación
-USER = os.environ.get("APP_USER")
-PASSWORD = os.environ.get("APP_PASSWORD")
+def get_services():
+    """Servicios de la aplicación que atiende la petición (o del contexto de aplicación activo)"""
+    return current_app.extensions[EXTENSION]
+
+# Atajos para las rutas: apuntan a los servicios de la aplicación que atiende cada petición
+storage = LocalProxy(lambda: get_services().storage)
+database = LocalProxy(lambda: get_services().database)
+metrics = LocalProxy(lambda: get_services().metrics)
+change_hub = LocalProxy(lambda: get_services().change_hub)
+scheduler = LocalProxy(lambda: get_services().scheduler)
+authenticator = LocalProxy(lambda: get_services().authenticator)
+fragment_cache = LocalProxy(lambda: get_services().fragment_cache)
+
+def parse_last_event_id(value):
+    """Lee Last-Event-ID: None si no viene y ValueError si no es un número de secuencia"""
+    if not value:
+        return None
+    if not value.isdigit():
+        raise ValueError('Last-Event-ID inválido')
+    return int(value)
 
 def check_auth(username, password):
-    return username == USER and password == PASSWORD
+    return authenticator.check(username, password)
 
 def authenticate():
     return Response(
@@ -45,78 +219,400 @@ def authenticate():
 
 def require_auth(f):
     def wrapper(*args, **kwargs):
-        auth = request.authorization
-        if not auth or not check_auth(auth.username, auth.password):
+        if authenticator.verify_header(request.headers.get('Authorization')) is None:
             return authenticate()
         return f(*args, **kwargs)
     wrapper.__name__ = f.__name__
     return wrapper
 
-# Endpoint principal: muestra la lista de tareas en la página de inicio
-@app.route('/')
+# Lógica de las rutas que no depende de Flask; también la usa el modo ASGI (asgi.py)
+def check_payload(data):
+    """Deja el JSON de una tarea listo para guardar: quita del título y la descripción los
+    marcadores de resaltado de la búsqueda (ver models/search.py) y pone la regla de repetición
+    (si viene) en forma canónica.
+
+    Devuelve el mensaje de error si la regla no es válida, o None.
+    """
+    for field in ('title', 'description'):
+        if isinstance(data.get(field), str):
+            data[field] = strip_markers(data[field])
+    if 'recurrence' not in data:
+        return None
+    try:
+        data['recurrence'] = normalize_rule(data['recurrence'])
+    except ValueError as error:
+        return str(error)
+    return None
+
+def task_from_payload(data):
+    """Crea una Task nueva a partir del JSON recibido (título y regla ya validados)"""
+    return Task(
+        title=data['title'],
+        description=data.get('description', ''),
+        priority=data.get('priority', 'medium'),
+        due_date=data.get('due_date', None),
+        recurrence=data.get('recurrence')
+    )
+
+def list_etag_tag(query):
+    """Parte del ETag de un listado que identifica sus filtros, orden y página"""
+    query_tag = hashlib.sha1(repr(query.cache_key).encode('utf-8')).hexdigest()[:16]
+    return f'list-{query_tag}'
+
+# Validación de caché HTTP (ETag / Last-Modified) a partir de la versión de la tabla.
+# Responder 304 solo requiere leer la tabla 'meta', no las tareas.
+def _table_validators(tag):
+    """Calcula el ETag y la fecha Last-Modified de un recurso derivado de la tabla 'tasks'"""
+    generation, last_modified = database.get_table_version()
+    return f'{generation}-{tag}', datetime.fromtimestamp(last_modified, timezone.utc)
+
+def _set_validators(response, etag, last_modified):
+    """Agrega ETag, Last-Modified y Cache-Control (revalidar siempre) a la respuesta"""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def _not_modified(etag, last_modified):
+    """Devuelve una respuesta 304 si el cliente ya tiene la versión vigente, o None"""
+    if request.if_none_match:
+        matched = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        matched = last_modified <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return _set_validators(Response(status=304), etag, last_modified)
+
+# Página principal: solo la primera página de tareas y los contadores, renderizados una vez
+# por versión de la tabla y día (las vencidas dependen de la fecha) y servidos desde memoria
+# mientras nadie escriba. app.js toma los mismos datos del JSON incrustado en lugar de pedirlos.
+MONTHS_SHORT = ('ene', 'feb', 'mar', 'abr', 'may', 'jun', 'jul', 'ago', 'sept', 'oct', 'nov', 'dic')
+
+@views.app_template_filter('short_date')
+def short_date_filter(value):
+    """Fecha ISO como '5 mar 2025', igual que formatDate() en app.js"""
+    try:
+        parsed = date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    return f'{parsed.day} {MONTHS_SHORT[parsed.month - 1]} {parsed.year}'
+
+RECURRENCE_UNITS = {'DAILY': ('día', 'días'), 'WEEKLY': ('semana', 'semanas'),
+                    'MONTHLY': ('mes', 'meses'), 'YEARLY': ('año', 'años')}
+
+@views.app_template_filter('recurrence_text')
+def recurrence_text_filter(value):
+    """Regla canónica como 'Cada semana' o 'Cada 2 meses', igual que getRecurrenceText() en app.js"""
+    try:
+        rule = parse_rule(value)
+    except (AttributeError, ValueError):
+        return value
+    singular, plural = RECURRENCE_UNITS[rule.freq]
+    return f'Cada {singular}' if rule.interval == 1 else f'Cada {rule.interval} {plural}'
+
+def render_index_page(today):
+    """
+    Obtiene los fragmentos de la página principal para la versión actual de la tabla,
+    renderizándolos solo si no están en la caché.
+    """
+    generation, _ = database.get_table_version()
+    key = ('index', generation, today)
+    page = fragment_cache.get(key) if current_app.config['FRAGMENT_CACHE_SIZE'] > 0 else None
+    if page is not None:
+        return page
+    
+    query = TaskQuery.from_args(
+        {},
+        default_limit=current_app.config['TASKS_PAGE_SIZE'],
+        max_limit=current_app.config['TASKS_MAX_PAGE_SIZE']
+    )
+    # Como en /api/tasks, el token se toma antes de leer las tareas
+    sync_token = database.get_change_token()
+    tasks, next_cursor = database.query_task_dicts(query)
+    stats = database.get_task_stats(today)
+    initial = {
+        'page_size': query.limit,
+        'tasks': tasks,
+        'next_cursor': next_cursor,
+        'sync_token': str(sync_token),
+        'stats': stats,
+        'stream': current_app.config['SSE_ENABLED'],
+        # ETags con los que app.js revalida estas mismas respuestas (If-None-Match)
+        'etags': {
+            'list': quote_etag(f'{generation}-{list_etag_tag(query)}'),
+            'stats': quote_etag(f'{generation}-stats-{today}'),
+        },
+    }
+    page = {
+        'tasks_html': Markup(render_template('partials/task_list.html', tasks=tasks, today=today)),
+        'initial_json': htmlsafe_json_dumps(initial, dumps=current_app.json.dumps),
+        'stats': stats,
+        'count': len(tasks),
+        'has_more': next_cursor is not None,
+    }
+    fragment_cache.set(key, page)
+    return page
+
+@views.route('/')
 @require_auth
 def index():
-    """Página principal que muestra la lista de tareas"""
-    tasks = database.get_all_tasks()
-    return render_template('index.html', tasks=tasks)
+    """Página principal que muestra la primera página de tareas"""
+    page = render_index_page(date.today().isoformat())
+    return render_template('index.html', page=page)
 
-@app.route('/api/tasks', methods=['GET'])
+@views.route('/api/tasks', methods=['GET'])
 @require_auth
 def get_tasks():
-    """API endpoint para obtener todas las tareas"""
-    tasks = database.get_all_tasks()
-    return jsonify([task.to_dict() for task in tasks])
+    """API endpoint para obtener las tareas filtradas y paginadas.
+
+    Parámetros opcionales: status, priority, due_date, sort, limit y cursor.
+    """
+    try:
+        query = TaskQuery.from_args(
+            request.args,
+            default_limit=current_app.config['TASKS_PAGE_SIZE'],
+            max_limit=current_app.config['TASKS_MAX_PAGE_SIZE']
+        )
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    etag, last_modified = _table_validators(list_etag_tag(query))
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    
+    # El token se toma antes de leer: si algo cambia en medio, el cliente lo recibirá otra vez
+    sync_token = database.get_change_token()
+    tasks, next_cursor = database.query_task_dicts(query)
+    return _set_validators(jsonify({
+        'tasks': tasks,
+        'next_cursor': next_cursor,
+        'sync_token': str(sync_token)
+    }), etag, last_modified)
+
+@views.route('/api/tasks/archive', methods=['GET'])
+@require_auth
+def get_archived_tasks():
+    """API endpoint para leer las tareas archivadas, paginadas.
+
+    Parámetros opcionales: priority, due_date, sort, limit y cursor, como en /api/tasks;
+    por defecto de la última modificada (completada) a la primera.
+    """
+    try:
+        query = TaskQuery.from_args(
+            request.args,
+            default_limit=current_app.config['TASKS_PAGE_SIZE'],
+            max_limit=current_app.config['TASKS_MAX_PAGE_SIZE'],
+            default_sort='-updated_at'
+        )
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    # El archivo solo cambia cuando se archivan tareas, que la generación ya cuenta como borrados
+    etag, last_modified = _table_validators(f'archive-{list_etag_tag(query)}')
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    
+    tasks, next_cursor = database.query_archived_task_dicts(query)
+    return _set_validators(jsonify({
+        'tasks': tasks,
+        'next_cursor': next_cursor
+    }), etag, last_modified)
 
-@app.route('/api/tasks', methods=['POST'])
+@views.route('/api/tasks/changes', methods=['GET'])
+@require_auth
+def get_task_changes():
+    """API endpoint de sincronización incremental.
+
+    Devuelve las tareas creadas o modificadas y los IDs eliminados desde el token
+    'since'. Sin 'since' solo devuelve el token actual. Si el token es demasiado
+    antiguo (el registro ya se podó) responde 410 y el cliente debe recargar todo.
+    """
+    since = request.args.get('since')
+    if since is None:
+        return jsonify({'changes': [], 'deleted': [], 'has_more': False,
+                        'next_token': str(database.get_change_token())})
+    if not since.isdigit():
+        return jsonify({'error': 'Token de sincronización inválido'}), 400
+    
+    changes = database.get_changes(int(since), current_app.config['CHANGES_PAGE_SIZE'])
+    if changes is None:
+        return jsonify({'error': 'Token de sincronización vencido: recarga las tareas'}), 410
+    
+    return jsonify({
+        'changes': changes.changed,
+        'deleted': changes.deleted,
+        'has_more': changes.has_more,
+        'next_token': str(changes.next_token)
+    })
+
+@views.route('/api/tasks/stream', methods=['GET'])
+@require_auth
+def stream_task_changes():
+    """API endpoint de cambios en vivo con Server-Sent Events.
+
+    Envía un evento 'created', 'updated' o 'deleted' por cada escritura, con el número de
+    secuencia del registro de cambios como id. Al reconectar, el navegador manda
+    Last-Event-ID (o last_event_id en la URL) y el stream sigue desde ahí; si esos cambios
+    ya se podaron envía 'reset'. Sin cambios envía un comentario cada SSE_HEARTBEAT segundos.
+    Con SSE_ENABLED desactivado responde 204, que le indica al navegador que no reconecte.
+    """
+    if not current_app.config['SSE_ENABLED']:
+        return Response(status=204)
+    try:
+        last_event_id = parse_last_event_id(
+            request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    
+    cursor, preamble = change_hub.open(last_event_id, current_app.config['SSE_RETRY_MS'])
+    events = change_hub.stream(cursor, current_app.json.dumps, current_app.config['SSE_HEARTBEAT'],
+                               current_app.config['SSE_MAX_DURATION'])
+    
+    def generate():
+        yield preamble
+        yield from events
+    
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@views.route('/api/tasks/stats', methods=['GET'])
+@require_auth
+def get_task_stats():
+    """API endpoint con los contadores del panel: total, pendientes, completadas y vencidas"""
+    today = date.today().isoformat()
+    etag, last_modified = _table_validators(f'stats-{today}')
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    
+    return _set_validators(jsonify(database.get_task_stats(today)), etag, last_modified)
+
+@views.route('/api/tasks/search', methods=['GET'])
+@require_auth
+def search_tasks():
+    """API endpoint de búsqueda de texto completo en título y descripción.
+
+    Parámetros: q (texto), limit y cursor (posición devuelta por la página anterior).
+    """
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'El parámetro q es requerido'}), 400
+    
+    try:
+        limit = min(int(request.args.get('limit', current_app.config['SEARCH_PAGE_SIZE'])),
+                    current_app.config['SEARCH_MAX_PAGE_SIZE'])
+        offset = int(request.args.get('cursor') or 0)
+    except ValueError:
+        return jsonify({'error': 'limit y cursor deben ser números enteros'}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({'error': 'limit y cursor fuera de rango'}), 400
+    
+    tasks, has_more = database.search_tasks(text, limit=limit, offset=offset)
+    return jsonify({
+        'tasks': tasks,
+        'next_cursor': str(offset + limit) if has_more else None
+    })
+
+@views.route('/api/tasks/<int:task_id>', methods=['GET'])
+@require_auth
+def get_task(task_id):
+    """API endpoint para obtener una tarea por su ID"""
+    etag, last_modified = _table_validators(f'task-{task_id}')
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    
+    task = database.get_task_by_id(task_id)
+    if not task:
+        return jsonify({'error': 'Tarea no encontrada'}), 404
+    
+    return _set_validators(jsonify(task.to_dict()), etag, last_modified)
+
+@views.route('/api/tasks/export', methods=['GET'])
+@require_auth
+def export_tasks():
+    """API endpoint para exportar todas las tareas en streaming.
+
+    Con format=ndjson (por defecto) envía una tarea JSON por línea; con format=json
+    envía un único arreglo. La memoria usada no depende del tamaño de la tabla.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({'error': 'Formato inválido: usa ndjson o json'}), 400
+    
+    chunks = database.iter_task_dicts(current_app.config['EXPORT_CHUNK_SIZE'])
+    
+    dumps = current_app.json.dumps
+    
+    def generate_ndjson():
+        for tasks in chunks:
+            yield ''.join(dumps(task) + '\n' for task in tasks)
+    
+    def generate_json():
+        yield '['
+        separator = ''
+        for tasks in chunks:
+            yield separator + ','.join(dumps(task) for task in tasks)
+            separator = ','
+        yield ']'
+    
+    if export_format == 'ndjson':
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+    else:
+        body, mimetype = generate_json(), 'application/json'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=tasks.{export_format}'}
+    )
+
+@views.route('/api/tasks', methods=['POST'])
 @require_auth
 def create_task():
     """API endpoint para crear una nueva tarea"""
     data = request.get_json()
     
-    if not data or 'title' not in data:
+    if not isinstance(data, dict) or 'title' not in data:
         return jsonify({'error': 'El título es requerido'}), 400
+    error = check_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    task = Task(
-        title=data['title'],
-        description=data.get('description', ''),
-        priority=data.get('priority', 'medium'),
-        due_date=data.get('due_date', None)
-    )
-    
+    task = task_from_payload(data)
     task_id = database.create_task(task)
     task.id = task_id
     
     return jsonify(task.to_dict()), 201
 
-@app.route('/api/tasks/<int:task_id>', methods=['PUT'])
+@views.route('/api/tasks/<int:task_id>', methods=['PUT'])
 @require_auth
 def update_task(task_id):
     """API endpoint para actualizar una tarea existente"""
     data = request.get_json()
     
-    if not data:
+    if not data or not isinstance(data, dict):
         return jsonify({'error': 'Datos requeridos'}), 400
+    error = check_payload(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    task = database.get_task_by_id(task_id)
+    # Una sola sentencia UPDATE ... RETURNING con los campos recibidos
+    task = database.patch_task(task_id, data)
     if not task:
         return jsonify({'error': 'Tarea no encontrada'}), 404
     
-    # Actualizar campos
-    if 'title' in data:
-        task.title = data['title']
-    if 'description' in data:
-        task.description = data['description']
-    if 'priority' in data:
-        task.priority = data['priority']
-    if 'due_date' in data:
-        task.due_date = data['due_date']
-    if 'completed' in data:
-        task.completed = data['completed']
-    
-    database.update_task(task)
     return jsonify(task.to_dict())
 
-@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@views.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 @require_auth
 def delete_task(task_id):
     """API endpoint para eliminar una tarea"""
@@ -127,25 +623,405 @@ def delete_task(task_id):
     database.delete_task(task_id)
     return jsonify({'message': 'Tarea eliminada exitosamente'})
 
-@app.route('/api/tasks/<int:task_id>/toggle', methods=['PUT'])
+@views.route('/api/tasks/<int:task_id>/toggle', methods=['PUT'])
 @require_auth
 def toggle_task(task_id):
     """API endpoint para cambiar el estado de completado de una tarea"""
-    task = database.get_task_by_id(task_id)
+    # SET completed = NOT completed en SQLite: sin leer la tarea antes ni carreras entre peticiones
+    task = database.toggle_task(task_id)
     if not task:
         return jsonify({'error': 'Tarea no encontrada'}), 404
     
-    task.completed = not task.completed
-    database.update_task(task)
     return jsonify(task.to_dict())
 
+# Endpoints por lotes: una sola transacción por petición, con resultado por elemento
+def _batch_items(key):
+    """Extrae y valida la lista de elementos de una petición por lotes.
+
+    Devuelve (items, None) o (None, respuesta de error).
+    """
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'Se requiere una lista no vacía en "{key}"'}), 400)
+    if len(items) > current_app.config['BATCH_MAX_SIZE']:
+        return None, (jsonify({
+            'error': f'El lote supera el máximo de {current_app.config["BATCH_MAX_SIZE"]} elementos'
+        }), 413)
+    return items, None
+
+def _is_task_id(value):
+    """Indica si un valor del JSON es un ID de tarea válido (bool no cuenta como entero)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _batch_response(results):
+    """Arma la respuesta de un lote: 200 si todo salió bien, 207 si hubo fallos parciales"""
+    failed = sum(1 for result in results if 'error' in result)
+    status = 200 if failed == 0 else (207 if failed < len(results) else 400)
+    return jsonify({
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed
+    }), status
+
+@views.route('/api/tasks/batch', methods=['POST'])
+@require_auth
+def create_tasks_batch():
+    """API endpoint para crear varias tareas en una sola transacción"""
+    items, error = _batch_items('tasks')
+    if error:
+        return error
+    
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('title'):
+            results[index] = {'index': index, 'status': 400, 'error': 'El título es requerido'}
+            continue
+        error = check_payload(item)
+        if error:
+            results[index] = {'index': index, 'status': 400, 'error': error}
+            continue
+        valid.append((index, task_from_payload(item)))
+    
+    task_ids = database.create_tasks([task for _, task in valid])
+    for (index, task), task_id in zip(valid, task_ids):
+        task.id = task_id
+        results[index] = {'index': index, 'status': 201, 'task': task.to_dict()}
+    
+    return _batch_response(results)
+
+@views.route('/api/tasks/batch', methods=['PATCH'])
+@require_auth
+def update_tasks_batch():
+    """API endpoint para modificar varias tareas en una sola transacción"""
+    items, error = _batch_items('tasks')
+    if error:
+        return error
+    
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not _is_task_id(item.get('id')):
+            results[index] = {'index': index, 'status': 400, 'error': 'El id es requerido'}
+            continue
+        error = check_payload(item)
+        if error:
+            results[index] = {'index': index, 'id': item['id'], 'status': 400, 'error': error}
+            continue
+        valid.append((index, item))
+    
+    tasks = database.patch_tasks([item for _, item in valid])
+    for (index, item), task in zip(valid, tasks):
+        if task is None:
+            results[index] = {'index': index, 'id': item['id'], 'status': 404,
+                              'error': 'Tarea no encontrada'}
+        else:
+            results[index] = {'index': index, 'status': 200, 'task': task.to_dict()}
+    
+    return _batch_response(results)
+
+@views.route('/api/tasks/batch', methods=['DELETE'])
+@require_auth
+def delete_tasks_batch():
+    """API endpoint para eliminar varias tareas en una sola transacción"""
+    items, error = _batch_items('ids')
+    if error:
+        return error
+    
+    results = [None] * len(items)
+    valid = []
+    for index, task_id in enumerate(items):
+        if not _is_task_id(task_id):
+            results[index] = {'index': index, 'status': 400, 'error': 'ID inválido'}
+            continue
+        valid.append((index, task_id))
+    
+    deleted = database.delete_tasks([task_id for _, task_id in valid])
+    for (index, task_id), ok in zip(valid, deleted):
+        if ok:
+            results[index] = {'index': index, 'id': task_id, 'status': 200}
+        else:
+            results[index] = {'index': index, 'id': task_id, 'status': 404,
+                              'error': 'Tarea no encontrada'}
+    
+    return _batch_response(results)
+
+# Instrumentación por petición: duración por ruta y perfilado opcional con cProfile
+def describe_metrics(metrics):
+    """Registra el tipo y la descripción de las métricas que exporta /metrics"""
+    metrics.describe('algoritmo_http_request_duration_seconds', 'histogram',
+                     'Duración de las peticiones HTTP por método, ruta y estado')
+    metrics.describe('algoritmo_db_connections_opened_total', 'counter',
+                     'Conexiones a la base de datos abiertas por el pool')
+    metrics.describe('algoritmo_cache_hits_total', 'counter', 'Lecturas servidas desde la caché')
+    metrics.describe('algoritmo_cache_misses_total', 'counter', 'Lecturas que no estaban en la caché')
+    metrics.describe('algoritmo_cache_invalidations_total', 'counter',
+                     'Vaciados de la caché por escrituras de otros workers')
+    metrics.describe('algoritmo_cache_hit_ratio', 'gauge', 'Proporción de lecturas servidas desde la caché')
+    metrics.describe('algoritmo_write_behind_submitted_total', 'counter',
+                     'Toggles y cambios parciales recibidos por la cola write-behind')
+    metrics.describe('algoritmo_write_behind_written_total', 'counter',
+                     'Tareas escritas por la cola tras combinar los cambios de cada una')
+    metrics.describe('algoritmo_write_behind_flushes_total', 'counter',
+                     'Lotes confirmados por la cola write-behind (uno por transacción)')
+    metrics.describe('algoritmo_write_behind_failed_total', 'counter',
+                     'Tareas de la cola write-behind que no se pudieron escribir')
+    metrics.describe('algoritmo_sse_subscribers', 'gauge',
+                     'Conexiones abiertas en /api/tasks/stream')
+    metrics.describe('algoritmo_scheduler_leader', 'gauge',
+                     'Workers que tienen la concesión del programador (debería ser 1)')
+    metrics.describe('algoritmo_scheduler_reminders_total', 'counter',
+                     'Avisos de vencimiento entregados a los hooks')
+    metrics.describe('algoritmo_scheduler_occurrences_total', 'counter',
+                     'Ocurrencias creadas al completar tareas repetidas')
+    metrics.describe('algoritmo_archived_tasks_total', 'counter',
+                     'Tareas completadas pasadas al archivo')
+    metrics.describe('algoritmo_change_log_pruned_total', 'counter',
+                     'Entradas eliminadas del registro de cambios por la poda automática')
+    metrics.describe('algoritmo_auth_cache_hits_total', 'counter',
+                     'Cabeceras Authorization ya verificadas, sin recalcular el hash')
+    metrics.describe('algoritmo_auth_cache_misses_total', 'counter',
+                     'Cabeceras Authorization verificadas con el hash de la contraseña')
+
+def _storage_samples(services, config):
+    """Contadores que acumulan el pool y las cachés, leídos en cada instantánea"""
+    yield 'algoritmo_db_connections_opened_total', {}, services.storage.connection_stats()['opened']
+    if config['CACHE_ENABLED']:
+        stats = services.database.cache_stats()
+        yield 'algoritmo_cache_hits_total', {}, stats['hits']
+        yield 'algoritmo_cache_misses_total', {}, stats['misses']
+        yield 'algoritmo_cache_invalidations_total', {}, stats['invalidations']
+    if isinstance(services.database, WriteBehindQueue):
+        queue_stats = services.database.stats()
+        yield 'algoritmo_write_behind_submitted_total', {}, queue_stats['submitted']
+        yield 'algoritmo_write_behind_written_total', {}, queue_stats['written']
+        yield 'algoritmo_write_behind_flushes_total', {}, queue_stats['flushes']
+        yield 'algoritmo_write_behind_failed_total', {}, queue_stats['failed']
+    yield 'algoritmo_sse_subscribers', {}, services.change_hub.subscribers
+    scheduler_stats = services.scheduler.stats()
+    yield 'algoritmo_scheduler_leader', {}, scheduler_stats['leader']
+    yield 'algoritmo_scheduler_reminders_total', {}, scheduler_stats['reminders']
+    yield 'algoritmo_scheduler_occurrences_total', {}, scheduler_stats['occurrences']
+    yield 'algoritmo_archived_tasks_total', {}, services.archiver.stats()['archived']
+    yield 'algoritmo_change_log_pruned_total', {}, services.change_log_pruner.stats()['pruned']
+    auth_stats = services.authenticator.cache_stats()
+    yield 'algoritmo_auth_cache_hits_total', {}, auth_stats['hits']
+    yield 'algoritmo_auth_cache_misses_total', {}, auth_stats['misses']
+
+def _should_profile():
+    if not current_app.config['PROFILING_ENABLED']:
+        return False
+    if request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1':
+        return True
+    return random.random() < current_app.config['PROFILE_SAMPLE_RATE']
+
+def _dump_profile(profiler):
+    """Guarda las estadísticas en PROFILE_DIR (legibles con pstats, snakeviz o flameprof)"""
+    os.makedirs(current_app.config['PROFILE_DIR'], exist_ok=True)
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    filename = f'{int(time.time() * 1000)}-{os.getpid()}-{endpoint}.prof'
+    profiler.dump_stats(os.path.join(current_app.config['PROFILE_DIR'], filename))
+    return filename
+
+@views.before_app_request
+def start_request_instrumentation():
+    g.request_started = time.perf_counter()
+    if _should_profile():
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Ya hay un perfilador activo (otra petición en el mismo proceso)
+            return
+        g.profiler = profiler
+
+@views.before_app_request
+def prepare_process():
+    # La primera petición de cada proceso (ya después del fork) aplica el esquema y arranca el
+    # programador si le toca; las siguientes solo comparan unos atributos
+    services = get_services()
+    services.ensure_schema()
+    services.start_scheduler_if_needed()
+
+@views.after_app_request
+def finish_request_instrumentation(response):
+    if request.method != 'GET':
+        # Una escritura de este worker llega a sus streams sin esperar al siguiente sondeo
+        change_hub.wake()
+        # Si toca podar el registro de cambios, se hace después de enviar la respuesta
+        pruner = get_services().change_log_pruner
+        if pruner.due():
+            response.call_on_close(pruner.prune)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        response.headers['X-Profile-File'] = _dump_profile(profiler)
+
+    started = g.pop('request_started', None)
+    if started is not None and 'first_request_ms' not in get_services().startup:
+        record_first_request(get_services(), time.perf_counter() - started)
+    if started is not None and current_app.config['METRICS_ENABLED']:
+        # En respuestas en streaming (exportación) solo se mide hasta el primer byte
+        metrics.observe('algoritmo_http_request_duration_seconds', time.perf_counter() - started, {
+            'method': request.method,
+            'route': request.url_rule.rule if request.url_rule else 'unmatched',
+            'status': response.status_code
+        })
+        metrics.flush()
+    return response
+
+def metrics_authorized(header):
+    """Si la cabecera Authorization trae el METRICS_TOKEN o un usuario válido de la API"""
+    token = current_app.config['METRICS_TOKEN']
+    if token and header and header.startswith('Bearer '):
+        return hmac.compare_digest(header[len('Bearer '):].encode(), token.encode())
+    return authenticator.verify_header(header) is not None
+
+# Métricas en formato Prometheus, combinadas entre workers si METRICS_DIR está configurado
+@views.route('/metrics')
+def metrics_endpoint():
+    """Endpoint para Prometheus con latencias, llamadas a la base de datos y caché"""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Métricas deshabilitadas'}), 404
+    if not metrics_authorized(request.headers.get('Authorization')):
+        return authenticate()
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Endpoint de salud para monitoreo y pruebas automáticas
-@app.route('/health')
+@views.route('/health')
 def health_check():
     """Endpoint para verificar el estado de la aplicación"""
-    return jsonify({'status': 'healthy', 'message': 'TaskMaster API is running'})
+    services = get_services()
+    status = {'status': 'healthy', 'message': 'TaskMaster API is running',
+              'json': services.json_backend}
+    if current_app.config['CACHE_ENABLED']:
+        status['cache'] = services.database.cache_stats()
+    if current_app.config['STARTUP_TIMING']:
+        status['startup'] = services.startup
+    return jsonify(status)
+
+# Comando de mantenimiento: flask --app app prune-changes
+@views.cli.command('prune-changes')
+def prune_changes_command():
+    """Poda el registro de cambios conservando CHANGE_LOG_RETENTION entradas"""
+    get_services().ensure_schema()
+    deleted = database.prune_change_log(current_app.config['CHANGE_LOG_RETENTION'])
+    print(f'Entradas eliminadas del registro de cambios: {deleted}')
+
+# Comando de mantenimiento: flask --app app rebuild-search
+@views.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Reconstruye el índice de búsqueda de texto completo"""
+    get_services().ensure_schema()
+    database.rebuild_search_index()
+    print('Índice de búsqueda reconstruido')
+
+# Comando de mantenimiento: flask --app app archive-tasks
+@views.cli.command('archive-tasks')
+@click.option('--days', type=float, default=None,
+              help='Antigüedad mínima en días (por defecto ARCHIVE_AFTER_DAYS)')
+@click.option('--full-vacuum', is_flag=True,
+              help='Reescribe el archivo completo al terminar (bloquea la base mientras dura)')
+def archive_tasks_command(days, full_vacuum):
+    """Archiva las tareas completadas antiguas y compacta la base de datos"""
+    get_services().ensure_schema()
+    archiver = Archiver.from_config(database, current_app.config, after_days=days)
+    if not archiver.enabled:
+        raise click.UsageError('Indica --days o configura ARCHIVE_AFTER_DAYS')
+    result = archiver.run(full_vacuum=full_vacuum)
+    print(f'Tareas archivadas: {result.archived}; páginas liberadas: {result.released_pages}')
+
+# Utilidad: flask --app app hash-password (el resultado va en APP_PASSWORD_HASH o APP_USERS)
+@views.cli.command('hash-password')
+@click.password_option()
+def hash_password_command(password):
+    """Imprime el hash de una contraseña para configurar la autenticación"""
+    print(generate_password_hash(password))
+
+def record_first_request(services, elapsed):
+    """Guarda la duración de la primera petición del proceso (y la registra con STARTUP_TIMING)"""
+    services.startup['first_request_ms'] = round(elapsed * 1000, 2)
+    if current_app.config['STARTUP_TIMING']:
+        current_app.logger.info('Arranque (pid %s): primera petición %s %s en %.2f ms', os.getpid(),
+                                request.method, request.path, elapsed * 1000)
+
+def create_app(config=None):
+    """
+    Crea la aplicación con la configuración de config.py y los valores de `config` encima.
+    No toca la base de datos: con SCHEMA_INIT=lazy (por defecto) las migraciones se aplican
+    con la primera petición de cada proceso; con SCHEMA_INIT=eager se aplican aquí y se cierran
+    las conexiones, así con gunicorn --preload corren una sola vez en el proceso maestro y cada
+    worker abre sus propias conexiones después del fork.
+    
+    Args:
+        config (Optional[Mapping]): Valores que reemplazan los de Config (por ejemplo, en pruebas)
+    
+    Returns:
+        Flask: Aplicación lista para servir
+    
+    Raises:
+        ValueError: Si SCHEMA_INIT, STORAGE_BACKEND o WRITE_BEHIND_MODE no son válidos
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+    if app.config['SCHEMA_INIT'] not in ('lazy', 'eager'):
+        raise ValueError(f'SCHEMA_INIT inválido: {app.config["SCHEMA_INIT"]}')
+    if app.config['STARTUP_TIMING'] and app.logger.level == logging.NOTSET:
+        app.logger.setLevel(logging.INFO)
+    
+    services = Services(app.config)
+    app.extensions[EXTENSION] = services
+    # Serialización JSON: orjson si está instalado, json de la biblioteca estándar si no
+    services.json_backend = init_json(app, app.config['JSON_BACKEND'])
+    app.register_blueprint(views)
+    
+    # Plantillas: con TEMPLATE_CACHE_DIR las plantillas compiladas se guardan en disco y los
+    # workers nuevos no vuelven a compilarlas; además se cargan ahora y no en la primera petición
+    # (con --preload, una sola vez en el proceso maestro)
+    if app.config['TEMPLATE_CACHE_DIR']:
+        os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'])
+    for template_name in ('index.html', 'partials/task_list.html'):
+        app.jinja_env.get_template(template_name)
+    
+    describe_metrics(services.metrics)
+    services.metrics.add_collector(partial(_storage_samples, services, app.config))
+    
+    def log_reminder(reminder):
+        """Hook de avisos por defecto: deja constancia en el log de la aplicación"""
+        app.logger.info('Aviso: la tarea %s "%s" vence el %s', reminder.task['id'],
+                        reminder.task['title'], reminder.task['due_date'])
+    
+    services.scheduler.add_hook(log_reminder)
+    
+    if app.config['SCHEMA_INIT'] == 'eager':
+        schema_started = time.perf_counter()
+        services.ensure_schema()
+        # Ninguna conexión abierta aquí debe pasar a los workers: las reabren bajo demanda
+        services.storage.close()
+        services.startup['schema_ms'] = round((time.perf_counter() - schema_started) * 1000, 2)
+    
+    services.startup['create_app_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    if app.config['STARTUP_TIMING']:
+        app.logger.info('Arranque (pid %s): create_app en %.2f ms', os.getpid(),
+                        services.startup['create_app_ms'])
+    return app
+
+def __getattr__(name):
+    # `app` se crea al pedirla (gunicorn app:app, flask --app app, from app import app) y no al
+    # importar el módulo: quien solo necesita create_app no paga una aplicación de más
+    if name == 'app':
+        globals()['app'] = application = create_app()
+        return application
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 if __name__ == '__main__':
+    app = create_app()
     app.run(
         debug=app.config['DEBUG'],
         host=app.config['HOST'],
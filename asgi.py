@@ -0,0 +1,350 @@
+# algoRitmo.py - Modo de servicio asíncrono (ASGI)
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo expone la aplicación como ASGI. Las rutas principales de la API de
+# tareas se atienden de forma nativa con corrutinas sobre AsyncDatabase, así una espera de SQLite
+# no bloquea al worker; el resto de rutas (página principal, lotes, exportación, etc.) se delegan
+# a la aplicación Flask de app.py a través de asgiref.
+# Documentación ASGI: https://asgi.readthedocs.io/en/latest/specs/www.html
+# Documentación asgiref: https://github.com/django/asgiref
+#
+# Uso (dependencias opcionales en requirements-async.txt):
+#   pip install -r requirements-async.txt
+#   uvicorn asgi:application --workers 2
+#
+# Referencias:
+# - https://www.uvicorn.org/deployment/
+# - https://flask.palletsprojects.com/en/3.0.x/deploying/asgi/
+#
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from app import (EXTENSION, app, check_payload, list_etag_tag, parse_last_event_id,
+                 task_from_payload)
+from models.async_database import AsyncDatabase
+from models.query import TaskQuery
+
+# Los mismos servicios (caché, métricas, autenticación, cambios en vivo) que usan las rutas de Flask
+services = app.extensions[EXTENSION]
+authenticator, change_hub, metrics = services.authenticator, services.change_hub, services.metrics
+
+TASK_PATH = re.compile(r'^/api/tasks/(\d+)$')
+TOGGLE_PATH = re.compile(r'^/api/tasks/(\d+)/toggle$')
+
+
+class AsgiResponse:
+    """Respuesta HTTP mínima para enviar por ASGI."""
+
+    def __init__(self, body=b'', status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = dict(headers or {})
+
+    def _encoded_headers(self):
+        return [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in self.headers.items()]
+
+    async def send(self, send):
+        headers = self._encoded_headers()
+        headers.append((b'content-length', str(len(self.body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': self.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+class StreamingResponse(AsgiResponse):
+    """Respuesta enviada por partes desde un generador asíncrono, hasta que termina o el cliente se va."""
+
+    def __init__(self, chunks, receive, status=200, headers=None):
+        super().__init__(b'', status, headers)
+        self.chunks = chunks
+        self.receive = receive
+
+    async def _disconnected(self):
+        while (await self.receive())['type'] != 'http.disconnect':
+            pass
+
+    async def send(self, send):
+        await send({'type': 'http.response.start', 'status': self.status,
+                    'headers': self._encoded_headers()})
+        # La desconexión se comprueba entre partes: con SSE, como mucho un heartbeat después
+        disconnected = asyncio.ensure_future(self._disconnected())
+        try:
+            async for chunk in self.chunks:
+                if disconnected.done():
+                    return
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'),
+                            'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await self.chunks.aclose()
+
+
+def json_response(payload, status=200, headers=None):
+    """Crea una respuesta con el JSON serializado por el proveedor de Flask (igual que jsonify)"""
+    headers = dict(headers or {})
+    headers['Content-Type'] = 'application/json'
+    return AsgiResponse(app.json.dumps(payload).encode('utf-8'), status, headers)
+
+
+class Request:
+    """Datos de la petición ASGI que usan los manejadores."""
+
+    def __init__(self, scope, body, receive=None):
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                        for name, value in scope['headers']}
+        self.args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return None
+        try:
+            return app.json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class TaskApi:
+    """
+    Aplicación ASGI que atiende la API de tareas con corrutinas y delega lo demás a Flask.
+    Comparte con app.py la autenticación, la validación de consultas y el formato de ETag,
+    así ambos modos responden igual.
+    """
+
+    def __init__(self, db, fallback):
+        """
+        Args:
+            db (AsyncDatabase): Fachada asíncrona de la base de datos
+            fallback: Aplicación ASGI para las rutas no atendidas aquí
+        """
+        self.db = db
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            await self.fallback(scope, receive, send)
+            return
+
+        handler, params, rule = self._route(scope['method'], scope['path'])
+        if handler is None:
+            await self.fallback(scope, receive, send)
+            return
+        # Sin lifespan (o si falló) el esquema se aplica aquí; después solo lee un atributo
+        services.ensure_schema()
+        if services.scheduler_check_due():
+            # Con SCHEDULER_ENABLED=auto se consulta la base de datos: fuera del bucle
+            await asyncio.get_running_loop().run_in_executor(None, services.start_scheduler_if_needed)
+
+        started = time.perf_counter()
+        request = Request(scope, await self._read_body(receive), receive)
+        if not self._authorized(request):
+            response = AsgiResponse('Acceso restringido'.encode('utf-8'), 401, {
+                'WWW-Authenticate': 'Basic realm="Login Required"',
+                'Content-Type': 'text/html; charset=utf-8'
+            })
+        else:
+            response = await handler(request, *params)
+        # En respuestas en streaming solo se mide hasta el primer byte, como en Flask
+        elapsed = time.perf_counter() - started
+        await response.send(send)
+        if not isinstance(response, StreamingResponse):
+            elapsed = time.perf_counter() - started
+        if request.method != 'GET':
+            change_hub.wake()
+            # La poda del registro (ver models/retention.py) escribe en SQLite: fuera del bucle
+            pruner = services.change_log_pruner
+            if pruner.due():
+                await asyncio.get_running_loop().run_in_executor(None, pruner.prune)
+
+        # Misma métrica y etiquetas que las rutas atendidas por Flask
+        if app.config['METRICS_ENABLED']:
+            metrics.observe('algoritmo_http_request_duration_seconds', elapsed, {
+                'method': request.method, 'route': rule, 'status': response.status
+            })
+            metrics.flush()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Las rutas /api no pasan por el before_request de Flask que prepara el proceso
+                services.ensure_schema()
+                services.start_scheduler_if_needed()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                services.scheduler.stop()
+                self.db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    @staticmethod
+    def _authorized(request):
+        return authenticator.verify_header(request.headers.get('authorization')) is not None
+
+    def _route(self, method, path):
+        """
+        Obtiene el manejador, sus parámetros y la regla de ruta (con la sintaxis de Flask,
+        para las métricas), o (None, (), None) si la ruta va a Flask
+        """
+        if path == '/api/tasks':
+            return {'GET': self.get_tasks, 'POST': self.create_task}.get(method), (), path
+        if path == '/api/tasks/stream' and method == 'GET':
+            return self.stream_changes, (), path
+        match = TASK_PATH.match(path)
+        if match:
+            handler = {'GET': self.get_task, 'PUT': self.update_task,
+                       'DELETE': self.delete_task}.get(method)
+            return handler, (int(match.group(1)),), '/api/tasks/<int:task_id>'
+        match = TOGGLE_PATH.match(path)
+        if match and method == 'PUT':
+            return self.toggle_task, (int(match.group(1)),), '/api/tasks/<int:task_id>/toggle'
+        return None, (), None
+
+    async def _validators(self, request, tag):
+        """Calcula ETag y Last-Modified; devuelve también un 304 si el cliente ya está al día"""
+        generation, last_modified = await self.db.get_table_version()
+        headers = {
+            'ETag': quote_etag(f'{generation}-{tag}'),
+            'Last-Modified': http_date(datetime.fromtimestamp(last_modified, timezone.utc)),
+            'Cache-Control': 'private, no-cache'
+        }
+        if_none_match = request.headers.get('if-none-match')
+        if_modified_since = parse_date(request.headers.get('if-modified-since'))
+        if if_none_match:
+            matched = parse_etags(if_none_match).contains(f'{generation}-{tag}')
+        elif if_modified_since:
+            matched = datetime.fromtimestamp(last_modified, timezone.utc) <= if_modified_since
+        else:
+            matched = False
+        return headers, (AsgiResponse(b'', 304, headers) if matched else None)
+
+    async def get_tasks(self, request):
+        try:
+            query = TaskQuery.from_args(
+                request.args,
+                default_limit=app.config['TASKS_PAGE_SIZE'],
+                max_limit=app.config['TASKS_MAX_PAGE_SIZE']
+            )
+        except ValueError as error:
+            return json_response({'error': str(error)}, 400)
+
+        headers, not_modified = await self._validators(request, list_etag_tag(query))
+        if not_modified:
+            return not_modified
+
+        sync_token = await self.db.get_change_token()
+        tasks, next_cursor = await self.db.query_task_dicts(query)
+        return json_response({
+            'tasks': tasks,
+            'next_cursor': next_cursor,
+            'sync_token': str(sync_token)
+        }, 200, headers)
+
+    async def stream_changes(self, request):
+        if not app.config['SSE_ENABLED']:
+            return AsgiResponse(b'', 204)
+        try:
+            last_event_id = parse_last_event_id(
+                request.headers.get('last-event-id') or request.args.get('last_event_id'))
+        except ValueError as error:
+            return json_response({'error': str(error)}, 400)
+
+        # Solo la primera conexión del proceso arranca el hilo y lee el token de SQLite
+        loop = asyncio.get_running_loop()
+        cursor, preamble = await loop.run_in_executor(
+            None, change_hub.open, last_event_id, app.config['SSE_RETRY_MS'])
+        events = change_hub.stream_async(cursor, app.json.dumps, app.config['SSE_HEARTBEAT'],
+                                         app.config['SSE_MAX_DURATION'])
+
+        async def generate():
+            try:
+                yield preamble
+                async for chunk in events:
+                    yield chunk
+            finally:
+                await events.aclose()
+
+        return StreamingResponse(generate(), request.receive, 200, {
+            'Content-Type': 'text/event-stream; charset=utf-8',
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+    async def get_task(self, request, task_id):
+        headers, not_modified = await self._validators(request, f'task-{task_id}')
+        if not_modified:
+            return not_modified
+
+        task = await self.db.get_task_by_id(task_id)
+        if not task:
+            return json_response({'error': 'Tarea no encontrada'}, 404)
+        return json_response(task.to_dict(), 200, headers)
+
+    async def create_task(self, request):
+        data = request.json()
+        if not isinstance(data, dict) or 'title' not in data:
+            return json_response({'error': 'El título es requerido'}, 400)
+        error = check_payload(data)
+        if error:
+            return json_response({'error': error}, 400)
+
+        task = task_from_payload(data)
+        task.id = await self.db.create_task(task)
+        return json_response(task.to_dict(), 201)
+
+    async def update_task(self, request, task_id):
+        data = request.json()
+        if not data or not isinstance(data, dict):
+            return json_response({'error': 'Datos requeridos'}, 400)
+        error = check_payload(data)
+        if error:
+            return json_response({'error': error}, 400)
+
+        task = await self.db.patch_task(task_id, data)
+        if not task:
+            return json_response({'error': 'Tarea no encontrada'}, 404)
+
+        return json_response(task.to_dict())
+
+    async def delete_task(self, request, task_id):
+        task = await self.db.get_task_by_id(task_id)
+        if not task:
+            return json_response({'error': 'Tarea no encontrada'}, 404)
+
+        await self.db.delete_task(task_id)
+        return json_response({'message': 'Tarea eliminada exitosamente'})
+
+    async def toggle_task(self, request, task_id):
+        task = await self.db.toggle_task(task_id)
+        if not task:
+            return json_response({'error': 'Tarea no encontrada'}, 404)
+
+        return json_response(task.to_dict())
+
+
+application = TaskApi(
+    AsyncDatabase(services.database, max_readers=app.config['ASYNC_DB_READERS']),
+    WsgiToAsgi(app)
+)
@@ -0,0 +1,166 @@
+# algoRitmo.py - Autenticación Basic con contraseñas cifradas
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo verifica las credenciales de la autenticación HTTP Basic contra hashes
+# de werkzeug (scrypt o pbkdf2, lentos a propósito) para uno o varios usuarios. Como el navegador
+# reenvía la misma cabecera Authorization en cada petición (incluido el sondeo de la API), las
+# verificaciones correctas se guardan en una caché LRU con expiración, indexada por un HMAC de la
+# cabecera: un acierto cuesta microsegundos y la contraseña nunca queda en memoria en claro.
+# Documentación werkzeug.security: https://werkzeug.palletsprojects.com/en/3.0.x/utils/#module-werkzeug.security
+#
+# Uso:
+#   flask --app app hash-password      (imprime el hash para APP_PASSWORD_HASH o APP_USERS)
+#
+# Referencias:
+# - https://datatracker.ietf.org/doc/html/rfc7617
+# - https://docs.python.org/3/library/hmac.html#hmac.compare_digest
+#
+import hashlib
+import hmac
+import secrets
+from typing import Any, Dict, Mapping, Optional
+
+from werkzeug.datastructures import Authorization
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from models.cache import LRUCache
+
+# Prefijos de los hashes que genera werkzeug.security.generate_password_hash
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+def is_password_hash(value: str) -> bool:
+    """Indica si el valor ya es un hash de werkzeug y no una contraseña en claro"""
+    return value.startswith(HASH_PREFIXES) and value.count('$') == 2
+
+
+def parse_users(value: str) -> Dict[str, str]:
+    """
+    Lee la lista de usuarios de APP_USERS: pares usuario:hash separados por comas.
+    Los hashes de werkzeug contienen ':' pero no ',', así que se separa por el primer ':'.
+
+    Args:
+        value (str): Por ejemplo 'ana:scrypt:32768:8:1$sal$hash,luis:pbkdf2:sha256:600000$sal$hash'
+
+    Returns:
+        Dict[str, str]: Hash de contraseña por usuario
+
+    Raises:
+        ValueError: Si algún par no tiene el formato esperado
+    """
+    users = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        username, separator, password_hash = item.partition(':')
+        if not separator or not username or not is_password_hash(password_hash):
+            raise ValueError(f'APP_USERS inválido cerca de {username!r}: se espera usuario:hash')
+        users[username] = password_hash
+    return users
+
+
+class BasicAuthenticator:
+    """
+    Verifica cabeceras Authorization de tipo Basic contra hashes de contraseña.
+    Solo se guardan en caché las verificaciones correctas, así un intento fallido
+    siempre paga el coste completo del hash.
+    """
+
+    def __init__(self, users: Mapping[str, str], cache_size: int = 1024, cache_ttl: float = 300.0):
+        """
+        Inicializa el verificador.
+
+        Args:
+            users (Mapping[str, str]): Hash de contraseña por usuario
+            cache_size (int): Cabeceras verificadas que se recuerdan (0 desactiva la caché)
+            cache_ttl (float): Segundos que vale una verificación antes de repetir el hash
+        """
+        self.users = dict(users)
+        self.cache = LRUCache(max_entries=cache_size, ttl=cache_ttl) if cache_size > 0 else None
+        # Clave del HMAC, distinta en cada proceso: la caché no sirve fuera de él
+        self._secret = secrets.token_bytes(32)
+        self._dummy_hash: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'BasicAuthenticator':
+        """
+        Crea el verificador a partir de la configuración de Flask.
+        APP_USERS admite varios usuarios; APP_USER con APP_PASSWORD_HASH (o APP_PASSWORD,
+        que se cifra al arrancar) agrega uno más, como en versiones anteriores.
+
+        Args:
+            config (Mapping[str, Any]): app.config
+
+        Returns:
+            BasicAuthenticator: Verificador configurado
+        """
+        users = parse_users(config.get('APP_USERS') or '')
+        username = config.get('APP_USER')
+        if username:
+            password_hash = config.get('APP_PASSWORD_HASH')
+            password = config.get('APP_PASSWORD')
+            if not password_hash and password:
+                password_hash = password if is_password_hash(password) else generate_password_hash(password)
+            if password_hash:
+                users[username] = password_hash
+        return cls(
+            users,
+            cache_size=config.get('AUTH_CACHE_SIZE', 1024),
+            cache_ttl=config.get('AUTH_CACHE_TTL', 300.0)
+        )
+
+    def check(self, username: Optional[str], password: Optional[str]) -> bool:
+        """
+        Verifica usuario y contraseña con el hash (camino lento, sin caché).
+        La comparación final es de tiempo constante (hmac.compare_digest).
+
+        Args:
+            username (str): Usuario recibido
+            password (str): Contraseña recibida
+
+        Returns:
+            bool: True si las credenciales son válidas
+        """
+        password_hash = self.users.get(username or '')
+        if password_hash is None:
+            # Con un usuario inexistente se verifica contra un hash cualquiera para tardar
+            # lo mismo y no revelar qué usuarios existen (se genera al primer intento)
+            if self._dummy_hash is None:
+                self._dummy_hash = generate_password_hash(secrets.token_urlsafe(16))
+            check_password_hash(self._dummy_hash, password or '')
+            return False
+        return check_password_hash(password_hash, password or '')
+
+    def _cache_key(self, header: str) -> bytes:
+        return hmac.new(self._secret, header.encode('utf-8', 'surrogateescape'), hashlib.sha256).digest()
+
+    def verify_header(self, header: Optional[str]) -> Optional[str]:
+        """
+        Verifica una cabecera Authorization completa.
+
+        Args:
+            header (str): Valor de la cabecera (por ejemplo 'Basic YWRtaW46c2VjcmV0')
+
+        Returns:
+            Optional[str]: Usuario autenticado, o None si falta o no es válida
+        """
+        if not header or not self.users:
+            return None
+        key = self._cache_key(header) if self.cache is not None else None
+        if key is not None:
+            username = self.cache.get(key)
+            if username is not None:
+                return username
+        auth = Authorization.from_header(header)
+        if auth is None or auth.type != 'basic' or not self.check(auth.username, auth.password):
+            return None
+        if key is not None:
+            self.cache.set(key, auth.username)
+        return auth.username
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Aciertos y fallos de la caché de verificaciones"""
+        if self.cache is None:
+            return {'hits': 0, 'misses': 0}
+        return {'hits': self.cache.hits, 'misses': self.cache.misses}
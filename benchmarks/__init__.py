@@ -0,0 +1,16 @@
+# algoRitmo.py - Suite de benchmarks y pruebas de carga
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este paquete siembra bases de datos de prueba (1k, 100k, 1M tareas), ejecuta los
+# endpoints de la API contra la app en proceso o detrás de gunicorn/uvicorn, mide escenarios de la
+# capa de datos y guarda los resultados en JSON para compararlos con una línea base.
+#
+# Uso:
+#   python -m benchmarks --sizes 1k,100k
+#   python -m benchmarks --sizes 100k --target gunicorn --save-baseline benchmarks/baselines/main.json
+#   python -m benchmarks --sizes 100k --baseline benchmarks/baselines/main.json
+#
+# Referencias:
+# - https://docs.python.org/3/library/time.html#time.perf_counter
+# - https://docs.python.org/3/library/tracemalloc.html
+#
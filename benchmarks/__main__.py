@@ -0,0 +1,152 @@
+# algoRitmo.py - Punto de entrada de la suite de benchmarks
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo siembra (o reutiliza) una base de datos por tamaño, ejecuta los
+# escenarios de endpoints en un proceso aparte y los de la capa de datos aquí mismo, guarda el
+# reporte en JSON y termina con código 1 si alguna métrica pasa su límite o, si se indica una
+# línea base, si hay regresiones.
+#
+# Uso:
+#   python -m benchmarks --sizes 1k,100k,1m --target inprocess
+#   python -m benchmarks --sizes 100k --only endpoints --scenarios list,get,toggle
+#   python -m benchmarks --sizes 100k --save-baseline benchmarks/baselines/main.json
+#   python -m benchmarks --sizes 100k --baseline benchmarks/baselines/main.json --threshold 0.2
+#
+# Referencias:
+# - https://docs.python.org/3/library/argparse.html
+# - https://docs.python.org/3/library/subprocess.html
+#
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from .baseline import check_limits, compare, format_comparisons, load_report, save_baseline
+from .harness import REPO_DIR
+from .micro import MICRO_SCENARIOS, SIZE_INDEPENDENT
+from .seed import ensure_seeded, parse_size, size_label, working_copy
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_endpoint_suite(db_path: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Ejecuta benchmarks.endpoints en un proceso nuevo y devuelve su resultado"""
+    command = [sys.executable, '-m', 'benchmarks.endpoints', '--db', db_path,
+               '--target', args.target, '--requests', str(args.requests),
+               '--concurrency', str(args.concurrency), '--workers', str(args.workers)]
+    if args.scenarios:
+        endpoint_names = [name for name in args.scenarios.split(',') if name not in MICRO_SCENARIOS]
+        if not endpoint_names:
+            return {}
+        command += ['--scenarios', ','.join(endpoint_names)]
+    output = subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks y pruebas de carga de algoRitmo.py')
+    parser.add_argument('--sizes', default='1k,100k', help='Tamaños a sembrar: 1k,100k,1m')
+    parser.add_argument('--only', choices=('all', 'endpoints', 'micro'), default='all')
+    parser.add_argument('--scenarios', default='', help='Escenarios a ejecutar, separados por comas')
+    parser.add_argument('--target', choices=('inprocess', 'gunicorn', 'uvicorn'), default='inprocess')
+    parser.add_argument('--requests', type=int, default=200, help='Peticiones por escenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='Clientes concurrentes')
+    parser.add_argument('--workers', type=int, default=2, help='Workers de gunicorn/uvicorn')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=os.path.join(BENCH_DIR, 'data'),
+                        help='Directorio de las bases sembradas (se reutilizan entre corridas)')
+    parser.add_argument('--output', default=None, help='Archivo del reporte JSON')
+    parser.add_argument('--baseline', default=None, help='Línea base contra la que comparar')
+    parser.add_argument('--save-baseline', default=None, help='Guardar este reporte como línea base')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Empeoramiento relativo que cuenta como regresión (0.2 = 20 %%)')
+    args = parser.parse_args(argv)
+
+    selected = [name for name in args.scenarios.split(',') if name]
+    micro_names = [name for name in MICRO_SCENARIOS if not selected or name in selected]
+    results: Dict[str, Any] = {}
+    size_independent_done = set()
+
+    for size in [parse_size(value) for value in args.sizes.split(',') if value]:
+        label = size_label(size)
+        template = ensure_seeded(args.data_dir, size, seed=args.seed)
+        with tempfile.TemporaryDirectory(prefix='algoritmo-bench-') as workdir:
+            if args.only in ('all', 'endpoints'):
+                print(f'[{label}] endpoints ({args.target})', flush=True)
+                copy = working_copy(template, workdir, 'endpoints.db')
+                for name, metrics in run_endpoint_suite(copy, args).items():
+                    results[f'{label}/{args.target}/{name}'] = metrics
+
+            if args.only in ('all', 'micro'):
+                copy = working_copy(template, workdir, 'micro.db')
+                for name in micro_names:
+                    if name in SIZE_INDEPENDENT:
+                        if name in size_independent_done:
+                            continue
+                        size_independent_done.add(name)
+                        key = f'any/{name}'
+                    else:
+                        key = f'{label}/{name}'
+                    print(f'[{label}] {name}', flush=True)
+                    results[key] = MICRO_SCENARIOS[name](copy, workdir)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results', f'{time.strftime("%Y%m%d-%H%M%S")}.json')
+    save_baseline(report, output)
+    print(f'Reporte guardado en {output}')
+    if args.save_baseline:
+        save_baseline(report, args.save_baseline)
+        print(f'Línea base guardada en {args.save_baseline}')
+
+    for key, metrics in sorted(results.items()):
+        summary = ', '.join(f'{name}={value["value"]}' for name, value in metrics.items())
+        print(f'{key}: {summary}')
+
+    status = 0
+    exceeded = check_limits(report)
+    if exceeded:
+        print(f'\n{len(exceeded)} métricas fuera de su límite:')
+        print('\n'.join(exceeded))
+        status = 1
+
+    if args.baseline:
+        comparisons = compare(report, load_report(args.baseline), args.threshold)
+        print(f'\nComparación con {args.baseline} (umbral {args.threshold:.0%}):')
+        print(format_comparisons(comparisons))
+        regressions = [item for item in comparisons if item.regression]
+        if regressions:
+            print(f'\n{len(regressions)} regresiones detectadas')
+            return 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
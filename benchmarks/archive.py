@@ -0,0 +1,219 @@
+# algoRitmo.py - Latencia de los listados según crece el historial
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo mide si las consultas de todos los días (primera página de /api/tasks,
+# pendientes de alta prioridad, completadas, estadísticas y búsqueda) se mantienen planas cuando
+# el historial de completadas crece hasta millones de filas. Para cada tamaño de historial crea una
+# base con las mismas tareas vigentes, mide con todo en la tabla 'tasks', archiva el historial con
+# archive_tasks en lotes (models/archive.py), compacta y vuelve a medir. También informa cuánto
+# tarda cada lote (lo que dura el bloqueo de escritura), las filas por segundo y el tamaño del archivo.
+#
+# Uso:
+#   python -m benchmarks.archive                             # historial de 10k y 100k
+#   python -m benchmarks.archive --history 10k,100k,1m --hot 20k --batch-size 2000
+#   python -m benchmarks --sizes 10k --only micro --scenarios archive_growth
+#
+# Referencias:
+# - https://www.sqlite.org/pragma.html#pragma_incremental_vacuum
+# - https://use-the-index-luke.com/sql/partial-results/fetch-next-page
+#
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from models.database import Database
+from models.query import TaskQuery
+from models.task import Task
+
+from .harness import metric
+from .seed import PRIORITIES, WORDS, generate_tasks, parse_size, size_label
+
+Result = Dict[str, Dict[str, Any]]
+
+# Las tareas vigentes se crean desde 2024 (generate_tasks); el historial termina antes
+CUTOFF = '2023-01-01'
+
+# Consultas del camino caliente: las que hacen la página principal y la API en cada visita
+HOT_QUERIES: Dict[str, Callable[[Database], Any]] = {
+    'first_page': lambda db: db.query_task_dicts(TaskQuery(limit=50)),
+    'pending_high': lambda db: db.query_task_dicts(TaskQuery(status='pending', priority='high', limit=50)),
+    'completed_page': lambda db: db.query_task_dicts(TaskQuery(status='completed', sort='-updated_at',
+                                                               limit=50)),
+    'stats': lambda db: db.get_task_stats(),
+    'search': lambda db: db.search_tasks('presupuesto', limit=20),
+}
+
+
+def history_tasks(size: int, chunk_size: int = 10_000) -> Iterator[List[Task]]:
+    """
+    Genera `size` tareas completadas entre 2020 y 2022, en bloques y siempre iguales.
+
+    Args:
+        size (int): Número de tareas
+        chunk_size (int): Tareas por bloque
+
+    Yields:
+        List[Task]: Bloque de tareas
+    """
+    start = datetime(2020, 1, 1)
+    step = timedelta(seconds=max(1, 86400 * 365 * 3 // max(size, 1)))
+    chunk: List[Task] = []
+    for index in range(size):
+        stamp = (start + step * index).isoformat(timespec='microseconds')
+        chunk.append(Task(
+            title=f'{WORDS[index % len(WORDS)].capitalize()} histórico #{index}',
+            description=f'Tarea cerrada sobre {WORDS[(index * 7) % len(WORDS)]}',
+            priority=PRIORITIES[index % len(PRIORITIES)],
+            completed=True,
+            created_at=stamp,
+            updated_at=stamp
+        ))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_database(path: str, history: int, hot: int) -> Database:
+    """Base con `history` completadas antiguas seguidas de `hot` tareas vigentes"""
+    database = Database(path, pool_size=1)
+    database.init_database()
+    for chunk in history_tasks(history):
+        database.create_tasks(chunk)
+    for chunk in generate_tasks(hot, seed=11):
+        database.create_tasks(chunk)
+    database.compact_storage()
+    return database
+
+
+def hot_path_ms(database: Database, repeat: int) -> Dict[str, float]:
+    """Mediana en milisegundos de cada consulta de HOT_QUERIES (tras una pasada de calentamiento)"""
+    timings = {}
+    for name, query in HOT_QUERIES.items():
+        query(database)
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query(database)
+            durations.append(time.perf_counter() - start)
+        timings[name] = round(statistics.median(durations) * 1000, 3)
+    return timings
+
+
+def archive_history(database: Database, batch_size: int) -> Dict[str, float]:
+    """
+    Archiva todo lo anterior a CUTOFF en lotes y compacta, como una pasada de Archiver.
+
+    Returns:
+        Dict[str, float]: Filas movidas, filas por segundo, lote más lento y compactación en ms
+    """
+    batches = []
+    archived = 0
+    while True:
+        start = time.perf_counter()
+        moved = database.archive_tasks(CUTOFF, batch_size)
+        batches.append(time.perf_counter() - start)
+        archived += moved
+        if moved < batch_size:
+            break
+    start = time.perf_counter()
+    released = database.compact_storage(0)
+    compact = time.perf_counter() - start
+    return {
+        'archived': archived,
+        'rows_per_s': round(archived / sum(batches)) if archived else 0,
+        'batch_max_ms': round(max(batches) * 1000, 2),
+        'compact_ms': round(compact * 1000, 2),
+        'released_pages': released,
+    }
+
+
+def _file_mb(path: str) -> float:
+    return round(sum(os.path.getsize(path + suffix) for suffix in ('', '-wal')
+                     if os.path.exists(path + suffix)) / 1_048_576, 2)
+
+
+def measure_history(workdir: str, history: int, hot: int = 10_000, batch_size: int = 1000,
+                    repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Mide el camino caliente con `history` completadas en la tabla y después de archivarlas.
+
+    Args:
+        workdir (str): Directorio para la base temporal
+        history (int): Completadas antiguas
+        hot (int): Tareas vigentes (las mismas para cualquier historial)
+        batch_size (int): Tareas por lote de archivo
+        repeat (int): Repeticiones de cada consulta
+
+    Returns:
+        Dict[str, Dict[str, float]]: 'before', 'after' y 'archive' (ver archive_history)
+    """
+    path = os.path.join(workdir, f'archive-{size_label(history)}.db')
+    database = build_database(path, history, hot)
+    try:
+        before = hot_path_ms(database, repeat)
+        before['file_mb'] = _file_mb(path)
+        run = archive_history(database, batch_size)
+        after = hot_path_ms(database, repeat)
+        after['file_mb'] = _file_mb(path)
+    finally:
+        database.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return {'before': before, 'after': after, 'archive': run}
+
+
+def archive_growth(db_path: str, workdir: str, histories: tuple = (10_000, 100_000),
+                   hot: int = 10_000) -> Result:
+    """
+    Consultas del camino caliente con 10k y 100k completadas antiguas en la tabla y tras
+    archivarlas; las cifras 'archived' deberían ser iguales para cualquier historial
+    """
+    result: Result = {}
+    for history in histories:
+        label = size_label(history)
+        measured = measure_history(workdir, history, hot)
+        for name in HOT_QUERIES:
+            result[f'{label}_{name}_ms'] = metric(measured['before'][name])
+            result[f'{label}_{name}_archived_ms'] = metric(measured['after'][name])
+        result[f'{label}_archive_rows_per_s'] = metric(measured['archive']['rows_per_s'], 'higher')
+        result[f'{label}_archive_batch_max_ms'] = metric(measured['archive']['batch_max_ms'])
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.archive',
+                                     description='Latencia de los listados según crece el historial')
+    parser.add_argument('--history', default='10k,100k',
+                        help='Completadas antiguas por corrida, separadas por comas (ej. 10k,100k,1m)')
+    parser.add_argument('--hot', default='10k', help='Tareas vigentes en todas las corridas')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Tareas por lote de archivo')
+    parser.add_argument('--repeat', type=int, default=20, help='Repeticiones de cada consulta')
+    args = parser.parse_args(argv)
+
+    hot = parse_size(args.hot)
+    columns = list(HOT_QUERIES) + ['file_mb']
+    print(f'{"historial":>10} {"estado":>9} ' + ' '.join(f'{name:>15}' for name in columns))
+    with tempfile.TemporaryDirectory(prefix='algoritmo-archive-') as workdir:
+        for history in (parse_size(value) for value in args.history.split(',')):
+            measured = measure_history(workdir, history, hot, args.batch_size, args.repeat)
+            for state, label in (('before', 'en tabla'), ('after', 'archivado')):
+                print(f'{size_label(history):>10} {label:>9} '
+                      + ' '.join(f'{measured[state][name]:>15}' for name in columns))
+            run = measured['archive']
+            print(f'{"":>10} {"archivo":>9} {run["archived"]} filas, {run["rows_per_s"]} filas/s, '
+                  f'lote más lento {run["batch_max_ms"]} ms, compactación {run["compact_ms"]} ms, '
+                  f'{run["released_pages"]} páginas liberadas', flush=True)
+    print('Tiempos en ms (mediana); file_mb incluye el WAL')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
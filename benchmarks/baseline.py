@@ -0,0 +1,134 @@
+# algoRitmo.py - Líneas base y detección de regresiones
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo guarda los resultados de una corrida como línea base en JSON y compara
+# una corrida nueva contra ella. Cada métrica indica si es mejor más baja (latencia, memoria) o más
+# alta (throughput); se marca regresión cuando empeora más que el umbral relativo. Las métricas
+# con un límite propio (por ejemplo, que la memoria de la exportación no crezca con las filas)
+# se comprueban siempre, sin línea base.
+#
+# Referencias:
+# - https://docs.python.org/3/library/json.html
+#
+import json
+import os
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Por debajo de estos valores absolutos las diferencias son ruido de medición
+NOISE_FLOOR = {'ms': 0.5, 'us': 5.0, 'mb': 1.0}
+
+
+class Comparison(NamedTuple):
+    """Una métrica comparada contra la línea base."""
+    key: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+    regression: bool
+
+
+def save_baseline(report: Dict[str, Any], path: str) -> None:
+    """
+    Guarda un reporte como línea base.
+
+    Args:
+        report (Dict[str, Any]): Reporte generado por python -m benchmarks
+        path (str): Archivo JSON de destino
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    """Lee un reporte o línea base guardados"""
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def _is_noise(metric: str, baseline: float, current: float) -> bool:
+    for suffix, floor in NOISE_FLOOR.items():
+        if metric.endswith(f'_{suffix}') and abs(current - baseline) < floor:
+            return True
+    return False
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = 0.2) -> List[Comparison]:
+    """
+    Compara las métricas presentes en ambos reportes.
+
+    Args:
+        current (Dict[str, Any]): Reporte nuevo
+        baseline (Dict[str, Any]): Línea base
+        threshold (float): Empeoramiento relativo tolerado (0.2 = 20 %)
+
+    Returns:
+        List[Comparison]: Una entrada por métrica comparable
+    """
+    comparisons = []
+    for key, metrics in sorted(current['results'].items()):
+        previous = baseline.get('results', {}).get(key)
+        if not previous:
+            continue
+        for name, measured in sorted(metrics.items()):
+            before: Optional[Dict[str, Any]] = previous.get(name)
+            if not before or measured['value'] is None or before['value'] is None:
+                continue
+            old, new = float(before['value']), float(measured['value'])
+            if old == 0:
+                change = 0.0 if new == 0 else float('inf')
+            else:
+                change = (new - old) / abs(old)
+            worse = change > threshold if measured['better'] == 'lower' else change < -threshold
+            if name == 'requests' or _is_noise(name, old, new):
+                worse = False
+            comparisons.append(Comparison(key, name, old, new, change, worse))
+    return comparisons
+
+
+def check_limits(report: Dict[str, Any]) -> List[str]:
+    """
+    Busca las métricas que pasaron su límite.
+
+    Args:
+        report (Dict[str, Any]): Reporte generado por python -m benchmarks
+
+    Returns:
+        List[str]: Una línea por métrica fuera de su límite
+    """
+    exceeded = []
+    for key, metrics in sorted(report['results'].items()):
+        for name, measured in sorted(metrics.items()):
+            limit, value = measured.get('limit'), measured['value']
+            if limit is None or value is None:
+                continue
+            if value > limit if measured['better'] == 'lower' else value < limit:
+                exceeded.append(f'{key:<32} {name:<26} {value:>12g} (límite {limit:g})')
+    return exceeded
+
+
+def format_comparisons(comparisons: List[Comparison], only_regressions: bool = False) -> str:
+    """
+    Formatea la comparación como tabla de texto.
+
+    Args:
+        comparisons (List[Comparison]): Resultado de compare()
+        only_regressions (bool): Mostrar solo las regresiones
+
+    Returns:
+        str: Tabla lista para imprimir
+    """
+    lines = []
+    for item in comparisons:
+        if only_regressions and not item.regression:
+            continue
+        flag = 'REGRESIÓN' if item.regression else ''
+        change = f'{item.change * 100:+.1f}%' if item.change != float('inf') else 'nuevo'
+        lines.append(f'{item.key:<32} {item.metric:<26} {item.baseline:>12g} -> '
+                     f'{item.current:>12g} {change:>8} {flag}')
+    return '\n'.join(lines)
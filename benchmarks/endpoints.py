@@ -0,0 +1,197 @@
+# algoRitmo.py - Escenarios de carga sobre los endpoints de la API
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo recorre los endpoints de la app (página principal, listado con filtros
+# y cursor, CRUD, toggle, lotes, estadísticas, búsqueda, cambios, exportación y sondeo con ETag)
+# contra la app en proceso o un servidor local. Se ejecuta en un proceso propio por base de datos,
+# porque app.py lee la configuración (DATABASE_PATH) al importarse, e imprime el resultado en JSON.
+#
+# Uso directo (normalmente lo invoca python -m benchmarks):
+#   python -m benchmarks.endpoints --db /tmp/tasks.db --target inprocess --requests 200
+#
+# Referencias:
+# - https://flask.palletsprojects.com/en/3.0.x/testing/
+# - https://docs.gunicorn.org/en/stable/design.html
+#
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from .harness import InProcessTarget, RequestSpec, bench_env, run_load, server
+from .seed import WORDS
+
+
+class Scenario(NamedTuple):
+    """Un escenario: función que arma las peticiones, fracción de peticiones y códigos esperados."""
+    build: Callable[[Dict[str, Any], random.Random], Callable[[int], RequestSpec]]
+    share: float = 1.0
+    expect: Tuple[int, ...] = (200,)
+
+
+def _random_id(context: Dict[str, Any], rng: random.Random) -> int:
+    return rng.randint(1, context['max_id'])
+
+
+def _new_task(index: int) -> Dict[str, Any]:
+    return {'title': f'Benchmark {index}', 'description': 'Creada por la suite de benchmarks',
+            'priority': 'medium'}
+
+
+# Lecturas primero y escrituras después, para que las lecturas vean siempre la base sembrada.
+# `share` reduce las peticiones de los escenarios que recorren toda la tabla.
+SCENARIOS: Dict[str, Scenario] = {
+    'index': Scenario(lambda ctx, rng: lambda i: ('GET', '/', None, None), share=0.05),
+    'list': Scenario(lambda ctx, rng: lambda i: ('GET', '/api/tasks', None, None)),
+    'list_filtered': Scenario(lambda ctx, rng: lambda i: (
+        'GET', f'/api/tasks?status=pending&priority={rng.choice(("low", "medium", "high"))}',
+        None, None)),
+    'list_cursor': Scenario(lambda ctx, rng: lambda i: (
+        'GET', f'/api/tasks?cursor={ctx["cursor"]}', None, None)),
+    'get': Scenario(lambda ctx, rng: lambda i: (
+        'GET', f'/api/tasks/{_random_id(ctx, rng)}', None, None), expect=(200, 404)),
+    'etag_poll': Scenario(lambda ctx, rng: lambda i: (
+        'GET', '/api/tasks', None, {'If-None-Match': ctx['etag']}), expect=(304,)),
+    'stats': Scenario(lambda ctx, rng: lambda i: ('GET', '/api/tasks/stats', None, None)),
+    'search': Scenario(lambda ctx, rng: lambda i: (
+        'GET', f'/api/tasks/search?q={quote(rng.choice(WORDS))}', None, None)),
+    'changes': Scenario(lambda ctx, rng: lambda i: (
+        'GET', f'/api/tasks/changes?since={ctx["since"]}', None, None)),
+    'export': Scenario(lambda ctx, rng: lambda i: (
+        'GET', '/api/tasks/export?format=ndjson', None, None), share=0.02),
+    'create': Scenario(lambda ctx, rng: lambda i: ('POST', '/api/tasks', _new_task(i), None),
+                       expect=(201,)),
+    'update': Scenario(lambda ctx, rng: lambda i: (
+        'PUT', f'/api/tasks/{_random_id(ctx, rng)}',
+        {'title': f'Actualizada {i}', 'priority': rng.choice(('low', 'medium', 'high'))}, None),
+        expect=(200, 404)),
+    'toggle': Scenario(lambda ctx, rng: lambda i: (
+        'PUT', f'/api/tasks/{_random_id(ctx, rng)}/toggle', None, None), expect=(200, 404)),
+    'batch_create': Scenario(lambda ctx, rng: lambda i: (
+        'POST', '/api/tasks/batch', {'tasks': [_new_task(i * 100 + j) for j in range(100)]}, None),
+        share=0.1, expect=(200,)),
+    'batch_patch': Scenario(lambda ctx, rng: lambda i: (
+        'PATCH', '/api/tasks/batch',
+        {'tasks': [{'id': _random_id(ctx, rng), 'priority': 'high'} for _ in range(100)]}, None),
+        share=0.1, expect=(200, 207)),
+    'delete': Scenario(lambda ctx, rng: lambda i: (
+        'DELETE', f'/api/tasks/{ctx["deletable"].pop()}', None, None), expect=(200,)),
+}
+
+
+def prepare_context(target: Any, db_path: str, deletable: int) -> Dict[str, Any]:
+    """
+    Obtiene los datos que necesitan los escenarios: ID máximo, cursor de la segunda
+    página, ETag del listado, token de cambios e IDs que se pueden borrar.
+
+    Args:
+        target: Destino de las peticiones
+        db_path (str): Base de datos servida
+        deletable (int): Tareas a crear para el escenario de borrado
+
+    Returns:
+        Dict[str, Any]: Contexto de los escenarios
+    """
+    conn = sqlite3.connect(db_path)
+    max_id = conn.execute('SELECT IFNULL(MAX(id), 1) FROM tasks').fetchone()[0]
+    conn.close()
+
+    status, body, headers = target.request('GET', '/api/tasks')
+    if status != 200:
+        raise RuntimeError(f'GET /api/tasks respondió {status}')
+    page = json.loads(body)
+    sync_token = int(page['sync_token'])
+
+    ids: List[int] = []
+    for offset in range(0, deletable, 1000):
+        batch = [_new_task(index) for index in range(offset, min(deletable, offset + 1000))]
+        _, created, _ = target.request('POST', '/api/tasks/batch', {'tasks': batch})
+        ids.extend(item['task']['id'] for item in json.loads(created)['results'])
+
+    # El ETag se toma después de las escrituras previas para que el sondeo responda 304
+    _, _, headers = target.request('GET', '/api/tasks')
+    return {
+        'max_id': max_id,
+        'cursor': page['next_cursor'] or '',
+        'etag': headers.get('etag', ''),
+        'since': max(0, sync_token - 100),
+        'deletable': ids,
+    }
+
+
+@contextmanager
+def open_target(kind: str, db_path: str, workers: int) -> Iterator[Any]:
+    """
+    Crea el destino de las peticiones. En proceso se importa app.py aquí mismo, después
+    de fijar las variables de entorno de la base de datos del benchmark.
+    """
+    if kind == 'inprocess':
+        os.environ.update(bench_env(db_path))
+        from app import app
+        yield InProcessTarget(app)
+    else:
+        with server(kind, db_path, workers=workers) as target:
+            yield target
+
+
+def run_endpoints(db_path: str, target_kind: str = 'inprocess', requests: int = 200,
+                  concurrency: int = 1, workers: int = 2,
+                  names: Optional[List[str]] = None, seed: int = 42) -> Dict[str, Any]:
+    """
+    Ejecuta los escenarios de endpoints sobre una base de datos.
+
+    Args:
+        db_path (str): Copia de trabajo de la base de datos (se modifica)
+        target_kind (str): 'inprocess', 'gunicorn' o 'uvicorn'
+        requests (int): Peticiones por escenario (antes de aplicar `share`)
+        concurrency (int): Hilos concurrentes
+        workers (int): Workers del servidor cuando no es en proceso
+        names (Optional[List[str]]): Escenarios a ejecutar (todos si no se indica)
+        seed (int): Semilla para elegir IDs y términos
+
+    Returns:
+        Dict[str, Any]: Métricas por escenario
+    """
+    names = names or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f'Escenarios desconocidos: {", ".join(sorted(unknown))}')
+
+    rng = random.Random(seed)
+    results: Dict[str, Any] = {}
+    with open_target(target_kind, db_path, workers) as target:
+        counts = {name: max(3, int(requests * SCENARIOS[name].share)) for name in names}
+        context = prepare_context(target, db_path, counts.get('delete', 0))
+        for name in names:
+            scenario = SCENARIOS[name]
+            make_request = scenario.build(context, rng)
+            warmup = 0 if name in ('delete', 'create', 'batch_create') else min(5, counts[name])
+            print(f'  {name}: {counts[name]} peticiones', file=sys.stderr, flush=True)
+            results[name] = run_load(target, make_request, counts[name], concurrency=concurrency,
+                                     expect=scenario.expect, warmup=warmup)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description='Escenarios de carga sobre los endpoints')
+    parser.add_argument('--db', required=True, help='Copia de trabajo de la base de datos')
+    parser.add_argument('--target', default='inprocess', choices=('inprocess', 'gunicorn', 'uvicorn'))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--scenarios', default='', help='Lista separada por comas')
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.scenarios.split(',') if name] or None
+    results = run_endpoints(args.db, args.target, args.requests, args.concurrency,
+                            args.workers, names)
+    json.dump(results, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,688 @@
+# algoRitmo.py - Conformidad y rendimiento de los motores de almacenamiento
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo ejecuta las mismas comprobaciones y las mismas mediciones sobre cada
+# motor de TaskRepository (SQLite, memoria y PostgreSQL): cada comprobación empieza con un motor
+# vacío y verifica un contrato que la app da por hecho (orden y cursores de TaskQuery, registro
+# de cambios también con escrituras concurrentes, búsqueda, estadísticas, cambios parciales,
+# concesiones, el programador de avisos con un reloj simulado, el archivo de completadas y las
+# garantías de la cola write-behind). PostgreSQL se incluye si se indica BENCH_POSTGRES_URL;
+# cada motor de prueba vive en un esquema propio que se borra al terminar.
+#
+# Uso:
+#   python -m benchmarks.engines                          # conformidad: termina con 1 si algo falla
+#   BENCH_POSTGRES_URL=postgresql://postgres@127.0.0.1/algoritmo_test python -m benchmarks.engines
+#   python -m benchmarks --sizes 10k --only micro --scenarios storage_engines
+#
+# Referencias:
+# - https://www.psycopg.org/psycopg3/docs/api/conninfo.html
+# - https://www.postgresql.org/docs/current/ddl-schemas.html
+#
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from models.database import Database
+from models.memory import MemoryDatabase
+from models.postgres import PostgresDatabase
+from models.query import SORTS, TaskQuery
+from models.repository import TaskRepository, TaskUpdate
+from models.scheduler import Scheduler, SimulatedClock
+from models.task import Task
+from models.write_behind import WriteBehindQueue
+
+from .harness import REPO_DIR, metric
+from .seed import WORDS, generate_tasks
+
+Result = Dict[str, Dict[str, Any]]
+
+ENGINES = ('sqlite', 'memory', 'postgres')
+
+
+@contextmanager
+def open_engine(name: str, workdir: str) -> Iterator[TaskRepository]:
+    """
+    Crea un motor vacío e inicializado; al salir libera sus conexiones y borra sus datos.
+
+    Args:
+        name (str): 'sqlite', 'memory' o 'postgres'
+        workdir (str): Directorio para los archivos temporales
+
+    Yields:
+        TaskRepository: Motor listo para usarse
+    """
+    if name == 'sqlite':
+        engine: TaskRepository = Database(os.path.join(workdir, f'engine-{uuid.uuid4().hex}.db'))
+    elif name == 'memory':
+        engine = MemoryDatabase()
+    elif name == 'postgres':
+        with _postgres_schema() as dsn:
+            engine = PostgresDatabase(dsn)
+            engine.init_database()
+            try:
+                yield engine
+            finally:
+                engine.close()
+        return
+    else:
+        raise ValueError(f'Motor desconocido: {name}')
+    engine.init_database()
+    try:
+        yield engine
+    finally:
+        engine.close()
+
+
+@contextmanager
+def _postgres_schema() -> Iterator[str]:
+    """Crea un esquema propio en BENCH_POSTGRES_URL y devuelve un DSN que lo usa por defecto"""
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+
+    url = os.environ['BENCH_POSTGRES_URL']
+    schema = f'bench_{uuid.uuid4().hex[:12]}'
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(f'CREATE SCHEMA {schema}')
+    try:
+        yield make_conninfo(url, options=f'-csearch_path={schema}')
+    finally:
+        with psycopg.connect(url, autocommit=True) as conn:
+            conn.execute(f'DROP SCHEMA {schema} CASCADE')
+
+
+def _analyze(engine: Any) -> None:
+    import psycopg
+
+    with psycopg.connect(engine.dsn, autocommit=True) as conn:
+        conn.execute('ANALYZE')
+
+
+def available_engines() -> List[str]:
+    """Motores que se pueden probar aquí (PostgreSQL solo con BENCH_POSTGRES_URL)"""
+    return [name for name in ENGINES if name != 'postgres' or os.environ.get('BENCH_POSTGRES_URL')]
+
+
+# Comprobaciones de conformidad. Cada una recibe un motor vacío y falla con AssertionError
+
+def _sample_tasks(count: int = 40) -> List[Task]:
+    """Tareas con prioridades, estados, vencimientos y fechas variadas (y empates de fecha)"""
+    rng = random.Random(7)
+    tasks = []
+    for index in range(count):
+        created = f'2024-03-{1 + index // 4:02d}T10:00:00.000000'
+        tasks.append(Task(
+            title=f'{WORDS[index % len(WORDS)]} {index}',
+            description=f'detalle {rng.choice(WORDS)}',
+            priority=('low', 'medium', 'high')[index % 3],
+            due_date=f'2024-04-{1 + index % 5:02d}' if index % 4 else None,
+            completed=index % 5 == 0,
+            created_at=created,
+            updated_at=f'2024-05-{1 + rng.randrange(9):02d}T08:00:00.000000'
+        ))
+    return tasks
+
+
+def check_crud(engine: TaskRepository) -> None:
+    task_id = engine.create_task(Task('Comprar pan', 'integral', 'high', '2024-06-01'))
+    task = engine.get_task_by_id(task_id)
+    assert task is not None and task.id == task_id
+    assert (task.title, task.description, task.priority, task.due_date, task.completed) == \
+        ('Comprar pan', 'integral', 'high', '2024-06-01', False)
+
+    task.title = 'Comprar pan y leche'
+    task.completed = True
+    assert engine.update_task(task)
+    stored = engine.get_task_by_id(task_id)
+    assert stored.title == 'Comprar pan y leche' and stored.completed is True
+    assert stored.created_at == task.created_at
+
+    assert not engine.update_task(Task('No existe', id=task_id + 1000))
+    assert engine.delete_task(task_id)
+    assert engine.get_task_by_id(task_id) is None
+    assert not engine.delete_task(task_id)
+
+
+def check_query_order_and_cursor(engine: TaskRepository) -> None:
+    engine.create_tasks(_sample_tasks())
+    everything, _ = engine.query_task_dicts(TaskQuery())
+    filters = [{}, {'status': 'pending'}, {'status': 'completed'}, {'priority': 'high'},
+               {'due_date': '2024-04-02'}, {'status': 'pending', 'priority': 'low'}]
+    for sort, (column, direction) in SORTS.items():
+        for filters_ in filters:
+            expected = sorted(
+                (task for task in everything if all(
+                    (task['completed'] == (value == 'completed')) if field == 'status'
+                    else task[field] == value
+                    for field, value in filters_.items())),
+                key=lambda task: (task[column], task['id']), reverse=direction == 'DESC')
+            seen, cursor = [], None
+            while True:
+                page, cursor = engine.query_task_dicts(
+                    TaskQuery(sort=sort, limit=7, cursor=cursor, **filters_))
+                seen += page
+                if cursor is None:
+                    break
+            assert [task['id'] for task in seen] == [task['id'] for task in expected], (sort, filters_)
+    tasks, _ = engine.query_tasks(TaskQuery(priority='medium', limit=3))
+    assert len(tasks) == 3 and all(isinstance(task, Task) for task in tasks)
+
+
+def check_partial_updates(engine: TaskRepository) -> None:
+    first, second = engine.create_tasks([Task('Uno'), Task('Dos', priority='low')])
+    toggled = engine.toggle_task(first)
+    assert toggled.completed is True and toggled.updated_at >= toggled.created_at
+    assert engine.toggle_task(first).completed is False
+
+    patched = engine.patch_task(second, {'priority': 'high', 'id': 999, 'unknown': 1})
+    assert patched.id == second and patched.priority == 'high' and patched.title == 'Dos'
+
+    # Asignar 'completed' e invertirlo en el mismo cambio deja el valor invertido
+    results = engine.apply_task_updates([
+        TaskUpdate(first, {'completed': True}, toggle=True),
+        TaskUpdate(second + 1000, {'title': 'No existe'}),
+        TaskUpdate(second, {'title': 'Dos bis'}, updated_at='2030-01-01T00:00:00.000000'),
+    ])
+    assert results[0].completed is False and results[1] is None
+    assert results[2].title == 'Dos bis' and results[2].updated_at == '2030-01-01T00:00:00.000000'
+
+    patched = engine.patch_tasks([{'id': first, 'completed': True}, {'id': second + 1000}])
+    assert patched[0].completed is True and patched[1] is None
+    assert engine.apply_task_updates([]) == [] and engine.patch_tasks([]) == []
+
+
+def check_batches(engine: TaskRepository) -> None:
+    task_ids = engine.create_tasks([Task(f'Lote {index}') for index in range(25)])
+    assert len(set(task_ids)) == 25
+    assert [engine.get_task_by_id(task_id).title for task_id in task_ids] == \
+        [f'Lote {index}' for index in range(25)]
+    assert engine.create_tasks([]) == [] and engine.delete_tasks([]) == []
+
+    missing = max(task_ids) + 1000
+    assert engine.delete_tasks([task_ids[0], missing, task_ids[0], task_ids[1]]) == \
+        [True, False, False, True]
+    assert engine.get_task_by_id(task_ids[0]) is None
+
+    exported = [task for chunk in engine.iter_task_dicts(chunk_size=4) for task in chunk]
+    listed, _ = engine.query_task_dicts(TaskQuery())
+    assert exported == listed and len(exported) == 23
+
+
+def check_change_log(engine: TaskRepository) -> None:
+    assert engine.get_change_token() == 0
+    generation, _ = engine.get_table_version()
+    first, second, third = engine.create_tasks([Task('A'), Task('B'), Task('C')])
+    token = engine.get_change_token()
+    assert token == 3 and engine.get_generation() > generation
+
+    engine.toggle_task(second)
+    engine.delete_task(third)
+    changes = engine.get_changes(token)
+    assert [task['id'] for task in changes.changed] == [second] and changes.deleted == [third]
+    assert changes.next_token == token + 2 and not changes.has_more
+    assert engine.get_changes(changes.next_token) == (
+        [], [], changes.next_token, False)
+
+    events = engine.get_change_events(0, limit=4)
+    assert [(event.seq, event.op, event.task_id) for event in events] == \
+        [(1, 'insert', first), (2, 'insert', second), (3, 'insert', third), (4, 'update', second)]
+    assert events[2].task is None and events[3].task['completed'] is True
+    assert engine.get_changes(0, limit=2).has_more
+
+    assert engine.prune_change_log(keep=2) == 3
+    assert engine.get_changes(0) is None and engine.get_change_events(2) is None
+    assert engine.get_change_token() == 5
+    assert [event.seq for event in engine.get_change_events(3)] == [4, 5]
+    assert engine.prune_change_log(keep=0) == 2
+    # Con el registro vacío el token no retrocede
+    assert engine.get_change_token() == 5 and engine.get_change_events(5) == []
+    engine.create_task(Task('D'))
+    assert [event.seq for event in engine.get_change_events(5)] == [6]
+
+
+def check_concurrent_writes(engine: TaskRepository) -> None:
+    task_ids = engine.create_tasks([Task(f'Tarea {index}') for index in range(8)])
+    token = engine.get_change_token()
+    seen: List[int] = []
+    done = threading.Event()
+
+    def write(worker: int) -> None:
+        rng = random.Random(worker)
+        for step in range(15):
+            if step % 3 == 0:
+                engine.create_task(Task(f'Nueva {worker}-{step}'))
+            elif step % 3 == 1:
+                engine.toggle_task(rng.choice(task_ids))
+            else:
+                engine.patch_tasks([{'id': task_id, 'title': f'Lote {worker}-{step}'}
+                                    for task_id in rng.sample(task_ids, 3)])
+
+    def read() -> None:
+        # Quien sigue el registro mientras otros escriben no debe saltarse ninguna entrada
+        since = token
+        while True:
+            finished = done.is_set()
+            events = engine.get_change_events(since)
+            seen.extend(event.seq for event in events)
+            since = events[-1].seq if events else since
+            if finished and not events:
+                return
+
+    writers = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    reader = threading.Thread(target=read)
+    for thread in writers + [reader]:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    done.set()
+    reader.join()
+    # Por hilo: 5 inserciones, 5 toggles y 5 lotes de 3 tareas
+    assert len(seen) == 4 * (5 + 5 + 5 * 3) and seen == sorted(set(seen))
+    assert seen[-1] == engine.get_change_token()
+
+    # PostgreSQL: una transacción abierta no detiene las escrituras de las demás, y el
+    # registro queda en orden de commit (la que confirma primero lleva el seq menor)
+    if isinstance(engine, PostgresDatabase):
+        first, second = task_ids[:2]
+        hold = threading.Event()
+        opened = threading.Event()
+
+        def slow_write() -> None:
+            with engine._transaction() as conn:
+                conn.execute("UPDATE tasks SET title = 'Lenta' WHERE id = %s", (first,))
+                opened.set()
+                hold.wait(10)
+
+        slow = threading.Thread(target=slow_write)
+        slow.start()
+        opened.wait(10)
+        fast = threading.Thread(target=engine.patch_task, args=(second, {'title': 'Rápida'}))
+        fast.start()
+        fast.join(5)
+        blocked = fast.is_alive()
+        hold.set()
+        slow.join()
+        fast.join()
+        assert not blocked, 'una escritura esperó a otra transacción que no la afectaba'
+        events = engine.get_change_events(seen[-1])
+        assert [event.task_id for event in events] == [second, first]
+
+
+def check_search(engine: TaskRepository) -> None:
+    first, second, third = engine.create_tasks([
+        Task('Revisar presupuesto', 'con el <cliente>'),
+        Task('Llamar al cliente', 'presupuestos del trimestre'),
+        Task('Otra cosa', None),
+    ])
+    results, has_more = engine.search_tasks('presu')
+    assert [task['id'] for task in results] == [first, second] and not has_more
+    assert '<mark>' in results[0]['title_snippet']
+    assert '&lt;cliente&gt;' in results[0]['description_snippet']
+
+    results, _ = engine.search_tasks('CLIENTE presupuesto')
+    assert {task['id'] for task in results} == {first, second}
+    results, has_more = engine.search_tasks('presupuesto', limit=1)
+    assert len(results) == 1 and has_more
+    assert engine.search_tasks('   ') == ([], False)
+    assert engine.search_tasks('inexistente') == ([], False)
+
+    engine.patch_task(third, {'title': 'Presupuesto anual'})
+    engine.delete_task(first)
+    results, _ = engine.search_tasks('presupuesto')
+    assert [task['id'] for task in results] == [third, second]
+    assert results[0]['description_snippet'] is None
+
+
+def check_stats(engine: TaskRepository) -> None:
+    engine.create_tasks([
+        Task('A', priority='high', due_date='2024-01-01'),
+        Task('B', priority='high', due_date='2024-12-31'),
+        Task('C', priority='low', due_date='2024-01-01', completed=True),
+        Task('D', priority='low', due_date=''),
+        Task('E', priority='medium'),
+    ])
+    stats = engine.get_task_stats(today='2024-06-01')
+    assert {key: stats[key] for key in ('total', 'completed', 'pending', 'overdue')} == \
+        {'total': 5, 'completed': 1, 'pending': 4, 'overdue': 1}
+    assert stats['by_priority']['high'] == {'total': 2, 'completed': 0, 'pending': 2, 'overdue': 1}
+    assert stats['by_priority']['low'] == {'total': 2, 'completed': 1, 'pending': 1, 'overdue': 0}
+
+    tasks, _ = engine.query_tasks(TaskQuery(priority='high'))
+    engine.patch_task(tasks[0].id, {'priority': 'low', 'completed': True})
+    stats = engine.get_task_stats(today='2024-06-01')
+    assert stats['by_priority']['low']['completed'] == 2 and stats['by_priority']['high']['total'] == 1
+
+
+def check_recurrence_and_leases(engine: TaskRepository) -> None:
+    first, second, third = engine.create_tasks([
+        Task('Regar plantas', 'balcón', 'low', '2024-04-01', recurrence='FREQ=WEEKLY'),
+        Task('Pagar alquiler', due_date='2024-04-05', recurrence='FREQ=MONTHLY'),
+        Task('Sin regla', due_date='2024-04-03'),
+    ])
+    assert engine.get_task_by_id(first).recurrence == 'FREQ=WEEKLY'
+    assert [task['id'] for task in engine.get_due_task_dicts('2024-04-01', '2024-04-03')] == \
+        [first, third]
+    assert engine.get_completed_recurring_task_dicts() == []
+    # Solo se crea la ocurrencia de una tarea completada, y una sola vez
+    assert engine.spawn_occurrence(first, '2024-04-08') is None
+
+    engine.toggle_task(first)
+    assert engine.get_due_task_dicts('2024-04-01', '2024-04-03')[0]['id'] == third
+    assert [task['id'] for task in engine.get_completed_recurring_task_dicts()] == [first]
+    spawned = engine.spawn_occurrence(first, '2024-04-08')
+    assert spawned is not None and spawned.id not in (first, second, third)
+    assert (spawned.title, spawned.description, spawned.priority, spawned.due_date,
+            spawned.recurrence, spawned.completed) == \
+        ('Regar plantas', 'balcón', 'low', '2024-04-08', 'FREQ=WEEKLY', False)
+    assert engine.get_task_by_id(first).recurrence is None
+    assert engine.spawn_occurrence(first, '2024-04-08') is None
+    assert engine.get_completed_recurring_task_dicts() == []
+    assert engine.patch_task(second, {'recurrence': None}).recurrence is None
+
+    lease = engine.acquire_lease('prueba', 'a', 30.0, 1000.0, '5.0')
+    assert lease is not None and (lease.owner, lease.expires_at, lease.state) == ('a', 1030.0, '5.0')
+    assert engine.acquire_lease('prueba', 'b', 30.0, 1010.0) is None
+    # Renovar sin estado conserva el guardado
+    assert engine.acquire_lease('prueba', 'a', 30.0, 1020.0).state == '5.0'
+    assert engine.acquire_lease('prueba', 'b', 30.0, 1049.0) is None
+    taken = engine.acquire_lease('prueba', 'b', 30.0, 1050.0)
+    assert taken is not None and taken.owner == 'b' and taken.state == '5.0'
+    assert not engine.release_lease('prueba', 'a')
+    assert engine.release_lease('prueba', 'b')
+    assert engine.acquire_lease('prueba', 'a', 30.0, 1051.0, '9.0').state == '9.0'
+    assert engine.acquire_lease('otra', 'b', 30.0, 1051.0) is not None
+
+
+def check_scheduler(engine: TaskRepository) -> None:
+    # Dos procesos simulados sobre el mismo motor, con el reloj a las 12:00 del 1 de abril
+    clock = SimulatedClock(datetime(2024, 4, 1, 12).timestamp())
+    fired: Dict[str, List[int]] = {'a': [], 'b': []}
+    schedulers = {}
+    for name in fired:
+        schedulers[name] = Scheduler(engine, clock, horizon=3 * 86400, lease_ttl=30.0,
+                                     owner=name, batch_size=2)
+        schedulers[name].add_hook(lambda reminder, name=name: fired[name].append(reminder.task['id']))
+    # Sin vencimientos en el horizonte, repetidas ni trabajos no hace falta arrancar el hilo
+    assert not schedulers['a'].has_work()
+    first, second, third = engine.create_tasks([
+        Task('Hoy', due_date='2024-04-01'),
+        Task('Mañana', due_date='2024-04-02', recurrence='FREQ=DAILY'),
+        Task('Lejana', due_date='2024-05-01'),
+    ])
+    a, b = schedulers['a'], schedulers['b']
+    assert a.has_work() and engine.has_due_tasks('2024-04-02', '2024-04-02')
+    assert not engine.has_due_tasks('2024-04-04', '2024-04-30')
+    assert a.tick() == 0 and b.tick() == 0 and a.is_leader and not b.is_leader
+    assert a.stats()['scheduled'] == 1
+
+    # Lo creado después se sigue por el registro de cambios; lo completado ya no avisa
+    fourth = engine.create_task(Task('Pasado mañana', due_date='2024-04-03'))
+    late = engine.create_task(Task('Ya no avisa', due_date='2024-04-03'))
+    engine.toggle_task(late)
+    clock.advance(12 * 3600)
+    assert a.tick() == 1 and b.tick() == 0 and fired == {'a': [second], 'b': []}
+    clock.advance(10)
+    assert a.tick() == 0
+
+    # Completar la repetida crea la siguiente ocurrencia, saltando las fechas ya pasadas
+    engine.toggle_task(second)
+    clock.advance(5)
+    assert a.tick() == 1 and a.occurrences == 1
+    pending, _ = engine.query_tasks(TaskQuery(status='pending'))
+    occurrences = [task for task in pending if task.title == 'Mañana']
+    assert len(occurrences) == 1 and occurrences[0].due_date == '2024-04-03'
+    assert engine.get_completed_recurring_task_dicts() == []
+
+    # 'a' deja de renovar: 'b' toma la concesión al vencer y sigue desde la marca de agua guardada
+    clock.advance(31)
+    assert b.tick() == 0 and b.is_leader and a.tick() == 0 and not a.is_leader
+    clock.advance(86400)
+    while b.tick():
+        pass
+    assert sorted(fired['b']) == sorted([fourth, occurrences[0].id]) and fired['a'] == [second]
+    assert b.stats()['reminders'] == 2 and b.stats()['scheduled'] == 0
+    clock.advance(40 * 86400)
+    assert b.tick() == 1 and a.tick() == 0 and fired['b'][-1] == third
+    assert first not in fired['a'] + fired['b']
+    # Ya no queda nada por delante: ni avisos en el horizonte ni repetidas completadas
+    assert not a.has_work()
+
+    # Al detenerse la libera: 'a' la toma en su siguiente intento, sin esperar a que venza
+    b.stop()
+    clock.advance(10)
+    assert a.tick() == 0 and a.is_leader and not b.is_leader
+
+
+def check_archive(engine: TaskRepository) -> None:
+    old = [Task(f'Vieja {index}', priority=('low', 'high')[index % 2], completed=True,
+                created_at=f'2023-0{1 + index}-01T09:00:00.000000',
+                updated_at=f'2024-01-0{1 + index}T09:00:00.000000') for index in range(5)]
+    kept = [
+        Task('Vieja pendiente', updated_at='2024-01-01T08:00:00.000000'),
+        Task('Reciente', completed=True, updated_at='2024-03-01T09:00:00.000000'),
+        Task('Repetida', completed=True, recurrence='FREQ=WEEKLY',
+             updated_at='2024-01-01T07:00:00.000000'),
+    ]
+    old_ids = engine.create_tasks(old)
+    kept_ids = engine.create_tasks(kept)
+    token = engine.get_change_token()
+
+    # Lotes en orden de updated_at: el último vuelve incompleto
+    assert engine.archive_tasks('2024-02-01', limit=2) == 2
+    assert engine.archive_tasks('2024-02-01', limit=2) == 2
+    assert engine.archive_tasks('2024-02-01', limit=2) == 1
+    assert engine.archive_tasks('2024-02-01', limit=2) == 0
+    assert all(engine.get_task_by_id(task_id) is None for task_id in old_ids)
+    listed, _ = engine.query_task_dicts(TaskQuery())
+    assert sorted(task['id'] for task in listed) == sorted(kept_ids)
+    assert engine.get_task_stats(today='2024-06-01')['total'] == 3
+    events = engine.get_change_events(token)
+    # Dentro de un lote el orden de las bajas no está garantizado (PostgreSQL)
+    assert {event.op for event in events} == {'delete'}
+    assert sorted(event.task_id for event in events) == sorted(old_ids)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = engine.query_archived_task_dicts(
+            TaskQuery(sort='-updated_at', limit=2, cursor=cursor))
+        seen += page
+        if cursor is None:
+            break
+    assert [task['id'] for task in seen] == old_ids[::-1]
+    assert (seen[-1]['title'], seen[-1]['completed'], seen[-1]['created_at']) == \
+        ('Vieja 0', True, '2023-01-01T09:00:00.000000')
+    high, _ = engine.query_archived_task_dicts(TaskQuery(priority='high'))
+    assert [task['id'] for task in high] == [old_ids[3], old_ids[1]]
+    assert engine.query_archived_task_dicts(TaskQuery(status='pending')) == ([], None)
+
+    assert engine.compact_storage() >= 0 and engine.compact_storage(full=True) >= 0
+    assert engine.archive_tasks('2024-06-01') == 1
+    assert engine.get_task_by_id(kept_ids[2]).recurrence == 'FREQ=WEEKLY'
+
+
+# Proceso que escribe con la cola en modo async y muere sin cerrarla: confirma un cambio (la
+# ventana anterior), deja otro en la ventana actual y espera a que lo maten
+KILLED_WRITER = """
+import sys, time
+from models.database import Database
+from models.write_behind import WriteBehindQueue
+queue = WriteBehindQueue(Database(sys.argv[1]), flush_interval=3600, durable=False)
+queue.patch_task(int(sys.argv[2]), {'title': 'Confirmada'})
+queue.flush()
+queue.patch_task(int(sys.argv[3]), {'title': 'Perdida'})
+print('listo', flush=True)
+time.sleep(60)
+"""
+
+
+def check_write_behind(engine: TaskRepository) -> None:
+    first, second, third = engine.create_tasks([Task('Uno'), Task('Dos'), Task('Tres')])
+
+    # sync: lo que se responde ya está escrito
+    queue = WriteBehindQueue(engine, flush_interval=0.01, durable=True)
+    assert queue.toggle_task(first).completed is True
+    assert engine.get_task_by_id(first).completed is True
+    assert queue.patch_task(first + 1000, {'title': 'No existe'}) is None
+    queue.close()
+
+    # async: se responde con el estado previsto y se escribe al vaciar la cola
+    queue = WriteBehindQueue(engine, flush_interval=3600, durable=False)
+    predicted = queue.toggle_task(second)
+    assert predicted.completed is True and engine.get_task_by_id(second).completed is False
+    assert queue.patch_task(second, {'title': 'Dos bis'}).completed is True
+    assert queue.toggle_task(first + 1000) is None
+    assert queue.flush() == 1
+    stored = engine.get_task_by_id(second)
+    assert (stored.title, stored.completed) == ('Dos bis', True)
+
+    # Una escritura directa posterior a un cambio en cola gana, no la pisa el lote
+    queue.patch_task(first, {'title': 'En cola'})
+    direct = engine.get_task_by_id(first)
+    direct.title = 'Directa'
+    assert queue.update_task(direct) is True
+    queue.toggle_task(second)
+    assert queue.patch_tasks([{'id': second, 'completed': True}])[0].completed is True
+    queue.patch_task(third, {'title': 'Borrada'})
+    assert queue.delete_task(third) is True
+    assert queue.flush() == 0
+    assert engine.get_task_by_id(first).title == 'Directa'
+    assert engine.get_task_by_id(second).completed is True
+    assert engine.get_task_by_id(third) is None
+    queue.close()
+
+    # async con el proceso muerto (SIGKILL): solo se pierde la última ventana. Necesita un
+    # motor que otro proceso pueda abrir; se comprueba con SQLite
+    if isinstance(engine, Database):
+        process = subprocess.Popen([sys.executable, '-c', KILLED_WRITER, engine.db_path, str(first),
+                                    str(second)], cwd=REPO_DIR, stdout=subprocess.PIPE,
+                                   universal_newlines=True)
+        try:
+            assert process.stdout.readline().strip() == 'listo'
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+        assert engine.get_task_by_id(first).title == 'Confirmada'
+        assert engine.get_task_by_id(second).title == 'Dos bis'
+
+
+CHECKS: Dict[str, Callable[[TaskRepository], None]] = {
+    'crud': check_crud,
+    'query_order_and_cursor': check_query_order_and_cursor,
+    'partial_updates': check_partial_updates,
+    'batches': check_batches,
+    'change_log': check_change_log,
+    'concurrent_writes': check_concurrent_writes,
+    'search': check_search,
+    'stats': check_stats,
+    'recurrence_and_leases': check_recurrence_and_leases,
+    'scheduler': check_scheduler,
+    'archive': check_archive,
+    'write_behind': check_write_behind,
+}
+
+
+def run_conformance(engines: List[str], workdir: str) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Ejecuta todas las comprobaciones sobre cada motor.
+
+    Args:
+        engines (List[str]): Motores a probar
+        workdir (str): Directorio para los archivos temporales
+
+    Returns:
+        Dict[str, Dict[str, Optional[str]]]: Por motor y comprobación, None si pasó o el error
+    """
+    report: Dict[str, Dict[str, Optional[str]]] = {}
+    for name in engines:
+        report[name] = {}
+        for check_name, check in CHECKS.items():
+            try:
+                with open_engine(name, workdir) as engine:
+                    check(engine)
+                report[name][check_name] = None
+            except Exception:
+                report[name][check_name] = traceback.format_exc(limit=-2).strip()
+    return report
+
+
+def _mean_us(durations: List[float]) -> float:
+    return round(sum(durations) / len(durations) * 1_000_000, 2)
+
+
+def storage_engines(db_path: str, workdir: str, size: int = 10_000, repeat: int = 200) -> Result:
+    """
+    Conformidad de cada motor y el costo de sus operaciones más usadas sobre `size` tareas
+    sembradas igual en todos: lote de inserción, página del listado, página filtrada, lectura
+    por ID, toggle, búsqueda y estadísticas
+    """
+    result: Result = {}
+    engines = available_engines()
+    for name, checks in run_conformance(engines, workdir).items():
+        result[f'{name}_conformance_failures'] = metric(
+            sum(error is not None for error in checks.values()))
+
+    for name in engines:
+        with open_engine(name, workdir) as engine:
+            start = time.perf_counter()
+            for chunk in generate_tasks(size):
+                engine.create_tasks(chunk)
+            result[f'{name}_seed_ms'] = metric(round((time.perf_counter() - start) * 1000, 2))
+            if name == 'postgres':
+                # Tras la carga masiva autovacuum actualizaría las estadísticas en unos segundos;
+                # sin ellas el planificador todavía cree que la tabla está vacía
+                _analyze(engine)
+
+            rng = random.Random(1)
+            task_ids = [task['id'] for chunk in engine.iter_task_dicts() for task in chunk]
+            operations = {
+                'list_page': lambda: engine.query_task_dicts(TaskQuery(limit=50)),
+                'list_filtered': lambda: engine.query_task_dicts(
+                    TaskQuery(status='pending', priority='high', sort='-updated_at', limit=50)),
+                'get': lambda: engine.get_task_by_id(rng.choice(task_ids)),
+                'toggle': lambda: engine.toggle_task(rng.choice(task_ids)),
+                'search': lambda: engine.search_tasks(rng.choice(WORDS)[:4]),
+                'stats': lambda: engine.get_task_stats(),
+            }
+            for operation, function in operations.items():
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    function()
+                    durations.append(time.perf_counter() - start)
+                result[f'{name}_{operation}_us'] = metric(_mean_us(durations))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.engines',
+                                     description='Conformidad de los motores de almacenamiento')
+    parser.add_argument('--engines', default=','.join(available_engines()),
+                        help='Motores a probar, separados por comas')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='algoritmo-engines-') as workdir:
+        report = run_conformance([name for name in args.engines.split(',') if name], workdir)
+
+    failures = 0
+    for name, checks in report.items():
+        for check_name, error in checks.items():
+            print(f'{name:<9} {check_name:<24} {"ok" if error is None else "FALLA"}')
+            if error is not None:
+                failures += 1
+                print('    ' + error.replace('\n', '\n    '))
+    print(f'{failures} fallas')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
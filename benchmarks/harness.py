@@ -0,0 +1,321 @@
+# algoRitmo.py - Herramientas comunes de medición para los benchmarks
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define los destinos contra los que se lanzan peticiones (la app Flask
+# en proceso o un servidor gunicorn/uvicorn local), la ejecución concurrente de peticiones, el
+# cálculo de percentiles y la lectura de memoria (RSS) de un proceso.
+# Documentación http.client: https://docs.python.org/3/library/http.client.html
+# Documentación /proc: https://man7.org/linux/man-pages/man5/proc.5.html
+#
+# Referencias:
+# - https://docs.gunicorn.org/en/stable/settings.html
+# - https://www.uvicorn.org/settings/
+#
+import base64
+import http.client
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Credenciales con las que se arranca la app durante los benchmarks
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench'
+AUTH_HEADER = 'Basic ' + base64.b64encode(f'{BENCH_USER}:{BENCH_PASSWORD}'.encode()).decode()
+
+# (estado, cuerpo, cabeceras con nombres en minúsculas)
+Response = Tuple[int, bytes, Mapping[str, str]]
+RequestSpec = Tuple[str, str, Optional[Any], Optional[Dict[str, str]]]
+
+
+def metric(value: Optional[float], better: str = 'lower',
+           limit: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Empaqueta un valor medido junto con su dirección deseable y, si lo tiene, el valor
+    que no debe pasar (la corrida termina con código 1 si lo pasa, haya o no línea base).
+
+    Args:
+        value (Optional[float]): Valor medido
+        better (str): 'lower' si menos es mejor (latencia, memoria) o 'higher' (throughput)
+        limit (Optional[float]): Máximo ('lower') o mínimo ('higher') admitido
+
+    Returns:
+        Dict[str, Any]: {'value': ..., 'better': ...} y 'limit' si se indica
+    """
+    packed = {'value': value, 'better': better}
+    if limit is not None:
+        packed['limit'] = limit
+    return packed
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0,
+              response_bytes: int = 0) -> Dict[str, Dict[str, Any]]:
+    """
+    Resume las latencias de una serie de peticiones u operaciones.
+
+    Args:
+        latencies (List[float]): Duración de cada operación en segundos
+        elapsed (float): Tiempo total de la serie en segundos
+        errors (int): Operaciones fallidas
+        response_bytes (int): Bytes recibidos en total
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Métricas con su dirección deseable
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        'requests': metric(count, 'higher'),
+        'errors': metric(errors),
+        'throughput_rps': metric(round(count / elapsed, 2) if elapsed else 0.0, 'higher'),
+        'mean_ms': metric(round(sum(ordered) / count * 1000, 3) if count else 0.0),
+        'p50_ms': metric(round(percentile(ordered, 0.50) * 1000, 3)),
+        'p95_ms': metric(round(percentile(ordered, 0.95) * 1000, 3)),
+        'p99_ms': metric(round(percentile(ordered, 0.99) * 1000, 3)),
+        'bytes_per_request': metric(round(response_bytes / count) if count else 0),
+    }
+
+
+def process_rss_mb(pid: Optional[int] = None, include_children: bool = False) -> Optional[float]:
+    """
+    Memoria residente (RSS) de un proceso y opcionalmente de sus hijos, en MiB.
+    Solo en Linux; en otros sistemas devuelve None.
+
+    Args:
+        pid (Optional[int]): Proceso (el actual si no se indica)
+        include_children (bool): Sumar los procesos hijos (workers de gunicorn)
+
+    Returns:
+        Optional[float]: RSS en MiB o None si no se puede leer
+    """
+    pid = pid or os.getpid()
+    pids = [pid]
+    if include_children:
+        try:
+            for task in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{task}/children') as handle:
+                    pids.extend(int(child) for child in handle.read().split())
+        except OSError:
+            pass
+    total_kb = 0
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/status') as handle:
+                for line in handle:
+                    if line.startswith('VmRSS:'):
+                        total_kb += int(line.split()[1])
+                        break
+        except OSError:
+            if current == pid:
+                return None
+    return round(total_kb / 1024, 1)
+
+
+class InProcessTarget:
+    """
+    Lanza las peticiones contra la app Flask importada en este proceso, con un cliente
+    de pruebas por hilo. Mide la app sin red ni servidor de por medio.
+    """
+
+    name = 'inprocess'
+
+    def __init__(self, app: Any):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[Any] = None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        all_headers = {'Authorization': AUTH_HEADER, **(headers or {})}
+        response = client.open(path, method=method, json=body, headers=all_headers)
+        data = response.get_data()
+        return response.status_code, data, {name.lower(): value for name, value in response.headers.items()}
+
+    def rss_mb(self) -> Optional[float]:
+        return process_rss_mb()
+
+
+class HttpTarget:
+    """
+    Lanza las peticiones por HTTP a un servidor local, con una conexión por hilo
+    que http.client reabre cuando el servidor la cierra.
+    """
+
+    def __init__(self, name: str, host: str, port: int, server_pid: Optional[int] = None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.server_pid = server_pid
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[Any] = None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        all_headers = {'Authorization': AUTH_HEADER, **(headers or {})}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            all_headers['Content-Type'] = 'application/json'
+        try:
+            conn.request(method, path, body=payload, headers=all_headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (ConnectionError, http.client.HTTPException, socket.timeout):
+            conn.close()
+            self._local.conn = None
+            raise
+        return response.status, data, {name.lower(): value for name, value in response.getheaders()}
+
+    def rss_mb(self) -> Optional[float]:
+        if self.server_pid is None:
+            return None
+        return process_rss_mb(self.server_pid, include_children=True)
+
+
+def free_port() -> int:
+    """Obtiene un puerto TCP libre en localhost"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bench_env(db_path: str, **extra: str) -> Dict[str, str]:
+    """Variables de entorno con las que corre la app durante un benchmark"""
+    env = dict(os.environ)
+    env.update({
+        'DATABASE_PATH': db_path,
+        'APP_USER': BENCH_USER,
+        'APP_PASSWORD': BENCH_PASSWORD,
+        'FLASK_ENV': 'production',
+    })
+    env.update(extra)
+    return env
+
+
+@contextmanager
+def server(kind: str, db_path: str, workers: int = 2,
+           env: Optional[Dict[str, str]] = None) -> Iterator[HttpTarget]:
+    """
+    Arranca gunicorn (WSGI) o uvicorn (ASGI) sobre la base de datos indicada y espera a
+    que /health responda.
+
+    Args:
+        kind (str): 'gunicorn' o 'uvicorn'
+        db_path (str): Base de datos a servir
+        workers (int): Número de workers
+        env (Optional[Dict[str, str]]): Variables de entorno adicionales
+
+    Yields:
+        HttpTarget: Destino HTTP apuntando al servidor
+    """
+    port = free_port()
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(workers), '--log-level', 'warning']
+    elif kind == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                   '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+    else:
+        raise ValueError(f'Servidor desconocido: {kind}')
+
+    process = subprocess.Popen(command, cwd=REPO_DIR, env=bench_env(db_path, **(env or {})))
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{kind} terminó al arrancar (código {process.returncode})')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                conn.request('GET', '/health')
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'{kind} no respondió en 60 segundos')
+            time.sleep(0.2)
+        yield HttpTarget(kind, '127.0.0.1', port, server_pid=process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def run_load(target: Any, make_request: Callable[[int], RequestSpec], count: int,
+             concurrency: int = 1, expect: Tuple[int, ...] = (200,),
+             warmup: int = 0) -> Dict[str, Dict[str, Any]]:
+    """
+    Ejecuta `count` peticiones repartidas en `concurrency` hilos y resume el resultado.
+
+    Args:
+        target: InProcessTarget o HttpTarget
+        make_request (Callable): Recibe el número de petición y devuelve (método, ruta, cuerpo, cabeceras)
+        count (int): Peticiones medidas
+        concurrency (int): Hilos concurrentes
+        expect (Tuple[int, ...]): Códigos de estado que cuentan como éxito
+        warmup (int): Peticiones previas que no se miden
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Métricas de summarize() más la memoria del servidor
+    """
+    for index in range(warmup):
+        target.request(*make_request(-index - 1))
+
+    latencies: List[float] = []
+    errors = 0
+    received = 0
+    lock = threading.Lock()
+
+    def one(index: int) -> None:
+        nonlocal errors, received
+        spec = make_request(index)
+        start = time.perf_counter()
+        try:
+            status, data, _ = target.request(*spec)
+            ok = status in expect
+        except Exception:
+            status, data, ok = 0, b'', False
+        duration = time.perf_counter() - start
+        with lock:
+            latencies.append(duration)
+            received += len(data)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for index in range(count):
+            one(index)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(count)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, elapsed, errors, received)
+    result['rss_mb'] = metric(target.rss_mb())
+    return result
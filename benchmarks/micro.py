@@ -0,0 +1,719 @@
+# algoRitmo.py - Escenarios de la capa de datos y del servidor
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo mide decisiones concretas de la implementación contra su alternativa:
+# pool de conexiones frente a conectar en cada llamada, WAL frente a journal clásico con varios
+# procesos escribiendo, planes de consulta (que ningún filtro recorra la tabla), lotes frente a
+# inserciones sueltas, toggles directos frente a la cola write-behind, memoria de la exportación
+# en streaming, __slots__ en Task, FTS5 frente a LIKE, la caché de verificaciones de la
+# autenticación Basic, tiempo hasta el primer byte de la página principal, latencia del stream
+# de cambios (SSE) con muchos suscriptores, concurrencia de gunicorn (WSGI) frente a uvicorn (ASGI),
+# los motores de almacenamiento entre sí (ver engines.py) y los listados según crece el historial
+# de completadas, con y sin archivo (ver archive.py), y el render de la lista en el navegador
+# con 10k tareas (render.js, requiere Node y jsdom).
+# Documentación EXPLAIN QUERY PLAN: https://www.sqlite.org/eqp.html
+# Documentación tracemalloc: https://docs.python.org/3/library/tracemalloc.html
+# Documentación resource: https://docs.python.org/3/library/resource.html
+#
+# Referencias:
+# - https://www.sqlite.org/wal.html
+# - https://www.sqlite.org/fts5.html
+#
+import asyncio
+import base64
+import gc
+import http.client
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from werkzeug.security import generate_password_hash
+
+from auth import BasicAuthenticator
+from models.database import Database
+from models.events import ChangeHub
+from models.query import PRIORITIES, SORTS, STATUSES, TaskQuery, encode_cursor
+from models.scheduler import Scheduler, SimulatedClock
+from models.task import Task
+from models.write_behind import WriteBehindQueue
+
+from .archive import archive_growth
+from .engines import storage_engines
+from .harness import (AUTH_HEADER, BENCH_PASSWORD, BENCH_USER, REPO_DIR, metric, percentile,
+                      run_load, server, summarize)
+from .seed import WORDS, generate_tasks
+from .startup import cold_start
+
+Result = Dict[str, Dict[str, Any]]
+
+
+def _timed(function: Callable[[], Any], repeat: int) -> List[float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def _mean_us(durations: List[float]) -> float:
+    return round(sum(durations) / len(durations) * 1_000_000, 2)
+
+
+def _max_id(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT IFNULL(MAX(id), 1) FROM tasks').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def pool_vs_connect(db_path: str, workdir: str, repeat: int = 2000) -> Result:
+    """Lectura por ID con el pool de conexiones frente a abrir una conexión por llamada"""
+    database = Database(db_path)
+    max_id = _max_id(db_path)
+    rng = random.Random(1)
+    pooled = _timed(lambda: database.get_task_by_id(rng.randint(1, max_id)), repeat)
+    database.close()
+
+    def connect_per_call() -> None:
+        # Lo que hacía la versión anterior de Database en cada método
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute('SELECT * FROM tasks WHERE id = ?', (rng.randint(1, max_id),)).fetchone()
+        conn.close()
+
+    direct = _timed(connect_per_call, repeat)
+    return {
+        'pool_us': metric(_mean_us(pooled)),
+        'connect_per_call_us': metric(_mean_us(direct)),
+        'speedup': metric(round(sum(direct) / sum(pooled), 2), 'higher'),
+    }
+
+
+def _write_worker(db_path: str, journal_mode: str, inserts: int, queue: Any) -> None:
+    database = Database(db_path, pool_size=1, journal_mode=journal_mode)
+    latencies, errors = [], 0
+    for index in range(inserts):
+        start = time.perf_counter()
+        try:
+            database.create_task(Task(f'Escritura {os.getpid()}-{index}'))
+        except sqlite3.OperationalError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    database.close()
+    queue.put((latencies, errors))
+
+
+def wal_writes(db_path: str, workdir: str, processes: int = 4, inserts: int = 200) -> Result:
+    """Varios procesos insertando a la vez con journal WAL frente a DELETE (el modo por defecto)"""
+    result: Result = {}
+    context = multiprocessing.get_context('spawn')
+    for mode in ('WAL', 'DELETE'):
+        path = os.path.join(workdir, f'writes-{mode.lower()}.db')
+        Database(path, journal_mode=mode).init_database()
+        queue = context.Queue()
+        workers = [context.Process(target=_write_worker, args=(path, mode, inserts, queue))
+                   for _ in range(processes)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        outcomes = [queue.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        latencies = [value for durations, _ in outcomes for value in durations]
+        summary = summarize(latencies, elapsed, sum(errors for _, errors in outcomes))
+        for name in ('throughput_rps', 'p50_ms', 'p99_ms', 'errors'):
+            result[f'{mode.lower()}_{name}'] = summary[name]
+    return result
+
+
+def query_plans(db_path: str, workdir: str) -> Result:
+    """
+    Revisa con EXPLAIN QUERY PLAN todas las combinaciones de filtros y órdenes de TaskQuery,
+    con y sin cursor. Cuenta las que recorren la tabla completa u ordenan en un B-tree temporal.
+    Con filtro por fecha exacta se tolera el B-tree temporal: solo ordena las tareas de ese día.
+    """
+    conn = sqlite3.connect(db_path)
+    row = conn.execute('SELECT created_at, updated_at, id FROM tasks ORDER BY id LIMIT 1').fetchone()
+    full_scans, temp_sorts, checked = 0, 0, 0
+    for status, priority, due_date, sort, paged in itertools.product(
+            (None,) + STATUSES, (None,) + PRIORITIES, (None, '2025-01-01'), SORTS, (False, True)):
+        cursor = None
+        if paged and row:
+            column = SORTS[sort][0]
+            cursor = encode_cursor(row[0] if column == 'created_at' else row[1], row[2])
+        sql, params = TaskQuery(status, priority, due_date, sort, limit=50, cursor=cursor).to_sql()
+        plan = ' | '.join(detail for *_, detail in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        checked += 1
+        if 'SCAN tasks' in plan and 'USING' not in plan:
+            full_scans += 1
+        if 'TEMP B-TREE' in plan and due_date is None:
+            temp_sorts += 1
+    conn.close()
+    return {
+        'queries_checked': metric(checked, 'higher'),
+        'full_scans': metric(full_scans),
+        'temp_btree_sorts': metric(temp_sorts),
+    }
+
+
+def batch_vs_single(db_path: str, workdir: str, count: int = 1000) -> Result:
+    """Crear `count` tareas con create_tasks (un executemany) frente a create_task una a una"""
+    timings = {}
+    for mode in ('single', 'batch'):
+        path = os.path.join(workdir, f'batch-{mode}.db')
+        database = Database(path)
+        database.init_database()
+        tasks = [Task(f'Lote {index}') for index in range(count)]
+        start = time.perf_counter()
+        if mode == 'batch':
+            database.create_tasks(tasks)
+        else:
+            for task in tasks:
+                database.create_task(task)
+        timings[mode] = time.perf_counter() - start
+        database.close()
+    return {
+        'single_ms': metric(round(timings['single'] * 1000, 2)),
+        'batch_ms': metric(round(timings['batch'] * 1000, 2)),
+        'speedup': metric(round(timings['single'] / timings['batch'], 2), 'higher'),
+    }
+
+
+def toggle_writes(db_path: str, workdir: str, threads: int = 8, toggles: int = 100,
+                  hot_tasks: int = 20) -> Result:
+    """
+    Ráfaga de toggles concurrentes sobre pocas tareas: leer y reescribir la fila completa (como
+    antes), UPDATE ... RETURNING directo y la cola write-behind en modo 'sync' y 'async'.
+    Reporta el tiempo total y cuántas transacciones llegaron a SQLite.
+    """
+    def read_and_rewrite(database: Any, task_id: int) -> None:
+        task = database.get_task_by_id(task_id)
+        task.completed = not task.completed
+        database.update_task(task)
+
+    result: Result = {}
+    for mode in ('rewrite', 'returning', 'queue_sync', 'queue_async'):
+        path = os.path.join(workdir, f'toggle-{mode}.db')
+        database = Database(path)
+        database.init_database()
+        task_ids = database.create_tasks([Task(f'Toggle {index}') for index in range(hot_tasks)])
+        start_token = database.get_change_token()
+        target: Any = database
+        if mode.startswith('queue'):
+            # En 'sync' cada cliente espera su lote: sin ventana, se agrupa lo que llega
+            # mientras se confirma el lote anterior (group commit)
+            durable = mode == 'queue_sync'
+            target = WriteBehindQueue(database, flush_interval=0.0 if durable else 0.05,
+                                      durable=durable)
+
+        def client(seed: int) -> None:
+            rng = random.Random(seed)
+            for _ in range(toggles):
+                task_id = rng.choice(task_ids)
+                if mode == 'rewrite':
+                    read_and_rewrite(target, task_id)
+                else:
+                    target.toggle_task(task_id)
+
+        workers = [threading.Thread(target=client, args=(seed,)) for seed in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if isinstance(target, WriteBehindQueue):
+            target.close()
+        elapsed = time.perf_counter() - start
+        # Cada UPDATE confirmado deja una entrada en task_changes
+        rows_written = database.get_change_token() - start_token
+        database.close()
+        result[f'{mode}_ms'] = metric(round(elapsed * 1000, 2))
+        result[f'{mode}_rows_written'] = metric(rows_written)
+    return result
+
+
+# Exportación en streaming en un proceso nuevo, como la de /api/tasks/export: imprime el mayor RSS
+# visto tras cada bloque hasta la primera décima parte de las filas y hasta el final. Se muestrea
+# /proc/self/statm: ru_maxrss incluye el RSS que tenía el proceso padre al hacer fork
+EXPORT_RSS = """
+import json, os, resource, sys
+from models.database import Database
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1048576
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1048576 if sys.platform == 'darwin' else 1024)
+
+database = Database(sys.argv[1], pool_size=1)
+tenth, rows, peak, first = int(sys.argv[2]) // 10, 0, rss_mb(), None
+with open(os.devnull, 'w') as sink:
+    for chunk in database.iter_task_dicts(int(sys.argv[3])):
+        sink.write(''.join(json.dumps(task) + '\\n' for task in chunk))
+        rows += len(chunk)
+        peak = max(peak, rss_mb())
+        if first is None and rows >= tenth:
+            first = peak
+print(json.dumps({'rows': rows, 'first_mb': first, 'all_mb': peak}))
+"""
+
+# Cuánto puede crecer el RSS de la exportación al pasar de una décima parte de las filas a
+# todas (por ejemplo, de 100k a 1M): la caché de páginas de SQLite y el allocator de Python
+# se estabilizan, cargar la tabla en memoria lo pasa de largo
+EXPORT_RSS_RATIO_LIMIT = 1.15
+
+
+def export_memory(db_path: str, workdir: str, materialize_limit: int = 200_000,
+                  chunk_size: int = 500) -> Result:
+    """
+    Memoria de la exportación. El RSS del proceso (incluye la caché de páginas de SQLite y los
+    búferes del cursor) se mide en un proceso nuevo al exportar la décima parte de las filas y
+    al exportarlas todas, y la corrida falla si crece más que EXPORT_RSS_RATIO_LIMIT: con la base
+    de 1M es la comparación entre 100k y 1M filas. Además, el pico de memoria de Python al
+    exportar en bloques (iter_task_dicts) frente a cargar la tabla completa (get_all_tasks +
+    to_dict); la segunda solo se mide hasta `materialize_limit` filas para no agotar la memoria.
+    """
+    database = Database(db_path)
+    rows = _max_id(db_path)
+    result: Result = {}
+
+    process = subprocess.run([sys.executable, '-c', EXPORT_RSS, db_path, str(rows), str(chunk_size)],
+                             cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    rss = json.loads(process.stdout)
+    result['streamed_rss_first_tenth_mb'] = metric(round(rss['first_mb'], 1))
+    result['streamed_rss_mb'] = metric(round(rss['all_mb'], 1))
+    result['streamed_rss_ratio'] = metric(round(rss['all_mb'] / rss['first_mb'], 3),
+                                          limit=EXPORT_RSS_RATIO_LIMIT)
+
+    def streamed() -> None:
+        for chunk in database.iter_task_dicts(chunk_size):
+            for task in chunk:
+                json.dumps(task)
+
+    def materialized() -> None:
+        json.dumps([task.to_dict() for task in database.get_all_tasks()])
+
+    for name, export in (('streamed', streamed), ('materialized', materialized)):
+        if name == 'materialized' and rows > materialize_limit:
+            result[f'{name}_peak_mb'] = metric(None)
+            continue
+        # El tiempo se mide sin tracemalloc, que hace cada asignación varias veces más lenta
+        gc.collect()
+        start = time.perf_counter()
+        export()
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        tracemalloc.start()
+        export()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[f'{name}_peak_mb'] = metric(round(peak / 1024 / 1024, 2))
+        result[f'{name}_seconds'] = metric(round(elapsed, 3))
+    database.close()
+    return result
+
+
+def task_slots(db_path: str, workdir: str, count: int = 100_000) -> Result:
+    """Memoria y tiempo de construcción de `count` Task con __slots__ frente a una clase con __dict__"""
+    # Misma inicialización y métodos, pero sin __slots__: los atributos van a un __dict__
+    DictTask = type('DictTask', (), {key: value for key, value in vars(Task).items()
+                                     if key not in ('__slots__', '__dict__', '__weakref__')
+                                     and not isinstance(value, type(Task.id))})
+    rows = [task for chunk in generate_tasks(count, seed=7) for task in chunk]
+    result: Result = {}
+    for name, cls in (('slots', Task), ('dict', DictTask)):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        built = [cls(task.title, task.description, task.priority, task.due_date, task.completed,
+                     index, task.created_at, task.updated_at) for index, task in enumerate(rows)]
+        elapsed = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[f'{name}_bytes_per_task'] = metric(round(current / count))
+        result[f'{name}_build_ms'] = metric(round(elapsed * 1000, 2))
+        del built
+    return result
+
+
+def fts_vs_like(db_path: str, workdir: str, repeat: int = 20) -> Result:
+    """
+    Búsqueda con el índice FTS5 frente a LIKE '%texto%', que recorre la tabla hasta llenar
+    la página. Se mide con palabras comunes (LIKE encuentra 20 filas enseguida) y con
+    términos selectivos, como el número de una tarea (LIKE recorre casi toda la tabla).
+    """
+    max_id = _max_id(db_path)
+    rng = random.Random(3)
+    term_sets = {
+        'word': [rng.choice(WORDS) for _ in range(repeat)],
+        'selective': [str(rng.randint(1, max_id)) for _ in range(repeat)],
+    }
+    database = Database(db_path)
+    conn = sqlite3.connect(db_path)
+    result: Result = {}
+    for kind, terms in term_sets.items():
+        fts_terms, like_terms = list(terms), list(terms)
+        fts = _timed(lambda: database.search_tasks(fts_terms.pop(), limit=20), repeat)
+
+        def like() -> None:
+            pattern = f'%{like_terms.pop()}%'
+            conn.execute('SELECT * FROM tasks WHERE title LIKE ? OR description LIKE ? LIMIT 20',
+                         (pattern, pattern)).fetchall()
+
+        scans = _timed(like, repeat)
+        result[f'fts_{kind}_p95_ms'] = metric(round(percentile(sorted(fts), 0.95) * 1000, 3))
+        result[f'like_{kind}_p95_ms'] = metric(round(percentile(sorted(scans), 0.95) * 1000, 3))
+        result[f'{kind}_speedup'] = metric(round(sum(scans) / sum(fts), 2), 'higher')
+    conn.close()
+    database.close()
+    return result
+
+
+def scheduler_tick(db_path: str, workdir: str, repeat: int = 200) -> Result:
+    """
+    Costo del programador de avisos sobre la base sembrada (vencimientos a ±60 días): carga
+    inicial de la ventana, tick sin cambios, tick tras una escritura y, como referencia, el
+    recorrido de todas las pendientes con vencimiento que haría un programador sin montículo
+    """
+    database = Database(db_path)
+    clock = SimulatedClock(time.time())
+    scheduler = Scheduler(database, clock, owner='bench')
+    result: Result = {}
+    start = time.perf_counter()
+    scheduler.tick()
+    result['load_ms'] = metric(round((time.perf_counter() - start) * 1000, 2))
+    result['scheduled'] = metric(scheduler.stats()['scheduled'], 'higher')
+
+    def advance_and_tick() -> None:
+        clock.advance(0.001)
+        scheduler.tick()
+
+    result['idle_tick_us'] = metric(_mean_us(_timed(advance_and_tick, repeat)))
+    task_id = random.Random(5).randint(1, _max_id(db_path))
+
+    def write_and_tick() -> None:
+        database.toggle_task(task_id)
+        advance_and_tick()
+
+    # Número par de toggles: la tarea queda como estaba
+    result['tick_after_write_us'] = metric(_mean_us(_timed(write_and_tick, repeat * 2)))
+
+    conn = sqlite3.connect(db_path)
+    scan = _timed(lambda: conn.execute(
+        'SELECT * FROM tasks WHERE completed = 0 AND due_date IS NOT NULL').fetchall(),
+        max(1, repeat // 20))
+    result['full_scan_us'] = metric(_mean_us(scan))
+    conn.close()
+    scheduler.stop()
+    database.close()
+    return result
+
+
+def json_serialization(db_path: str, workdir: str, limit: int = 100_000) -> Result:
+    """
+    Serialización de hasta `limit` tareas: proveedor estándar de Flask frente a orjson
+    (json_provider.py), más el costo que tenía convertir las fechas desde y hacia datetime
+    antes de guardarlas como texto ISO 8601.
+    """
+    from datetime import datetime
+
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+
+    from json_provider import OrjsonProvider, orjson
+
+    database = Database(db_path)
+    tasks, _ = database.query_tasks(TaskQuery(limit=limit))
+    database.close()
+    app = Flask(__name__)
+
+    start = time.perf_counter()
+    payload = [task.to_dict() for task in tasks]
+    to_dict = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for task in tasks:
+        # Lo que hacían _row_to_task y to_dict con cada fecha
+        datetime.fromisoformat(task.created_at).isoformat()
+        datetime.fromisoformat(task.updated_at).isoformat()
+    roundtrip = time.perf_counter() - start
+
+    stdlib = min(_timed(lambda: DefaultJSONProvider(app).dumps(payload), 3))
+    result: Result = {
+        'tasks': metric(len(tasks), 'higher'),
+        'to_dict_ms': metric(round(to_dict * 1000, 2)),
+        'datetime_roundtrip_ms': metric(round(roundtrip * 1000, 2)),
+        'stdlib_ms': metric(round(stdlib * 1000, 2)),
+    }
+    if orjson is not None:
+        fast = min(_timed(lambda: OrjsonProvider(app).dumps(payload), 3))
+        result['orjson_ms'] = metric(round(fast * 1000, 2))
+        result['orjson_speedup'] = metric(round(stdlib / fast, 2), 'higher')
+    return result
+
+
+def auth_cache(db_path: str, workdir: str, repeat: int = 20, hits: int = 20_000) -> Result:
+    """
+    Costo por petición de la autenticación Basic: verificar el hash (primera petición o
+    credenciales inválidas) frente a un acierto de la caché de verificaciones
+    """
+    users = {BENCH_USER: generate_password_hash(BENCH_PASSWORD), 'otro': generate_password_hash('otro')}
+    wrong_header = 'Basic ' + base64.b64encode(f'{BENCH_USER}:incorrecta'.encode()).decode()
+
+    uncached = BasicAuthenticator(users, cache_size=0)
+    verify = _timed(lambda: uncached.verify_header(AUTH_HEADER), repeat)
+    rejected = _timed(lambda: uncached.verify_header(wrong_header), repeat)
+
+    cached = BasicAuthenticator(users)
+    cached.verify_header(AUTH_HEADER)
+    hit = _timed(lambda: cached.verify_header(AUTH_HEADER), hits)
+    return {
+        'hash_verify_ms': metric(round(sum(verify) / len(verify) * 1000, 2)),
+        'rejected_ms': metric(round(sum(rejected) / len(rejected) * 1000, 2)),
+        'cache_hit_us': metric(_mean_us(hit)),
+        'cache_hit_p99_us': metric(round(percentile(sorted(hit), 0.99) * 1_000_000, 2)),
+        'speedup': metric(round((sum(verify) / len(verify)) / (sum(hit) / len(hit)), 1), 'higher'),
+    }
+
+
+def _ttfb(conn: http.client.HTTPConnection, path: str) -> Tuple[float, int]:
+    """Tiempo hasta recibir el estado y las cabeceras (primer byte) y tamaño del cuerpo"""
+    start = time.perf_counter()
+    conn.request('GET', path, headers={'Authorization': AUTH_HEADER})
+    response = conn.getresponse()
+    elapsed = time.perf_counter() - start
+    return elapsed, len(response.read())
+
+
+def index_ttfb(db_path: str, workdir: str, repeat: int = 50) -> Result:
+    """
+    Tiempo hasta el primer byte de la página principal servida por gunicorn: con el fragmento
+    en caché, tras una escritura (hay que volver a renderizarlo) y, como referencia, lo que
+    costaba leer toda la tabla como hacía antes la ruta. Pensado para --sizes 50k.
+    """
+    writer = Database(db_path, pool_size=1)
+    # Migrar aquí y no en el servidor: así el esquema no cambia con esta conexión abierta
+    writer.init_database()
+    started = time.perf_counter()
+    all_tasks = writer.get_all_tasks()
+    full_read = time.perf_counter() - started
+    del all_tasks
+
+    with server('gunicorn', db_path, workers=1) as target:
+        conn = http.client.HTTPConnection(target.host, target.port, timeout=60)
+        _ttfb(conn, '/')
+        cached = []
+        for _ in range(repeat):
+            elapsed, page_bytes = _ttfb(conn, '/')
+            cached.append(elapsed)
+        # Cada tarea nueva cambia la versión de la tabla: el fragmento se vuelve a renderizar
+        rendered = []
+        for index in range(repeat):
+            writer.create_task(Task(title=f'Medición de TTFB #{index}'))
+            rendered.append(_ttfb(conn, '/')[0])
+        conn.close()
+    writer.close()
+
+    cached.sort()
+    rendered.sort()
+    return {
+        'cached_ttfb_ms': metric(round(percentile(cached, 0.5) * 1000, 2)),
+        'cached_ttfb_p95_ms': metric(round(percentile(cached, 0.95) * 1000, 2)),
+        'render_ttfb_ms': metric(round(percentile(rendered, 0.5) * 1000, 2)),
+        'render_ttfb_p95_ms': metric(round(percentile(rendered, 0.95) * 1000, 2)),
+        'page_kb': metric(round(page_bytes / 1024, 1)),
+        'full_table_read_ms': metric(round(full_read * 1000, 2)),
+    }
+
+
+async def _sse_subscriber(host: str, port: int, ready: asyncio.Event, pending: List[int],
+                          arrivals: List[float]) -> None:
+    """Abre /api/tasks/stream y anota cuándo llega cada evento 'created'"""
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write((f'GET /api/tasks/stream HTTP/1.1\r\nHost: {host}\r\n'
+                  f'Authorization: {AUTH_HEADER}\r\nAccept: text/event-stream\r\n\r\n').encode())
+    marker = b'event: created'
+    buffer = b''
+    try:
+        while b'retry:' not in buffer:
+            buffer += await reader.read(4096)
+        pending[0] -= 1
+        if pending[0] == 0:
+            ready.set()
+        buffer = b''
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            now = time.perf_counter()
+            buffer += chunk
+            arrivals.extend([now] * buffer.count(marker))
+            # Se conserva la cola por si el marcador llegó partido entre dos lecturas
+            buffer = buffer[buffer.rfind(marker) + len(marker):] if marker in buffer else buffer[-len(marker):]
+    finally:
+        writer.close()
+
+
+async def _sse_rounds(target: Any, writer: Database, subscribers: int, rounds: int) -> List[float]:
+    ready = asyncio.Event()
+    pending = [subscribers]
+    arrivals: List[List[float]] = [[] for _ in range(subscribers)]
+    clients = [asyncio.ensure_future(_sse_subscriber(target.host, target.port, ready, pending, arrivals[i]))
+               for i in range(subscribers)]
+    await asyncio.wait_for(ready.wait(), 60)
+
+    loop = asyncio.get_running_loop()
+    latencies = []
+    for index in range(rounds):
+        committed = await loop.run_in_executor(
+            None, lambda: (writer.create_task(Task(title=f'Evento SSE #{index}')), time.perf_counter())[1])
+        deadline = time.monotonic() + 10
+        while any(len(times) <= index for times in arrivals) and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        latencies.extend(times[index] - committed for times in arrivals if len(times) > index)
+    for client in clients:
+        client.cancel()
+    await asyncio.gather(*clients, return_exceptions=True)
+    return latencies
+
+
+async def _hub_rounds(hub: ChangeHub, writer: Database, subscribers: int, rounds: int) -> List[float]:
+    cursor = hub.start()
+    latencies = []
+    for _ in range(rounds):
+        arrivals: List[float] = []
+
+        async def subscriber(position: int) -> None:
+            await hub.wait_async(position, 10)
+            arrivals.append(time.perf_counter())
+
+        waiting = [asyncio.ensure_future(subscriber(cursor)) for _ in range(subscribers)]
+        await asyncio.sleep(0.05)
+        writer.create_task(Task(title='Evento del hub'))
+        committed = time.perf_counter()
+        hub.wake()
+        await asyncio.gather(*waiting)
+        latencies.extend(arrival - committed for arrival in arrivals)
+        cursor = hub.last_seq
+    return latencies
+
+
+def sse_fanout(db_path: str, workdir: str, subscribers: int = 1000, rounds: int = 20,
+               workers: int = 2) -> Result:
+    """
+    Latencia desde que se confirma una escritura hasta que llega a `subscribers` conexiones de
+    /api/tasks/stream abiertas contra uvicorn. La escritura la hace otro proceso, así los
+    workers solo la ven al consultar el registro (SSE_POLL_INTERVAL). Como referencia, el mismo
+    reparto dentro de un proceso con ChangeHub despertado tras la escritura, como hace la app
+    con las escrituras de sus propias peticiones.
+    """
+    writer = Database(db_path, pool_size=1)
+    writer.init_database()
+    result: Result = {}
+
+    hub = ChangeHub(Database(db_path, pool_size=1), poll_interval=3600)
+    hub_latencies = sorted(asyncio.run(_hub_rounds(hub, writer, subscribers, rounds)))
+    result['hub_p50_ms'] = metric(round(percentile(hub_latencies, 0.5) * 1000, 2))
+    result['hub_p99_ms'] = metric(round(percentile(hub_latencies, 0.99) * 1000, 2))
+
+    if importlib.util.find_spec('uvicorn') is None:
+        print('  uvicorn no está instalado; se omite el stream por HTTP', file=sys.stderr)
+    else:
+        poll_interval = 0.05
+        env = {'SSE_ENABLED': 'true', 'SSE_POLL_INTERVAL': str(poll_interval)}
+        with server('uvicorn', db_path, workers=workers, env=env) as target:
+            latencies = sorted(asyncio.run(_sse_rounds(target, writer, subscribers, rounds)))
+        result['missed'] = metric(subscribers * rounds - len(latencies))
+        result['poll_interval_ms'] = metric(poll_interval * 1000)
+        result['stream_p50_ms'] = metric(round(percentile(latencies, 0.5) * 1000, 2))
+        result['stream_p99_ms'] = metric(round(percentile(latencies, 0.99) * 1000, 2))
+        result['stream_max_ms'] = metric(round(latencies[-1] * 1000, 2) if latencies else None)
+    writer.close()
+    return result
+
+
+def server_concurrency(db_path: str, workdir: str, connections: int = 200,
+                       requests: int = 2000, workers: int = 2) -> Result:
+    """
+    Muchas conexiones simultáneas contra GET /api/tasks/<id> con gunicorn (workers síncronos)
+    y con uvicorn (asgi.py). Uvicorn se omite si no está instalado (requirements-async.txt).
+    """
+    result: Result = {}
+    max_id = _max_id(db_path)
+    rng = random.Random(5)
+    for kind in ('gunicorn', 'uvicorn'):
+        if importlib.util.find_spec(kind) is None:
+            print(f'  {kind} no está instalado; se omite', file=sys.stderr)
+            continue
+        with server(kind, db_path, workers=workers) as target:
+            summary = run_load(target, lambda i: ('GET', f'/api/tasks/{rng.randint(1, max_id)}',
+                                                  None, None),
+                               requests, concurrency=connections, expect=(200, 404), warmup=20)
+        for name in ('throughput_rps', 'p50_ms', 'p99_ms', 'errors', 'rss_mb'):
+            result[f'{kind}_{name}'] = summary[name]
+    return result
+
+
+def client_render(db_path: str, workdir: str, count: int = 10_000) -> Result:
+    """
+    Render de la lista con `count` tareas en jsdom (benchmarks/render.js): primer render,
+    render sin cambios, un toggle optimista frente a reconstruir la lista, índices frente a
+    .filter() encadenados y búsqueda binaria frente a findIndex. Se omite sin Node o sin jsdom.
+    """
+    node = shutil.which('node')
+    if node is None:
+        print('  node no está instalado; se omite', file=sys.stderr)
+        return {}
+    process = subprocess.run([node, os.path.join('benchmarks', 'render.js'), '--tasks', str(count),
+                              '--json'], cwd=REPO_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines() or ['sin salida']
+        print(f'  render.js falló ({lines[-1]}); se omite', file=sys.stderr)
+        return {}
+    return {name: metric(value) for name, value in json.loads(process.stdout).items()}
+
+
+# Escenarios en el orden en que se ejecutan. Todos reciben la copia de trabajo y un directorio
+# temporal; los que crean sus propias bases no dependen del tamaño sembrado.
+MICRO_SCENARIOS: Dict[str, Callable[[str, str], Result]] = {
+    'pool_vs_connect': pool_vs_connect,
+    'query_plans': query_plans,
+    'fts_vs_like': fts_vs_like,
+    'export_memory': export_memory,
+    'task_slots': task_slots,
+    'json_serialization': json_serialization,
+    'auth_cache': auth_cache,
+    'scheduler_tick': scheduler_tick,
+    'batch_vs_single': batch_vs_single,
+    'toggle_writes': toggle_writes,
+    'wal_writes': wal_writes,
+    'index_ttfb': index_ttfb,
+    'cold_start': cold_start,
+    'sse_fanout': sse_fanout,
+    'server_concurrency': server_concurrency,
+    'storage_engines': storage_engines,
+    'archive_growth': archive_growth,
+    'client_render': client_render,
+}
+
+# Escenarios que no usan la base sembrada: basta con ejecutarlos una vez por corrida
+SIZE_INDEPENDENT = frozenset({'task_slots', 'batch_vs_single', 'toggle_writes', 'wal_writes',
+                              'auth_cache', 'sse_fanout', 'storage_engines', 'archive_growth',
+                              'client_render'})
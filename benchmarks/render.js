@@ -0,0 +1,192 @@
+/**
+ * algoRitmo.py - Render de la lista de tareas sin navegador
+ * Proyecto: algoRitmo.py
+ * Autor: JuanFuent.es
+ * Descripción: Este archivo carga static/js/app.js en jsdom con la plantilla de tarjeta de
+ * templates/index.html y N tareas en #initialData, y mide el render de la lista: el primero,
+ * volver a renderizar sin cambios, un toggle optimista (upsertTask + renderTasks, que solo
+ * cambia una tarjeta) frente a reconstruir toda la lista como antes, cambiar de filtro con los
+ * índices de TaskIndex frente a .filter() encadenados, y el costo de ubicar una tarea en la
+ * lista con búsqueda binaria frente a findIndex. IndexedDB y EventSource no existen en jsdom:
+ * la app sigue con la copia solo en memoria, como en un navegador sin IndexedDB.
+ *
+ * Uso (requiere Node 18+ y jsdom, que no forma parte de requirements.txt):
+ *   npm install --no-save jsdom
+ *   node benchmarks/render.js                     # 10k tareas
+ *   node benchmarks/render.js --tasks 50000 --json
+ *   python -m benchmarks --sizes 1k --only micro --scenarios client_render
+ *
+ * Referencias:
+ * - https://github.com/jsdom/jsdom#executing-scripts
+ * - https://developer.mozilla.org/en-US/docs/Web/API/Performance/now
+ */
+const fs = require('fs');
+const path = require('path');
+const { performance } = require('perf_hooks');
+
+const REPO_DIR = path.dirname(__dirname);
+const PRIORITIES = ['low', 'medium', 'high'];
+const WORDS = ['revisar', 'informe', 'cliente', 'reunión', 'factura', 'diseño', 'servidor',
+               'correo', 'presupuesto', 'migración', 'pruebas', 'despliegue', 'soporte'];
+
+function loadJsdom() {
+    try {
+        return require('jsdom');
+    } catch (error) {
+        console.error('jsdom no está instalado (npm install --no-save jsdom)');
+        process.exit(2);
+    }
+}
+
+// Tareas deterministas con el mismo formato que /api/tasks, ordenadas como la lista
+function generateTasks(count) {
+    let state = 42;
+    const random = () => {
+        state = (state * 1103515245 + 12345) % 2147483648;
+        return state / 2147483648;
+    };
+    const start = Date.UTC(2024, 0, 1);
+    const tasks = [];
+    for (let index = 0; index < count; index++) {
+        const created = new Date(start + index * 60000).toISOString().slice(0, 23) + '000';
+        const due = random() < 0.7
+            ? new Date(start + Math.floor(random() * 730) * 86400000).toISOString().slice(0, 10)
+            : null;
+        tasks.push({
+            id: index + 1,
+            title: `${WORDS[index % WORDS.length]} #${index}`,
+            description: `Tarea de prueba sobre ${WORDS[(index * 7) % WORDS.length]}`,
+            priority: PRIORITIES[Math.floor(random() * 3)],
+            due_date: due,
+            recurrence: index % 50 === 0 ? 'FREQ=WEEKLY' : null,
+            completed: random() < 0.3,
+            created_at: created,
+            updated_at: created
+        });
+    }
+    return tasks.reverse();
+}
+
+// Página mínima: los elementos que usa renderTasks, la plantilla real y los datos iniciales
+function buildPage(tasks) {
+    const index = fs.readFileSync(path.join(REPO_DIR, 'templates', 'index.html'), 'utf8');
+    const template = index.match(/<template id="taskTemplate">[\s\S]*?<\/template>/)[0];
+    const data = { page_size: tasks.length, tasks, next_cursor: null, sync_token: '0',
+                   stream: false, etags: {}, stats: {} };
+    return `<!DOCTYPE html><html><body>
+        <span id="taskCount"></span>
+        <div id="emptyState"></div>
+        <div id="tasksContainer"></div>
+        <div id="loadMoreBtn"></div>
+        ${template}
+        <script type="application/json" id="initialData">${JSON.stringify(data).replace(/</g, '\\u003c')}</script>
+    </body></html>`;
+}
+
+function timed(fn) {
+    const start = performance.now();
+    fn();
+    return performance.now() - start;
+}
+
+function median(values) {
+    const sorted = values.slice().sort((a, b) => a - b);
+    return sorted[Math.floor(sorted.length / 2)];
+}
+
+function round(value) {
+    return Math.round(value * 1000) / 1000;
+}
+
+async function run(count, repeat) {
+    const { JSDOM } = loadJsdom();
+    const tasks = generateTasks(count);
+    const dom = new JSDOM(buildPage(tasks), { runScripts: 'outside-only', url: 'http://localhost/' });
+    const { window } = dom;
+    window.requestAnimationFrame = callback => setTimeout(callback, 0);
+    window.eval(fs.readFileSync(path.join(REPO_DIR, 'static', 'js', 'app.js'), 'utf8'));
+    // La app se crea sola con DOMContentLoaded; después se espera a que termine restoreCache()
+    await new Promise(resolve => window.addEventListener('load', resolve));
+    await new Promise(resolve => setTimeout(resolve, 0));
+    const manager = window.taskManager;
+    const container = window.document.getElementById('tasksContainer');
+    const results = {};
+
+    results.first_render_ms = timed(() => manager.renderTasks());
+    if (container.children.length !== count) {
+        throw new Error(`Se esperaban ${count} tarjetas y hay ${container.children.length}`);
+    }
+    results.rerender_unchanged_ms = median(Array.from({ length: repeat }, () => timed(() => manager.renderTasks())));
+
+    // Toggle optimista de una tarea a mitad de la lista: solo se cambia su tarjeta
+    const middle = manager.tasks[Math.floor(count / 2)];
+    const toggles = [];
+    for (let i = 0; i < repeat; i++) {
+        const current = manager.index.get(middle.id);
+        toggles.push(timed(() => {
+            manager.upsertTask({ ...current, completed: !current.completed }, { persist: false });
+            manager.renderTasks();
+        }));
+    }
+    results.toggle_render_ms = median(toggles);
+
+    // Lo que hacía renderTasks antes: vaciar el contenedor y crear todas las tarjetas
+    const rebuild = () => {
+        container.innerHTML = '';
+        manager.tasks.forEach(task => container.appendChild(manager.createTaskElement(task)));
+    };
+    results.full_rebuild_ms = median(Array.from({ length: Math.max(3, Math.floor(repeat / 4)) }, () => timed(rebuild)));
+    manager.cards.clear();
+    container.innerHTML = '';
+    manager.renderTasks();
+
+    // Filtros: índices frente a recorrer la lista con un .filter() por condición
+    const filters = { status: 'pending', priority: 'high' };
+    results.index_query_ms = median(Array.from({ length: repeat }, () => timed(() => manager.index.query(filters))));
+    const all = Array.from(manager.index.values());
+    results.chained_filter_ms = median(Array.from({ length: repeat }, () => timed(() => all
+        .filter(task => !task.completed)
+        .filter(task => task.priority === filters.priority)
+        .sort(window.compareTasks))));
+
+    // Cambio de filtro con lo que ya se conoce (lo que se ve mientras responde el servidor)
+    manager.pageSize = 50;
+    const switches = [];
+    ['pending', 'completed', 'pending', 'completed'].forEach(status => {
+        manager.activeFilters = { status };
+        switches.push(timed(() => manager.showCachedPage({ status })));
+    });
+    results.filter_switch_ms = median(switches);
+
+    // Ubicar una tarea en la lista: búsqueda binaria frente a findIndex
+    manager.activeFilters = {};
+    manager.showCachedPage({});
+    manager.tasks = manager.index.query({});
+    const last = manager.tasks[manager.tasks.length - 1];
+    results.find_position_us = median(Array.from({ length: repeat }, () => timed(() => manager.findTaskPosition(last)))) * 1000;
+    results.find_index_us = median(Array.from({ length: repeat }, () => timed(() => manager.tasks.findIndex(t => t.id === last.id)))) * 1000;
+
+    window.close();
+    return Object.fromEntries(Object.entries(results).map(([name, value]) => [name, round(value)]));
+}
+
+async function main(argv) {
+    const option = (name, fallback) => {
+        const position = argv.indexOf(name);
+        return position === -1 ? fallback : argv[position + 1];
+    };
+    const count = parseInt(option('--tasks', '10000'), 10);
+    const repeat = parseInt(option('--repeat', '20'), 10);
+    const results = await run(count, repeat);
+    if (argv.includes('--json')) {
+        console.log(JSON.stringify(results));
+        return;
+    }
+    console.log(`${count} tareas (mediana de ${repeat} repeticiones; ms salvo *_us)`);
+    Object.entries(results).forEach(([name, value]) => console.log(`  ${name.padEnd(22)} ${value}`));
+}
+
+main(process.argv.slice(2)).catch(error => {
+    console.error(error);
+    process.exit(1);
+});
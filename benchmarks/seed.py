@@ -0,0 +1,172 @@
+# algoRitmo.py - Siembra de bases de datos para benchmarks
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo genera tareas deterministas (misma semilla, mismos datos) y las
+# inserta con Database.create_tasks, de modo que triggers, índices y FTS quedan como en producción.
+# Las bases sembradas se guardan como plantillas y cada corrida trabaja sobre una copia. El nombre
+# de la plantilla lleva la versión del esquema: tras una migración nueva se siembra otra.
+#
+# Referencias:
+# - https://docs.python.org/3/library/random.html#random.Random
+# - https://www.sqlite.org/pragma.html#pragma_wal_checkpoint
+#
+import os
+import random
+import shutil
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Iterator, List
+
+from models.database import Database
+from models.migrations import MIGRATIONS
+from models.task import Task
+
+SIZES = {'1k': 1_000, '10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+PRIORITIES = ('low', 'medium', 'high')
+
+WORDS = (
+    'revisar', 'informe', 'cliente', 'reunión', 'factura', 'diseño', 'servidor', 'correo',
+    'presupuesto', 'migración', 'pruebas', 'despliegue', 'documentación', 'proveedor',
+    'contrato', 'inventario', 'campaña', 'análisis', 'entrega', 'soporte', 'calendario',
+    'backup', 'seguridad', 'nómina', 'auditoría', 'prototipo', 'encuesta', 'capacitación',
+)
+
+
+def parse_size(value: str) -> int:
+    """
+    Convierte '1k', '100k', '1m' o un número a cantidad de tareas.
+
+    Args:
+        value (str): Tamaño indicado en la línea de comandos
+
+    Returns:
+        int: Número de tareas
+    """
+    value = value.strip().lower()
+    if value in SIZES:
+        return SIZES[value]
+    if value.endswith('k'):
+        return int(float(value[:-1]) * 1_000)
+    if value.endswith('m'):
+        return int(float(value[:-1]) * 1_000_000)
+    return int(value)
+
+
+def size_label(size: int) -> str:
+    """Etiqueta corta de un tamaño (1000 -> '1k')"""
+    if size % 1_000_000 == 0:
+        return f'{size // 1_000_000}m'
+    if size % 1_000 == 0:
+        return f'{size // 1_000}k'
+    return str(size)
+
+
+def generate_tasks(size: int, seed: int = 42, chunk_size: int = 10_000) -> Iterator[List[Task]]:
+    """
+    Genera `size` tareas en bloques, siempre iguales para la misma semilla.
+    Un 30 % están completadas y las fechas de vencimiento caen entre 60 días atrás
+    y 60 días adelante, así hay tareas vencidas en cualquier día.
+
+    Args:
+        size (int): Número de tareas
+        seed (int): Semilla del generador
+        chunk_size (int): Tareas por bloque
+
+    Yields:
+        List[Task]: Bloque de tareas
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    start = datetime(2024, 1, 1)
+    step = timedelta(seconds=max(1, 86400 * 365 // max(size, 1)))
+    chunk: List[Task] = []
+    for index in range(size):
+        words = rng.sample(WORDS, 3)
+        due = rng.random()
+        created_at = (start + step * index).isoformat(timespec='microseconds')
+        chunk.append(Task(
+            title=f'{words[0].capitalize()} {words[1]} #{index}',
+            description=f'Tarea de prueba sobre {words[1]} y {words[2]}',
+            priority=rng.choice(PRIORITIES),
+            due_date=(today + timedelta(days=rng.randint(-60, 60))).isoformat() if due < 0.7 else None,
+            completed=rng.random() < 0.3,
+            created_at=created_at,
+            updated_at=created_at
+        ))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed_database(path: str, size: int, seed: int = 42) -> str:
+    """
+    Crea una base de datos con `size` tareas. Se escribe en un archivo temporal y se
+    renombra al final, así una siembra interrumpida nunca se reutiliza.
+
+    Args:
+        path (str): Ruta final del archivo
+        size (int): Número de tareas
+        seed (int): Semilla del generador
+
+    Returns:
+        str: Ruta del archivo sembrado
+    """
+    temp_path = f'{path}.partial'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(temp_path + suffix):
+            os.remove(temp_path + suffix)
+
+    database = Database(temp_path, pool_size=1)
+    database.init_database()
+    for chunk in generate_tasks(size, seed=seed):
+        database.create_tasks(chunk)
+    database.close()
+
+    # Estadísticas del planificador y WAL vaciado: la plantilla queda en un solo archivo
+    conn = sqlite3.connect(temp_path)
+    conn.execute('ANALYZE')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    os.replace(temp_path, path)
+    return path
+
+
+def ensure_seeded(data_dir: str, size: int, seed: int = 42) -> str:
+    """
+    Devuelve la plantilla sembrada de `size` tareas, creándola si no existe. Las plantillas
+    de una versión anterior del esquema no se reutilizan (los escenarios no migran la copia).
+
+    Args:
+        data_dir (str): Directorio de plantillas
+        size (int): Número de tareas
+        seed (int): Semilla del generador
+
+    Returns:
+        str: Ruta de la plantilla
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'tasks-{size_label(size)}-s{seed}-v{len(MIGRATIONS)}.db')
+    if not os.path.exists(path):
+        print(f'Sembrando {size} tareas en {path}...', flush=True)
+        seed_database(path, size, seed=seed)
+    return path
+
+
+def working_copy(template: str, workdir: str, name: str = 'tasks.db') -> str:
+    """
+    Copia una plantilla para que las escrituras del benchmark no la modifiquen.
+
+    Args:
+        template (str): Plantilla sembrada
+        workdir (str): Directorio de trabajo de la corrida
+        name (str): Nombre del archivo copiado
+
+    Returns:
+        str: Ruta de la copia
+    """
+    path = os.path.join(workdir, name)
+    shutil.copyfile(template, path)
+    return path
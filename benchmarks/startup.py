@@ -0,0 +1,176 @@
+# algoRitmo.py - Medición del arranque en frío
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo arranca la aplicación en procesos nuevos de Python, como un worker de
+# gunicorn recién creado o un arranque en frío de Render, y mide cada etapa: importar app.py,
+# create_app(), la primera petición a / (esquema, caché vacía, verificación de la contraseña) y
+# la segunda. Con --budget-ms termina con 1 si el arranque completo supera el presupuesto, así
+# sirve como prueba en CI; con --importtime muestra los módulos que más tardan en importarse.
+#
+# Uso:
+#   python -m benchmarks.startup                             # presupuesto por defecto: 1500 ms
+#   python -m benchmarks.startup --db database/tasks.db --repeat 10 --budget-ms 800
+#   python -m benchmarks.startup --importtime 15
+#   python -m benchmarks --sizes 100k --only micro --scenarios cold_start
+#
+# Referencias:
+# - https://docs.python.org/3/using/cmdline.html#cmdoption-X
+# - https://docs.gunicorn.org/en/stable/settings.html#preload-app
+#
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from werkzeug.security import generate_password_hash
+
+from .harness import AUTH_HEADER, BENCH_PASSWORD, REPO_DIR, bench_env, metric
+
+Result = Dict[str, Dict[str, Any]]
+
+SCHEMA_MODES = ('lazy', 'eager')
+
+# Presupuesto de un arranque completo: desde que se lanza el proceso hasta la primera respuesta
+DEFAULT_BUDGET_MS = 1500.0
+
+# Se ejecuta en el proceso nuevo; los tiempos se toman con el mismo reloj que usa la app
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+headers = {'Authorization': sys.argv[1]}
+status = client.get('/', headers=headers).status_code
+first = time.perf_counter()
+client.get('/', headers=headers)
+second = time.perf_counter()
+print(json.dumps({
+    'status': status,
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first - created) * 1000,
+    'second_request_ms': (second - first) * 1000,
+}), flush=True)
+'''
+
+
+def startup_env(db_path: str, schema_init: str) -> Dict[str, str]:
+    """
+    Entorno de un arranque medido: la contraseña va ya cifrada (como se recomienda en
+    producción) y el programador queda apagado para que su primer tick no compita.
+    """
+    env = bench_env(db_path, SCHEMA_INIT=schema_init, SCHEDULER_ENABLED='false',
+                    APP_PASSWORD_HASH=generate_password_hash(BENCH_PASSWORD))
+    env.pop('APP_PASSWORD', None)
+    return env
+
+
+def measure_once(env: Dict[str, str]) -> Dict[str, float]:
+    """
+    Arranca la app en un proceso nuevo y devuelve los milisegundos de cada etapa, más
+    ready_ms: desde que se lanza el proceso (intérprete incluido) hasta la primera respuesta.
+
+    Args:
+        env (Dict[str, str]): Variables de entorno del proceso
+
+    Returns:
+        Dict[str, float]: Tiempos del arranque
+
+    Raises:
+        RuntimeError: Si el proceso falla o la primera petición no responde 200
+    """
+    launched = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', CHILD_SCRIPT, AUTH_HEADER], cwd=REPO_DIR,
+                               env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    answered = time.perf_counter()
+    process.stdout.close()
+    if process.wait() != 0 or not line:
+        raise RuntimeError(f'El arranque falló (código {process.returncode})')
+    timings = json.loads(line)
+    if timings.pop('status') != 200:
+        raise RuntimeError('La primera petición no respondió 200')
+    # El segundo GET ya no cuenta para "lista para atender"
+    timings['ready_ms'] = (answered - launched) * 1000 - timings['second_request_ms']
+    return timings
+
+
+def measure(db_path: str, schema_init: str = 'lazy', repeat: int = 5) -> Dict[str, float]:
+    """Mediana de cada etapa en `repeat` arranques, redondeada a centésimas de milisegundo"""
+    env = startup_env(db_path, schema_init)
+    runs = [measure_once(env) for _ in range(repeat)]
+    return {key: round(statistics.median(run[key] for run in runs), 2) for key in runs[0]}
+
+
+def slowest_imports(limit: int = 10) -> List[Tuple[str, float]]:
+    """
+    Importa app.py con -X importtime y devuelve los módulos con más tiempo propio.
+
+    Args:
+        limit (int): Cantidad de módulos a devolver
+
+    Returns:
+        List[Tuple[str, float]]: (módulo, milisegundos propios), de mayor a menor
+    """
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=REPO_DIR, env=dict(os.environ), capture_output=True, text=True,
+                            check=True).stderr
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us) / 1000))
+    return sorted(modules, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def cold_start(db_path: str, workdir: str, repeat: int = 5) -> Result:
+    """
+    Arranque en frío con cada SCHEMA_INIT sobre la base sembrada: importar app.py,
+    create_app(), la primera petición a / y el total hasta la primera respuesta
+    """
+    result: Result = {}
+    for mode in SCHEMA_MODES:
+        for key, value in measure(db_path, mode, repeat).items():
+            result[f'{mode}_{key}'] = metric(value)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup',
+                                     description='Tiempo de arranque en frío de la aplicación')
+    parser.add_argument('--db', help='Base de datos a servir (por defecto, una nueva y vacía)')
+    parser.add_argument('--repeat', type=int, default=5, help='Arranques por modo')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='Máximo de ready_ms (mediana) antes de fallar')
+    parser.add_argument('--importtime', type=int, default=0, metavar='N',
+                        help='Muestra también los N módulos más lentos de importar')
+    args = parser.parse_args(argv)
+
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix='algoritmo-startup-') as workdir:
+        db_path = args.db or os.path.join(workdir, 'tasks.db')
+        for mode in SCHEMA_MODES:
+            timings = measure(db_path, mode, args.repeat)
+            over = timings['ready_ms'] > args.budget_ms
+            failures += over
+            print(f'SCHEMA_INIT={mode:<5} ' + '  '.join(f'{key}={value}' for key, value in timings.items())
+                  + ('  EXCEDE EL PRESUPUESTO' if over else ''))
+    if args.importtime:
+        print('Módulos más lentos de importar (ms propios):')
+        for name, elapsed in slowest_imports(args.importtime):
+            print(f'  {elapsed:8.2f}  {name}')
+    print(f'Presupuesto: {args.budget_ms} ms; {failures} modos lo exceden')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,9 +9,140 @@ class Config:
     DEBUG = os.environ.get('FLASK_ENV') == 'development'
     
     # Configuración de la base de datos
+    # Motor de almacenamiento: 'sqlite' (DATABASE_PATH), 'memory' (sin persistencia, un
+    # proceso: pruebas y demos) o 'postgres' (DATABASE_URL, requiere requirements-postgres.txt)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'sqlite').lower()
+    DATABASE_URL = os.environ.get('DATABASE_URL', '')
     BASE_DIR = Path(__file__).parent
     DATABASE_PATH = os.environ.get('DATABASE_PATH', 
                                   str(BASE_DIR / 'database' / 'tasks.db'))
+    # Pool de conexiones: cuántas conexiones reutilizar y cuánto esperar por una libre
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+    DATABASE_POOL_TIMEOUT = float(os.environ.get('DATABASE_POOL_TIMEOUT', 10.0))
+    # Cuándo se aplican las migraciones: 'lazy' con la primera petición de cada proceso;
+    # 'eager' al crear la aplicación, cerrando después las conexiones (gunicorn --preload:
+    # corren una vez en el proceso maestro y los workers abren las suyas tras el fork)
+    SCHEMA_INIT = os.environ.get('SCHEMA_INIT', 'lazy').lower()
+    # Modo de medición de arranque: registra en el log (y en /health) cuánto tardan create_app
+    # y la primera petición de cada proceso. benchmarks/startup.py mide también la importación
+    STARTUP_TIMING = os.environ.get('STARTUP_TIMING', 'false').lower() == 'true'
+    
+    # Ajustes de SQLite para varios workers de gunicorn escribiendo en el mismo archivo
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milisegundos
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -16000))  # negativo = KiB
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 134217728))  # bytes
+    SQLITE_BUSY_RETRIES = int(os.environ.get('SQLITE_BUSY_RETRIES', 5))
+    SQLITE_BUSY_BACKOFF = float(os.environ.get('SQLITE_BUSY_BACKOFF', 0.05))  # segundos
+    
+    # Caché de lecturas en memoria (se invalida con cada escritura, en cualquier worker)
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_TTL = float(os.environ.get('CACHE_TTL', 30.0))  # segundos
+    
+    # Página principal: fragmentos renderizados por versión de la tabla (0 desactiva la caché)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 8))
+    FRAGMENT_CACHE_TTL = float(os.environ.get('FRAGMENT_CACHE_TTL', 300.0))  # segundos
+    # Directorio opcional para guardar las plantillas Jinja ya compiladas
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', '')
+    
+    # Paginación de /api/tasks
+    TASKS_PAGE_SIZE = int(os.environ.get('TASKS_PAGE_SIZE', 50))
+    TASKS_MAX_PAGE_SIZE = int(os.environ.get('TASKS_MAX_PAGE_SIZE', 500))
+    
+    # Máximo de elementos por petición en /api/tasks/batch
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 1000))
+    
+    # Cola write-behind para toggles y cambios parciales: 'off' (escritura directa), 'sync'
+    # (cada petición espera a que su lote se confirme) o 'async' (responde antes de escribir;
+    # un cierre abrupto puede perder la última ventana de WRITE_BEHIND_INTERVAL segundos).
+    # En 'sync' no se espera por defecto: se agrupa lo que llega mientras se confirma un lote
+    WRITE_BEHIND_MODE = os.environ.get('WRITE_BEHIND_MODE', 'off').lower()
+    WRITE_BEHIND_INTERVAL = float(os.environ.get(
+        'WRITE_BEHIND_INTERVAL', 0.0 if WRITE_BEHIND_MODE == 'sync' else 0.05))  # segundos
+    WRITE_BEHIND_MAX_BATCH = int(os.environ.get('WRITE_BEHIND_MAX_BATCH', 500))
+    
+    # Búsqueda de texto completo (/api/tasks/search)
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    SEARCH_MAX_PAGE_SIZE = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', 100))
+    
+    # Sincronización incremental (/api/tasks/changes)
+    CHANGES_PAGE_SIZE = int(os.environ.get('CHANGES_PAGE_SIZE', 500))
+    # El registro de cambios conserva las últimas CHANGE_LOG_RETENTION entradas: cada worker lo
+    # poda tras una escritura, como mucho una vez cada CHANGE_LOG_PRUNE_INTERVAL segundos (0 no
+    # poda solo; `flask --app app prune-changes` lo hace a mano)
+    CHANGE_LOG_RETENTION = int(os.environ.get('CHANGE_LOG_RETENTION', 100000))
+    CHANGE_LOG_PRUNE_INTERVAL = float(os.environ.get('CHANGE_LOG_PRUNE_INTERVAL', 3600.0))  # segundos
+    
+    # Cambios en vivo (/api/tasks/stream, Server-Sent Events). Cada conexión ocupa un hilo en
+    # Flask: activarlo con uvicorn (asgi.py) o con gunicorn -k gthread, nunca con workers síncronos.
+    # Cada worker consulta el registro de cambios cada SSE_POLL_INTERVAL segundos y guarda los
+    # últimos SSE_BUFFER_SIZE en memoria; cada conexión se cierra tras SSE_MAX_DURATION segundos
+    # y el navegador reconecta solo
+    SSE_ENABLED = os.environ.get('SSE_ENABLED', 'false').lower() == 'true'
+    SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 0.25))  # segundos
+    SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15.0))  # segundos
+    SSE_MAX_DURATION = float(os.environ.get('SSE_MAX_DURATION', 300.0))  # segundos
+    SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', 1000))
+    SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', 3000))
+    
+    # Avisos de vencimiento y tareas repetidas (models/scheduler.py). Hay un hilo por worker, pero
+    # solo trabaja el que tiene la concesión en la base de datos; si ese worker muere, otro la toma
+    # pasados SCHEDULER_LEASE_TTL segundos. Cada aviso llega al inicio del día de vencimiento menos
+    # SCHEDULER_REMIND_BEFORE segundos (negativo: después; -32400 avisa a las 9:00 de ese día)
+    # SCHEDULER_ENABLED: 'auto' (por defecto) arranca el hilo solo en los workers que tienen trabajo
+    # para él (archivo automático, avisos de tareas que vencen dentro de SCHEDULER_HORIZON o tareas
+    # repetidas completadas); 'true' siempre; 'false' nunca
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'auto').lower()
+    SCHEDULER_INTERVAL = float(os.environ.get('SCHEDULER_INTERVAL', 1.0))  # segundos
+    SCHEDULER_LEASE_TTL = float(os.environ.get('SCHEDULER_LEASE_TTL', 30.0))  # segundos
+    SCHEDULER_HORIZON = float(os.environ.get('SCHEDULER_HORIZON', 172800.0))  # segundos
+    SCHEDULER_REMIND_BEFORE = float(os.environ.get('SCHEDULER_REMIND_BEFORE', 0.0))  # segundos
+    
+    # Archivo de tareas completadas (models/archive.py, /api/tasks/archive). Las completadas hace
+    # más de ARCHIVE_AFTER_DAYS días pasan al archivo en lotes de ARCHIVE_BATCH_SIZE, uno por tick
+    # del programador; al terminar cada pasada se liberan hasta ARCHIVE_VACUUM_PAGES páginas
+    # (0: todas) y se actualizan las estadísticas. 0 días desactiva el archivo automático
+    # (`flask --app app archive-tasks --days N` lo hace a mano)
+    ARCHIVE_AFTER_DAYS = float(os.environ.get('ARCHIVE_AFTER_DAYS', 0.0))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000))
+    ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', 3600.0))  # segundos entre pasadas
+    ARCHIVE_VACUUM_PAGES = int(os.environ.get('ARCHIVE_VACUUM_PAGES', 1000))
+    
+    # Filas leídas por bloque al exportar en /api/tasks/export
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 500))
+    
+    # Modo ASGI (asgi.py): hilos para lecturas concurrentes; las escrituras usan un solo hilo
+    ASYNC_DB_READERS = int(os.environ.get('ASYNC_DB_READERS', 4))
+    
+    # Métricas en /metrics. Con METRICS_DIR (un directorio compartido) cada worker vuelca
+    # sus valores a un archivo y cualquiera de ellos responde con la suma de todos
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))  # segundos
+    # /metrics pide usuario y contraseña como el resto de la API; con METRICS_TOKEN acepta también
+    # 'Authorization: Bearer <token>' (bearer_token en Prometheus), sin dar acceso a las tareas
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Perfilado con cProfile: por petición (cabecera X-Profile: 1 o ?profile=1) o por muestreo
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))  # 0.0 a 1.0
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', str(BASE_DIR / 'database' / 'profiles'))
+    
+    # Serialización JSON: 'auto' usa orjson si está instalado, 'stdlib' fuerza el módulo json
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+    
+    # Autenticación Basic. APP_USERS: pares usuario:hash separados por comas (los hashes se
+    # generan con `flask --app app hash-password`). APP_USER con APP_PASSWORD_HASH o
+    # APP_PASSWORD (en claro, se cifra al arrancar) agrega un usuario más
+    APP_USERS = os.environ.get('APP_USERS', '')
+    APP_USER = os.environ.get('APP_USER')
+    APP_PASSWORD = os.environ.get('APP_PASSWORD')
+    APP_PASSWORD_HASH = os.environ.get('APP_PASSWORD_HASH')
+    # Verificaciones correctas que se recuerdan y cuánto valen antes de repetir el hash
+    AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 1024))
+    AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 300.0))  # segundos
     
     # Configuración del servidor
     HOST = os.environ.get('HOST', '0.0.0.0')
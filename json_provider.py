@@ -0,0 +1,83 @@
+# algoRitmo.py - Serialización JSON de la aplicación
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define el proveedor JSON de Flask que usa orjson cuando está instalado
+# (requirements-fast.txt) y el módulo json de la biblioteca estándar en caso contrario. Todo lo que
+# pasa por jsonify, request.get_json, app.json y el filtro tojson de Jinja usa este proveedor.
+# Documentación proveedores JSON de Flask: https://flask.palletsprojects.com/en/3.0.x/api/#flask.json.provider.JSONProvider
+# Documentación orjson: https://github.com/ijl/orjson
+#
+# Referencias:
+# - https://docs.python.org/3/library/json.html
+#
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional
+    orjson = None
+
+JSON_BACKENDS = ('auto', 'orjson', 'stdlib')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Proveedor JSON sobre orjson. Conserva el comportamiento del proveedor por defecto para los
+    tipos que orjson no conoce (fechas, Decimal, UUID, objetos con __html__) y recurre a él
+    cuando se piden opciones propias del módulo json (por ejemplo, cls o indent numérico).
+    """
+
+    # El orden de las claves ya es estable (lo fija to_dict); ordenarlas solo cuesta tiempo
+    sort_keys = False
+
+    def _option(self) -> int:
+        # Las fechas se delegan a `default` para que salgan igual que con el proveedor estándar
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._option()).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._option() | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=option),
+                                        mimetype=self.mimetype)
+
+
+def init_json(app: Any, backend: str = 'auto') -> str:
+    """
+    Instala el proveedor JSON en la aplicación.
+
+    Args:
+        app (Flask): Aplicación Flask
+        backend (str): 'auto' (orjson si está instalado), 'orjson' o 'stdlib'
+
+    Returns:
+        str: Backend en uso ('orjson' o 'stdlib')
+
+    Raises:
+        ValueError: Si el backend no es válido
+        RuntimeError: Si se pidió orjson y no está instalado
+    """
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f'JSON_BACKEND inválido: {backend}')
+    if backend == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_BACKEND=orjson requiere instalar orjson (requirements-fast.txt)')
+    if backend == 'stdlib' or orjson is None:
+        return 'stdlib'
+    app.json = OrjsonProvider(app)
+    return 'orjson'
@@ -0,0 +1,148 @@
+# algoRitmo.py - Archivo de tareas completadas
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define Archiver, que pasa las tareas completadas hace más de
+# ARCHIVE_AFTER_DAYS días de la tabla 'tasks' al archivo ('archived_tasks') en lotes, cada uno en
+# su propia transacción, y al terminar cada pasada compacta el almacenamiento (VACUUM incremental
+# y ANALYZE). Así la tabla que recorren los listados, la búsqueda y las estadísticas crece con las
+# tareas vigentes y no con todo el historial; el archivo se lee con /api/tasks/archive.
+# Corre como trabajo del programador (models/scheduler.py): solo en el worker con la concesión y
+# un lote por tick, para que nunca retenga el bloqueo de escritura mucho tiempo.
+# Documentación VACUUM: https://www.sqlite.org/lang_vacuum.html
+#
+# Referencias:
+# - https://www.sqlite.org/pragma.html#pragma_incremental_vacuum
+# - https://www.sqlite.org/lang_analyze.html#approximate_analyze_for_large_databases
+# - https://www.postgresql.org/docs/current/routine-vacuuming.html
+#
+import time
+from datetime import datetime
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+
+# Segundos por día, para ARCHIVE_AFTER_DAYS
+DAY = 86400.0
+
+
+class ArchiveRun(NamedTuple):
+    """Resultado de una pasada completa: tareas archivadas y páginas devueltas al sistema"""
+    archived: int
+    released_pages: int
+
+
+class Archiver:
+    """
+    Pasadas de archivo: lotes de `batch_size` tareas hasta que no quedan completadas más
+    antiguas que `max_age`, y después compact_storage. step() hace un lote por llamada (el
+    programador lo llama en cada tick) y espera `interval` segundos entre pasadas; run() hace
+    una pasada completa de una vez (comando de mantenimiento).
+    """
+
+    def __init__(self, database: Any, max_age: float, batch_size: int = 1000,
+                 interval: float = 3600.0, vacuum_pages: int = 1000):
+        """
+        Inicializa el archivador.
+
+        Args:
+            database (Any): TaskRepository (o una de sus envolturas) con archive_tasks
+            max_age (float): Segundos desde la última modificación para archivar una completada
+                (0 desactiva step())
+            batch_size (int): Tareas movidas por transacción
+            interval (float): Segundos entre el final de una pasada y el inicio de la siguiente
+            vacuum_pages (int): Páginas a liberar al final de cada pasada (0: todas las libres)
+        """
+        self.database = database
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+        self._next_run = 0.0
+        self._moved_in_run = 0
+        self.archived = 0
+        self.runs = 0
+        self.released_pages = 0
+
+    @classmethod
+    def from_config(cls, database: Any, config: Mapping[str, Any],
+                    after_days: Optional[float] = None) -> 'Archiver':
+        """
+        Crea el archivador a partir de la configuración de la aplicación.
+
+        Args:
+            database (Any): Capa de datos
+            config (Mapping): Configuración (por ejemplo, app.config)
+            after_days (Optional[float]): Antigüedad en días (ARCHIVE_AFTER_DAYS si no se indica)
+
+        Returns:
+            Archiver: Archivador configurado
+        """
+        if after_days is None:
+            after_days = config.get('ARCHIVE_AFTER_DAYS', 0.0)
+        return cls(
+            database,
+            max_age=after_days * DAY,
+            batch_size=config.get('ARCHIVE_BATCH_SIZE', 1000),
+            interval=config.get('ARCHIVE_INTERVAL', 3600.0),
+            vacuum_pages=config.get('ARCHIVE_VACUUM_PAGES', 1000)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Si hay una antigüedad configurada"""
+        return self.max_age > 0
+
+    def cutoff(self, now: float) -> str:
+        """Fecha ISO 8601 (hora local, como now_iso) antes de la cual se archiva"""
+        return datetime.fromtimestamp(now - self.max_age).isoformat(timespec='microseconds')
+
+    def stats(self) -> Dict[str, int]:
+        """Tareas archivadas, pasadas terminadas y páginas liberadas por este proceso"""
+        return {'archived': self.archived, 'runs': self.runs, 'released_pages': self.released_pages}
+
+    def step(self, now: float) -> int:
+        """
+        Mueve un lote si hay una pasada en curso o ya toca la siguiente. El lote que vuelve
+        incompleto termina la pasada: si algo se movió, se compacta el almacenamiento.
+
+        Args:
+            now (float): Hora actual en segundos Unix (la del reloj del programador)
+
+        Returns:
+            int: Tareas archivadas en esta llamada
+        """
+        if not self.enabled or now < self._next_run:
+            return 0
+        moved = self.database.archive_tasks(self.cutoff(now), self.batch_size)
+        self.archived += moved
+        self._moved_in_run += moved
+        if moved < self.batch_size:
+            if self._moved_in_run:
+                self.released_pages += self.database.compact_storage(self.vacuum_pages)
+            self._moved_in_run = 0
+            self._next_run = now + self.interval
+            self.runs += 1
+        return moved
+
+    def run(self, now: Optional[float] = None, full_vacuum: bool = False) -> ArchiveRun:
+        """
+        Hace una pasada completa sin esperas y compacta siempre al final.
+
+        Args:
+            now (Optional[float]): Hora de referencia en segundos Unix (la actual si no se indica)
+            full_vacuum (bool): Reescribir el archivo completo (ver compact_storage)
+
+        Returns:
+            ArchiveRun: Tareas archivadas y páginas liberadas
+        """
+        now = time.time() if now is None else now
+        before = self.cutoff(now)
+        archived = 0
+        while True:
+            moved = self.database.archive_tasks(before, self.batch_size)
+            archived += moved
+            if moved < self.batch_size:
+                break
+        released = self.database.compact_storage(self.vacuum_pages, full=full_vacuum)
+        self.archived += archived
+        self.released_pages += released
+        self.runs += 1
+        return ArchiveRun(archived, released)
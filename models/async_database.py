@@ -0,0 +1,61 @@
+# algoRitmo.py - Fachada asíncrona de la capa de datos
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define AsyncDatabase, que expone los métodos de Database como
+# corrutinas. Las lecturas se ejecutan en un pool de hilos acotado y las escrituras en un único
+# hilo escritor, así el event loop del servidor ASGI nunca se bloquea esperando a SQLite.
+# Documentación asyncio: https://docs.python.org/3/library/asyncio-eventloop.html#executing-code-in-thread-or-process-pools
+# Documentación concurrent.futures: https://docs.python.org/3/library/concurrent.futures.html
+#
+# Referencias:
+# - https://www.sqlite.org/wal.html#concurrency
+# - https://asgi.readthedocs.io/
+#
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+from .repository import WRITE_METHODS
+
+
+class AsyncDatabase:
+    """
+    Fachada asíncrona sobre Database (o CachedDatabase).
+    `await db.get_task_by_id(1)` ejecuta el método síncrono en el pool de lectores;
+    `await db.create_task(task)` lo ejecuta en el hilo escritor dedicado.
+    """
+
+    def __init__(self, database: Any, max_readers: int = 4):
+        """
+        Inicializa la fachada y sus pools de hilos.
+
+        Args:
+            database (Any): Database o CachedDatabase a envolver
+            max_readers (int): Hilos máximos para lecturas concurrentes
+        """
+        self.database = database
+        self._readers = ThreadPoolExecutor(max_workers=max_readers,
+                                           thread_name_prefix='db-reader')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        method = getattr(self.database, name)
+        if not callable(method):
+            return method
+        # Una capa puede indicar qué escrituras no necesitan el hilo escritor (la cola
+        # write-behind ya las agrupa en su propio hilo; en fila solo esperarían de a una)
+        write_methods = getattr(self.database, 'serialized_writes', WRITE_METHODS)
+        executor = self._writer if name in write_methods else self._readers
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(method, *args, **kwargs))
+
+        call.__name__ = name
+        return call
+
+    def close(self) -> None:
+        """Espera a que terminen las operaciones pendientes y libera los hilos"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
@@ -0,0 +1,286 @@
+# algoRitmo.py - Caché en memoria de lectura para la capa de datos
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define LRUCache (LRU con expiración por TTL) y CachedDatabase, que
+# envuelve a Database y guarda tareas y listados en memoria. La invalidación usa el contador
+# de generación del motor de almacenamiento, así funciona aunque la escritura venga de otro
+# worker de gunicorn.
+# Documentación OrderedDict: https://docs.python.org/3/library/collections.html#collections.OrderedDict
+# Documentación copy: https://docs.python.org/3/library/copy.html
+#
+# Referencias:
+# - https://en.wikipedia.org/wiki/Cache_replacement_policies#LRU
+# - https://martinfowler.com/bliki/TwoHardThings.html
+#
+import copy
+import threading
+import time
+from datetime import date
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+from .repository import TaskRepository, TaskUpdate, open_repository
+from .query import TaskQuery
+from .task import Task
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Caché LRU con expiración por tiempo, segura para hilos.
+    Cuenta aciertos y fallos para exponer métricas.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0):
+        """
+        Inicializa la caché.
+
+        Args:
+            max_entries (int): Número máximo de entradas antes de descartar la menos usada
+            ttl (float): Segundos que vive cada entrada
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtiene un valor vigente y lo marca como usado recientemente.
+
+        Args:
+            key (Hashable): Clave a buscar
+            default (Any): Valor a devolver si no existe o expiró
+
+        Returns:
+            Any: Valor guardado o `default`
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Guarda un valor, descartando la entrada menos usada si se supera el máximo.
+
+        Args:
+            key (Hashable): Clave
+            value (Any): Valor a guardar
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Elimina todas las entradas"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedDatabase:
+    """
+    Envoltorio de Database que cachea las lecturas y se invalida por generación.
+    Antes de cada lectura compara la generación guardada en SQLite con la última
+    vista; si cambió (en este u otro proceso), vacía la caché.
+    Los métodos que no cachea se delegan tal cual a la base de datos envuelta.
+    """
+
+    def __init__(self, database: TaskRepository, max_entries: int = 1024, ttl: float = 30.0):
+        """
+        Inicializa el envoltorio.
+
+        Args:
+            database (TaskRepository): Motor de almacenamiento a envolver
+            max_entries (int): Entradas máximas de la caché
+            ttl (float): Segundos que vive cada entrada
+        """
+        self.database = database
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._generation: Optional[int] = None
+        self._generation_lock = threading.Lock()
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'CachedDatabase':
+        """
+        Crea la base de datos y su caché a partir de la configuración.
+
+        Args:
+            config (Mapping): Configuración (por ejemplo, app.config)
+
+        Returns:
+            CachedDatabase: Base de datos con caché
+        """
+        return cls(
+            open_repository(config),
+            max_entries=config.get('CACHE_MAX_ENTRIES', 1024),
+            ttl=config.get('CACHE_TTL', 30.0)
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        # Solo se llama para atributos que CachedDatabase no define
+        return getattr(self.database, name)
+
+    def _sync_generation(self) -> int:
+        """
+        Vacía la caché si otra escritura cambió la generación desde la última lectura.
+
+        Returns:
+            int: Generación vigente en SQLite
+        """
+        generation = self.database.get_generation()
+        with self._generation_lock:
+            if generation != self._generation:
+                if self._generation is not None:
+                    self.invalidations += 1
+                self._cache.clear()
+                self._generation = generation
+        return generation
+
+    def _cached(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """
+        Devuelve el valor cacheado para `key` o lo carga y lo guarda.
+
+        Args:
+            key (Hashable): Clave de la caché
+            load (Callable): Función que obtiene el valor de la base de datos
+
+        Returns:
+            Any: Valor cacheado o recién cargado
+        """
+        generation = self._sync_generation()
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            # Si hubo una escritura mientras se cargaba, el valor puede estar viejo: no se guarda
+            with self._generation_lock:
+                if self._generation == generation:
+                    self._cache.set(key, value)
+        return value
+
+    def _invalidate(self) -> None:
+        """Vacía la caché local tras una escritura hecha por este proceso"""
+        with self._generation_lock:
+            self._cache.clear()
+            self._generation = None
+
+    # Lecturas cacheadas. Las tareas se devuelven como copias para que quien
+    # las modifique (por ejemplo, la ruta de actualización) no altere la caché.
+
+    def get_task_by_id(self, task_id: int) -> Optional[Task]:
+        task = self._cached(('task', task_id), lambda: self.database.get_task_by_id(task_id))
+        return copy.copy(task) if task is not None else None
+
+    def get_all_tasks(self) -> List[Task]:
+        tasks = self._cached(('all',), self.database.get_all_tasks)
+        return [copy.copy(task) for task in tasks]
+
+    def query_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        tasks, next_cursor = self._cached(('query', query.cache_key),
+                                          lambda: self.database.query_task_dicts(query))
+        return [dict(task) for task in tasks], next_cursor
+
+    def get_task_stats(self, today: Optional[str] = None) -> Dict[str, Any]:
+        today = today or date.today().isoformat()
+        return copy.deepcopy(self._cached(('stats', today),
+                                          lambda: self.database.get_task_stats(today)))
+
+    # Escrituras: se delegan y luego se invalida la caché local
+
+    def create_task(self, task: Task) -> int:
+        try:
+            return self.database.create_task(task)
+        finally:
+            self._invalidate()
+
+    def update_task(self, task: Task) -> bool:
+        try:
+            return self.database.update_task(task)
+        finally:
+            self._invalidate()
+
+    def toggle_task(self, task_id: int) -> Optional[Task]:
+        try:
+            return self.database.toggle_task(task_id)
+        finally:
+            self._invalidate()
+
+    def patch_task(self, task_id: int, fields: Mapping[str, Any]) -> Optional[Task]:
+        try:
+            return self.database.patch_task(task_id, fields)
+        finally:
+            self._invalidate()
+
+    def apply_task_updates(self, updates: Sequence[TaskUpdate]) -> List[Optional[Task]]:
+        try:
+            return self.database.apply_task_updates(updates)
+        finally:
+            self._invalidate()
+
+    def delete_task(self, task_id: int) -> bool:
+        try:
+            return self.database.delete_task(task_id)
+        finally:
+            self._invalidate()
+
+    def create_tasks(self, tasks: List[Task]) -> List[int]:
+        try:
+            return self.database.create_tasks(tasks)
+        finally:
+            self._invalidate()
+
+    def patch_tasks(self, changes: List[Dict[str, Any]]) -> List[Optional[Task]]:
+        try:
+            return self.database.patch_tasks(changes)
+        finally:
+            self._invalidate()
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        try:
+            return self.database.delete_tasks(task_ids)
+        finally:
+            self._invalidate()
+
+    def spawn_occurrence(self, task_id: int, due_date: str) -> Optional[Task]:
+        try:
+            return self.database.spawn_occurrence(task_id, due_date)
+        finally:
+            self._invalidate()
+
+    def archive_tasks(self, before: str, limit: int = 1000) -> int:
+        try:
+            return self.database.archive_tasks(before, limit)
+        finally:
+            self._invalidate()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene las métricas de la caché.
+
+        Returns:
+            Dict[str, Any]: Aciertos, fallos, tasa de aciertos, invalidaciones y entradas
+        """
+        hits, misses = self._cache.hits, self._cache.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            'invalidations': self.invalidations,
+            'entries': len(self._cache)
+        }
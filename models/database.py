@@ -8,28 +8,91 @@
 # Referencias:
 # - https://flask.palletsprojects.com/en/2.3.x/patterns/sqlite3/
 # - https://docs.python.org/3/library/datetime.html
+# - https://www.sqlite.org/pragma.html#pragma_incremental_vacuum
+# - https://www.sqlite.org/fts5.html#the_merge_command
 #
 import sqlite3
 import os
-from typing import List, Optional
-from datetime import datetime
-from .task import Task
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from datetime import date
+from .migrations import current_version, migrate
+from .pool import ConnectionPool
+from .query import TASK_COLUMNS, TaskQuery, encode_cursor
+from .repository import (PATCHABLE_FIELDS, ChangeEvent, Lease, TaskChanges, TaskRepository,
+                         TaskUpdate, build_task_stats, resolve_update, task_row_to_dict)
+from .search import HIGHLIGHT_END, HIGHLIGHT_START, build_match_query, highlight
+from .storage import DEFAULT_JOURNAL_MODE, connection_pragmas, retry_on_busy
+from .task import Task, now_iso
 
-class Database:
+# Parámetros por sentencia en consultas IN (...); SQLite antiguo admite hasta 999
+SQL_PARAMS_CHUNK = 500
+
+# UPDATE ... RETURNING existe desde SQLite 3.35; antes se relee la fila en la misma transacción
+RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# PRAGMA auto_vacuum: con INCREMENTAL las páginas libres se devuelven al sistema por partes
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Filas por índice que ANALYZE examina tras archivar: estadísticas aproximadas con un costo
+# que no depende del tamaño de la tabla (PRAGMA analysis_limit, SQLite 3.32+)
+ANALYSIS_LIMIT = 1000
+
+# Trabajo por paso al fusionar el índice FTS5 tras archivar. Negativo: fusiona todos los
+# segmentos aunque no lleguen al umbral de automerge, que es donde quedan las filas borradas
+FTS_MERGE_PAGES = -500
+
+class Database(TaskRepository):
     """
     Clase que maneja todas las operaciones de base de datos SQLite.
     Implementa el patrón Model del MVC para la persistencia de datos.
+    Es el motor por defecto de TaskRepository (STORAGE_BACKEND=sqlite).
     """
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, pool_size: int = 5, pool_timeout: float = 10.0,
+                 pragmas: Optional[Dict[str, Union[str, int]]] = None,
+                 journal_mode: str = DEFAULT_JOURNAL_MODE,
+                 busy_retries: int = 5, busy_backoff: float = 0.05):
         """
         Inicializa la conexión a la base de datos.
         
         Args:
             db_path (str): Ruta al archivo de base de datos SQLite
+            pool_size (int): Número máximo de conexiones reutilizables
+            pool_timeout (float): Segundos a esperar por una conexión libre
+            pragmas (Optional[Dict]): PRAGMAs a aplicar a cada conexión
+            journal_mode (str): Modo de journal (WAL permite lectores concurrentes a un escritor)
+            busy_retries (int): Reintentos de una escritura ante SQLITE_BUSY
+            busy_backoff (float): Espera inicial en segundos entre reintentos
         """
         self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff
         self._ensure_database_directory()
+        self._pool = ConnectionPool(db_path, size=pool_size, timeout=pool_timeout,
+                                    pragmas=pragmas)
+    
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'Database':
+        """
+        Crea una instancia a partir de la configuración de la aplicación.
+        
+        Args:
+            config (Mapping): Configuración (por ejemplo, app.config)
+            
+        Returns:
+            Database: Instancia configurada
+        """
+        return cls(
+            config['DATABASE_PATH'],
+            pool_size=config.get('DATABASE_POOL_SIZE', 5),
+            pool_timeout=config.get('DATABASE_POOL_TIMEOUT', 10.0),
+            pragmas=connection_pragmas(config),
+            journal_mode=config.get('SQLITE_JOURNAL_MODE', DEFAULT_JOURNAL_MODE),
+            busy_retries=config.get('SQLITE_BUSY_RETRIES', 5),
+            busy_backoff=config.get('SQLITE_BUSY_BACKOFF', 0.05)
+        )
     
     def _ensure_database_directory(self) -> None:
         """Asegura que el directorio de la base de datos existe"""
@@ -37,39 +100,176 @@ class Database:
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
     
-    def _get_connection(self) -> sqlite3.Connection:
+    @contextmanager
+    def _get_connection(self) -> Iterator[sqlite3.Connection]:
         """
-        Obtiene una conexión a la base de datos.
+        Presta una conexión del pool y la devuelve al terminar el bloque `with`.
         
-        Returns:
+        Yields:
             sqlite3.Connection: Conexión a la base de datos
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Permite acceder a las columnas por nombre
-        return conn
-    
-    def init_database(self) -> None:
-        """Inicializa la base de datos creando las tablas necesarias (si no existen).
-        Crea la tabla 'tasks' para almacenar las tareas del usuario.
-        """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        # Crear tabla de tareas si no existe
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                priority TEXT DEFAULT 'medium',
-                due_date TEXT,
-                completed BOOLEAN DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        with self._pool.connection() as conn:
+            yield conn
+    
+    def close(self) -> None:
+        """Cierra todas las conexiones del pool"""
+        self._pool.close()
+    
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Obtiene el estado del pool de conexiones.
+        
+        Returns:
+            Dict[str, int]: Tamaño máximo del pool y conexiones abiertas desde el inicio
+        """
+        return {'size': self._pool.size, 'opened': self._pool.connections_opened}
+    
+    @retry_on_busy
+    def init_database(self) -> int:
+        """Inicializa la base de datos aplicando las migraciones pendientes.
+        La primera crea la tabla 'tasks'; las siguientes agregan índices y cambios de esquema.
+        
+        Returns:
+            int: Versión del esquema tras migrar
+        """
+        with self._get_connection() as conn:
+            if current_version(conn) == 0:
+                # auto_vacuum solo se puede elegir antes de crear la primera tabla (después hace
+                # falta un VACUUM completo): las bases nuevas nacen listas para compact_storage
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            # El modo de journal es persistente en el archivo: basta con fijarlo una vez
+            conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+            return migrate(conn)
+    
+    def get_generation(self) -> int:
+        """
+        Obtiene el contador de generación, que aumenta con cada escritura en 'tasks'
+        hecha por cualquier proceso.
+        
+        Returns:
+            int: Generación actual de la tabla de tareas
+        """
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+    
+    def get_table_version(self) -> Tuple[int, int]:
+        """
+        Obtiene, en una sola consulta, la generación y la fecha de la última escritura.
+        Sirve para validar cachés HTTP (ETag / Last-Modified) sin leer la tabla 'tasks'.
+        
+        Returns:
+            Tuple[int, int]: Generación y segundos Unix de la última modificación
+        """
+        with self._get_connection() as conn:
+            values = dict(conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('generation', 'last_modified')"
+            ).fetchall())
+        return values.get('generation', 0), values.get('last_modified', 0)
+    
+    def get_change_token(self) -> int:
+        """
+        Obtiene el token de sincronización actual: el último seq del registro de cambios.
+        
+        Returns:
+            int: Token a usar como 'since' en get_changes
+        """
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'task_changes'"
+            ).fetchone()
+        return row[0] if row else 0
+    
+    def get_changes(self, since: int, limit: int = 500) -> Optional[TaskChanges]:
+        """
+        Obtiene las tareas insertadas o modificadas y los IDs eliminados desde un token.
+        
+        Args:
+            since (int): Token devuelto por get_change_token o por una llamada anterior
+            limit (int): Máximo de entradas del registro a procesar
+            
+        Returns:
+            Optional[TaskChanges]: Cambios desde `since`, o None si el token es anterior
+            a la última poda del registro y el cliente debe recargar todo
+        """
+        with self._get_connection() as conn:
+            floor = conn.execute(
+                "SELECT value FROM meta WHERE key = 'change_log_floor'"
+            ).fetchone()
+            if floor and since < floor[0]:
+                return None
+            
+            entries = conn.execute(
+                'SELECT seq, task_id FROM task_changes WHERE seq > ? ORDER BY seq LIMIT ?',
+                (since, limit)
+            ).fetchall()
+            if not entries:
+                return TaskChanges([], [], since, False)
+            
+            # Cada tarea aparece una sola vez con su estado actual; si ya no existe, se borró
+            task_ids = list(dict.fromkeys(entry['task_id'] for entry in entries))
+            current = self._fetch_task_dicts_by_ids(conn, task_ids)
+        
+        changed = [current[task_id] for task_id in task_ids if task_id in current]
+        deleted = [task_id for task_id in task_ids if task_id not in current]
+        return TaskChanges(changed, deleted, entries[-1]['seq'], len(entries) == limit)
+    
+    def get_change_events(self, since: int, limit: int = 500) -> Optional[List[ChangeEvent]]:
+        """
+        Obtiene las entradas del registro de cambios posteriores a un token, una por
+        escritura y en orden, para emitirlas como eventos (ver models/events.py).
+        
+        Args:
+            since (int): Último número de secuencia ya entregado
+            limit (int): Máximo de entradas a devolver
+            
+        Returns:
+            Optional[List[ChangeEvent]]: Entradas con op 'insert', 'update' o 'delete' y la
+            tarea tal como está ahora (None si ya no existe), o None si el registro ya se
+            podó por encima de `since`
+        """
+        with self._get_connection() as conn:
+            floor = conn.execute(
+                "SELECT value FROM meta WHERE key = 'change_log_floor'"
+            ).fetchone()
+            if floor and since < floor[0]:
+                return None
+            
+            entries = conn.execute(
+                'SELECT seq, task_id, op FROM task_changes WHERE seq > ? ORDER BY seq LIMIT ?',
+                (since, limit)
+            ).fetchall()
+            if not entries:
+                return []
+            current = self._fetch_task_dicts_by_ids(
+                conn, list(dict.fromkeys(entry['task_id'] for entry in entries)))
+        
+        return [ChangeEvent(entry['seq'], entry['op'], entry['task_id'], current.get(entry['task_id']))
+                for entry in entries]
+    
+    @retry_on_busy
+    def prune_change_log(self, keep: int) -> int:
+        """
+        Elimina las entradas más antiguas del registro de cambios, conservando las últimas `keep`.
+        
+        Args:
+            keep (int): Número de entradas a conservar
+            
+        Returns:
+            int: Entradas eliminadas
+        """
+        with self._transaction() as conn:
+            row = conn.execute('SELECT MAX(seq) FROM task_changes').fetchone()
+            floor = (row[0] or 0) - keep
+            if floor <= 0:
+                return 0
+            deleted = conn.execute('DELETE FROM task_changes WHERE seq <= ?', (floor,)).rowcount
+            conn.execute(
+                "UPDATE meta SET value = MAX(value, ?) WHERE key = 'change_log_floor'", (floor,)
             )
-        ''')
-        conn.commit()
-        conn.close()
+        return deleted
     
+    @retry_on_busy
     def create_task(self, task: Task) -> int:
         """
         Crea una nueva tarea en la base de datos.
@@ -80,60 +280,177 @@ class Database:
         Returns:
             int: ID de la tarea creada
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO tasks (title, description, priority, due_date, completed, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            task.title,
-            task.description,
-            task.priority,
-            task.due_date,
-            task.completed,
-            task.created_at,
-            task.updated_at
-        ))
-        
-        task_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO tasks (title, description, priority, due_date, completed, created_at,
+                                   updated_at, recurrence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                task.title,
+                task.description,
+                task.priority,
+                task.due_date,
+                task.completed,
+                task.created_at,
+                task.updated_at,
+                task.recurrence
+            ))
+            
+            task_id = cursor.lastrowid
+            conn.commit()
         
         return task_id
     
-    def get_all_tasks(self) -> List[Task]:
+    def query_tasks(self, query: TaskQuery) -> Tuple[List[Task], Optional[str]]:
         """
-        Obtiene todas las tareas de la base de datos.
+        Obtiene las tareas que cumplen una consulta, paginadas por cursor.
         
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+            
         Returns:
-            List[Task]: Lista de todas las tareas
+            Tuple[List[Task], Optional[str]]: Tareas de la página y cursor de la
+            siguiente página (None si no hay más)
+        """
+        rows, next_cursor = self._query_rows(query)
+        return [self._row_to_task(row) for row in rows], next_cursor
+    
+    def query_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        Igual que query_tasks, pero devuelve diccionarios listos para JSON sin
+        construir objetos Task.
         
-        cursor.execute('''
-            SELECT id, title, description, priority, due_date, completed, created_at, updated_at
-            FROM tasks
-            ORDER BY created_at DESC
-        ''')
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Tareas de la página y cursor
+            de la siguiente página (None si no hay más)
+        """
+        rows, next_cursor = self._query_rows(query)
+        return [self._row_to_dict(row) for row in rows], next_cursor
+    
+    def _query_rows(self, query: TaskQuery,
+                    table: str = 'tasks') -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """
+        Ejecuta una consulta y separa la fila extra que indica si hay otra página.
         
-        tasks = []
-        for row in cursor.fetchall():
-            task = Task(
-                id=row['id'],
-                title=row['title'],
-                description=row['description'],
-                priority=row['priority'],
-                due_date=row['due_date'],
-                completed=bool(row['completed'])
-            )
-            task.created_at = datetime.fromisoformat(row['created_at'])
-            task.updated_at = datetime.fromisoformat(row['updated_at'])
-            tasks.append(task)
+        Args:
+            query (TaskQuery): Consulta a ejecutar
+            table (str): Tabla a consultar ('tasks' o 'archived_tasks')
+            
+        Returns:
+            Tuple[List[sqlite3.Row], Optional[str]]: Filas de la página y cursor siguiente
+        """
+        sql, params = query.to_sql(table=table)
+        with self._get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        
+        next_cursor = None
+        if query.limit is not None and len(rows) > query.limit:
+            rows = rows[:query.limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[query.sort_column], last['id'])
+        
+        return rows, next_cursor
+    
+    def iter_task_dicts(self, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorre todas las tareas en bloques usando fetchmany, sin cargar la tabla en memoria.
+        La conexión queda prestada hasta que el generador se agota o se cierra.
+        
+        Args:
+            chunk_size (int): Filas por bloque
+            
+        Yields:
+            List[Dict[str, Any]]: Bloque de hasta `chunk_size` tareas como diccionarios
+        """
+        sql, params = TaskQuery().to_sql()
+        with self._get_connection() as conn:
+            cursor = conn.execute(sql, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield [self._row_to_dict(row) for row in rows]
+            finally:
+                cursor.close()
+    
+    def search_tasks(self, text: str, limit: int = 20,
+                     offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Busca tareas por título y descripción usando el índice FTS5, ordenadas por relevancia.
+        Cada palabra se busca por prefijo y el título pesa más que la descripción.
+        
+        Args:
+            text (str): Texto a buscar
+            limit (int): Tamaño de página
+            offset (int): Resultados a saltar
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: Tareas encontradas (con 'title_snippet' y
+            'description_snippet' en HTML resaltado) y si hay más resultados
+        """
+        match = build_match_query(text)
+        if match is None:
+            return [], False
         
-        conn.close()
-        return tasks
+        columns = ', '.join(f't.{column.strip()}' for column in TASK_COLUMNS.split(','))
+        with self._get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {columns},
+                       snippet(tasks_fts, 0, ?, ?, '…', 12) AS title_snippet,
+                       snippet(tasks_fts, 1, ?, ?, '…', 24) AS description_snippet
+                FROM tasks_fts
+                JOIN tasks t ON t.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH ?
+                ORDER BY bm25(tasks_fts, 10.0, 1.0)
+                LIMIT ? OFFSET ?
+            ''', (HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END,
+                  match, limit + 1, offset)).fetchall()
+        
+        results = []
+        for row in rows[:limit]:
+            task = self._row_to_dict(row[:-2])
+            task['title_snippet'] = highlight(row['title_snippet'])
+            task['description_snippet'] = highlight(row['description_snippet'])
+            results.append(task)
+        return results, len(rows) > limit
+    
+    @retry_on_busy
+    def rebuild_search_index(self) -> None:
+        """Reconstruye el índice FTS5 a partir de la tabla 'tasks'"""
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('optimize')")
+    
+    def get_task_stats(self, today: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtiene los totales de tareas por estado y prioridad, y las vencidas, en una sola
+        consulta. Los totales salen de 'task_counts' (mantenida por triggers) y las vencidas
+        del índice (completed, due_date, priority), así que el costo no depende del tamaño de la tabla.
+        
+        Args:
+            today (Optional[str]): Fecha de referencia YYYY-MM-DD (hoy si no se indica)
+            
+        Returns:
+            Dict[str, Any]: total, completed, pending, overdue y el mismo desglose en by_priority
+        """
+        today = today or date.today().isoformat()
+        with self._get_connection() as conn:
+            rows = conn.execute('''
+                SELECT completed, priority, n, 0 FROM task_counts WHERE n > 0
+                UNION ALL
+                SELECT 0, IFNULL(priority, ''), 0, COUNT(*)
+                FROM tasks
+                WHERE completed = 0 AND due_date > '' AND due_date < ?
+                GROUP BY priority
+            ''', (today,)).fetchall()
+        
+        return build_task_stats(rows)
     
     def get_task_by_id(self, task_id: int) -> Optional[Task]:
         """
@@ -145,33 +462,19 @@ class Database:
         Returns:
             Optional[Task]: Tarea encontrada o None si no existe
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, title, description, priority, due_date, completed, created_at, updated_at
-            FROM tasks
-            WHERE id = ?
-        ''', (task_id,))
-        
-        row = cursor.fetchone()
-        conn.close()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?', (task_id,))
+            
+            row = cursor.fetchone()
         
         if row:
-            task = Task(
-                id=row['id'],
-                title=row['title'],
-                description=row['description'],
-                priority=row['priority'],
-                due_date=row['due_date'],
-                completed=bool(row['completed'])
-            )
-            task.created_at = datetime.fromisoformat(row['created_at'])
-            task.updated_at = datetime.fromisoformat(row['updated_at'])
-            return task
+            return self._row_to_task(row)
         
         return None
     
+    @retry_on_busy
     def update_task(self, task: Task) -> bool:
         """
         Actualiza una tarea existente en la base de datos.
@@ -185,30 +488,73 @@ class Database:
         if not task.id:
             return False
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE tasks
-            SET title = ?, description = ?, priority = ?, due_date = ?, 
-                completed = ?, updated_at = ?
-            WHERE id = ?
-        ''', (
-            task.title,
-            task.description,
-            task.priority,
-            task.due_date,
-            task.completed,
-            datetime.now(),
-            task.id
-        ))
-        
-        rows_affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        task.updated_at = now_iso()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE tasks
+                SET title = ?, description = ?, priority = ?, due_date = ?, 
+                    completed = ?, updated_at = ?, recurrence = ?
+                WHERE id = ?
+            ''', (
+                task.title,
+                task.description,
+                task.priority,
+                task.due_date,
+                task.completed,
+                task.updated_at,
+                task.recurrence,
+                task.id
+            ))
+            
+            rows_affected = cursor.rowcount
+            conn.commit()
         
         return rows_affected > 0
     
+    @retry_on_busy
+    def apply_task_updates(self, updates: Sequence[TaskUpdate]) -> List[Optional[Task]]:
+        """
+        Aplica varios cambios parciales en una sola transacción (un solo commit), cada uno
+        con una sentencia UPDATE ... RETURNING (SET completed = NOT completed para un toggle),
+        sin leer la tarea antes ni reescribir las demás columnas. toggle_task y patch_task
+        (en TaskRepository) son un lote de uno; la cola write-behind envía lotes ya agrupados.
+        
+        Args:
+            updates (Sequence[TaskUpdate]): Cambios a aplicar, en orden
+            
+        Returns:
+            List[Optional[Task]]: Tarea actualizada por cada cambio, o None si no existe
+        """
+        if not updates:
+            return []
+        
+        now = now_iso()
+        with self._transaction() as conn:
+            return [self._apply_update(conn, update, now) for update in updates]
+    
+    def _apply_update(self, conn: sqlite3.Connection, update: TaskUpdate, now: str) -> Optional[Task]:
+        """Ejecuta el UPDATE de un TaskUpdate y devuelve la fila resultante"""
+        fields, toggle = resolve_update(update)
+        assignments = [f'{field} = ?' for field in fields]
+        params: List[Any] = list(fields.values())
+        if toggle:
+            assignments.append('completed = NOT completed')
+        assignments.append('updated_at = ?')
+        params += [update.updated_at or now, update.task_id]
+        sql = f'UPDATE tasks SET {", ".join(assignments)} WHERE id = ?'
+        
+        if RETURNING_SUPPORTED:
+            rows = conn.execute(f'{sql} RETURNING {TASK_COLUMNS}', params).fetchall()
+        elif conn.execute(sql, params).rowcount:
+            rows = conn.execute(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?',
+                                (update.task_id,)).fetchall()
+        else:
+            rows = []
+        return self._row_to_task(rows[0]) if rows else None
+    
+    @retry_on_busy
     def delete_task(self, task_id: int) -> bool:
         """
         Elimina una tarea de la base de datos.
@@ -219,118 +565,462 @@ class Database:
         Returns:
             bool: True si la eliminación fue exitosa, False en caso contrario
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            
+            rows_affected = cursor.rowcount
+            conn.commit()
         
-        cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        return rows_affected > 0
+    
+    @retry_on_busy
+    def create_tasks(self, tasks: List[Task]) -> List[int]:
+        """
+        Crea varias tareas con un solo executemany dentro de una transacción.
         
-        rows_affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        Args:
+            tasks (List[Task]): Tareas a crear
+            
+        Returns:
+            List[int]: IDs asignados, en el mismo orden que `tasks`
+        """
+        if not tasks:
+            return []
         
-        return rows_affected > 0
+        with self._transaction() as conn:
+            first_id = self._last_task_id(conn) + 1
+            conn.executemany('''
+                INSERT INTO tasks (title, description, priority, due_date, completed, created_at,
+                                   updated_at, recurrence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                task.title,
+                task.description,
+                task.priority,
+                task.due_date,
+                task.completed,
+                task.created_at,
+                task.updated_at,
+                task.recurrence
+            ) for task in tasks])
+            # Con AUTOINCREMENT y el bloqueo de escritura tomado, los IDs son consecutivos
+            task_ids = list(range(first_id, self._last_task_id(conn) + 1))
+        
+        return task_ids
     
-    def get_tasks_by_priority(self, priority: str) -> List[Task]:
+    @retry_on_busy
+    def patch_tasks(self, changes: List[Dict[str, Any]]) -> List[Optional[Task]]:
         """
-        Obtiene todas las tareas de una prioridad específica.
+        Aplica cambios parciales a varias tareas dentro de una transacción.
+        Cada cambio es un diccionario con 'id' y los campos a modificar.
         
         Args:
-            priority (str): Prioridad de las tareas a buscar
-            
-        Returns:
-            List[Task]: Lista de tareas con la prioridad especificada
-        """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, title, description, priority, due_date, completed, created_at, updated_at
-            FROM tasks
-            WHERE priority = ?
-            ORDER BY created_at DESC
-        ''', (priority,))
-        
-        tasks = []
-        for row in cursor.fetchall():
-            task = Task(
-                id=row['id'],
-                title=row['title'],
-                description=row['description'],
-                priority=row['priority'],
-                due_date=row['due_date'],
-                completed=bool(row['completed'])
-            )
-            task.created_at = datetime.fromisoformat(row['created_at'])
-            task.updated_at = datetime.fromisoformat(row['updated_at'])
-            tasks.append(task)
+            changes (List[Dict[str, Any]]): Cambios a aplicar
+            
+        Returns:
+            List[Optional[Task]]: Tarea actualizada por cada cambio, o None si no existe
+        """
+        if not changes:
+            return []
+        
+        with self._transaction() as conn:
+            existing = {
+                task.id: task
+                for task in self._fetch_tasks_by_ids(conn, [change['id'] for change in changes])
+            }
+            now = now_iso()
+            results: List[Optional[Task]] = []
+            for change in changes:
+                task = existing.get(change['id'])
+                if task is not None:
+                    for field in PATCHABLE_FIELDS:
+                        if field in change:
+                            setattr(task, field, change[field])
+                    task.updated_at = now
+                results.append(task)
+            
+            updated = {task.id: task for task in results if task is not None}
+            conn.executemany('''
+                UPDATE tasks
+                SET title = ?, description = ?, priority = ?, due_date = ?, 
+                    completed = ?, updated_at = ?, recurrence = ?
+                WHERE id = ?
+            ''', [(
+                task.title,
+                task.description,
+                task.priority,
+                task.due_date,
+                task.completed,
+                task.updated_at,
+                task.recurrence,
+                task.id
+            ) for task in updated.values()])
         
-        conn.close()
-        return tasks
+        return results
     
-    def get_completed_tasks(self) -> List[Task]:
+    @retry_on_busy
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
         """
-        Obtiene todas las tareas completadas.
+        Elimina varias tareas dentro de una transacción.
         
+        Args:
+            task_ids (List[int]): IDs de las tareas a eliminar
+            
         Returns:
-            List[Task]: Lista de tareas completadas
+            List[bool]: True por cada ID que existía y fue eliminado
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        if not task_ids:
+            return []
         
-        cursor.execute('''
-            SELECT id, title, description, priority, due_date, completed, created_at, updated_at
-            FROM tasks
-            WHERE completed = 1
-            ORDER BY updated_at DESC
-        ''')
+        with self._transaction() as conn:
+            existing = {task.id for task in self._fetch_tasks_by_ids(conn, task_ids)}
+            conn.executemany('DELETE FROM tasks WHERE id = ?',
+                             [(task_id,) for task_id in existing])
         
-        tasks = []
-        for row in cursor.fetchall():
-            task = Task(
-                id=row['id'],
-                title=row['title'],
-                description=row['description'],
-                priority=row['priority'],
-                due_date=row['due_date'],
-                completed=bool(row['completed'])
-            )
-            task.created_at = datetime.fromisoformat(row['created_at'])
-            task.updated_at = datetime.fromisoformat(row['updated_at'])
-            tasks.append(task)
+        # Un ID repetido solo cuenta como eliminado la primera vez
+        results = []
+        for task_id in task_ids:
+            results.append(task_id in existing)
+            existing.discard(task_id)
+        return results
+    
+    def get_due_task_dicts(self, first: str, last: str) -> List[Dict[str, Any]]:
+        """
+        Obtiene las tareas pendientes que vencen en un rango de fechas, con el índice
+        (completed, due_date, priority): el costo depende de las tareas del rango, no de la tabla.
+        
+        Args:
+            first (str): Primera fecha YYYY-MM-DD del rango
+            last (str): Última fecha YYYY-MM-DD del rango (incluida)
         
-        conn.close()
-        return tasks
+        Returns:
+            List[Dict[str, Any]]: Tareas del rango (sin orden garantizado)
+        """
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                f'SELECT {TASK_COLUMNS} FROM tasks WHERE completed = 0 AND due_date BETWEEN ? AND ?',
+                (first, last)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
     
-    def get_pending_tasks(self) -> List[Task]:
+    def has_due_tasks(self, first: str, last: str) -> bool:
         """
-        Obtiene todas las tareas pendientes.
+        Comprueba si alguna tarea pendiente vence en un rango de fechas: basta con la primera
+        entrada del índice (completed, due_date, priority) dentro del rango.
+        
+        Args:
+            first (str): Primera fecha YYYY-MM-DD del rango
+            last (str): Última fecha YYYY-MM-DD del rango (incluida)
         
         Returns:
-            List[Task]: Lista de tareas pendientes
+            bool: True si hay al menos una
+        """
+        with self._get_connection() as conn:
+            row = conn.execute(
+                'SELECT EXISTS (SELECT 1 FROM tasks WHERE completed = 0 AND due_date BETWEEN ? AND ?)',
+                (first, last)
+            ).fetchone()
+        return bool(row[0])
+    
+    def get_completed_recurring_task_dicts(self) -> List[Dict[str, Any]]:
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        Obtiene las tareas completadas que todavía tienen regla de repetición (las que esperan
+        a que se cree su siguiente ocurrencia), con el índice parcial idx_tasks_recurring_completed.
         
-        cursor.execute('''
-            SELECT id, title, description, priority, due_date, completed, created_at, updated_at
-            FROM tasks
-            WHERE completed = 0
-            ORDER BY created_at DESC
-        ''')
+        Returns:
+            List[Dict[str, Any]]: Tareas encontradas, por ID
+        """
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                f'SELECT {TASK_COLUMNS} FROM tasks '
+                'WHERE completed = 1 AND recurrence IS NOT NULL ORDER BY id'
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+    
+    @retry_on_busy
+    def spawn_occurrence(self, task_id: int, due_date: str) -> Optional[Task]:
+        """
+        Crea la siguiente ocurrencia de una tarea repetida ya completada: una copia pendiente
+        con la regla y el nuevo vencimiento. La original pierde la regla en la misma transacción,
+        así que llamarla dos veces (o desde dos procesos) crea una sola ocurrencia.
         
-        tasks = []
-        for row in cursor.fetchall():
-            task = Task(
-                id=row['id'],
-                title=row['title'],
-                description=row['description'],
-                priority=row['priority'],
-                due_date=row['due_date'],
-                completed=bool(row['completed'])
-            )
-            task.created_at = datetime.fromisoformat(row['created_at'])
-            task.updated_at = datetime.fromisoformat(row['updated_at'])
-            tasks.append(task)
+        Args:
+            task_id (int): ID de la tarea completada
+            due_date (str): Vencimiento YYYY-MM-DD de la nueva ocurrencia
+        
+        Returns:
+            Optional[Task]: Tarea creada, o None si la tarea no existe, no está completada
+            o ya no tiene regla
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                f'SELECT {TASK_COLUMNS} FROM tasks '
+                'WHERE id = ? AND completed = 1 AND recurrence IS NOT NULL',
+                (task_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            original = self._row_to_task(row)
+            task = Task(original.title, original.description, original.priority, due_date,
+                        recurrence=original.recurrence)
+            conn.execute('UPDATE tasks SET recurrence = NULL, updated_at = ? WHERE id = ?',
+                         (task.created_at, task_id))
+            task.id = conn.execute('''
+                INSERT INTO tasks (title, description, priority, due_date, completed, created_at,
+                                   updated_at, recurrence)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                task.title,
+                task.description,
+                task.priority,
+                task.due_date,
+                task.completed,
+                task.created_at,
+                task.updated_at,
+                task.recurrence
+            )).lastrowid
+        
+        return task
+    
+    @retry_on_busy
+    def acquire_lease(self, name: str, owner: str, ttl: float, now: float,
+                      state: Optional[str] = None) -> Optional[Lease]:
+        """
+        Toma o renueva una concesión de la tabla 'leases'. Con varios workers de gunicorn sobre
+        el mismo archivo, solo uno la tiene a la vez: BEGIN IMMEDIATE serializa los intentos.
+        
+        Args:
+            name (str): Nombre de la concesión
+            owner (str): Identificador de quien la pide (único por proceso)
+            ttl (float): Segundos de validez desde `now`
+            now (float): Hora actual en segundos Unix (la del reloj de quien la pide)
+            state (Optional[str]): Estado a guardar con la concesión (None lo conserva)
+        
+        Returns:
+            Optional[Lease]: Concesión tomada, o None si otro la tiene y no ha vencido
+        """
+        with self._transaction() as conn:
+            conn.execute('''
+                INSERT INTO leases (name, owner, expires_at, state) VALUES (?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE
+                SET owner = excluded.owner,
+                    expires_at = excluded.expires_at,
+                    state = IFNULL(excluded.state, leases.state)
+                WHERE leases.owner = excluded.owner OR leases.expires_at <= ?
+            ''', (name, owner, now + ttl, state, now))
+            row = conn.execute('SELECT name, owner, expires_at, state FROM leases WHERE name = ?',
+                               (name,)).fetchone()
+        
+        return Lease(*row) if row['owner'] == owner else None
+    
+    @retry_on_busy
+    def release_lease(self, name: str, owner: str) -> bool:
+        """
+        Libera una concesión para que otro proceso la tome sin esperar a que venza.
+        
+        Args:
+            name (str): Nombre de la concesión
+            owner (str): Quien la tiene
+        
+        Returns:
+            bool: True si era de `owner` y quedó libre
+        """
+        with self._transaction() as conn:
+            released = conn.execute(
+                'UPDATE leases SET expires_at = 0 WHERE name = ? AND owner = ?', (name, owner)
+            ).rowcount
+        return released > 0
+
+    @retry_on_busy
+    def archive_tasks(self, before: str, limit: int = 1000) -> int:
+        """
+        Pasa a 'archived_tasks' las completadas más antiguas, en una transacción: un INSERT
+        ... SELECT y un DELETE con la misma condición, que recorren el índice
+        (completed, updated_at) desde el principio. Los triggers de 'tasks' registran el borrado.
+        
+        Args:
+            before (str): Fecha ISO 8601; se archivan las completadas con updated_at anterior
+            limit (int): Máximo de tareas a mover en esta transacción
+        
+        Returns:
+            int: Tareas archivadas (menos que `limit` si ya no quedan)
+        """
+        oldest = '''
+            SELECT id FROM tasks
+            WHERE completed = 1 AND updated_at < ? AND recurrence IS NULL
+            ORDER BY updated_at, id
+            LIMIT ?
+        '''
+        with self._transaction() as conn:
+            moved = conn.execute(
+                f'INSERT INTO archived_tasks ({TASK_COLUMNS}) '
+                f'SELECT {TASK_COLUMNS} FROM tasks WHERE id IN ({oldest})',
+                (before, limit)
+            ).rowcount
+            if moved:
+                conn.execute(f'DELETE FROM tasks WHERE id IN ({oldest})', (before, limit))
+        return moved
+    
+    def query_archived_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de tareas archivadas con la misma sentencia que query_task_dicts
+        sobre 'archived_tasks'. Los órdenes por fecha usan sus propios índices.
+        
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Tareas de la página y cursor
+            de la siguiente página (None si no hay más)
+        """
+        rows, next_cursor = self._query_rows(query, table='archived_tasks')
+        return [self._row_to_dict(row) for row in rows], next_cursor
+    
+    @retry_on_busy
+    def compact_storage(self, max_pages: int = 0, full: bool = False) -> int:
+        """
+        Fusiona los segmentos del índice FTS5 (descartando las entradas de las tareas
+        archivadas), devuelve al sistema las páginas que quedaron libres y actualiza las
+        estadísticas del planificador de consultas.
+        Con auto_vacuum=INCREMENTAL (las bases creadas desde la migración 11) usa PRAGMA
+        incremental_vacuum, que no reescribe el archivo; con full=True ejecuta un VACUUM
+        completo, que además activa ese modo en bases anteriores pero bloquea la base mientras
+        dura (solo para el comando de mantenimiento).
+        
+        Args:
+            max_pages (int): Páginas a liberar como máximo (0: todas las libres)
+            full (bool): Reescribir el archivo completo con VACUUM
+        
+        Returns:
+            int: Páginas devueltas al sistema
+        """
+        with self._get_connection() as conn:
+            # Cada paso confirma por separado: el bloqueo de escritura se suelta entre uno y otro
+            while True:
+                changes = conn.total_changes
+                conn.execute('INSERT INTO tasks_fts (tasks_fts, rank) VALUES (?, ?)',
+                             ('merge', FTS_MERGE_PAGES))
+                conn.commit()
+                if conn.total_changes - changes < 2:
+                    break
+            free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if full:
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            elif conn.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+                # Solo libera páginas mientras se recorre su resultado
+                conn.execute(f'PRAGMA incremental_vacuum({int(max_pages)})').fetchall()
+                conn.commit()
+            conn.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+            try:
+                conn.execute('ANALYZE tasks')
+                conn.execute('ANALYZE archived_tasks')
+                conn.commit()
+            finally:
+                conn.execute('PRAGMA analysis_limit = 0')
+            free_after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return max(free_before - free_after, 0)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Presta una conexión con una transacción de escritura abierta (BEGIN IMMEDIATE).
+        Confirma al salir del bloque o revierte si ocurre una excepción.
+        
+        Yields:
+            sqlite3.Connection: Conexión con la transacción abierta
+        """
+        with self._get_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+    
+    @staticmethod
+    def _last_task_id(conn: sqlite3.Connection) -> int:
+        """Obtiene el último ID asignado por AUTOINCREMENT a la tabla 'tasks'"""
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+        return row[0] if row else 0
+    
+    def _fetch_tasks_by_ids(self, conn: sqlite3.Connection, task_ids: List[int]) -> List[Task]:
+        """
+        Obtiene las tareas existentes de una lista de IDs.
         
-        conn.close()
-        return tasks 
\ No newline at end of file
+        Args:
+            conn (sqlite3.Connection): Conexión a usar
+            task_ids (List[int]): IDs a buscar
+            
+        Returns:
+            List[Task]: Tareas encontradas (sin orden garantizado)
+        """
+        return [self._row_to_task(row) for row in self._fetch_rows_by_ids(conn, task_ids)]
+    
+    def _fetch_task_dicts_by_ids(self, conn: sqlite3.Connection,
+                                 task_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Obtiene como diccionarios las tareas existentes de una lista de IDs.
+        
+        Args:
+            conn (sqlite3.Connection): Conexión a usar
+            task_ids (List[int]): IDs a buscar
+            
+        Returns:
+            Dict[int, Dict[str, Any]]: Tareas encontradas indexadas por ID
+        """
+        return {row['id']: self._row_to_dict(row)
+                for row in self._fetch_rows_by_ids(conn, task_ids)}
+    
+    @staticmethod
+    def _fetch_rows_by_ids(conn: sqlite3.Connection, task_ids: List[int]) -> List[sqlite3.Row]:
+        """
+        Lee las filas de una lista de IDs en bloques para no superar el límite de
+        parámetros de SQLite.
+        
+        Args:
+            conn (sqlite3.Connection): Conexión a usar
+            task_ids (List[int]): IDs a buscar
+            
+        Returns:
+            List[sqlite3.Row]: Filas encontradas (sin orden garantizado)
+        """
+        unique_ids = list(dict.fromkeys(task_ids))
+        rows: List[sqlite3.Row] = []
+        for start in range(0, len(unique_ids), SQL_PARAMS_CHUNK):
+            chunk = unique_ids[start:start + SQL_PARAMS_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(conn.execute(
+                f'SELECT {TASK_COLUMNS} FROM tasks WHERE id IN ({placeholders})', chunk
+            ).fetchall())
+        return rows
+    
+    @staticmethod
+    def _row_to_task(row: sqlite3.Row) -> Task:
+        """
+        Construye una Task a partir de una fila de la tabla 'tasks'.
+        
+        Args:
+            row (sqlite3.Row): Fila con las columnas de TASK_COLUMNS
+            
+        Returns:
+            Task: Tarea hidratada
+        """
+        return Task(
+            id=row['id'],
+            title=row['title'],
+            description=row['description'],
+            priority=row['priority'],
+            due_date=row['due_date'],
+            completed=bool(row['completed']),
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+            recurrence=row['recurrence']
+        )
+    
+    # Vía rápida para listados de solo lectura (ver task_row_to_dict)
+    _row_to_dict = staticmethod(task_row_to_dict)
@@ -0,0 +1,334 @@
+# algoRitmo.py - Difusión de cambios de tareas (Server-Sent Events)
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define ChangeHub, que sigue el registro de cambios 'task_changes' de
+# SQLite y reparte cada cambio a todos los suscriptores del proceso. Cada worker de gunicorn (o
+# de uvicorn) tiene su propio hub leyendo la misma tabla, así un cambio hecho en cualquier worker
+# llega a los navegadores conectados a todos ellos: la tabla es el canal entre procesos.
+# Un solo hilo por proceso consulta la tabla; los suscriptores solo esperan, con hilos (Flask)
+# o con corrutinas (asgi.py), y se ponen al día desde un búfer en memoria o desde la tabla.
+# Documentación Server-Sent Events: https://html.spec.whatwg.org/multipage/server-sent-events.html
+#
+# Referencias:
+# - https://developer.mozilla.org/en-US/docs/Web/API/Server-sent_events/Using_server-sent_events
+# - https://docs.python.org/3/library/threading.html#condition-objects
+#
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Callable, Deque, Dict, Iterator, List,
+                    Optional, Set, Tuple)
+
+from .repository import ChangeEvent
+
+if TYPE_CHECKING:
+    # asyncio solo se importa al usarse desde asgi.py: la versión WSGI arranca sin cargarlo
+    import asyncio
+
+# Nombre del evento SSE por operación del registro de cambios
+EVENT_NAMES = {'insert': 'created', 'update': 'updated', 'delete': 'deleted'}
+
+# Comentario SSE (el navegador lo ignora) que mantiene viva la conexión en proxies y balanceadores
+HEARTBEAT = ': heartbeat\n\n'
+
+
+def format_event(event: ChangeEvent, dumps: Callable[[Any], str]) -> str:
+    """
+    Da formato SSE a un cambio. El id es el número de secuencia del registro: el navegador
+    lo reenvía en Last-Event-ID al reconectar y el stream sigue desde ahí.
+
+    Args:
+        event (ChangeEvent): Cambio a enviar
+        dumps (Callable): Serializador JSON (app.json.dumps)
+
+    Returns:
+        str: Bloque 'id/event/data' terminado en línea vacía, o solo el id si la tarea
+        se borró después (su evento 'deleted' llega a continuación)
+    """
+    if event.op != 'delete' and event.task is None:
+        return f'id: {event.seq}\n\n'
+    payload = {'id': event.task_id, 'task': event.task if event.op != 'delete' else None}
+    return f'id: {event.seq}\nevent: {EVENT_NAMES.get(event.op, event.op)}\ndata: {dumps(payload)}\n\n'
+
+
+def format_reset(seq: int) -> str:
+    """Evento 'reset': los cambios perdidos ya no se pueden reconstruir y el cliente recarga todo"""
+    return f'id: {seq}\nevent: reset\ndata: {{}}\n\n'
+
+
+class ChangeHub:
+    """
+    Sigue 'task_changes' desde un hilo y despierta a los suscriptores que esperan.
+    Guarda los últimos `buffer_size` cambios para que los suscriptores (y las reconexiones
+    recientes) se pongan al día sin consultar SQLite.
+    """
+
+    def __init__(self, database: Any, poll_interval: float = 0.25, buffer_size: int = 1000,
+                 batch_size: int = 500):
+        """
+        Inicializa el hub. El hilo lector se crea con el primer suscriptor.
+
+        Args:
+            database (Any): Database o CachedDatabase con get_change_events
+            poll_interval (float): Segundos entre consultas al registro de cambios
+            buffer_size (int): Cambios recientes que se guardan en memoria
+            batch_size (int): Entradas leídas del registro por consulta
+        """
+        self.database = database
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._buffer: Deque[ChangeEvent] = deque(maxlen=buffer_size)
+        self._last_seq = 0
+        self._condition = threading.Condition()
+        # Bloques ya formateados por (cursor, último seq): los suscriptores al día comparten el mismo
+        self._chunks: Dict[Tuple[int, int], str] = {}
+        self._async_waiters: Set[Tuple['asyncio.AbstractEventLoop', 'asyncio.Future']] = set()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.subscribers = 0
+        self.delivered_batches = 0
+
+    @property
+    def last_seq(self) -> int:
+        """Último número de secuencia leído del registro"""
+        return self._last_seq
+
+    def start(self) -> int:
+        """
+        Arranca el hilo lector si no está corriendo en este proceso.
+
+        Returns:
+            int: Último número de secuencia conocido (punto de partida de un suscriptor nuevo)
+        """
+        with self._condition:
+            if self._thread is None or self._pid != os.getpid():
+                # Tras un fork el hilo del proceso padre no existe en el hijo
+                self._pid = os.getpid()
+                self._buffer.clear()
+                self._last_seq = self.database.get_change_token()
+                self._thread = threading.Thread(target=self._run, name='change-hub', daemon=True)
+                self._thread.start()
+            return self._last_seq
+
+    def wake(self) -> None:
+        """Consulta el registro ya, sin esperar al intervalo (tras una escritura en este proceso)"""
+        self._wakeup.set()
+
+    def poll(self) -> int:
+        """
+        Lee del registro los cambios nuevos y despierta a los suscriptores.
+
+        Returns:
+            int: Cambios leídos
+        """
+        events = self.database.get_change_events(self._last_seq, self.batch_size)
+        if events is None:
+            # El registro se podó por encima de lo leído: se sigue desde el token actual
+            # y los suscriptores atrasados recibirán un evento 'reset'
+            events = []
+            token = self.database.get_change_token()
+        else:
+            token = events[-1].seq if events else self._last_seq
+        if token == self._last_seq:
+            return 0
+
+        by_loop: Dict['asyncio.AbstractEventLoop', List['asyncio.Future']] = defaultdict(list)
+        with self._condition:
+            self._buffer.extend(events)
+            self._last_seq = token
+            self._condition.notify_all()
+            for loop, future in self._async_waiters:
+                by_loop[loop].append(future)
+            self._async_waiters.clear()
+        # Una sola llamada por event loop, aunque tenga miles de suscriptores esperando
+        for loop, waiting in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_resolve_all, waiting)
+            except RuntimeError:
+                pass  # El loop ya se cerró
+        self.delivered_batches += 1
+        return len(events)
+
+    def events_after(self, cursor: int, limit: Optional[int] = None) -> Optional[List[ChangeEvent]]:
+        """
+        Obtiene los cambios posteriores a `cursor`, del búfer si todavía están en él o del
+        registro de SQLite si el suscriptor viene de más atrás (por ejemplo, al reconectar).
+
+        Args:
+            cursor (int): Último número de secuencia entregado al suscriptor
+            limit (Optional[int]): Máximo de cambios a devolver
+
+        Returns:
+            Optional[List[ChangeEvent]]: Cambios en orden, o None si ya no se pueden
+            reconstruir (el registro se podó) y el cliente debe recargar todo
+        """
+        limit = limit or self.batch_size
+        with self._condition:
+            if cursor >= self._last_seq:
+                return []
+            if self._buffer and cursor >= self._buffer[0].seq - 1:
+                # Casi siempre el suscriptor va al día: se recorre desde el final, no todo el búfer
+                events = []
+                for event in reversed(self._buffer):
+                    if event.seq <= cursor:
+                        break
+                    events.append(event)
+                events.reverse()
+                return events[:limit]
+        return self.database.get_change_events(cursor, limit)
+
+    def wait(self, cursor: int, timeout: float) -> Optional[List[ChangeEvent]]:
+        """
+        Espera (bloqueando el hilo) a que haya cambios posteriores a `cursor`.
+
+        Args:
+            cursor (int): Último número de secuencia entregado
+            timeout (float): Segundos máximos de espera
+
+        Returns:
+            Optional[List[ChangeEvent]]: Igual que events_after; lista vacía si venció el plazo
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._last_seq <= cursor:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._condition.wait(remaining)
+        return self.events_after(cursor)
+
+    async def wait_async(self, cursor: int, timeout: float) -> Optional[List[ChangeEvent]]:
+        """
+        Igual que wait(), pero esperando en el event loop en lugar de bloquear un hilo.
+
+        Args:
+            cursor (int): Último número de secuencia entregado
+            timeout (float): Segundos máximos de espera
+
+        Returns:
+            Optional[List[ChangeEvent]]: Igual que events_after; lista vacía si venció el plazo
+        """
+        # Un Future con call_later y no asyncio.wait_for: con miles de suscriptores, crear
+        # una tarea por espera es lo que más cuesta al repartir cada cambio
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        waiter = (loop, loop.create_future())
+        with self._condition:
+            if self._last_seq <= cursor:
+                self._async_waiters.add(waiter)
+        if waiter in self._async_waiters:
+            timer = loop.call_later(timeout, _resolve_all, [waiter[1]])
+            try:
+                await waiter[1]
+            finally:
+                timer.cancel()
+                with self._condition:
+                    self._async_waiters.discard(waiter)
+            if self._last_seq <= cursor:
+                return []
+        # La lectura de SQLite para ponerse al día no debe bloquear el event loop
+        if self._buffer and cursor >= self._buffer[0].seq - 1:
+            return self.events_after(cursor)
+        return await asyncio.get_running_loop().run_in_executor(None, self.events_after, cursor)
+
+    def open(self, last_event_id: Optional[int], retry_ms: int) -> Tuple[int, str]:
+        """
+        Prepara un stream nuevo: arranca el hilo lector y decide desde dónde se envía.
+
+        Args:
+            last_event_id (Optional[int]): Cabecera Last-Event-ID de una reconexión (None si es nueva)
+            retry_ms (int): Milisegundos que el navegador espera antes de reconectar
+
+        Returns:
+            Tuple[int, str]: Cursor inicial y primer bloque a enviar (retry e id inicial, o un
+            'reset' si el id no corresponde a esta base de datos)
+        """
+        current = self.start()
+        if last_event_id is None:
+            # Un bloque sin data no genera evento, pero fija el id con el que reconectará
+            return current, f'retry: {retry_ms}\nid: {current}\n\n'
+        if last_event_id > current:
+            return current, f'retry: {retry_ms}\n\n' + format_reset(current)
+        return last_event_id, f'retry: {retry_ms}\n\n'
+
+    def _next_chunk(self, events: Optional[List[ChangeEvent]], cursor: int,
+                    dumps: Callable[[Any], str]) -> Tuple[str, int]:
+        if events is None:
+            return format_reset(self._last_seq), self._last_seq
+        if not events:
+            return HEARTBEAT, cursor
+        key = (cursor, events[-1].seq)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = ''.join(format_event(event, dumps) for event in events)
+            if len(self._chunks) >= 64:
+                self._chunks.clear()
+            self._chunks[key] = chunk
+        return chunk, events[-1].seq
+
+    def stream(self, cursor: int, dumps: Callable[[Any], str], heartbeat: float,
+               max_duration: float) -> Iterator[str]:
+        """
+        Genera los bloques SSE desde `cursor` esperando en el hilo de la petición (Flask).
+
+        Args:
+            cursor (int): Cursor devuelto por open()
+            dumps (Callable): Serializador JSON
+            heartbeat (float): Segundos sin cambios tras los que se envía un comentario
+            max_duration (float): Segundos tras los que se cierra el stream
+
+        Yields:
+            str: Eventos, 'reset' o comentarios de heartbeat
+        """
+        deadline = time.monotonic() + max_duration
+        self._count_subscriber(1)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = self.wait(cursor, min(heartbeat, remaining))
+                chunk, cursor = self._next_chunk(events, cursor, dumps)
+                yield chunk
+        finally:
+            self._count_subscriber(-1)
+
+    async def stream_async(self, cursor: int, dumps: Callable[[Any], str], heartbeat: float,
+                           max_duration: float) -> AsyncIterator[str]:
+        """Igual que stream(), pero esperando en el event loop (asgi.py)"""
+        deadline = time.monotonic() + max_duration
+        self._count_subscriber(1)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = await self.wait_async(cursor, min(heartbeat, remaining))
+                chunk, cursor = self._next_chunk(events, cursor, dumps)
+                yield chunk
+        finally:
+            self._count_subscriber(-1)
+
+    def _count_subscriber(self, delta: int) -> None:
+        with self._condition:
+            self.subscribers += delta
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                self.poll()
+            except Exception:
+                # Un error pasajero de SQLite (bloqueo, disco) no debe detener la difusión
+                time.sleep(self.poll_interval)
+
+
+def _resolve_all(futures: List['asyncio.Future']) -> None:
+    for future in futures:
+        # Puede estar cancelado (el cliente se fue) o resuelto por el plazo
+        if not future.done():
+            future.set_result(None)
@@ -0,0 +1,801 @@
+# algoRitmo.py - Motor de almacenamiento en memoria
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define MemoryDatabase, un TaskRepository que guarda las tareas en
+# diccionarios dentro del proceso, con índices por estado, prioridad y fecha de vencimiento,
+# listas ordenadas para la paginación por cursor y un índice invertido para la búsqueda por
+# prefijo. No persiste nada ni se comparte entre workers: sirve para pruebas, demos y para
+# medir cuánto cuesta la capa web sin la base de datos (STORAGE_BACKEND=memory).
+# Documentación bisect: https://docs.python.org/3/library/bisect.html
+# Documentación unicodedata: https://docs.python.org/3/library/unicodedata.html
+#
+# Referencias:
+# - https://en.wikipedia.org/wiki/Inverted_index
+# - https://www.sqlite.org/fts5.html#unicode61_tokenizer
+#
+import bisect
+import heapq
+import threading
+import time
+import unicodedata
+from collections import Counter, deque
+from datetime import date
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .query import SORTS, TaskQuery, encode_cursor
+from .repository import (PATCHABLE_FIELDS, ChangeEvent, Lease, TaskChanges, TaskRepository,
+                         TaskUpdate, build_task_stats, resolve_update, task_from_dict)
+from .search import HIGHLIGHT_END, HIGHLIGHT_START, highlight, search_terms, strip_markers
+from .task import Task, now_iso
+
+# Pesos de la búsqueda, los mismos que bm25(tasks_fts, 10.0, 1.0) en SQLite
+TITLE_WEIGHT = 10
+DESCRIPTION_WEIGHT = 1
+
+# Si el filtro más selectivo deja menos de 1/8 de las tareas, se ordenan solo esas
+# en lugar de recorrer el índice de orden completo descartando filas
+SELECTIVE_FRACTION = 8
+
+
+def fold(text: str) -> str:
+    """
+    Normaliza una palabra para compararla: minúsculas y sin diacríticos, como el
+    tokenizador unicode61 de FTS5 con remove_diacritics.
+
+    Args:
+        text (str): Palabra a normalizar
+
+    Returns:
+        str: Palabra normalizada
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class MemoryDatabase(TaskRepository):
+    """
+    Motor de almacenamiento en memoria, seguro para hilos (un solo RLock).
+    Las lecturas devuelven copias, así nadie modifica las tareas guardadas por accidente.
+    """
+
+    # Las escrituras ya se serializan con el lock y no esperan E/S: no necesitan el hilo escritor
+    serialized_writes = frozenset()
+
+    def __init__(self) -> None:
+        """Inicializa un almacén vacío"""
+        self._lock = threading.RLock()
+        self._tasks: Dict[int, Dict[str, Any]] = {}
+        self._last_id = 0
+        # Índices secundarios: valor -> IDs
+        self._by_completed: Dict[bool, Set[int]] = {False: set(), True: set()}
+        self._by_priority: Dict[Any, Set[int]] = {}
+        self._by_due_date: Dict[Any, Set[int]] = {}
+        # Índices de orden: (valor, id) en orden ascendente, uno por columna de SORTS
+        self._order: Dict[str, List[Tuple[str, int]]] = {
+            column: [] for column, _ in SORTS.values()
+        }
+        # Índice invertido de búsqueda: palabra normalizada -> {ID: peso de sus apariciones},
+        # y el vocabulario ordenado para encontrar las palabras que empiezan por un prefijo
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._vocabulary: List[str] = []
+        # Totales por (completada, prioridad), como la tabla task_counts, y pendientes con
+        # vencimiento por fecha y prioridad, para contar las vencidas sin recorrer tareas
+        self._counts: Counter = Counter()
+        self._pending_due: Dict[str, Counter] = {}
+        # Completadas con regla de repetición (esperan su siguiente ocurrencia) y concesiones
+        self._recurring_completed: Set[int] = set()
+        self._leases: Dict[str, Lease] = {}
+        # Archivo de tareas completadas, con sus propios índices de orden (ver archive_tasks)
+        self._archive: Dict[int, Dict[str, Any]] = {}
+        self._archive_order: Dict[str, List[Tuple[str, int]]] = {
+            column: [] for column, _ in SORTS.values()
+        }
+        # Registro de cambios y versión de la tabla
+        self._changes: Deque[Tuple[int, int, str]] = deque()
+        self._seq = 0
+        self._floor = 0
+        self._generation = 0
+        self._last_modified = int(time.time())
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'MemoryDatabase':
+        """
+        Crea el motor a partir de la configuración (no usa ningún ajuste).
+
+        Args:
+            config (Mapping): Configuración (por ejemplo, app.config)
+
+        Returns:
+            MemoryDatabase: Almacén vacío
+        """
+        return cls()
+
+    def init_database(self) -> int:
+        """No hay esquema que migrar: siempre devuelve 0"""
+        return 0
+
+    def close(self) -> None:
+        """No hay conexiones que liberar"""
+
+    def connection_stats(self) -> Dict[str, int]:
+        """El motor en memoria no abre conexiones"""
+        return {'size': 0, 'opened': 0}
+
+    # Versión de la tabla y registro de cambios
+
+    def get_generation(self) -> int:
+        """
+        Obtiene el contador de generación, que aumenta con cada tarea escrita.
+
+        Returns:
+            int: Generación actual
+        """
+        return self._generation
+
+    def get_table_version(self) -> Tuple[int, int]:
+        """
+        Obtiene la generación y la fecha de la última escritura.
+
+        Returns:
+            Tuple[int, int]: Generación y segundos Unix de la última modificación
+        """
+        with self._lock:
+            return self._generation, self._last_modified
+
+    def get_change_token(self) -> int:
+        """
+        Obtiene el último número de secuencia del registro de cambios.
+
+        Returns:
+            int: Token a usar como 'since' en get_changes
+        """
+        return self._seq
+
+    def get_changes(self, since: int, limit: int = 500) -> Optional[TaskChanges]:
+        """
+        Obtiene las tareas insertadas o modificadas y los IDs eliminados desde un token.
+
+        Args:
+            since (int): Token devuelto por get_change_token o por una llamada anterior
+            limit (int): Máximo de entradas del registro a procesar
+
+        Returns:
+            Optional[TaskChanges]: Cambios desde `since`, o None si el registro ya se podó
+        """
+        with self._lock:
+            entries = self._entries_after(since, limit)
+            if entries is None:
+                return None
+            if not entries:
+                return TaskChanges([], [], since, False)
+            task_ids = list(dict.fromkeys(task_id for _, task_id, _ in entries))
+            changed = [dict(self._tasks[task_id]) for task_id in task_ids if task_id in self._tasks]
+            deleted = [task_id for task_id in task_ids if task_id not in self._tasks]
+        return TaskChanges(changed, deleted, entries[-1][0], len(entries) == limit)
+
+    def get_change_events(self, since: int, limit: int = 500) -> Optional[List[ChangeEvent]]:
+        """
+        Obtiene las entradas del registro de cambios posteriores a un token, en orden.
+
+        Args:
+            since (int): Último número de secuencia ya entregado
+            limit (int): Máximo de entradas a devolver
+
+        Returns:
+            Optional[List[ChangeEvent]]: Entradas con la tarea tal como está ahora, o None
+            si el registro ya se podó por encima de `since`
+        """
+        with self._lock:
+            entries = self._entries_after(since, limit)
+            if entries is None:
+                return None
+            return [ChangeEvent(seq, op, task_id,
+                                dict(self._tasks[task_id]) if task_id in self._tasks else None)
+                    for seq, task_id, op in entries]
+
+    def _entries_after(self, since: int, limit: int) -> Optional[List[Tuple[int, int, str]]]:
+        """Entradas con seq > since (los seq del registro son consecutivos); None si se podó"""
+        if since < self._floor:
+            return None
+        if not self._changes:
+            return []
+        start = max(0, since + 1 - self._changes[0][0])
+        return list(islice(self._changes, start, start + limit))
+
+    def prune_change_log(self, keep: int) -> int:
+        """
+        Elimina las entradas más antiguas del registro de cambios, conservando las últimas `keep`.
+
+        Args:
+            keep (int): Número de entradas a conservar
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        with self._lock:
+            floor = self._seq - keep
+            if floor <= 0:
+                return 0
+            deleted = 0
+            while self._changes and self._changes[0][0] <= floor:
+                self._changes.popleft()
+                deleted += 1
+            self._floor = max(self._floor, floor)
+        return deleted
+
+    # Lecturas
+
+    def get_task_by_id(self, task_id: int) -> Optional[Task]:
+        """
+        Obtiene una tarea por su ID.
+
+        Args:
+            task_id (int): ID de la tarea
+
+        Returns:
+            Optional[Task]: Tarea encontrada o None si no existe
+        """
+        task = self._tasks.get(task_id)
+        return task_from_dict(task) if task is not None else None
+
+    def query_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de tareas como diccionarios. Si algún filtro es selectivo se
+        ordenan solo sus candidatas; si no, se recorre el índice de orden desde el cursor.
+
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Tareas de la página y cursor
+            de la siguiente página (None si no hay más)
+        """
+        column, direction = SORTS[query.sort]
+        descending = direction == 'DESC'
+        wanted = None if query.limit is None else query.limit + 1
+        with self._lock:
+            candidates = self._candidates(query)
+            if candidates is not None and len(candidates) * SELECTIVE_FRACTION < len(self._tasks):
+                keys = sorted((self._tasks[task_id][column] or '', task_id)
+                              for task_id in candidates)
+                candidates = None
+            else:
+                keys = self._order[column]
+            rows = [dict(self._tasks[task_id]) for _, task_id in islice(
+                self._walk(keys, query.after, descending, candidates), wanted)]
+
+        next_cursor = None
+        if query.limit is not None and len(rows) > query.limit:
+            rows = rows[:query.limit]
+            next_cursor = encode_cursor(rows[-1][column], rows[-1]['id'])
+        return rows, next_cursor
+
+    def _candidates(self, query: TaskQuery) -> Optional[Set[int]]:
+        """IDs que cumplen los filtros de la consulta, o None si no hay filtros"""
+        sets = []
+        if query.status is not None:
+            sets.append(self._by_completed[query.status == 'completed'])
+        if query.priority is not None:
+            sets.append(self._by_priority.get(query.priority, set()))
+        if query.due_date is not None:
+            sets.append(self._by_due_date.get(query.due_date, set()))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    @staticmethod
+    def _walk(keys: List[Tuple[str, int]], after: Optional[Tuple[str, int]], descending: bool,
+              candidates: Optional[Set[int]]) -> Iterator[Tuple[str, int]]:
+        """Recorre `keys` en el orden pedido desde la posición siguiente al cursor"""
+        if descending:
+            end = bisect.bisect_left(keys, after) if after is not None else len(keys)
+            positions: Iterable[int] = range(end - 1, -1, -1)
+        else:
+            start = bisect.bisect_right(keys, after) if after is not None else 0
+            positions = range(start, len(keys))
+        for position in positions:
+            key = keys[position]
+            if candidates is None or key[1] in candidates:
+                yield key
+
+    def iter_task_dicts(self, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorre todas las tareas en bloques, en el orden por defecto (-created_at).
+        El orden se fija al empezar; las tareas eliminadas mientras tanto se omiten.
+
+        Args:
+            chunk_size (int): Tareas por bloque
+
+        Yields:
+            List[Dict[str, Any]]: Bloque de hasta `chunk_size` tareas como diccionarios
+        """
+        with self._lock:
+            task_ids = [task_id for _, task_id in reversed(self._order['created_at'])]
+        for start in range(0, len(task_ids), chunk_size):
+            with self._lock:
+                chunk = [dict(self._tasks[task_id]) for task_id in task_ids[start:start + chunk_size]
+                         if task_id in self._tasks]
+            if chunk:
+                yield chunk
+
+    def search_tasks(self, text: str, limit: int = 20,
+                     offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Busca tareas por prefijo en título y descripción con el índice invertido. Cada
+        palabra debe aparecer en la tarea; el título pesa más que la descripción.
+
+        Args:
+            text (str): Texto a buscar
+            limit (int): Tamaño de página
+            offset (int): Resultados a saltar
+
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: Tareas encontradas (con 'title_snippet' y
+            'description_snippet' en HTML resaltado) y si hay más resultados
+        """
+        terms = [fold(term) for term in search_terms(text)]
+        if not terms:
+            return [], False
+
+        with self._lock:
+            scores: Optional[Dict[int, int]] = None
+            for term in terms:
+                term_scores = self._prefix_scores(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {task_id: score + term_scores[task_id]
+                              for task_id, score in scores.items() if task_id in term_scores}
+                if not scores:
+                    return [], False
+            # Solo se ordena lo necesario para llegar al final de la página
+            ranked = heapq.nsmallest(offset + limit, scores.items(),
+                                     key=lambda item: (-item[1], item[0]))
+            page = [dict(self._tasks[task_id]) for task_id, _ in ranked[offset:]]
+
+        for task in page:
+            task['title_snippet'] = highlight(self._mark(task['title'], terms))
+            task['description_snippet'] = highlight(self._mark(task['description'], terms))
+        return page, len(scores) > offset + limit
+
+    def _prefix_scores(self, term: str) -> Dict[int, int]:
+        """Peso de las palabras que empiezan por `term`, por cada tarea que tiene alguna"""
+        scores: Dict[int, int] = {}
+        position = bisect.bisect_left(self._vocabulary, term)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            for task_id, weight in self._postings[self._vocabulary[position]].items():
+                scores[task_id] = scores.get(task_id, 0) + weight
+            position += 1
+        return scores
+
+    @staticmethod
+    def _mark(text: Optional[str], terms: List[str]) -> Optional[str]:
+        """Rodea con los marcadores de resaltado las palabras que coinciden con algún término"""
+        if text is None:
+            return None
+        text = strip_markers(text)
+        parts: List[str] = []
+        last = 0
+        for word in search_terms(text):
+            start = text.index(word, last)
+            folded = fold(word)
+            if any(folded.startswith(term) for term in terms):
+                parts += [text[last:start], HIGHLIGHT_START, word, HIGHLIGHT_END]
+            else:
+                parts.append(text[last:start + len(word)])
+            last = start + len(word)
+        parts.append(text[last:])
+        return ''.join(parts)
+
+    def get_task_stats(self, today: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtiene los totales de tareas por estado y prioridad, y las vencidas. Ambos se
+        mantienen al escribir; las vencidas solo recorren las fechas distintas.
+
+        Args:
+            today (Optional[str]): Fecha de referencia YYYY-MM-DD (hoy si no se indica)
+
+        Returns:
+            Dict[str, Any]: total, completed, pending, overdue y el mismo desglose en by_priority
+        """
+        today = today or date.today().isoformat()
+        with self._lock:
+            rows = [(completed, priority, count, 0)
+                    for (completed, priority), count in self._counts.items() if count > 0]
+            overdue: Counter = Counter()
+            for due_date, by_priority in self._pending_due.items():
+                if due_date < today:
+                    overdue.update(by_priority)
+        rows += [(False, priority, 0, count) for priority, count in overdue.items() if count > 0]
+        return build_task_stats(rows)
+
+    # Escrituras
+
+    def create_task(self, task: Task) -> int:
+        """
+        Crea una nueva tarea.
+
+        Args:
+            task (Task): Tarea a crear
+
+        Returns:
+            int: ID de la tarea creada
+        """
+        return self.create_tasks([task])[0]
+
+    def create_tasks(self, tasks: List[Task]) -> List[int]:
+        """
+        Crea varias tareas de una vez.
+
+        Args:
+            tasks (List[Task]): Tareas a crear
+
+        Returns:
+            List[int]: IDs asignados, en el mismo orden que `tasks`
+        """
+        task_ids = []
+        with self._lock:
+            for task in tasks:
+                self._last_id += 1
+                row = task.to_dict()
+                row['id'] = self._last_id
+                row['completed'] = bool(row['completed'])
+                self._store(row, 'insert')
+                task_ids.append(self._last_id)
+        return task_ids
+
+    def update_task(self, task: Task) -> bool:
+        """
+        Reescribe todos los campos de una tarea existente.
+
+        Args:
+            task (Task): Tarea a actualizar
+
+        Returns:
+            bool: True si la actualización fue exitosa, False en caso contrario
+        """
+        if not task.id:
+            return False
+
+        task.updated_at = now_iso()
+        with self._lock:
+            current = self._tasks.get(task.id)
+            if current is None:
+                return False
+            row = task.to_dict()
+            row['completed'] = bool(row['completed'])
+            row['created_at'] = current['created_at']
+            self._store(row, 'update')
+        return True
+
+    def apply_task_updates(self, updates: Sequence[TaskUpdate]) -> List[Optional[Task]]:
+        """
+        Aplica varios cambios parciales de una vez.
+
+        Args:
+            updates (Sequence[TaskUpdate]): Cambios a aplicar, en orden
+
+        Returns:
+            List[Optional[Task]]: Tarea actualizada por cada cambio, o None si no existe
+        """
+        now = now_iso()
+        results: List[Optional[Task]] = []
+        with self._lock:
+            for update in updates:
+                current = self._tasks.get(update.task_id)
+                if current is None:
+                    results.append(None)
+                    continue
+                fields, toggle = resolve_update(update)
+                row = dict(current, **fields)
+                row['completed'] = bool(row['completed']) != toggle
+                row['updated_at'] = update.updated_at or now
+                self._store(row, 'update')
+                results.append(task_from_dict(row))
+        return results
+
+    def patch_tasks(self, changes: List[Dict[str, Any]]) -> List[Optional[Task]]:
+        """
+        Aplica cambios parciales ({'id': ..., campos}) a varias tareas de una vez.
+
+        Args:
+            changes (List[Dict[str, Any]]): Cambios a aplicar
+
+        Returns:
+            List[Optional[Task]]: Tarea actualizada por cada cambio, o None si no existe
+        """
+        return self.apply_task_updates([
+            TaskUpdate(change['id'], {field: change[field] for field in PATCHABLE_FIELDS
+                                      if field in change})
+            for change in changes
+        ])
+
+    def delete_task(self, task_id: int) -> bool:
+        """
+        Elimina una tarea.
+
+        Args:
+            task_id (int): ID de la tarea a eliminar
+
+        Returns:
+            bool: True si la eliminación fue exitosa, False en caso contrario
+        """
+        return self.delete_tasks([task_id])[0]
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        """
+        Elimina varias tareas de una vez.
+
+        Args:
+            task_ids (List[int]): IDs de las tareas a eliminar
+
+        Returns:
+            List[bool]: True por cada ID que existía y fue eliminado (un ID repetido
+            solo cuenta la primera vez)
+        """
+        results = []
+        with self._lock:
+            for task_id in task_ids:
+                current = self._tasks.pop(task_id, None)
+                if current is not None:
+                    self._unindex(current)
+                    self._log(task_id, 'delete')
+                results.append(current is not None)
+        return results
+
+    # Programador de avisos y repeticiones
+
+    def get_due_task_dicts(self, first: str, last: str) -> List[Dict[str, Any]]:
+        """
+        Obtiene las tareas pendientes que vencen en un rango de fechas. Recorre solo las
+        fechas distintas con pendientes (las claves de los contadores de vencidas).
+
+        Args:
+            first (str): Primera fecha YYYY-MM-DD del rango
+            last (str): Última fecha YYYY-MM-DD del rango (incluida)
+
+        Returns:
+            List[Dict[str, Any]]: Tareas del rango (sin orden garantizado)
+        """
+        with self._lock:
+            return [dict(self._tasks[task_id])
+                    for due_date in self._pending_due if first <= due_date <= last
+                    for task_id in self._by_due_date[due_date]
+                    if not self._tasks[task_id]['completed']]
+
+    def has_due_tasks(self, first: str, last: str) -> bool:
+        """
+        Comprueba si alguna tarea pendiente vence en un rango de fechas.
+
+        Args:
+            first (str): Primera fecha YYYY-MM-DD del rango
+            last (str): Última fecha YYYY-MM-DD del rango (incluida)
+
+        Returns:
+            bool: True si hay al menos una
+        """
+        with self._lock:
+            return any(not self._tasks[task_id]['completed']
+                       for due_date in self._pending_due if first <= due_date <= last
+                       for task_id in self._by_due_date[due_date])
+
+    def get_completed_recurring_task_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Obtiene las tareas completadas que todavía tienen regla de repetición.
+
+        Returns:
+            List[Dict[str, Any]]: Tareas encontradas, por ID
+        """
+        with self._lock:
+            return [dict(self._tasks[task_id]) for task_id in sorted(self._recurring_completed)]
+
+    def spawn_occurrence(self, task_id: int, due_date: str) -> Optional[Task]:
+        """
+        Crea la siguiente ocurrencia de una tarea repetida ya completada y le quita la regla
+        a la original, bajo el mismo lock.
+
+        Args:
+            task_id (int): ID de la tarea completada
+            due_date (str): Vencimiento YYYY-MM-DD de la nueva ocurrencia
+
+        Returns:
+            Optional[Task]: Tarea creada, o None si la tarea no existe, no está completada
+            o ya no tiene regla
+        """
+        with self._lock:
+            if task_id not in self._recurring_completed:
+                return None
+            original = self._tasks[task_id]
+            task = Task(original['title'], original['description'], original['priority'],
+                        due_date, recurrence=original['recurrence'])
+            self._store(dict(original, recurrence=None, updated_at=task.created_at), 'update')
+            task.id = self.create_task(task)
+        return task
+
+    def acquire_lease(self, name: str, owner: str, ttl: float, now: float,
+                      state: Optional[str] = None) -> Optional[Lease]:
+        """
+        Toma o renueva una concesión. En memoria solo compiten los hilos del proceso.
+
+        Args:
+            name (str): Nombre de la concesión
+            owner (str): Identificador de quien la pide
+            ttl (float): Segundos de validez desde `now`
+            now (float): Hora actual en segundos Unix (la del reloj de quien la pide)
+            state (Optional[str]): Estado a guardar con la concesión (None lo conserva)
+
+        Returns:
+            Optional[Lease]: Concesión tomada, o None si otro la tiene y no ha vencido
+        """
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current.owner != owner and current.expires_at > now:
+                return None
+            if state is None and current is not None:
+                state = current.state
+            lease = self._leases[name] = Lease(name, owner, now + ttl, state)
+        return lease
+
+    def release_lease(self, name: str, owner: str) -> bool:
+        """
+        Libera una concesión conservando su estado.
+
+        Args:
+            name (str): Nombre de la concesión
+            owner (str): Quien la tiene
+
+        Returns:
+            bool: True si era de `owner` y quedó libre
+        """
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or current.owner != owner:
+                return False
+            self._leases[name] = current._replace(expires_at=0.0)
+        return True
+
+    # Archivo de tareas completadas
+
+    def archive_tasks(self, before: str, limit: int = 1000) -> int:
+        """
+        Pasa al archivo las completadas más antiguas, recorriendo el índice de orden por
+        updated_at desde el principio, bajo el mismo lock.
+
+        Args:
+            before (str): Fecha ISO 8601; se archivan las completadas con updated_at anterior
+            limit (int): Máximo de tareas a mover
+
+        Returns:
+            int: Tareas archivadas (menos que `limit` si ya no quedan)
+        """
+        with self._lock:
+            moved = []
+            for updated_at, task_id in self._order['updated_at']:
+                if updated_at >= before or len(moved) == limit:
+                    break
+                row = self._tasks[task_id]
+                if row['completed'] and not row['recurrence']:
+                    moved.append(row)
+            for row in moved:
+                del self._tasks[row['id']]
+                self._unindex(row)
+                self._log(row['id'], 'delete')
+                self._archive[row['id']] = row
+                for column, keys in self._archive_order.items():
+                    bisect.insort(keys, (row[column] or '', row['id']))
+        return len(moved)
+
+    def query_archived_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de tareas archivadas recorriendo su índice de orden desde el cursor
+        y descartando las que no cumplen los filtros.
+
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Tareas de la página y cursor
+            de la siguiente página (None si no hay más)
+        """
+        column, direction = SORTS[query.sort]
+        wanted = None if query.limit is None else query.limit + 1
+        with self._lock:
+            keys = self._walk(self._archive_order[column], query.after, direction == 'DESC', None)
+            rows = [dict(self._archive[task_id]) for _, task_id in islice(
+                (key for key in keys if self._matches(self._archive[key[1]], query)), wanted)]
+
+        next_cursor = None
+        if query.limit is not None and len(rows) > query.limit:
+            rows = rows[:query.limit]
+            next_cursor = encode_cursor(rows[-1][column], rows[-1]['id'])
+        return rows, next_cursor
+
+    @staticmethod
+    def _matches(row: Mapping[str, Any], query: TaskQuery) -> bool:
+        """Si la tarea cumple los filtros de la consulta"""
+        return ((query.status is None or row['completed'] == (query.status == 'completed'))
+                and (query.priority is None or row['priority'] == query.priority)
+                and (query.due_date is None or row['due_date'] == query.due_date))
+
+    # Índices
+
+    def _store(self, row: Dict[str, Any], op: str) -> None:
+        """Guarda la fila (reemplazando la anterior si existe), actualiza índices y registro"""
+        current = self._tasks.get(row['id'])
+        if current is not None:
+            self._unindex(current)
+        self._tasks[row['id']] = row
+        self._index(row)
+        self._log(row['id'], op)
+
+    def _index(self, row: Mapping[str, Any]) -> None:
+        task_id = row['id']
+        self._by_completed[row['completed']].add(task_id)
+        self._by_priority.setdefault(row['priority'], set()).add(task_id)
+        self._by_due_date.setdefault(row['due_date'], set()).add(task_id)
+        for column, keys in self._order.items():
+            bisect.insort(keys, (row[column] or '', task_id))
+        for word, weight in self._word_weights(row).items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                bisect.insort(self._vocabulary, word)
+            postings[task_id] = weight
+        self._counts[row['completed'], row['priority'] or ''] += 1
+        if row['due_date'] and not row['completed']:
+            self._pending_due.setdefault(row['due_date'], Counter())[row['priority'] or ''] += 1
+        if row['completed'] and row['recurrence']:
+            self._recurring_completed.add(task_id)
+
+    def _unindex(self, row: Mapping[str, Any]) -> None:
+        task_id = row['id']
+        self._by_completed[row['completed']].discard(task_id)
+        self._discard(self._by_priority, row['priority'], task_id)
+        self._discard(self._by_due_date, row['due_date'], task_id)
+        for column, keys in self._order.items():
+            position = bisect.bisect_left(keys, (row[column] or '', task_id))
+            del keys[position]
+        for word in self._word_weights(row):
+            postings = self._postings[word]
+            del postings[task_id]
+            if not postings:
+                del self._postings[word]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+        self._counts[row['completed'], row['priority'] or ''] -= 1
+        if row['due_date'] and not row['completed']:
+            by_priority = self._pending_due[row['due_date']]
+            by_priority[row['priority'] or ''] -= 1
+            if not +by_priority:
+                del self._pending_due[row['due_date']]
+        self._recurring_completed.discard(task_id)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[int]], key: Any, task_id: int) -> bool:
+        """Quita el ID del índice; borra la clave si queda vacía y devuelve si la borró"""
+        task_ids = index.get(key)
+        if task_ids is None:
+            return False
+        task_ids.discard(task_id)
+        if task_ids:
+            return False
+        del index[key]
+        return True
+
+    @staticmethod
+    def _word_weights(row: Mapping[str, Any]) -> Dict[str, int]:
+        """Palabras normalizadas del título y la descripción con el peso de sus apariciones"""
+        weights: Dict[str, int] = {}
+        for field, weight in (('title', TITLE_WEIGHT), ('description', DESCRIPTION_WEIGHT)):
+            for word in search_terms(row[field] or ''):
+                word = fold(word)
+                weights[word] = weights.get(word, 0) + weight
+        return weights
+
+    def _log(self, task_id: int, op: str) -> None:
+        """Agrega una entrada al registro de cambios y avanza la versión de la tabla"""
+        self._seq += 1
+        self._changes.append((self._seq, task_id, op))
+        self._generation += 1
+        self._last_modified = int(time.time())
@@ -0,0 +1,340 @@
+# algoRitmo.py - Métricas de la aplicación en formato Prometheus
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define MetricsRegistry, que acumula contadores e histogramas en memoria
+# y los combina entre workers a través de un archivo JSON por proceso, e InstrumentedDatabase,
+# que mide la duración, filas devueltas y errores de cada método de Database.
+# Documentación formato de exposición: https://prometheus.io/docs/instrumenting/exposition_formats/
+# Documentación histogramas: https://prometheus.io/docs/practices/histograms/
+#
+# Referencias:
+# - https://prometheus.github.io/client_python/multiprocess/
+# - https://docs.python.org/3/library/time.html#time.perf_counter
+#
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+# Límites superiores (segundos) de las cubetas de los histogramas de duración
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Proporciones que se calculan al exponer, ya combinados los workers:
+# nombre -> (contador de aciertos, contador de fallos)
+DERIVED_RATIOS = {
+    'algoritmo_cache_hit_ratio': ('algoritmo_cache_hits_total', 'algoritmo_cache_misses_total'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Mapping[str, str], float]
+
+
+def _labels_key(labels: Optional[Mapping[str, Any]]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in (labels or {}).items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def count_rows(result: Any) -> int:
+    """
+    Estima cuántas filas devolvió un método de Database a partir de su resultado.
+
+    Args:
+        result (Any): Valor devuelto (lista, tupla (lista, cursor), tarea, None...)
+
+    Returns:
+        int: Número de filas
+    """
+    if result is None or isinstance(result, (bool, int, float, str)):
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        # (filas, cursor), (filas, hay_más) o TaskChanges(changed, deleted, ...)
+        return sum(len(item) for item in result if isinstance(item, list))
+    return 1
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas seguro para hilos.
+    Cada worker acumula sus valores en memoria y, si hay un directorio configurado, los
+    vuelca periódicamente a `metrics-<pid>.json`; al exponer se suman los de todos los
+    archivos, así cualquier worker responde por el servicio completo.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Inicializa el registro.
+
+        Args:
+            directory (Optional[str]): Directorio compartido entre workers (None = solo este proceso)
+            flush_interval (float): Segundos mínimos entre volcados al archivo del proceso
+            buckets (Tuple[float, ...]): Límites de las cubetas de los histogramas
+        """
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+        self.buckets = tuple(buckets)
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List[Any]] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """
+        Registra el tipo ('counter', 'histogram' o 'gauge') y la descripción de una métrica.
+
+        Args:
+            name (str): Nombre de la métrica
+            kind (str): Tipo de métrica
+            help_text (str): Texto de ayuda (# HELP)
+        """
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, amount: float = 1.0,
+            labels: Optional[Mapping[str, Any]] = None) -> None:
+        """Suma `amount` a un contador"""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float,
+                labels: Optional[Mapping[str, Any]] = None) -> None:
+        """Registra una observación (por ejemplo, una duración en segundos) en un histograma"""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """
+        Agrega una función que se consulta en cada instantánea y devuelve contadores
+        ya acumulados por otro objeto (por ejemplo, aciertos de la caché).
+
+        Args:
+            collector (Callable): Devuelve tuplas (nombre, etiquetas, valor)
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Obtiene los valores actuales de este proceso en un formato serializable a JSON.
+
+        Returns:
+            Dict[str, Any]: Contadores e histogramas (con cubetas no acumuladas)
+        """
+        with self._lock:
+            counters = [[name, dict(labels), value]
+                        for (name, labels), value in self._counters.items()]
+            histograms = [[name, dict(labels), list(counts), total, count]
+                          for (name, labels), (counts, total, count) in self._histograms.items()]
+        for collector in self._collectors:
+            counters.extend([name, dict(labels), float(value)]
+                            for name, labels, value in collector())
+        return {'pid': os.getpid(), 'buckets': list(self.buckets),
+                'counters': counters, 'histograms': histograms}
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Vuelca la instantánea de este proceso a su archivo, como mucho una vez por
+        `flush_interval` salvo que se fuerce. No hace nada sin directorio configurado.
+
+        Args:
+            force (bool): Volcar aunque no haya pasado el intervalo
+        """
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump(self.snapshot(), handle, separators=(',', ':'))
+        # os.replace es atómico: otro worker nunca lee un archivo a medio escribir
+        os.replace(temp_path, path)
+
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        """Instantáneas de todos los workers (o solo la de este proceso)"""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path, encoding='utf-8') as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('buckets') == list(self.buckets):
+                snapshots.append(snapshot)
+        return snapshots
+
+    def collect(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], List[Any]]]:
+        """
+        Suma los valores de todos los workers.
+
+        Returns:
+            Tuple: Contadores e histogramas combinados, indexados por (nombre, etiquetas)
+        """
+        counters: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], List[Any]] = {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot['counters']:
+                key = (name, _labels_key(labels))
+                counters[key] = counters.get(key, 0.0) + value
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, _labels_key(labels))
+                merged = histograms.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+                merged[2] += count
+        return counters, histograms
+
+    def render(self) -> str:
+        """
+        Genera el texto de exposición de Prometheus con los valores de todos los workers.
+
+        Returns:
+            str: Métricas en formato text/plain version 0.0.4
+        """
+        counters, histograms = self.collect()
+        lines: List[str] = []
+
+        def header(name: str, default_kind: str) -> None:
+            kind, help_text = self._help.get(name, (default_kind, name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        for name in sorted({name for name, _ in counters}):
+            header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        for name, (hits_name, misses_name) in DERIVED_RATIOS.items():
+            hits = {labels: value for (metric, labels), value in counters.items() if metric == hits_name}
+            if not hits:
+                continue
+            header(name, 'gauge')
+            for labels, hit_count in sorted(hits.items()):
+                total = hit_count + counters.get((misses_name, labels), 0.0)
+                ratio = hit_count / total if total else 0.0
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(round(ratio, 6))}')
+
+        for name in sorted({name for name, _ in histograms}):
+            header(name, 'histogram')
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels, (("le", repr(bound)),))} '
+                                 f'{cumulative}')
+                lines.append(f'{name}_bucket{_format_labels(labels, (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class InstrumentedDatabase:
+    """
+    Envoltorio de Database que mide cada llamada a un método público: duración,
+    filas devueltas y errores. Se coloca debajo de CachedDatabase para medir solo
+    las consultas que realmente llegan a SQLite.
+    """
+
+    def __init__(self, database: Any, registry: MetricsRegistry):
+        """
+        Args:
+            database (Any): Database a envolver
+            registry (MetricsRegistry): Registro donde se acumulan las métricas
+        """
+        self.database = database
+        self.registry = registry
+        self._wrappers: Dict[str, Callable[..., Any]] = {}
+        registry.describe('algoritmo_db_call_duration_seconds', 'histogram',
+                          'Duración de las llamadas a Database por método')
+        registry.describe('algoritmo_db_rows_total', 'counter',
+                          'Filas devueltas por las llamadas a Database por método')
+        registry.describe('algoritmo_db_errors_total', 'counter',
+                          'Llamadas a Database que terminaron con excepción')
+
+    def __getattr__(self, name: str) -> Any:
+        wrapper = self._wrappers.get(name)
+        if wrapper is not None:
+            return wrapper
+        attribute = getattr(self.database, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+        wrapper = self._wrappers[name] = self._instrument(name, attribute)
+        return wrapper
+
+    def _instrument(self, name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        registry = self.registry
+        labels = {'method': name}
+
+        if inspect.isgeneratorfunction(method):
+            # Los generadores (exportación) se miden de la primera a la última fila
+            @wraps(method)
+            def generator_wrapper(*args: Any, **kwargs: Any) -> Iterator[Any]:
+                start = time.perf_counter()
+                rows = 0
+                try:
+                    for item in method(*args, **kwargs):
+                        rows += 1
+                        yield item
+                except Exception:
+                    registry.inc('algoritmo_db_errors_total', labels=labels)
+                    raise
+                finally:
+                    registry.observe('algoritmo_db_call_duration_seconds',
+                                     time.perf_counter() - start, labels)
+                    registry.inc('algoritmo_db_rows_total', rows, labels)
+            return generator_wrapper
+
+        @wraps(method)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception:
+                registry.inc('algoritmo_db_errors_total', labels=labels)
+                raise
+            finally:
+                registry.observe('algoritmo_db_call_duration_seconds',
+                                 time.perf_counter() - start, labels)
+            registry.inc('algoritmo_db_rows_total', count_rows(result), labels)
+            return result
+        return wrapper
@@ -0,0 +1,317 @@
+# algoRitmo.py - Migraciones versionadas del esquema SQLite
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define la lista ordenada de migraciones del esquema y la función
+# que aplica las pendientes, usando PRAGMA user_version para guardar la versión actual.
+# Documentación PRAGMA user_version: https://www.sqlite.org/pragma.html#pragma_user_version
+# Documentación índices: https://www.sqlite.org/queryplanner.html
+#
+# Referencias:
+# - https://www.sqlite.org/lang_createindex.html
+# - https://www.sqlite.org/lang_transaction.html
+#
+import sqlite3
+from typing import List, NamedTuple
+
+
+class Migration(NamedTuple):
+    """Un paso del esquema: versión a la que lleva, descripción y sentencias SQL."""
+    version: int
+    description: str
+    statements: List[str]
+
+
+# Migraciones en orden. Nunca se modifica una ya publicada: se agrega una nueva al final.
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'Tabla de tareas', [
+        '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT DEFAULT 'medium',
+            due_date TEXT,
+            completed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    # Índices que cubren las consultas de TaskQuery. SQLite agrega el rowid (id) al
+    # final de cada índice, así que también sirven para el desempate por id del cursor.
+    Migration(2, 'Índices secundarios de tareas', [
+        'CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks (updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_created_at ON tasks (completed, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_updated_at ON tasks (completed, updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_priority_created_at ON tasks (priority, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_due_date_created_at ON tasks (due_date, created_at)',
+        'ANALYZE',
+    ]),
+    # Contador de generación compartido entre procesos: cualquier escritura en 'tasks'
+    # lo incrementa, así cada worker sabe cuándo invalidar su caché en memoria.
+    Migration(3, 'Contador de generación de tareas', [
+        'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_generation_insert AFTER INSERT ON tasks
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'generation';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_generation_update AFTER UPDATE ON tasks
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'generation';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_generation_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'generation';
+        END
+        """,
+    ]),
+    # Fecha de la última escritura (segundos Unix) para Last-Modified / If-Modified-Since.
+    # Los triggers se recrean para actualizar generación y fecha en una sola sentencia.
+    Migration(4, 'Fecha de última modificación de tareas', [
+        """
+        INSERT OR IGNORE INTO meta (key, value)
+        VALUES ('last_modified', CAST(strftime('%s', 'now') AS INTEGER))
+        """,
+        'DROP TRIGGER IF EXISTS tasks_generation_insert',
+        'DROP TRIGGER IF EXISTS tasks_generation_update',
+        'DROP TRIGGER IF EXISTS tasks_generation_delete',
+    ] + [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS tasks_version_{event.lower()} AFTER {event} ON tasks
+        BEGIN
+            UPDATE meta
+            SET value = CASE key
+                WHEN 'generation' THEN value + 1
+                ELSE CAST(strftime('%s', 'now') AS INTEGER)
+            END
+            WHERE key IN ('generation', 'last_modified');
+        END
+        """
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]),
+    # Registro de cambios para sincronización incremental: una fila por escritura en 'tasks'.
+    # 'change_log_floor' guarda hasta qué seq se ha podado, para detectar tokens vencidos.
+    Migration(5, 'Registro de cambios de tareas', [
+        """
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "INSERT OR IGNORE INTO meta (key, value) VALUES ('change_log_floor', 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, op) VALUES (NEW.id, 'insert');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_update AFTER UPDATE ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, op) VALUES (NEW.id, 'update');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, op) VALUES (OLD.id, 'delete');
+        END
+        """,
+    ]),
+    # Índice de texto completo (FTS5) sobre título y descripción, con contenido externo:
+    # el texto vive solo en 'tasks' y los triggers mantienen el índice sincronizado.
+    Migration(6, 'Búsqueda de texto completo', [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description,
+            content='tasks', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        """,
+        # Indexa las tareas que ya existían antes de esta migración
+        "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+    ]),
+    # Contadores por (completada, prioridad) mantenidos por triggers, para que las
+    # estadísticas no recorran la tabla. Las vencidas dependen del día: se cuentan con
+    # el índice (completed, due_date).
+    Migration(7, 'Contadores de estadísticas de tareas', [
+        """
+        CREATE TABLE IF NOT EXISTS task_counts (
+            completed INTEGER NOT NULL,
+            priority TEXT NOT NULL,
+            n INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (completed, priority)
+        )
+        """,
+        """
+        INSERT OR REPLACE INTO task_counts (completed, priority, n)
+        SELECT CASE WHEN completed THEN 1 ELSE 0 END, IFNULL(priority, ''), COUNT(*)
+        FROM tasks
+        GROUP BY 1, 2
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_counts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_counts (completed, priority, n)
+            VALUES (CASE WHEN NEW.completed THEN 1 ELSE 0 END, IFNULL(NEW.priority, ''), 1)
+            ON CONFLICT (completed, priority) DO UPDATE SET n = n + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_counts_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_counts SET n = n - 1
+            WHERE completed = CASE WHEN OLD.completed THEN 1 ELSE 0 END
+              AND priority = IFNULL(OLD.priority, '');
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_counts_update AFTER UPDATE OF completed, priority ON tasks
+        BEGIN
+            UPDATE task_counts SET n = n - 1
+            WHERE completed = CASE WHEN OLD.completed THEN 1 ELSE 0 END
+              AND priority = IFNULL(OLD.priority, '');
+            INSERT INTO task_counts (completed, priority, n)
+            VALUES (CASE WHEN NEW.completed THEN 1 ELSE 0 END, IFNULL(NEW.priority, ''), 1)
+            ON CONFLICT (completed, priority) DO UPDATE SET n = n + 1;
+        END
+        """,
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_due_date ON tasks (completed, due_date)',
+    ]),
+    # Las fechas pasan a guardarse en ISO 8601 ('T' como separador), el mismo texto que envía
+    # la API, así no hay que convertirlas en cada lectura. La API ya las enviaba con 'T', de modo
+    # que el cambio no se registra en task_changes: el trigger se quita durante la conversión.
+    Migration(8, 'Fechas de tareas en formato ISO 8601', [
+        'DROP TRIGGER IF EXISTS tasks_changes_update',
+        """
+        UPDATE tasks
+        SET created_at = replace(created_at, ' ', 'T'),
+            updated_at = replace(updated_at, ' ', 'T')
+        WHERE instr(created_at, ' ') > 0 OR instr(updated_at, ' ') > 0
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS tasks_changes_update AFTER UPDATE ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, op) VALUES (NEW.id, 'update');
+        END
+        """,
+    ]),
+    # Las vencidas se agrupan por prioridad: con la prioridad en el índice el conteo no visita
+    # la tabla (en 50k tareas pasa de ~20 ms a ~3 ms, y es lo que más pesaba en la página principal)
+    Migration(9, 'Índice de vencidas que cubre la prioridad', [
+        'DROP INDEX IF EXISTS idx_tasks_completed_due_date',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_due_date ON tasks (completed, due_date, priority)',
+    ]),
+    # Tareas repetidas y concesiones del programador (models/scheduler.py). El índice parcial
+    # solo contiene las completadas que esperan su siguiente ocurrencia: casi siempre está vacío.
+    # 'leases' no tiene triggers: renovar la concesión no cambia la generación de las tareas.
+    Migration(10, 'Tareas repetidas y concesiones del programador', [
+        'ALTER TABLE tasks ADD COLUMN recurrence TEXT',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_tasks_recurring_completed ON tasks (id)
+        WHERE completed = 1 AND recurrence IS NOT NULL
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            state TEXT
+        )
+        ''',
+    ]),
+    # Archivo de tareas completadas (models/archive.py): las mismas columnas que 'tasks' y sin
+    # triggers, así mover una tarea cuenta como un borrado para la generación, los contadores,
+    # la búsqueda y el registro de cambios. Vive en el mismo archivo para que mover un lote sea
+    # una sola transacción (entre bases adjuntas con WAL el commit no es atómico).
+    Migration(11, 'Archivo de tareas completadas', [
+        '''
+        CREATE TABLE IF NOT EXISTS archived_tasks (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT,
+            due_date TEXT,
+            completed BOOLEAN,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            recurrence TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_archived_tasks_updated_at ON archived_tasks (updated_at)',
+        'CREATE INDEX IF NOT EXISTS idx_archived_tasks_created_at ON archived_tasks (created_at)',
+    ]),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """
+    Obtiene la versión del esquema guardada en el archivo.
+
+    Args:
+        conn (sqlite3.Connection): Conexión a la base de datos
+
+    Returns:
+        int: Valor de PRAGMA user_version (0 en una base de datos nueva)
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Aplica en orden las migraciones pendientes, cada una en su propia transacción.
+    Es seguro llamarla desde varios procesos a la vez: BEGIN IMMEDIATE toma el
+    bloqueo de escritura y la versión se vuelve a leer antes de aplicar cada paso.
+
+    Args:
+        conn (sqlite3.Connection): Conexión a la base de datos
+
+    Returns:
+        int: Versión del esquema tras migrar
+    """
+    for migration in MIGRATIONS:
+        if current_version(conn) >= migration.version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if current_version(conn) < migration.version:
+                for statement in migration.statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {migration.version}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return current_version(conn)
@@ -0,0 +1,194 @@
+# algoRitmo.py - Pool de conexiones SQLite
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define la clase ConnectionPool, que mantiene conexiones SQLite
+# reutilizables para evitar abrir y cerrar una conexión en cada operación. Es seguro ante fork
+# (gunicorn --preload): el proceso hijo abre sus propias conexiones.
+# Documentación SQLite: https://docs.python.org/3/library/sqlite3.html
+# Documentación queue: https://docs.python.org/3/library/queue.html
+#
+# Referencias:
+# - https://www.sqlite.org/threadsafe.html
+# - https://www.sqlite.org/pragma.html
+# - https://www.sqlite.org/howtocorrupt.html#_carrying_an_open_database_connection_across_a_fork_
+#
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Union
+
+
+class PoolTimeoutError(Exception):
+    """Se lanza cuando no hay conexiones libres dentro del tiempo de espera."""
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones SQLite seguro para hilos.
+    Cada conexión se abre una sola vez, se le aplican los PRAGMAs y se reutiliza
+    con semántica de préstamo/devolución (checkout/return).
+    """
+
+    def __init__(self, db_path: str, size: int = 5, timeout: float = 10.0,
+                 pragmas: Optional[Dict[str, Union[str, int]]] = None):
+        """
+        Inicializa el pool. Las conexiones se crean bajo demanda hasta `size`.
+
+        Args:
+            db_path (str): Ruta al archivo de base de datos SQLite
+            size (int): Número máximo de conexiones abiertas
+            timeout (float): Segundos a esperar por una conexión libre
+            pragmas (Optional[Dict]): PRAGMAs a aplicar una vez por conexión
+        """
+        if size < 1:
+            raise ValueError('El tamaño del pool debe ser al menos 1')
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or {})
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=size)
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # Conexiones heredadas del proceso padre: no se usan ni se cierran en el hijo
+        self._inherited: List[sqlite3.Connection] = []
+        self.connections_opened = 0
+
+    def _after_fork(self) -> None:
+        """
+        Olvida las conexiones abiertas antes del fork. Se conservan las referencias porque
+        cerrarlas desde el hijo podría hacer un checkpoint o borrar el WAL que usa el padre.
+        """
+        self._inherited.extend(self._all)
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._all = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _open(self) -> sqlite3.Connection:
+        """
+        Abre una conexión nueva y le aplica los PRAGMAs configurados.
+
+        Returns:
+            sqlite3.Connection: Conexión lista para usarse
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Permite acceder a las columnas por nombre
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        self.connections_opened += 1
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Verifica que la conexión siga siendo usable"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        """Cierra una conexión y la retira del pool"""
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def checkout(self) -> sqlite3.Connection:
+        """
+        Obtiene una conexión del pool, abriendo una nueva si hay capacidad.
+
+        Returns:
+            sqlite3.Connection: Conexión prestada
+
+        Raises:
+            PoolTimeoutError: Si no hay conexiones libres tras `timeout` segundos
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if len(self._all) < self.size:
+                    conn = self._open()
+                    self._all.append(conn)
+            if conn is None:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolTimeoutError(
+                        f'No hay conexiones libres tras {self.timeout} segundos')
+
+        if not self._is_healthy(conn):
+            self._discard(conn)
+            return self.checkout()
+        return conn
+
+    def checkin(self, conn: sqlite3.Connection) -> None:
+        """
+        Devuelve una conexión al pool. Si quedó una transacción abierta se revierte.
+        Si el pool se cerró mientras estaba prestada, la conexión se cierra en lugar de
+        volver a la cola (y si se heredó del padre tras un fork, solo se olvida).
+
+        Args:
+            conn (sqlite3.Connection): Conexión a devolver
+        """
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        # Bajo el candado para que close() no vacíe la cola entre la comprobación y el put
+        with self._lock:
+            retired = conn not in self._all
+            if not retired:
+                self._idle.put_nowait(conn)
+        if retired and conn not in self._inherited:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Context manager que presta una conexión y la devuelve al salir.
+
+        Yields:
+            sqlite3.Connection: Conexión prestada
+        """
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def close(self) -> None:
+        """
+        Cierra las conexiones libres del pool (se vuelven a abrir bajo demanda). Las que están
+        prestadas se retiran y se cierran al devolverse: cerrarlas aquí rompería al hilo que las usa.
+        """
+        if self._pid != os.getpid():
+            self._after_fork()
+            return
+        idle = []
+        with self._lock:
+            self._all = []
+            while True:
+                try:
+                    idle.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+        for conn in idle:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
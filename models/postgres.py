@@ -0,0 +1,1017 @@
+# algoRitmo.py - Motor de almacenamiento PostgreSQL
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define PostgresDatabase, un TaskRepository sobre PostgreSQL con un
+# pool de conexiones de psycopg_pool. Replica el esquema de SQLite (índices de TaskQuery,
+# contadores de estadísticas, registro de cambios y versión de la tabla mantenidos por triggers)
+# y usa un tsvector generado con índice GIN para la búsqueda. Con varios workers o varias
+# instancias de la aplicación todos comparten la misma base de datos (STORAGE_BACKEND=postgres).
+# Documentación psycopg: https://www.psycopg.org/psycopg3/docs/
+# Documentación psycopg_pool: https://www.psycopg.org/psycopg3/docs/advanced/pool.html
+#
+# Uso (dependencias opcionales en requirements-postgres.txt):
+#   pip install -r requirements-postgres.txt
+#   STORAGE_BACKEND=postgres DATABASE_URL=postgresql://usuario@host/algoritmo gunicorn app:app
+#
+# Referencias:
+# - https://www.postgresql.org/docs/current/textsearch-controls.html
+# - https://www.postgresql.org/docs/current/explicit-locking.html#ADVISORY-LOCKS
+# - https://www.psycopg.org/psycopg3/docs/advanced/pipeline.html
+# - https://www.postgresql.org/docs/current/routine-vacuuming.html
+#
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+except ImportError:  # Dependencia opcional
+    psycopg = None
+    ConnectionPool = None
+
+from .migrations import Migration
+from .query import TASK_COLUMNS, TaskQuery, encode_cursor
+from .repository import (PATCHABLE_FIELDS, ChangeEvent, Lease, TaskChanges, TaskRepository,
+                         TaskUpdate, build_task_stats, resolve_update, task_from_dict,
+                         task_row_to_dict)
+from .search import HIGHLIGHT_END, HIGHLIGHT_START, highlight, search_terms
+from .task import Task, now_iso
+
+# Claves de pg_advisory_xact_lock: migraciones y registro de cambios de 'tasks'
+MIGRATION_LOCK = 0x616c676f01
+CHANGE_LOG_LOCK = 0x616c676f02
+
+# Las fechas se comparan byte a byte (COLLATE "C"), igual que en SQLite: así el orden y los
+# cursores de TaskQuery son idénticos en ambos motores. El parser de texto de PostgreSQL toma
+# '<palabra>' como una etiqueta HTML y no la indexa; '<' y '>' se cambian por espacios para que
+# se busque igual que en FTS5 (en ts_headline, por TAG_MASK, que después se revierte)
+PG_MIGRATIONS: List[Migration] = [
+    Migration(1, 'Esquema inicial', [
+        '''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id BIGSERIAL PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT DEFAULT 'medium',
+            due_date TEXT COLLATE "C",
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TEXT COLLATE "C" NOT NULL,
+            updated_at TEXT COLLATE "C" NOT NULL,
+            search TSVECTOR GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', translate(COALESCE(title, ''), '<>', '  ')), 'A') ||
+                setweight(to_tsvector('simple', translate(COALESCE(description, ''), '<>', '  ')), 'B')
+            ) STORED
+        )
+        ''',
+        # Los mismos índices que SQLite; aquí el id se agrega explícitamente para el cursor
+        'CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_updated_at ON tasks (updated_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_created_at ON tasks (completed, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_updated_at ON tasks (completed, updated_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_priority_created_at ON tasks (priority, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_due_date_created_at ON tasks (due_date, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_completed_due_date ON tasks (completed, due_date, priority)',
+        'CREATE INDEX IF NOT EXISTS idx_tasks_search ON tasks USING GIN (search)',
+        '''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq BIGSERIAL PRIMARY KEY,
+            task_id BIGINT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMPTZ DEFAULT now()
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS task_counts (
+            completed BOOLEAN NOT NULL,
+            priority TEXT NOT NULL,
+            n BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (completed, priority)
+        )
+        ''',
+        """
+        INSERT INTO meta (key, value) VALUES
+            ('generation', 0),
+            ('last_modified', EXTRACT(EPOCH FROM now())::BIGINT),
+            ('change_log_floor', 0)
+        ON CONFLICT (key) DO NOTHING
+        """,
+        # Un solo trigger por fila hace lo que en SQLite hacen los de versión, registro de
+        # cambios y contadores. Toma CHANGE_LOG_LOCK antes de pedir el seq: las escrituras quedan en
+        # fila hasta el commit de la anterior, así el orden de los seq es el orden de commit y
+        # quien lee el registro nunca salta un cambio que aún no se había confirmado
+        f"""
+        CREATE OR REPLACE FUNCTION tasks_track() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock({CHANGE_LOG_LOCK});
+            UPDATE meta
+            SET value = CASE key
+                WHEN 'generation' THEN value + 1
+                ELSE EXTRACT(EPOCH FROM clock_timestamp())::BIGINT
+            END
+            WHERE key IN ('generation', 'last_modified');
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO task_changes (task_id, op) VALUES (NEW.id, 'insert');
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO task_changes (task_id, op) VALUES (NEW.id, 'update');
+            ELSE
+                INSERT INTO task_changes (task_id, op) VALUES (OLD.id, 'delete');
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE task_counts SET n = n - 1
+                WHERE completed = OLD.completed AND priority = COALESCE(OLD.priority, '');
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO task_counts (completed, priority, n)
+                VALUES (NEW.completed, COALESCE(NEW.priority, ''), 1)
+                ON CONFLICT (completed, priority) DO UPDATE SET n = task_counts.n + 1;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        'DROP TRIGGER IF EXISTS tasks_track ON tasks',
+        '''
+        CREATE TRIGGER tasks_track AFTER INSERT OR UPDATE OR DELETE ON tasks
+        FOR EACH ROW EXECUTE FUNCTION tasks_track()
+        ''',
+    ]),
+    # Tareas repetidas y concesiones del programador, como la migración 10 de SQLite
+    Migration(2, 'Tareas repetidas y concesiones del programador', [
+        'ALTER TABLE tasks ADD COLUMN IF NOT EXISTS recurrence TEXT',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_tasks_recurring_completed ON tasks (id)
+        WHERE completed AND recurrence IS NOT NULL
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at DOUBLE PRECISION NOT NULL,
+            state TEXT
+        )
+        ''',
+    ]),
+    # Archivo de tareas completadas, como la migración 11 de SQLite: sin trigger, así mover
+    # una tarea cuenta como un borrado en el registro de cambios y los contadores
+    Migration(3, 'Archivo de tareas completadas', [
+        '''
+        CREATE TABLE IF NOT EXISTS archived_tasks (
+            id BIGINT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT,
+            priority TEXT,
+            due_date TEXT COLLATE "C",
+            completed BOOLEAN NOT NULL,
+            created_at TEXT COLLATE "C" NOT NULL,
+            updated_at TEXT COLLATE "C" NOT NULL,
+            recurrence TEXT
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_archived_tasks_updated_at ON archived_tasks (updated_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_archived_tasks_created_at ON archived_tasks (created_at, id)',
+    ]),
+    # El trigger de la migración 1 tomaba CHANGE_LOG_LOCK con la primera fila escrita y lo
+    # retenía hasta el commit: todas las escrituras de todas las instancias iban de a una.
+    # Como trigger diferido corre al confirmar, después de que la transacción hizo su trabajo
+    # (filas, índices, tsvector) en paralelo con las demás: solo el registro de cambios, la
+    # generación y los contadores quedan en fila, y el orden de los seq sigue siendo el de commit
+    Migration(4, 'Registro de cambios al confirmar', [
+        'DROP TRIGGER IF EXISTS tasks_track ON tasks',
+        '''
+        CREATE CONSTRAINT TRIGGER tasks_track AFTER INSERT OR UPDATE OR DELETE ON tasks
+        DEFERRABLE INITIALLY DEFERRED
+        FOR EACH ROW EXECUTE FUNCTION tasks_track()
+        ''',
+    ]),
+]
+
+# Caracteres de control que reemplazan a '<' y '>' en ts_headline. translate() quita además los
+# marcadores de resaltado del texto (no tienen reemplazo): solo quedan los de ts_headline
+TAG_MASK = '\x04\x05'
+MASKED_CHARS = '<>' + HIGHLIGHT_START + HIGHLIGHT_END
+_UNMASK_TAGS = str.maketrans(TAG_MASK, '<>')
+
+# Columnas de 'tasks' en el orden de TASK_COLUMNS, con el alias t
+_TASK_COLUMNS_T = ', '.join(f't.{column.strip()}' for column in TASK_COLUMNS.split(','))
+
+
+class PostgresDatabase(TaskRepository):
+    """
+    Motor de almacenamiento PostgreSQL con pool de conexiones.
+    El pool se crea con la primera consulta de cada proceso, así es seguro crear el motor
+    antes del fork de gunicorn (cada worker abre sus propias conexiones).
+    """
+
+    # PostgreSQL admite escrituras concurrentes; en un solo hilo escritor solo esperarían
+    # de a una en el proceso
+    serialized_writes = frozenset()
+
+    def __init__(self, dsn: str, pool_size: int = 5, pool_timeout: float = 10.0):
+        """
+        Inicializa el motor sin conectar todavía.
+
+        Args:
+            dsn (str): Cadena de conexión, por ejemplo postgresql://usuario@host/algoritmo
+            pool_size (int): Número máximo de conexiones abiertas por proceso
+            pool_timeout (float): Segundos a esperar por una conexión libre
+
+        Raises:
+            RuntimeError: Si psycopg o psycopg_pool no están instalados
+        """
+        if psycopg is None:
+            raise RuntimeError(
+                'STORAGE_BACKEND=postgres requiere instalar psycopg (requirements-postgres.txt)')
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._pool: Optional['ConnectionPool'] = None
+        self._pid: Optional[int] = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'PostgresDatabase':
+        """
+        Crea el motor a partir de la configuración de la aplicación.
+
+        Args:
+            config (Mapping): Configuración (por ejemplo, app.config)
+
+        Returns:
+            PostgresDatabase: Instancia configurada
+
+        Raises:
+            ValueError: Si falta DATABASE_URL
+        """
+        if not config.get('DATABASE_URL'):
+            raise ValueError('STORAGE_BACKEND=postgres requiere DATABASE_URL')
+        return cls(
+            config['DATABASE_URL'],
+            pool_size=config.get('DATABASE_POOL_SIZE', 5),
+            pool_timeout=config.get('DATABASE_POOL_TIMEOUT', 10.0)
+        )
+
+    def _get_pool(self) -> 'ConnectionPool':
+        """Devuelve el pool de este proceso, creándolo si es la primera vez o si hubo un fork"""
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            with self._pool_lock:
+                if self._pool is None or self._pid != pid:
+                    # El pool heredado del proceso padre no se cierra: sus conexiones son del padre
+                    self._pool = ConnectionPool(
+                        self.dsn,
+                        min_size=1,
+                        max_size=self.pool_size,
+                        timeout=self.pool_timeout,
+                        kwargs={'autocommit': True},
+                        name='algoritmo',
+                        open=True
+                    )
+                    self._pid = pid
+        return self._pool
+
+    @contextmanager
+    def _get_connection(self) -> Iterator['psycopg.Connection']:
+        """
+        Presta una conexión del pool en modo autocommit: una lectura de una sola sentencia
+        cuesta un viaje al servidor, sin BEGIN ni COMMIT.
+
+        Yields:
+            psycopg.Connection: Conexión prestada
+        """
+        with self._get_pool().connection() as conn:
+            yield conn
+
+    @contextmanager
+    def _snapshot(self) -> Iterator['psycopg.Connection']:
+        """
+        Presta una conexión con una transacción abierta, para que varias sentencias vean los
+        mismos datos. Confirma al salir del bloque o revierte si ocurre una excepción.
+
+        Yields:
+            psycopg.Connection: Conexión con la transacción abierta
+        """
+        with self._get_connection() as conn, conn.transaction():
+            yield conn
+
+    @contextmanager
+    def _transaction(self, task_ids: Sequence[int] = ()) -> Iterator['psycopg.Connection']:
+        """
+        Presta una conexión con una transacción de escritura abierta. Las escrituras de
+        distintas transacciones corren en paralelo; el registro de cambios se ordena al
+        confirmar (ver la migración 4). Un lote que modifica varias tareas existentes las
+        bloquea primero en orden de ID: así dos lotes con las mismas tareas en distinto
+        orden esperan uno al otro en lugar de interbloquearse.
+
+        Args:
+            task_ids (Sequence[int]): Tareas que la transacción va a modificar o eliminar
+
+        Yields:
+            psycopg.Connection: Conexión con la transacción de escritura abierta
+        """
+        with self._snapshot() as conn:
+            if len(set(task_ids)) > 1:
+                conn.execute('SELECT FROM tasks WHERE id = ANY(%s) ORDER BY id FOR UPDATE',
+                             (sorted(set(task_ids)),))
+            yield conn
+
+    def close(self) -> None:
+        """Cierra las conexiones del pool de este proceso"""
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.close()
+        self._pool = None
+
+    def connection_stats(self) -> Dict[str, int]:
+        """
+        Obtiene el estado del pool de conexiones.
+
+        Returns:
+            Dict[str, int]: Tamaño máximo del pool y conexiones abiertas desde el inicio
+        """
+        opened = self._pool.get_stats().get('connections_num', 0) if self._pool else 0
+        return {'size': self.pool_size, 'opened': opened}
+
+    def init_database(self) -> int:
+        """
+        Aplica las migraciones pendientes en una sola transacción. Es seguro llamarla desde
+        varios procesos a la vez: MIGRATION_LOCK hace que esperen a la primera.
+
+        Returns:
+            int: Versión del esquema tras migrar
+        """
+        with self._snapshot() as conn:
+            conn.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK,))
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BIGINT NOT NULL)')
+            row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            version = row[0] if row else 0
+            for migration in PG_MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                for statement in migration.statements:
+                    conn.execute(statement)
+                version = migration.version
+            conn.execute('''
+                INSERT INTO meta (key, value) VALUES ('schema_version', %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
+            ''', (version,))
+        return version
+
+    # Versión de la tabla y registro de cambios
+
+    def get_generation(self) -> int:
+        """
+        Obtiene el contador de generación, que aumenta con cada escritura en 'tasks'
+        hecha por cualquier proceso.
+
+        Returns:
+            int: Generación actual de la tabla de tareas
+        """
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def get_table_version(self) -> Tuple[int, int]:
+        """
+        Obtiene, en una sola consulta, la generación y la fecha de la última escritura.
+
+        Returns:
+            Tuple[int, int]: Generación y segundos Unix de la última modificación
+        """
+        with self._get_connection() as conn:
+            values = dict(conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('generation', 'last_modified')"
+            ).fetchall())
+        return values.get('generation', 0), values.get('last_modified', 0)
+
+    def get_change_token(self) -> int:
+        """
+        Obtiene el token de sincronización actual: el último seq del registro de cambios
+        (o el límite de la última poda, si la poda vació el registro).
+
+        Returns:
+            int: Token a usar como 'since' en get_changes
+        """
+        with self._get_connection() as conn:
+            row = conn.execute('''
+                SELECT GREATEST(
+                    (SELECT MAX(seq) FROM task_changes),
+                    (SELECT value FROM meta WHERE key = 'change_log_floor'),
+                    0
+                )
+            ''').fetchone()
+        return row[0]
+
+    def get_changes(self, since: int, limit: int = 500) -> Optional[TaskChanges]:
+        """
+        Obtiene las tareas insertadas o modificadas y los IDs eliminados desde un token.
+
+        Args:
+            since (int): Token devuelto por get_change_token o por una llamada anterior
+            limit (int): Máximo de entradas del registro a procesar
+
+        Returns:
+            Optional[TaskChanges]: Cambios desde `since`, o None si el registro ya se podó
+        """
+        with self._snapshot() as conn:
+            entries = self._entries_after(conn, since, limit)
+            if entries is None:
+                return None
+            if not entries:
+                return TaskChanges([], [], since, False)
+            task_ids = list(dict.fromkeys(task_id for _, task_id, _ in entries))
+            current = self._fetch_task_dicts_by_ids(conn, task_ids)
+
+        changed = [current[task_id] for task_id in task_ids if task_id in current]
+        deleted = [task_id for task_id in task_ids if task_id not in current]
+        return TaskChanges(changed, deleted, entries[-1][0], len(entries) == limit)
+
+    def get_change_events(self, since: int, limit: int = 500) -> Optional[List[ChangeEvent]]:
+        """
+        Obtiene las entradas del registro de cambios posteriores a un token, en orden.
+
+        Args:
+            since (int): Último número de secuencia ya entregado
+            limit (int): Máximo de entradas a devolver
+
+        Returns:
+            Optional[List[ChangeEvent]]: Entradas con la tarea tal como está ahora, o None
+            si el registro ya se podó por encima de `since`
+        """
+        with self._snapshot() as conn:
+            entries = self._entries_after(conn, since, limit)
+            if entries is None:
+                return None
+            if not entries:
+                return []
+            current = self._fetch_task_dicts_by_ids(
+                conn, list(dict.fromkeys(task_id for _, task_id, _ in entries)))
+
+        return [ChangeEvent(seq, op, task_id, current.get(task_id)) for seq, task_id, op in entries]
+
+    @staticmethod
+    def _entries_after(conn: 'psycopg.Connection', since: int,
+                       limit: int) -> Optional[List[Tuple[int, int, str]]]:
+        """Entradas (seq, task_id, op) con seq > since; None si el registro ya se podó"""
+        floor = conn.execute("SELECT value FROM meta WHERE key = 'change_log_floor'").fetchone()
+        if floor and since < floor[0]:
+            return None
+        return conn.execute(
+            'SELECT seq, task_id, op FROM task_changes WHERE seq > %s ORDER BY seq LIMIT %s',
+            (since, limit)
+        ).fetchall()
+
+    def prune_change_log(self, keep: int) -> int:
+        """
+        Elimina las entradas más antiguas del registro de cambios, conservando las últimas `keep`.
+
+        Args:
+            keep (int): Número de entradas a conservar
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        with self._snapshot() as conn:
+            # Como el trigger al confirmar: 'meta' solo se escribe con CHANGE_LOG_LOCK tomado
+            conn.execute('SELECT pg_advisory_xact_lock(%s)', (CHANGE_LOG_LOCK,))
+            row = conn.execute('SELECT MAX(seq) FROM task_changes').fetchone()
+            floor = (row[0] or 0) - keep
+            if floor <= 0:
+                return 0
+            deleted = conn.execute('DELETE FROM task_changes WHERE seq <= %s', (floor,)).rowcount
+            conn.execute(
+                "UPDATE meta SET value = GREATEST(value, %s) WHERE key = 'change_log_floor'",
+                (floor,)
+            )
+        return deleted
+
+    # Lecturas
+
+    def get_task_by_id(self, task_id: int) -> Optional[Task]:
+        """
+        Obtiene una tarea por su ID.
+
+        Args:
+            task_id (int): ID de la tarea
+
+        Returns:
+            Optional[Task]: Tarea encontrada o None si no existe
+        """
+        with self._get_connection() as conn:
+            row = conn.execute(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = %s', (task_id,)).fetchone()
+        return task_from_dict(task_row_to_dict(row)) if row else None
+
+    def query_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de tareas como diccionarios, con la misma sentencia que SQLite.
+
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Tareas de la página y cursor
+            de la siguiente página (None si no hay más)
+        """
+        return self._query_page(query, 'tasks')
+
+    def _query_page(self, query: TaskQuery, table: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Ejecuta la consulta sobre `table` y separa la fila extra que indica si hay otra página"""
+        sql, params = query.to_sql(placeholder='%s', table=table)
+        with self._get_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        tasks = [task_row_to_dict(row) for row in rows]
+        next_cursor = None
+        if query.limit is not None and len(tasks) > query.limit:
+            tasks = tasks[:query.limit]
+            next_cursor = encode_cursor(tasks[-1][query.sort_column], tasks[-1]['id'])
+        return tasks, next_cursor
+
+    def iter_task_dicts(self, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorre todas las tareas en bloques con un cursor del servidor, sin cargar la tabla
+        en memoria. La conexión queda prestada hasta que el generador se agota o se cierra.
+
+        Args:
+            chunk_size (int): Filas por bloque
+
+        Yields:
+            List[Dict[str, Any]]: Bloque de hasta `chunk_size` tareas como diccionarios
+        """
+        sql, params = TaskQuery().to_sql(placeholder='%s')
+        with self._snapshot() as conn:
+            with conn.cursor(name='iter_task_dicts') as cursor:
+                cursor.itersize = chunk_size
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield [task_row_to_dict(row) for row in rows]
+
+    def search_tasks(self, text: str, limit: int = 20,
+                     offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Busca tareas por prefijo en título y descripción con el índice GIN sobre 'search',
+        ordenadas por ts_rank con el título (peso A) diez veces por encima de la descripción (B).
+        Los fragmentos resaltados se calculan solo para la página.
+
+        Args:
+            text (str): Texto a buscar
+            limit (int): Tamaño de página
+            offset (int): Resultados a saltar
+
+        Returns:
+            Tuple[List[Dict[str, Any]], bool]: Tareas encontradas (con 'title_snippet' y
+            'description_snippet' en HTML resaltado) y si hay más resultados
+        """
+        terms = search_terms(text)
+        if not terms:
+            return [], False
+
+        # Cada término es solo \w+, así que puede citarse sin escapar nada
+        tsquery = ' & '.join(f"'{term}':*" for term in terms)
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, HighlightAll=true'
+        with self._get_connection() as conn:
+            rows = conn.execute(f'''
+                SELECT {_TASK_COLUMNS_T},
+                       ts_headline('simple', translate(t.title, %s, %s), query, %s),
+                       ts_headline('simple', translate(t.description, %s, %s), query, %s)
+                FROM (
+                    SELECT {TASK_COLUMNS}, ts_rank('{{0, 0, 0.1, 1}}', search, query) AS rank
+                    FROM tasks, to_tsquery('simple', %s) AS query
+                    WHERE search @@ query
+                    ORDER BY rank DESC, id
+                    LIMIT %s OFFSET %s
+                ) AS t, to_tsquery('simple', %s) AS query
+                ORDER BY t.rank DESC, t.id
+            ''', (MASKED_CHARS, TAG_MASK, options, MASKED_CHARS, TAG_MASK, options, tsquery,
+                  limit + 1, offset, tsquery)).fetchall()
+
+        results = []
+        for row in rows[:limit]:
+            task = task_row_to_dict(row[:-2])
+            task['title_snippet'] = highlight(self._unmask(row[-2]))
+            task['description_snippet'] = highlight(self._unmask(row[-1]))
+            results.append(task)
+        return results, len(rows) > limit
+
+    @staticmethod
+    def _unmask(snippet: Optional[str]) -> Optional[str]:
+        """Devuelve '<' y '>' a un fragmento de ts_headline"""
+        return snippet.translate(_UNMASK_TAGS) if snippet is not None else None
+
+    def get_task_stats(self, today: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtiene los totales de tareas por estado y prioridad (de 'task_counts') y las
+        vencidas (del índice (completed, due_date, priority)) en una sola consulta.
+
+        Args:
+            today (Optional[str]): Fecha de referencia YYYY-MM-DD (hoy si no se indica)
+
+        Returns:
+            Dict[str, Any]: total, completed, pending, overdue y el mismo desglose en by_priority
+        """
+        today = today or date.today().isoformat()
+        with self._get_connection() as conn:
+            rows = conn.execute('''
+                SELECT completed, priority, n, 0::BIGINT FROM task_counts WHERE n > 0
+                UNION ALL
+                SELECT FALSE, COALESCE(priority, ''), 0, COUNT(*)
+                FROM tasks
+                WHERE NOT completed AND due_date > '' AND due_date < %s
+                GROUP BY priority
+            ''', (today,)).fetchall()
+
+        return build_task_stats(rows)
+
+    # Escrituras
+
+    def create_task(self, task: Task) -> int:
+        """
+        Crea una nueva tarea.
+
+        Args:
+            task (Task): Tarea a crear
+
+        Returns:
+            int: ID de la tarea creada
+        """
+        return self.create_tasks([task])[0]
+
+    def create_tasks(self, tasks: List[Task]) -> List[int]:
+        """
+        Crea varias tareas con un solo executemany (en pipeline) dentro de una transacción.
+
+        Args:
+            tasks (List[Task]): Tareas a crear
+
+        Returns:
+            List[int]: IDs asignados, en el mismo orden que `tasks`
+        """
+        if not tasks:
+            return []
+
+        with self._transaction() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany('''
+                    INSERT INTO tasks (title, description, priority, due_date, completed,
+                                       created_at, updated_at, recurrence)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                ''', [(
+                    task.title,
+                    task.description,
+                    task.priority,
+                    task.due_date,
+                    bool(task.completed),
+                    task.created_at,
+                    task.updated_at,
+                    task.recurrence
+                ) for task in tasks], returning=True)
+                task_ids = []
+                while True:
+                    task_ids.append(cursor.fetchone()[0])
+                    if not cursor.nextset():
+                        break
+        return task_ids
+
+    def update_task(self, task: Task) -> bool:
+        """
+        Actualiza una tarea existente.
+
+        Args:
+            task (Task): Tarea a actualizar
+
+        Returns:
+            bool: True si la actualización fue exitosa, False en caso contrario
+        """
+        if not task.id:
+            return False
+
+        task.updated_at = now_iso()
+        with self._transaction() as conn:
+            rows_affected = conn.execute('''
+                UPDATE tasks
+                SET title = %s, description = %s, priority = %s, due_date = %s,
+                    completed = %s, updated_at = %s, recurrence = %s
+                WHERE id = %s
+            ''', (
+                task.title,
+                task.description,
+                task.priority,
+                task.due_date,
+                bool(task.completed),
+                task.updated_at,
+                task.recurrence,
+                task.id
+            )).rowcount
+        return rows_affected > 0
+
+    def apply_task_updates(self, updates: Sequence[TaskUpdate]) -> List[Optional[Task]]:
+        """
+        Aplica varios cambios parciales en una transacción, cada uno con UPDATE ... RETURNING
+        (SET completed = NOT completed para un toggle). Las sentencias se envían en pipeline:
+        un lote cuesta un viaje de ida y vuelta al servidor, no uno por tarea.
+
+        Args:
+            updates (Sequence[TaskUpdate]): Cambios a aplicar, en orden
+
+        Returns:
+            List[Optional[Task]]: Tarea actualizada por cada cambio, o None si no existe
+        """
+        if not updates:
+            return []
+
+        now = now_iso()
+        with self._transaction([update.task_id for update in updates]) as conn:
+            with conn.pipeline():
+                cursors = [conn.execute(*self._update_statement(update, now)) for update in updates]
+            rows = [cursor.fetchone() for cursor in cursors]
+        return [task_from_dict(task_row_to_dict(row)) if row else None for row in rows]
+
+    @staticmethod
+    def _update_statement(update: TaskUpdate, now: str) -> Tuple[str, List[Any]]:
+        """Sentencia UPDATE ... RETURNING y parámetros de un TaskUpdate"""
+        fields, toggle = resolve_update(update)
+        if 'completed' in fields:
+            fields['completed'] = bool(fields['completed'])
+        assignments = [f'{field} = %s' for field in fields]
+        params: List[Any] = list(fields.values())
+        if toggle:
+            assignments.append('completed = NOT completed')
+        assignments.append('updated_at = %s')
+        params += [update.updated_at or now, update.task_id]
+        return (f'UPDATE tasks SET {", ".join(assignments)} WHERE id = %s RETURNING {TASK_COLUMNS}',
+                params)
+
+    def patch_tasks(self, changes: List[Dict[str, Any]]) -> List[Optional[Task]]:
+        """
+        Aplica cambios parciales a varias tareas dentro de una transacción.
+        Cada cambio es un diccionario con 'id' y los campos a modificar.
+
+        Args:
+            changes (List[Dict[str, Any]]): Cambios a aplicar
+
+        Returns:
+            List[Optional[Task]]: Tarea actualizada por cada cambio, o None si no existe
+        """
+        return self.apply_task_updates([
+            TaskUpdate(change['id'], {field: change[field] for field in PATCHABLE_FIELDS
+                                      if field in change})
+            for change in changes
+        ])
+
+    def delete_task(self, task_id: int) -> bool:
+        """
+        Elimina una tarea.
+
+        Args:
+            task_id (int): ID de la tarea a eliminar
+
+        Returns:
+            bool: True si la eliminación fue exitosa, False en caso contrario
+        """
+        return self.delete_tasks([task_id])[0]
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        """
+        Elimina varias tareas con una sola sentencia DELETE ... RETURNING.
+
+        Args:
+            task_ids (List[int]): IDs de las tareas a eliminar
+
+        Returns:
+            List[bool]: True por cada ID que existía y fue eliminado
+        """
+        if not task_ids:
+            return []
+
+        with self._transaction(task_ids) as conn:
+            existing = {row[0] for row in conn.execute(
+                'DELETE FROM tasks WHERE id = ANY(%s) RETURNING id', (list(task_ids),)
+            ).fetchall()}
+
+        # Un ID repetido solo cuenta como eliminado la primera vez
+        results = []
+        for task_id in task_ids:
+            results.append(task_id in existing)
+            existing.discard(task_id)
+        return results
+
+    # Programador de avisos y repeticiones
+
+    def get_due_task_dicts(self, first: str, last: str) -> List[Dict[str, Any]]:
+        """
+        Obtiene las tareas pendientes que vencen en un rango de fechas, con el índice
+        (completed, due_date, priority).
+
+        Args:
+            first (str): Primera fecha YYYY-MM-DD del rango
+            last (str): Última fecha YYYY-MM-DD del rango (incluida)
+
+        Returns:
+            List[Dict[str, Any]]: Tareas del rango (sin orden garantizado)
+        """
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                f'SELECT {TASK_COLUMNS} FROM tasks '
+                'WHERE NOT completed AND due_date BETWEEN %s AND %s',
+                (first, last)
+            ).fetchall()
+        return [task_row_to_dict(row) for row in rows]
+
+    def has_due_tasks(self, first: str, last: str) -> bool:
+        """
+        Comprueba si alguna tarea pendiente vence en un rango de fechas, con el índice
+        (completed, due_date, priority).
+
+        Args:
+            first (str): Primera fecha YYYY-MM-DD del rango
+            last (str): Última fecha YYYY-MM-DD del rango (incluida)
+
+        Returns:
+            bool: True si hay al menos una
+        """
+        with self._get_connection() as conn:
+            row = conn.execute(
+                'SELECT EXISTS (SELECT 1 FROM tasks WHERE NOT completed AND due_date BETWEEN %s AND %s)',
+                (first, last)
+            ).fetchone()
+        return row[0]
+
+    def get_completed_recurring_task_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Obtiene las tareas completadas que todavía tienen regla de repetición, con el índice
+        parcial idx_tasks_recurring_completed.
+
+        Returns:
+            List[Dict[str, Any]]: Tareas encontradas, por ID
+        """
+        with self._get_connection() as conn:
+            rows = conn.execute(
+                f'SELECT {TASK_COLUMNS} FROM tasks '
+                'WHERE completed AND recurrence IS NOT NULL ORDER BY id'
+            ).fetchall()
+        return [task_row_to_dict(row) for row in rows]
+
+    def spawn_occurrence(self, task_id: int, due_date: str) -> Optional[Task]:
+        """
+        Crea la siguiente ocurrencia de una tarea repetida ya completada y le quita la regla
+        a la original, con una sola sentencia (UPDATE e INSERT encadenados con WITH).
+
+        Args:
+            task_id (int): ID de la tarea completada
+            due_date (str): Vencimiento YYYY-MM-DD de la nueva ocurrencia
+
+        Returns:
+            Optional[Task]: Tarea creada, o None si la tarea no existe, no está completada
+            o ya no tiene regla
+        """
+        now = now_iso()
+        with self._transaction() as conn:
+            # RETURNING devuelve los valores nuevos: la regla se lee de la subconsulta
+            row = conn.execute(f'''
+                WITH original AS (
+                    UPDATE tasks SET recurrence = NULL, updated_at = %s
+                    FROM (
+                        SELECT id, recurrence FROM tasks
+                        WHERE id = %s AND completed AND recurrence IS NOT NULL
+                    ) AS old
+                    WHERE tasks.id = old.id
+                    RETURNING tasks.title, tasks.description, tasks.priority, old.recurrence
+                )
+                INSERT INTO tasks (title, description, priority, due_date, completed,
+                                   created_at, updated_at, recurrence)
+                SELECT title, description, priority, %s, FALSE, %s, %s, recurrence FROM original
+                RETURNING {TASK_COLUMNS}
+            ''', (now, task_id, due_date, now, now)).fetchone()
+        return task_from_dict(task_row_to_dict(row)) if row else None
+
+    def acquire_lease(self, name: str, owner: str, ttl: float, now: float,
+                      state: Optional[str] = None) -> Optional[Lease]:
+        """
+        Toma o renueva una concesión de la tabla 'leases' con un solo INSERT ... ON CONFLICT,
+        así varias instancias de la aplicación se turnan sin bloqueos explícitos.
+
+        Args:
+            name (str): Nombre de la concesión
+            owner (str): Identificador de quien la pide (único por proceso)
+            ttl (float): Segundos de validez desde `now`
+            now (float): Hora actual en segundos Unix (la del reloj de quien la pide)
+            state (Optional[str]): Estado a guardar con la concesión (None lo conserva)
+
+        Returns:
+            Optional[Lease]: Concesión tomada, o None si otro la tiene y no ha vencido
+        """
+        with self._get_connection() as conn:
+            row = conn.execute('''
+                INSERT INTO leases (name, owner, expires_at, state) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (name) DO UPDATE
+                SET owner = EXCLUDED.owner,
+                    expires_at = EXCLUDED.expires_at,
+                    state = COALESCE(EXCLUDED.state, leases.state)
+                WHERE leases.owner = EXCLUDED.owner OR leases.expires_at <= %s
+                RETURNING name, owner, expires_at, state
+            ''', (name, owner, now + ttl, state, now)).fetchone()
+        return Lease(*row) if row else None
+
+    def release_lease(self, name: str, owner: str) -> bool:
+        """
+        Libera una concesión para que otro proceso la tome sin esperar a que venza.
+
+        Args:
+            name (str): Nombre de la concesión
+            owner (str): Quien la tiene
+
+        Returns:
+            bool: True si era de `owner` y quedó libre
+        """
+        with self._get_connection() as conn:
+            released = conn.execute(
+                'UPDATE leases SET expires_at = 0 WHERE name = %s AND owner = %s', (name, owner)
+            ).rowcount
+        return released > 0
+
+    # Archivo de tareas completadas
+
+    def archive_tasks(self, before: str, limit: int = 1000) -> int:
+        """
+        Pasa a 'archived_tasks' las completadas más antiguas con una sola sentencia (DELETE e
+        INSERT encadenados con WITH), recorriendo el índice (completed, updated_at, id). Las
+        que otra transacción está modificando se saltan (SKIP LOCKED) y quedan para otra pasada.
+
+        Args:
+            before (str): Fecha ISO 8601; se archivan las completadas con updated_at anterior
+            limit (int): Máximo de tareas a mover en esta transacción
+
+        Returns:
+            int: Tareas archivadas (menos que `limit` si ya no quedan)
+        """
+        with self._transaction() as conn:
+            return conn.execute(f'''
+                WITH moved AS (
+                    DELETE FROM tasks
+                    WHERE id IN (
+                        SELECT id FROM tasks
+                        WHERE completed AND updated_at < %s AND recurrence IS NULL
+                        ORDER BY updated_at, id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING {TASK_COLUMNS}
+                )
+                INSERT INTO archived_tasks ({TASK_COLUMNS})
+                SELECT {TASK_COLUMNS} FROM moved
+            ''', (before, limit)).rowcount
+
+    def query_archived_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Obtiene una página de tareas archivadas con la misma sentencia que query_task_dicts.
+
+        Args:
+            query (TaskQuery): Filtros, orden, límite y cursor
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Tareas de la página y cursor
+            de la siguiente página (None si no hay más)
+        """
+        return self._query_page(query, 'archived_tasks')
+
+    def compact_storage(self, max_pages: int = 0, full: bool = False) -> int:
+        """
+        VACUUM (ANALYZE) de las tareas y del archivo: el espacio de las filas movidas queda
+        disponible para las nuevas y las estadísticas al día, sin bloquear lecturas ni
+        escrituras. Con full=True, VACUUM FULL reescribe las tablas y devuelve el espacio al
+        sistema, pero las bloquea mientras dura. PostgreSQL no informa las páginas liberadas.
+
+        Args:
+            max_pages (int): No se usa (VACUUM recorre solo las páginas con filas muertas)
+            full (bool): Reescribir las tablas con VACUUM FULL
+
+        Returns:
+            int: Siempre 0
+        """
+        options = 'FULL, ANALYZE' if full else 'ANALYZE'
+        # VACUUM no puede correr dentro de una transacción: las conexiones están en autocommit
+        with self._get_connection() as conn:
+            conn.execute(f'VACUUM ({options}) tasks, archived_tasks')
+        return 0
+
+    @staticmethod
+    def _fetch_task_dicts_by_ids(conn: 'psycopg.Connection',
+                                 task_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Obtiene como diccionarios las tareas existentes de una lista de IDs.
+
+        Args:
+            conn (psycopg.Connection): Conexión a usar
+            task_ids (List[int]): IDs a buscar
+
+        Returns:
+            Dict[int, Dict[str, Any]]: Tareas encontradas indexadas por ID
+        """
+        rows = conn.execute(f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = ANY(%s)',
+                            (task_ids,)).fetchall()
+        return {row[0]: task_row_to_dict(row) for row in rows}
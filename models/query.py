@@ -0,0 +1,193 @@
+# algoRitmo.py - Constructor de consultas de tareas con filtros y paginación por cursor
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define la clase TaskQuery, que arma el SELECT de tareas a partir de
+# filtros (estado, prioridad, fecha de vencimiento), un orden y un cursor de paginación keyset.
+# Documentación SQLite row values: https://www.sqlite.org/rowvalue.html
+# Documentación paginación keyset: https://use-the-index-luke.com/no-offset
+#
+# Referencias:
+# - https://docs.python.org/3/library/base64.html
+# - https://docs.python.org/3/library/json.html
+#
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Mapping, Optional, Tuple
+
+TASK_COLUMNS = ('id, title, description, priority, due_date, completed, created_at, updated_at, '
+                'recurrence')
+
+STATUSES = ('pending', 'completed')
+PRIORITIES = ('low', 'medium', 'high')
+
+# Órdenes soportados: nombre público -> (columna, dirección)
+SORTS = {
+    '-created_at': ('created_at', 'DESC'),
+    'created_at': ('created_at', 'ASC'),
+    '-updated_at': ('updated_at', 'DESC'),
+    'updated_at': ('updated_at', 'ASC'),
+}
+
+
+def encode_cursor(value: Any, task_id: int) -> str:
+    """
+    Codifica la posición (valor de orden, id) de la última fila de una página.
+
+    Args:
+        value (Any): Valor de la columna de orden de la última fila
+        task_id (int): ID de la última fila
+
+    Returns:
+        str: Cursor opaco en base64 apto para URLs
+    """
+    raw = json.dumps([str(value), task_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Args:
+        cursor (str): Cursor recibido del cliente
+
+    Returns:
+        Tuple[str, int]: Valor de orden e ID de la última fila vista
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, task_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(value), int(task_id)
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError('Cursor de paginación inválido')
+
+
+class TaskQuery:
+    """
+    Consulta componible sobre la tabla 'tasks' (o sobre el archivo, 'archived_tasks').
+    Reúne los filtros que antes vivían en métodos separados (por prioridad,
+    completadas, pendientes) y añade paginación keyset sobre (orden, id).
+    """
+
+    def __init__(self, status: Optional[str] = None, priority: Optional[str] = None,
+                 due_date: Optional[str] = None, sort: str = '-created_at',
+                 limit: Optional[int] = None, cursor: Optional[str] = None):
+        """
+        Inicializa y valida la consulta.
+
+        Args:
+            status (Optional[str]): 'pending' o 'completed'
+            priority (Optional[str]): 'low', 'medium' o 'high'
+            due_date (Optional[str]): Fecha de vencimiento exacta en formato YYYY-MM-DD
+            sort (str): Orden, por ejemplo '-created_at' (descendente) o 'updated_at'
+            limit (Optional[int]): Tamaño de página; None devuelve todas las filas
+            cursor (Optional[str]): Cursor devuelto por la página anterior
+
+        Raises:
+            ValueError: Si algún parámetro no es válido
+        """
+        if status is not None and status not in STATUSES:
+            raise ValueError(f'Estado inválido: {status}')
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError(f'Prioridad inválida: {priority}')
+        if due_date is not None:
+            try:
+                datetime.strptime(due_date, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f'Fecha inválida: {due_date}')
+        if sort not in SORTS:
+            raise ValueError(f'Orden inválido: {sort}')
+        if limit is not None and limit < 1:
+            raise ValueError('El límite debe ser mayor que cero')
+
+        self.status = status
+        self.priority = priority
+        self.due_date = due_date
+        self.sort = sort
+        self.limit = limit
+        self.after = decode_cursor(cursor) if cursor else None
+
+    @classmethod
+    def from_args(cls, args: Mapping[str, str], default_limit: int, max_limit: int,
+                  default_sort: str = '-created_at') -> 'TaskQuery':
+        """
+        Crea la consulta a partir de los parámetros de una petición HTTP.
+
+        Args:
+            args (Mapping[str, str]): Parámetros de la query string (request.args)
+            default_limit (int): Tamaño de página si no se indica 'limit'
+            max_limit (int): Tamaño máximo de página permitido
+            default_sort (str): Orden si no se indica 'sort'
+
+        Returns:
+            TaskQuery: Consulta validada
+
+        Raises:
+            ValueError: Si algún parámetro no es válido
+        """
+        try:
+            limit = int(args.get('limit', default_limit))
+        except ValueError:
+            raise ValueError('El límite debe ser un número entero')
+        return cls(
+            status=args.get('status') or None,
+            priority=args.get('priority') or None,
+            due_date=args.get('due_date') or None,
+            sort=args.get('sort') or default_sort,
+            limit=min(limit, max_limit),
+            cursor=args.get('cursor') or None
+        )
+
+    @property
+    def cache_key(self) -> Tuple[Any, ...]:
+        """Tupla que identifica la consulta; dos consultas iguales devuelven las mismas filas"""
+        return (self.status, self.priority, self.due_date, self.sort, self.limit, self.after)
+
+    @property
+    def sort_column(self) -> str:
+        """Columna por la que se ordena"""
+        return SORTS[self.sort][0]
+
+    def to_sql(self, placeholder: str = '?', table: str = 'tasks') -> Tuple[str, List[Any]]:
+        """
+        Genera la sentencia SQL y sus parámetros.
+        Si hay límite se pide una fila extra para saber si existe otra página.
+
+        Args:
+            placeholder (str): Marcador de parámetro del driver ('?' en sqlite3, '%s' en psycopg)
+            table (str): Tabla a consultar: 'tasks' o 'archived_tasks' (mismas columnas)
+
+        Returns:
+            Tuple[str, List[Any]]: Sentencia SQL y lista de parámetros
+        """
+        column, direction = SORTS[self.sort]
+        conditions: List[str] = []
+        params: List[Any] = []
+
+        if self.status is not None:
+            conditions.append(f'completed = {placeholder}')
+            params.append(self.status == 'completed')
+        if self.priority is not None:
+            conditions.append(f'priority = {placeholder}')
+            params.append(self.priority)
+        if self.due_date is not None:
+            conditions.append(f'due_date = {placeholder}')
+            params.append(self.due_date)
+        if self.after is not None:
+            operator = '<' if direction == 'DESC' else '>'
+            conditions.append(f'({column}, id) {operator} ({placeholder}, {placeholder})')
+            params.extend(self.after)
+
+        sql = f'SELECT {TASK_COLUMNS} FROM {table}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {column} {direction}, id {direction}'
+        if self.limit is not None:
+            sql += f' LIMIT {placeholder}'
+            params.append(self.limit + 1)
+        return sql, params
@@ -0,0 +1,146 @@
+# algoRitmo.py - Reglas de repetición de tareas
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define RecurrenceRule, un subconjunto de RRULE (FREQ e INTERVAL) con
+# el que una tarea se repite cada N días, semanas, meses o años, y next_due_date, que calcula la
+# fecha de la siguiente ocurrencia. La API acepta también los atajos 'daily', 'weekly', 'monthly'
+# y 'yearly'; en la base de datos se guarda siempre la forma canónica ('FREQ=WEEKLY;INTERVAL=2').
+# Documentación RRULE: https://datatracker.ietf.org/doc/html/rfc5545#section-3.3.10
+# Documentación calendar: https://docs.python.org/3/library/calendar.html
+#
+# Referencias:
+# - https://docs.python.org/3/library/datetime.html#date-objects
+#
+import calendar
+from datetime import date, timedelta
+from typing import Any, NamedTuple, Optional
+
+# Frecuencias soportadas y sus atajos en la API
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+ALIASES = {'daily': 'DAILY', 'weekly': 'WEEKLY', 'monthly': 'MONTHLY', 'yearly': 'YEARLY'}
+
+# Un intervalo mayor no tiene sentido para una lista de tareas y acota el cálculo de fechas
+MAX_INTERVAL = 1000
+
+
+class RecurrenceRule(NamedTuple):
+    """Regla de repetición: frecuencia (de FREQUENCIES) e intervalo entre ocurrencias"""
+    freq: str
+    interval: int = 1
+
+    def __str__(self) -> str:
+        """Forma canónica, la que se guarda en la columna 'recurrence'"""
+        if self.interval == 1:
+            return f'FREQ={self.freq}'
+        return f'FREQ={self.freq};INTERVAL={self.interval}'
+
+    def shift(self, day: date, steps: int) -> date:
+        """
+        Avanza `steps` ocurrencias desde `day`. En meses y años el día se ajusta al último
+        del mes si no existe (31 de enero + 1 mes = 28 o 29 de febrero).
+
+        Args:
+            day (date): Fecha de partida
+            steps (int): Ocurrencias a avanzar
+
+        Returns:
+            date: Fecha resultante
+        """
+        if self.freq == 'DAILY':
+            return day + timedelta(days=self.interval * steps)
+        if self.freq == 'WEEKLY':
+            return day + timedelta(weeks=self.interval * steps)
+        months = self.interval * steps * (12 if self.freq == 'YEARLY' else 1)
+        year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+        return date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def parse_rule(text: str) -> RecurrenceRule:
+    """
+    Interpreta una regla en forma RRULE ('FREQ=MONTHLY;INTERVAL=3') o un atajo ('weekly').
+
+    Args:
+        text (str): Regla a interpretar
+
+    Returns:
+        RecurrenceRule: Regla válida
+
+    Raises:
+        ValueError: Si la regla no es válida o usa partes no soportadas
+    """
+    text = text.strip()
+    if text.lower() in ALIASES:
+        return RecurrenceRule(ALIASES[text.lower()])
+
+    parts = {}
+    for part in text.upper().removeprefix('RRULE:').split(';'):
+        key, _, value = part.partition('=')
+        if not value or key in parts:
+            raise ValueError(f'Regla de repetición inválida: {text}')
+        parts[key] = value
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f'Frecuencia no soportada: {freq}')
+    interval = parts.pop('INTERVAL', '1')
+    if not interval.isdigit() or not 1 <= int(interval) <= MAX_INTERVAL:
+        raise ValueError(f'INTERVAL debe ser un entero entre 1 y {MAX_INTERVAL}')
+    if parts:
+        raise ValueError(f'Partes de la regla no soportadas: {", ".join(sorted(parts))}')
+    return RecurrenceRule(freq, int(interval))
+
+
+def normalize_rule(value: Any) -> Optional[str]:
+    """
+    Valida la regla recibida en el JSON de una tarea y la devuelve en forma canónica.
+
+    Args:
+        value (Any): Regla, o None / cadena vacía para quitarla
+
+    Returns:
+        Optional[str]: Regla canónica, o None si la tarea no se repite
+
+    Raises:
+        ValueError: Si no es una cadena o la regla no es válida
+    """
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError('La regla de repetición debe ser una cadena')
+    return str(parse_rule(value))
+
+
+def next_due_date(rule: str, due_date: Optional[str], today: date) -> str:
+    """
+    Calcula el vencimiento de la siguiente ocurrencia: la primera fecha de la serie posterior
+    a `today`. Si la tarea se completó con retraso, las ocurrencias ya pasadas se saltan en
+    lugar de crearse vencidas; sin vencimiento (o con uno inválido) la serie parte de `today`.
+
+    Args:
+        rule (str): Regla guardada en la tarea
+        due_date (Optional[str]): Vencimiento actual YYYY-MM-DD
+        today (date): Fecha de referencia (la del reloj del programador)
+
+    Returns:
+        str: Fecha YYYY-MM-DD de la siguiente ocurrencia
+    """
+    parsed = parse_rule(rule)
+    try:
+        start = date.fromisoformat(due_date) if due_date else today
+    except ValueError:
+        start = today
+
+    # Se estima el número de pasos sin iterar ocurrencia por ocurrencia (una serie diaria
+    # completada con años de retraso no da miles de vueltas) y se corrige al final
+    steps = 1
+    if start < today:
+        if parsed.freq in ('DAILY', 'WEEKLY'):
+            period = parsed.interval * (7 if parsed.freq == 'WEEKLY' else 1)
+            steps = max(1, (today - start).days // period)
+        else:
+            months = (today.year - start.year) * 12 + today.month - start.month
+            steps = max(1, months // (parsed.interval * (12 if parsed.freq == 'YEARLY' else 1)))
+    following = parsed.shift(start, steps)
+    while following <= today:
+        steps += 1
+        following = parsed.shift(start, steps)
+    return following.isoformat()
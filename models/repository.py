@@ -0,0 +1,397 @@
+# algoRitmo.py - Interfaz común de los motores de almacenamiento de tareas
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define TaskRepository, la interfaz que cumplen los tres motores de
+# almacenamiento (SQLite en models/database.py, memoria en models/memory.py y PostgreSQL en
+# models/postgres.py), los tipos que comparten y open_repository, que elige el motor según
+# STORAGE_BACKEND. CachedDatabase, InstrumentedDatabase, WriteBehindQueue y ChangeHub solo
+# usan estos métodos, así funcionan igual sobre cualquier motor.
+# Documentación abc: https://docs.python.org/3/library/abc.html
+# Documentación patrón Repository: https://martinfowler.com/eaaCatalog/repository.html
+#
+# Referencias:
+# - https://docs.python.org/3/library/typing.html#typing.NamedTuple
+#
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .query import TaskQuery
+from .task import Task
+
+# Motores disponibles para STORAGE_BACKEND
+STORAGE_BACKENDS = ('sqlite', 'memory', 'postgres')
+
+# Campos que se pueden modificar con patch_task, patch_tasks y apply_task_updates
+PATCHABLE_FIELDS = ('title', 'description', 'priority', 'due_date', 'completed', 'recurrence')
+
+# Métodos que escriben en la base de datos: se serializan en el hilo escritor.
+# SQLite admite un solo escritor a la vez; encolarlos evita reintentos por SQLITE_BUSY
+# dentro del mismo proceso. Viven aquí y no en async_database.py para no importar asyncio
+# al arrancar la versión WSGI.
+WRITE_METHODS = frozenset({
+    'init_database',
+    'create_task',
+    'update_task',
+    'toggle_task',
+    'patch_task',
+    'apply_task_updates',
+    'delete_task',
+    'create_tasks',
+    'patch_tasks',
+    'delete_tasks',
+    'prune_change_log',
+    'rebuild_search_index',
+    'spawn_occurrence',
+    'acquire_lease',
+    'release_lease',
+    'archive_tasks',
+    'compact_storage',
+})
+
+
+class ChangeEvent(NamedTuple):
+    """Una entrada del registro de cambios con el estado actual de su tarea"""
+    seq: int
+    op: str
+    task_id: int
+    task: Optional[Dict[str, Any]]
+
+
+class TaskUpdate(NamedTuple):
+    """Cambio parcial de una tarea: campos a asignar y, después, si se invierte 'completed'"""
+    task_id: int
+    fields: Mapping[str, Any]
+    toggle: bool = False
+    updated_at: Optional[str] = None
+
+
+class TaskChanges(NamedTuple):
+    """Resultado de get_changes"""
+    changed: List[Dict[str, Any]]
+    deleted: List[int]
+    next_token: int
+    has_more: bool
+
+
+class Lease(NamedTuple):
+    """Concesión con nombre: quién la tiene, hasta cuándo (segundos Unix) y su estado guardado"""
+    name: str
+    owner: str
+    expires_at: float
+    state: Optional[str]
+
+
+def resolve_update(update: TaskUpdate) -> Tuple[Dict[str, Any], bool]:
+    """
+    Normaliza un TaskUpdate: se queda con los campos de PATCHABLE_FIELDS y, si además de
+    asignar 'completed' se pide invertirlo, lo resuelve aquí para que el motor haga una sola
+    asignación.
+
+    Args:
+        update (TaskUpdate): Cambio a aplicar
+
+    Returns:
+        Tuple[Dict[str, Any], bool]: Campos a asignar y si hay que invertir 'completed'
+    """
+    fields = {field: update.fields[field] for field in PATCHABLE_FIELDS if field in update.fields}
+    toggle = update.toggle
+    if toggle and 'completed' in fields:
+        fields['completed'] = not fields['completed']
+        toggle = False
+    return fields, toggle
+
+
+def build_task_stats(rows: Iterable[Tuple[Any, str, int, int]]) -> Dict[str, Any]:
+    """
+    Arma el resultado de get_task_stats a partir de filas (completada, prioridad, tareas, vencidas).
+
+    Args:
+        rows (Iterable): Conteos parciales; una misma prioridad puede aparecer varias veces
+
+    Returns:
+        Dict[str, Any]: total, completed, pending, overdue y el mismo desglose en by_priority
+    """
+    def empty() -> Dict[str, int]:
+        return {'total': 0, 'completed': 0, 'pending': 0, 'overdue': 0}
+
+    stats: Dict[str, Any] = empty()
+    by_priority: Dict[str, Dict[str, int]] = {}
+    for completed, priority, count, overdue in rows:
+        for bucket in (stats, by_priority.setdefault(priority, empty())):
+            bucket['total'] += count
+            bucket['completed' if completed else 'pending'] += count
+            bucket['overdue'] += overdue
+    stats['by_priority'] = by_priority
+    return stats
+
+
+def task_row_to_dict(row: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Convierte una fila directamente al diccionario de Task.to_dict(), sin crear
+    objetos Task. Es la vía rápida para listados de solo lectura.
+
+    Args:
+        row (Sequence[Any]): Fila con las columnas de TASK_COLUMNS, en ese orden
+
+    Returns:
+        Dict[str, Any]: Diccionario listo para serializar a JSON
+    """
+    (task_id, title, description, priority, due_date, completed, created_at, updated_at,
+     recurrence) = row
+    # Las fechas ya están guardadas en ISO 8601: se envían tal cual
+    return {
+        'id': task_id,
+        'title': title,
+        'description': description,
+        'priority': priority,
+        'due_date': due_date,
+        'completed': bool(completed),
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'recurrence': recurrence
+    }
+
+
+def task_from_dict(data: Mapping[str, Any]) -> Task:
+    """Construye una Task a partir del diccionario de Task.to_dict()"""
+    return Task(
+        id=data['id'],
+        title=data['title'],
+        description=data['description'],
+        priority=data['priority'],
+        due_date=data['due_date'],
+        completed=bool(data['completed']),
+        created_at=data['created_at'],
+        updated_at=data['updated_at'],
+        recurrence=data.get('recurrence')
+    )
+
+
+class TaskRepository(ABC):
+    """
+    Interfaz de un motor de almacenamiento de tareas.
+    Todos los motores devuelven los mismos diccionarios (Task.to_dict) y los mismos cursores,
+    mantienen un contador de generación que cambia con cada escritura y un registro de cambios
+    con números de secuencia crecientes, que es lo que usan la caché, los ETag y /api/tasks/stream.
+    """
+
+    # Escrituras que AsyncDatabase ejecuta en un único hilo escritor. SQLite admite un solo
+    # escritor a la vez; un motor con escrituras concurrentes puede devolver un conjunto vacío
+    serialized_writes = WRITE_METHODS
+
+    @classmethod
+    @abstractmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'TaskRepository':
+        """Crea el motor a partir de la configuración de la aplicación"""
+
+    @abstractmethod
+    def init_database(self) -> int:
+        """Crea o migra el esquema; devuelve su versión"""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Libera las conexiones del motor"""
+
+    @abstractmethod
+    def connection_stats(self) -> Dict[str, int]:
+        """Tamaño máximo del pool ('size') y conexiones abiertas desde el inicio ('opened')"""
+
+    # Versión de la tabla y registro de cambios
+
+    @abstractmethod
+    def get_generation(self) -> int:
+        """Contador que aumenta con cada escritura en las tareas, hecha por cualquier proceso"""
+
+    @abstractmethod
+    def get_table_version(self) -> Tuple[int, int]:
+        """Generación y segundos Unix de la última escritura, en una sola lectura"""
+
+    @abstractmethod
+    def get_change_token(self) -> int:
+        """Último número de secuencia del registro de cambios"""
+
+    @abstractmethod
+    def get_changes(self, since: int, limit: int = 500) -> Optional[TaskChanges]:
+        """Tareas cambiadas e IDs eliminados desde `since`; None si el registro ya se podó"""
+
+    @abstractmethod
+    def get_change_events(self, since: int, limit: int = 500) -> Optional[List[ChangeEvent]]:
+        """Entradas del registro posteriores a `since`, en orden; None si ya se podó"""
+
+    @abstractmethod
+    def prune_change_log(self, keep: int) -> int:
+        """Conserva las últimas `keep` entradas del registro; devuelve las eliminadas"""
+
+    # Lecturas
+
+    @abstractmethod
+    def get_task_by_id(self, task_id: int) -> Optional[Task]:
+        """Tarea con ese ID, o None"""
+
+    @abstractmethod
+    def query_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Página de tareas como diccionarios y cursor de la siguiente (None si no hay más)"""
+
+    @abstractmethod
+    def iter_task_dicts(self, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """Todas las tareas en bloques, sin cargarlas juntas en memoria"""
+
+    @abstractmethod
+    def search_tasks(self, text: str, limit: int = 20,
+                     offset: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+        """Búsqueda por prefijo en título y descripción, el título con más peso"""
+
+    @abstractmethod
+    def get_task_stats(self, today: Optional[str] = None) -> Dict[str, Any]:
+        """Totales por estado y prioridad, y las vencidas a la fecha `today`"""
+
+    # Escrituras
+
+    @abstractmethod
+    def create_task(self, task: Task) -> int:
+        """Crea una tarea y devuelve su ID"""
+
+    @abstractmethod
+    def create_tasks(self, tasks: List[Task]) -> List[int]:
+        """Crea varias tareas en una transacción; IDs en el mismo orden"""
+
+    @abstractmethod
+    def update_task(self, task: Task) -> bool:
+        """Reescribe todos los campos de una tarea existente"""
+
+    @abstractmethod
+    def apply_task_updates(self, updates: Sequence[TaskUpdate]) -> List[Optional[Task]]:
+        """Aplica cambios parciales en una transacción; la tarea resultante de cada uno o None"""
+
+    @abstractmethod
+    def delete_task(self, task_id: int) -> bool:
+        """Elimina una tarea; False si no existía"""
+
+    @abstractmethod
+    def patch_tasks(self, changes: List[Dict[str, Any]]) -> List[Optional[Task]]:
+        """Cambios parciales ({'id': ..., campos}) en una transacción"""
+
+    @abstractmethod
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        """Elimina varias tareas; un ID repetido solo cuenta la primera vez"""
+
+    # Programador de avisos y repeticiones (models/scheduler.py)
+
+    @abstractmethod
+    def get_due_task_dicts(self, first: str, last: str) -> List[Dict[str, Any]]:
+        """Tareas pendientes que vencen entre `first` y `last` (YYYY-MM-DD, ambas incluidas)"""
+
+    @abstractmethod
+    def has_due_tasks(self, first: str, last: str) -> bool:
+        """Si hay alguna tarea pendiente que vence entre `first` y `last` (sin leerlas)"""
+
+    @abstractmethod
+    def get_completed_recurring_task_dicts(self) -> List[Dict[str, Any]]:
+        """Tareas completadas que todavía tienen regla de repetición"""
+
+    @abstractmethod
+    def spawn_occurrence(self, task_id: int, due_date: str) -> Optional[Task]:
+        """
+        Si la tarea está completada y tiene regla, crea la siguiente ocurrencia (pendiente, con
+        la regla y vencimiento `due_date`) y quita la regla a la original, en una transacción.
+        Devuelve la tarea nueva, o None si no había nada que crear (por ejemplo, ya se creó)
+        """
+
+    @abstractmethod
+    def acquire_lease(self, name: str, owner: str, ttl: float, now: float,
+                      state: Optional[str] = None) -> Optional[Lease]:
+        """
+        Toma o renueva la concesión `name` hasta `now + ttl` si está libre, vencida o ya es de
+        `owner`; con `state` también lo guarda. Devuelve la concesión, o None si es de otro
+        """
+
+    @abstractmethod
+    def release_lease(self, name: str, owner: str) -> bool:
+        """Libera la concesión si es de `owner` (conserva su estado para el siguiente dueño)"""
+
+    # Archivo de tareas completadas (models/archive.py)
+
+    @abstractmethod
+    def archive_tasks(self, before: str, limit: int = 1000) -> int:
+        """
+        Pasa al archivo, en una transacción, hasta `limit` tareas completadas con updated_at
+        anterior a `before` (ISO 8601), de la más antigua a la más reciente. Las completadas que
+        esperan su siguiente ocurrencia (con regla) se quedan. Para la caché, los contadores, la
+        búsqueda y el registro de cambios es un borrado. Devuelve las tareas movidas
+        """
+
+    @abstractmethod
+    def query_archived_task_dicts(self, query: TaskQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Página de tareas archivadas, con los mismos filtros, órdenes y cursores que query_task_dicts"""
+
+    # Operaciones derivadas: los motores pueden reemplazarlas por versiones más directas
+
+    def rebuild_search_index(self) -> None:
+        """Reconstruye el índice de búsqueda (los motores que lo mantienen solos no hacen nada)"""
+
+    def compact_storage(self, max_pages: int = 0, full: bool = False) -> int:
+        """
+        Libera el espacio que dejaron las tareas archivadas y actualiza las estadísticas del
+        planificador de consultas. Devuelve las páginas liberadas (0 si el motor no lo informa)
+        """
+        return 0
+
+    def query_tasks(self, query: TaskQuery) -> Tuple[List[Task], Optional[str]]:
+        """Igual que query_task_dicts, pero con objetos Task"""
+        tasks, next_cursor = self.query_task_dicts(query)
+        return [task_from_dict(task) for task in tasks], next_cursor
+
+    def toggle_task(self, task_id: int) -> Optional[Task]:
+        """Invierte el estado de completado; devuelve la tarea ya actualizada o None"""
+        return self.apply_task_updates([TaskUpdate(task_id, {}, toggle=True)])[0]
+
+    def patch_task(self, task_id: int, fields: Mapping[str, Any]) -> Optional[Task]:
+        """Modifica solo los campos indicados (de PATCHABLE_FIELDS); la tarea actualizada o None"""
+        return self.apply_task_updates([TaskUpdate(task_id, fields)])[0]
+
+    def get_all_tasks(self) -> List[Task]:
+        """Todas las tareas, de la más reciente a la más antigua"""
+        tasks, _ = self.query_tasks(TaskQuery())
+        return tasks
+
+    def get_tasks_by_priority(self, priority: str) -> List[Task]:
+        """Todas las tareas de una prioridad"""
+        tasks, _ = self.query_tasks(TaskQuery(priority=priority))
+        return tasks
+
+    def get_completed_tasks(self) -> List[Task]:
+        """Tareas completadas, de la última modificada a la primera"""
+        tasks, _ = self.query_tasks(TaskQuery(status='completed', sort='-updated_at'))
+        return tasks
+
+    def get_pending_tasks(self) -> List[Task]:
+        """Tareas pendientes"""
+        tasks, _ = self.query_tasks(TaskQuery(status='pending'))
+        return tasks
+
+
+def open_repository(config: Mapping[str, Any]) -> TaskRepository:
+    """
+    Crea el motor de almacenamiento indicado en STORAGE_BACKEND.
+    Los motores se importan aquí para que PostgreSQL solo requiera psycopg cuando se usa.
+
+    Args:
+        config (Mapping): Configuración (por ejemplo, app.config)
+
+    Returns:
+        TaskRepository: Motor configurado, sin inicializar el esquema
+
+    Raises:
+        ValueError: Si el motor no es válido
+    """
+    backend = config.get('STORAGE_BACKEND', 'sqlite')
+    if backend == 'sqlite':
+        from .database import Database
+        return Database.from_config(config)
+    if backend == 'memory':
+        from .memory import MemoryDatabase
+        return MemoryDatabase.from_config(config)
+    if backend == 'postgres':
+        from .postgres import PostgresDatabase
+        return PostgresDatabase.from_config(config)
+    raise ValueError(f'STORAGE_BACKEND inválido: {backend}')
@@ -0,0 +1,107 @@
+# algoRitmo.py - Poda automática del registro de cambios
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define ChangeLogPruner, que mantiene el registro de cambios
+# ('task_changes') en las últimas CHANGE_LOG_RETENTION entradas. El registro solo crece con las
+# escrituras, así que la poda va con ellas: tras una escritura, si pasaron CHANGE_LOG_PRUNE_INTERVAL
+# segundos desde la última poda de este proceso, se poda una vez, después de enviar la respuesta.
+# No necesita un hilo ni la concesión del programador: podar dos veces lo mismo no borra nada más.
+# Los clientes que se quedaron por debajo de lo conservado reciben 410 y recargan la lista.
+#
+# Referencias:
+# - https://flask.palletsprojects.com/en/stable/api/#flask.Response.call_on_close
+# - https://www.sqlite.org/lang_delete.html
+#
+import logging
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeLogPruner:
+    """
+    Poda el registro de cambios como mucho una vez cada `interval` segundos por proceso.
+    due() es una comparación y se puede consultar en cada escritura; prune() hace la poda.
+    """
+
+    def __init__(self, database: Any, keep: int, interval: float = 3600.0):
+        """
+        Inicializa la poda.
+
+        Args:
+            database (Any): TaskRepository (o una de sus envolturas) con prune_change_log
+            keep (int): Entradas del registro que se conservan (0 desactiva la poda)
+            interval (float): Segundos mínimos entre dos podas de este proceso (0 la desactiva)
+        """
+        self.database = database
+        self.keep = keep
+        self.interval = interval
+        # La primera escritura de cada proceso poda: así el registro queda acotado tras reiniciar
+        self._next_run = 0.0
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.pruned = 0
+        self.failed = 0
+
+    @classmethod
+    def from_config(cls, database: Any, config: Mapping[str, Any]) -> 'ChangeLogPruner':
+        """
+        Crea la poda a partir de la configuración de la aplicación.
+
+        Args:
+            database (Any): Capa de datos
+            config (Mapping): Configuración (por ejemplo, app.config)
+
+        Returns:
+            ChangeLogPruner: Poda configurada
+        """
+        return cls(
+            database,
+            keep=config.get('CHANGE_LOG_RETENTION', 100000),
+            interval=config.get('CHANGE_LOG_PRUNE_INTERVAL', 3600.0)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Si hay una retención y un intervalo configurados"""
+        return self.keep > 0 and self.interval > 0
+
+    def due(self, now: Optional[float] = None) -> bool:
+        """Si toca podar (sin consultar la base de datos)"""
+        now = time.monotonic() if now is None else now
+        return self.enabled and now >= self._next_run
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Poda si toca. Si otro hilo ya está podando no espera. Un error se registra y se
+        reintenta pasado el intervalo: nunca llega a la petición que disparó la poda.
+
+        Args:
+            now (Optional[float]): Hora monótona de referencia (la actual si no se indica)
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        now = time.monotonic() if now is None else now
+        if not self.due(now) or not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            if now < self._next_run:
+                return 0
+            self._next_run = now + self.interval
+            deleted = self.database.prune_change_log(self.keep)
+        except Exception:
+            self.failed += 1
+            logger.exception('No se pudo podar el registro de cambios')
+            return 0
+        finally:
+            self._lock.release()
+        self.runs += 1
+        self.pruned += deleted
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        """Podas hechas, entradas eliminadas y podas que fallaron en este proceso"""
+        return {'runs': self.runs, 'pruned': self.pruned, 'failed': self.failed}
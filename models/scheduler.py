@@ -0,0 +1,446 @@
+# algoRitmo.py - Programador de avisos de vencimiento y tareas repetidas
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define Scheduler, que llama a las funciones registradas con add_hook
+# cuando una tarea pendiente llega a su vencimiento y crea la siguiente ocurrencia de una tarea
+# repetida cuando se completa. Cada tick cuesta lo que hay que hacer y no lo que hay guardado:
+# los avisos de las próximas horas viven en un montículo ordenado por hora, que se llena con el
+# índice (completed, due_date) y se mantiene al día siguiendo el registro de cambios. Corre en un
+# hilo por worker, pero solo trabaja el que tiene la concesión 'scheduler' en la base de datos;
+# los trabajos periódicos registrados con add_job (como el archivo de models/archive.py) corren
+# en el mismo tick. El reloj se inyecta: con SimulatedClock se prueba sin esperar.
+# Documentación heapq: https://docs.python.org/3/library/heapq.html
+#
+# Referencias:
+# - https://docs.python.org/3/library/heapq.html#priority-queue-implementation-notes
+# - https://martin.kleppmann.com/2016/02/08/how-to-do-distributed-locking.html
+#
+import heapq
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from .recurrence import next_due_date
+
+logger = logging.getLogger(__name__)
+
+# Nombre de la concesión en la tabla 'leases'
+LEASE_NAME = 'scheduler'
+
+
+class SystemClock:
+    """Reloj real, en segundos Unix"""
+
+    def now(self) -> float:
+        return time.time()
+
+
+class SimulatedClock:
+    """Reloj que solo avanza cuando se le pide, para probar el programador sin esperar"""
+
+    def __init__(self, start: float) -> None:
+        self._now = start
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> float:
+        """Adelanta el reloj y devuelve la nueva hora"""
+        self._now += seconds
+        return self._now
+
+
+class Reminder(NamedTuple):
+    """Aviso que reciben los hooks: la tarea (como en Task.to_dict) y la hora prevista"""
+    task: Dict[str, Any]
+    remind_at: float
+
+
+def remind_time(due_date: Optional[str], remind_before: float = 0.0) -> Optional[float]:
+    """
+    Calcula la hora del aviso de una tarea: el inicio del día de vencimiento (hora local)
+    menos `remind_before` segundos.
+
+    Args:
+        due_date (Optional[str]): Vencimiento YYYY-MM-DD
+        remind_before (float): Antelación en segundos (negativa, después del inicio del día)
+
+    Returns:
+        Optional[float]: Segundos Unix, o None si la tarea no tiene un vencimiento válido
+    """
+    if not due_date:
+        return None
+    try:
+        day = date.fromisoformat(due_date)
+    except ValueError:
+        return None
+    return datetime.combine(day, datetime.min.time()).timestamp() - remind_before
+
+
+def _local_date(timestamp: float) -> date:
+    return datetime.fromtimestamp(timestamp).date()
+
+
+class Scheduler:
+    """
+    Avisos de vencimiento y ocurrencias de tareas repetidas, con una concesión en la base de
+    datos para que un solo proceso los atienda. Solo se cargan los avisos de la ventana
+    (marca de agua, marca de agua + horizon]; la ventana avanza con el reloj y lo que cambia
+    dentro de ella llega por el registro de cambios.
+
+    La marca de agua (hasta qué hora ya se avisó) se guarda con la concesión: si el proceso que
+    la tiene muere, el siguiente sigue desde ahí. Un aviso puede repetirse si el proceso muere
+    entre llamar a los hooks y guardar la marca, pero nunca se pierde; crear una ocurrencia es
+    atómico en el motor, así que nunca se duplica.
+    """
+
+    def __init__(self, database: Any, clock: Optional[Any] = None, remind_before: float = 0.0,
+                 horizon: float = 172800.0, lease_ttl: float = 30.0, interval: float = 1.0,
+                 batch_size: int = 500, owner: Optional[str] = None):
+        """
+        Inicializa el programador. El hilo se crea con start().
+
+        Args:
+            database (Any): TaskRepository (o una de sus envolturas) con los métodos del programador
+            clock (Optional[Any]): Objeto con now() en segundos Unix (SystemClock si no se indica)
+            remind_before (float): Segundos antes del inicio del día de vencimiento para avisar
+            horizon (float): Segundos por delante del reloj que se cargan en el montículo
+            lease_ttl (float): Segundos de validez de la concesión sin renovarla
+            interval (float): Segundos entre ticks del hilo
+            batch_size (int): Entradas del registro de cambios leídas por consulta
+            owner (Optional[str]): Identificador de este proceso en la concesión
+        """
+        self.database = database
+        self.clock = clock or SystemClock()
+        self.remind_before = remind_before
+        self.horizon = horizon
+        self.lease_ttl = lease_ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self._fixed_owner = owner
+        self.owner = owner or self._default_owner()
+        self._hooks: List[Callable[[Reminder], None]] = []
+        self._jobs: List[Callable[[float], int]] = []
+        # Montículo de (hora del aviso, ID). Las entradas viejas (la tarea cambió de fecha o se
+        # completó) no se buscan para borrarlas: se descartan al salir si no coinciden con _entries
+        self._heap: List[Tuple[float, int]] = []
+        self._entries: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        # Completadas con regla cuya siguiente ocurrencia falta crear
+        self._to_spawn: Dict[int, Dict[str, Any]] = {}
+        self._loaded = False
+        self._token = 0
+        self._watermark = 0.0
+        self._window_end = 0.0
+        self._lease_expires = 0.0
+        self._next_attempt = 0.0
+        self._tick_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.ticks = 0
+        self.reminders = 0
+        self.occurrences = 0
+        self.hook_errors = 0
+
+    @classmethod
+    def from_config(cls, database: Any, config: Mapping[str, Any]) -> 'Scheduler':
+        """
+        Crea el programador a partir de la configuración de la aplicación.
+
+        Args:
+            database (Any): Capa de datos
+            config (Mapping): Configuración (por ejemplo, app.config)
+
+        Returns:
+            Scheduler: Programador sin arrancar
+        """
+        return cls(
+            database,
+            remind_before=config.get('SCHEDULER_REMIND_BEFORE', 0.0),
+            horizon=config.get('SCHEDULER_HORIZON', 172800.0),
+            lease_ttl=config.get('SCHEDULER_LEASE_TTL', 30.0),
+            interval=config.get('SCHEDULER_INTERVAL', 1.0),
+            batch_size=config.get('CHANGES_PAGE_SIZE', 500)
+        )
+
+    @staticmethod
+    def _default_owner() -> str:
+        return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+    def add_hook(self, hook: Callable[[Reminder], None]) -> None:
+        """
+        Registra una función que recibe cada aviso. Se llama desde el hilo del programador;
+        si lanza una excepción se registra y se sigue con las demás.
+
+        Args:
+            hook (Callable): Función que recibe un Reminder
+        """
+        self._hooks.append(hook)
+
+    def add_job(self, job: Callable[[float], int]) -> None:
+        """
+        Registra un trabajo que se ejecuta al final de cada tick, solo en el proceso que tiene
+        la concesión. Debe ser breve (un lote por llamada) para no retrasar los avisos; si lanza
+        una excepción se registra y se reintenta en el siguiente tick.
+
+        Args:
+            job (Callable): Función que recibe la hora del reloj y devuelve cuánto trabajo hizo
+        """
+        self._jobs.append(job)
+
+    @property
+    def running(self) -> bool:
+        """Si el hilo está corriendo en este proceso"""
+        return self._thread is not None and self._pid == os.getpid()
+
+    def has_work(self) -> bool:
+        """
+        Si hay algo que solo hace el programador: trabajos registrados (como el archivo), avisos
+        de tareas pendientes que vencen dentro del horizonte (las fechas que cargaría _extend)
+        o tareas repetidas completadas que esperan su siguiente ocurrencia.
+        """
+        if self._jobs:
+            return True
+        now = self.clock.now()
+        first = _local_date(now + self.remind_before).isoformat()
+        last = _local_date(now + self.horizon + self.remind_before).isoformat()
+        return (self.database.has_due_tasks(first, last)
+                or bool(self.database.get_completed_recurring_task_dicts()))
+
+    @property
+    def is_leader(self) -> bool:
+        """Si este proceso tiene la concesión ahora"""
+        return self._lease_expires > self.clock.now()
+
+    def stats(self) -> Dict[str, int]:
+        """Ticks con la concesión, avisos entregados, ocurrencias creadas y avisos en el montículo"""
+        return {'leader': int(self.is_leader), 'ticks': self.ticks, 'reminders': self.reminders,
+                'occurrences': self.occurrences, 'hook_errors': self.hook_errors,
+                'scheduled': len(self._entries)}
+
+    def tick(self) -> int:
+        """
+        Ejecuta un ciclo: renueva la concesión, aplica los cambios nuevos, avanza la ventana,
+        entrega los avisos vencidos, crea las ocurrencias pendientes y corre los trabajos.
+
+        Returns:
+            int: Avisos entregados, ocurrencias creadas y lo que devuelvan los trabajos
+            (0 si otro proceso tiene la concesión)
+        """
+        with self._tick_lock:
+            now = self.clock.now()
+            if not self._hold_lease(now):
+                return 0
+            self.ticks += 1
+            if not self._loaded:
+                self._load(now)
+            else:
+                self._follow_changes(now)
+                if now + self.horizon / 2 > self._window_end:
+                    self._extend(now + self.horizon)
+            return self._fire(now) + self._spawn(now) + self._run_jobs(now)
+
+    # Concesión
+
+    def _hold_lease(self, now: float) -> bool:
+        """Toma o renueva la concesión cuando hace falta; False si la tiene otro proceso"""
+        if self._lease_expires - now > self.lease_ttl * 2 / 3:
+            return True
+        if self._lease_expires <= now:
+            # Vencida: otro pudo tomarla y avanzar la marca de agua; se parte de la guardada
+            self._reset()
+            if now < self._next_attempt:
+                return False
+        lease = self.database.acquire_lease(LEASE_NAME, self.owner, self.lease_ttl, now,
+                                            self._state())
+        if lease is None:
+            self._next_attempt = now + self.lease_ttl / 3
+            return False
+        if lease.state is None:
+            # Primera concesión en esta base de datos: la marca de agua se guarda ya, para que
+            # quien la tome después no salte lo ocurrido desde ahora
+            lease = self.database.acquire_lease(LEASE_NAME, self.owner, self.lease_ttl, now,
+                                                repr(now))
+            if lease is None:
+                return False
+        self._lease_expires = lease.expires_at
+        if not self._loaded:
+            self._watermark = float(lease.state)
+        return True
+
+    def _state(self) -> Optional[str]:
+        """Marca de agua a guardar con la concesión (None si todavía no se cargó: se conserva)"""
+        return repr(self._watermark) if self._loaded else None
+
+    def _reset(self) -> None:
+        self._loaded = False
+        self._lease_expires = 0.0
+        self._heap.clear()
+        self._entries.clear()
+        self._to_spawn.clear()
+
+    # Montículo de avisos
+
+    def _load(self, now: float) -> None:
+        """Carga la ventana desde la marca de agua y las repetidas pendientes de crear"""
+        self._heap.clear()
+        self._entries.clear()
+        self._to_spawn.clear()
+        # El token se lee antes que las tareas: lo que cambie mientras tanto se vuelve a aplicar
+        self._token = self.database.get_change_token()
+        self._window_end = self._watermark
+        self._extend(now + self.horizon)
+        for task in self.database.get_completed_recurring_task_dicts():
+            self._to_spawn[task['id']] = task
+        self._loaded = True
+
+    def _extend(self, until: float) -> None:
+        """Agrega a la ventana los avisos hasta `until` (solo se consultan las fechas nuevas)"""
+        first = _local_date(self._window_end + self.remind_before).isoformat()
+        last = _local_date(until + self.remind_before).isoformat()
+        self._window_end = until
+        for task in self.database.get_due_task_dicts(first, last):
+            self._schedule(task)
+
+    def _schedule(self, task: Dict[str, Any]) -> None:
+        """Agrega, mueve o quita el aviso de una tarea según su estado actual"""
+        task_id = task['id']
+        remind_at = None if task['completed'] else remind_time(task['due_date'], self.remind_before)
+        if remind_at is None or not self._watermark < remind_at <= self._window_end:
+            self._entries.pop(task_id, None)
+            return
+        previous = self._entries.get(task_id)
+        self._entries[task_id] = (remind_at, task)
+        if previous is None or previous[0] != remind_at:
+            heapq.heappush(self._heap, (remind_at, task_id))
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                # Demasiadas entradas viejas: se reconstruye con las vigentes
+                self._heap = [(at, entry_id) for entry_id, (at, _) in self._entries.items()]
+                heapq.heapify(self._heap)
+
+    def _follow_changes(self, now: float) -> None:
+        """Aplica las escrituras hechas desde el último tick, leyendo solo el registro de cambios"""
+        while True:
+            events = self.database.get_change_events(self._token, self.batch_size)
+            if events is None:
+                # El registro se podó por encima de lo leído: se recarga la ventana completa
+                self._load(now)
+                return
+            for event in events:
+                if event.task is None:
+                    self._entries.pop(event.task_id, None)
+                    self._to_spawn.pop(event.task_id, None)
+                    continue
+                self._schedule(event.task)
+                if event.task['completed'] and event.task['recurrence']:
+                    self._to_spawn[event.task_id] = event.task
+                else:
+                    # Se volvió a marcar pendiente (o perdió la regla) antes de crear la ocurrencia
+                    self._to_spawn.pop(event.task_id, None)
+            if events:
+                self._token = events[-1].seq
+            if len(events) < self.batch_size:
+                return
+
+    def _fire(self, now: float) -> int:
+        """Entrega los avisos con hora hasta `now` y guarda la nueva marca de agua"""
+        due: List[Reminder] = []
+        while self._heap and self._heap[0][0] <= now:
+            remind_at, task_id = heapq.heappop(self._heap)
+            entry = self._entries.get(task_id)
+            if entry is not None and entry[0] == remind_at:
+                del self._entries[task_id]
+                due.append(Reminder(entry[1], remind_at))
+        self._watermark = max(self._watermark, now)
+        if not due:
+            return 0
+
+        for reminder in due:
+            for hook in self._hooks:
+                try:
+                    hook(reminder)
+                except Exception:
+                    self.hook_errors += 1
+                    logger.exception('Falló un hook de avisos con la tarea %s', reminder.task['id'])
+        self.reminders += len(due)
+        # Se guarda ya (y no en la siguiente renovación) para no repetirlos si el proceso muere
+        lease = self.database.acquire_lease(LEASE_NAME, self.owner, self.lease_ttl, now,
+                                            self._state())
+        if lease is None:
+            self._reset()
+        else:
+            self._lease_expires = lease.expires_at
+        return len(due)
+
+    def _spawn(self, now: float) -> int:
+        """Crea la siguiente ocurrencia de cada repetida completada"""
+        today = _local_date(now)
+        created = 0
+        for task_id, task in list(self._to_spawn.items()):
+            try:
+                due_date = next_due_date(task['recurrence'], task['due_date'], today)
+            except ValueError:
+                logger.warning('Regla de repetición inválida en la tarea %s: %r',
+                               task_id, task['recurrence'])
+            else:
+                if self.database.spawn_occurrence(task_id, due_date) is not None:
+                    created += 1
+            # Si spawn_occurrence lanza una excepción no se llega aquí: se reintenta en el siguiente tick
+            del self._to_spawn[task_id]
+        self.occurrences += created
+        return created
+
+    def _run_jobs(self, now: float) -> int:
+        """Ejecuta los trabajos registrados; el error de uno no impide los demás"""
+        done = 0
+        for job in self._jobs:
+            try:
+                done += job(now)
+            except Exception:
+                logger.exception('Falló un trabajo del programador (%s)',
+                                 getattr(job, '__qualname__', job))
+        return done
+
+    # Hilo
+
+    def start(self) -> None:
+        """Arranca el hilo si no está corriendo en este proceso (se puede llamar en cada petición)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._tick_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                # Tras un fork el hilo del padre no existe en el hijo, y su concesión no es nuestra
+                self._reset()
+                self.owner = self._fixed_owner or self._default_owner()
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el hilo y libera la concesión para que otro proceso la tome sin esperar"""
+        self._stop.set()
+        thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            thread.join()
+        self._thread = None
+        with self._tick_lock:
+            if self._lease_expires > 0:
+                self.database.release_lease(LEASE_NAME, self.owner)
+            self._reset()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                # Un error pasajero (bloqueo, conexión) no debe detener el programador
+                logger.exception('Falló un tick del programador')
+            self._stop.wait(self.interval)
@@ -0,0 +1,104 @@
+# algoRitmo.py - Utilidades de búsqueda de texto completo (SQLite FTS5)
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo convierte el texto que escribe el usuario en una consulta MATCH
+# segura para FTS5 (con búsqueda por prefijo) y transforma los fragmentos de snippet() en HTML
+# escapado con las coincidencias resaltadas.
+# Documentación FTS5: https://www.sqlite.org/fts5.html
+# Documentación markupsafe: https://markupsafe.palletsprojects.com/
+#
+# Referencias:
+# - https://www.sqlite.org/fts5.html#full_text_query_syntax
+# - https://www.sqlite.org/fts5.html#the_snippet_function
+#
+import re
+from typing import List, Optional
+
+from markupsafe import escape
+
+# Marcadores de control que snippet() inserta alrededor de cada coincidencia. escape() no los
+# toca, así que también podrían venir en el texto de una tarea: la API los quita al guardar
+# (strip_markers), PostgreSQL y el motor en memoria los quitan antes de marcar, y highlight()
+# solo convierte pares bien formados, por si quedan en datos anteriores.
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+_MARKER_PATTERN = re.compile(f'([{HIGHLIGHT_START}{HIGHLIGHT_END}])')
+_STRIP_MARKERS = str.maketrans('', '', HIGHLIGHT_START + HIGHLIGHT_END)
+
+
+def search_terms(text: str) -> List[str]:
+    """
+    Separa el texto de búsqueda en palabras (letras, dígitos y guion bajo), sin operadores.
+    Todos los motores de almacenamiento buscan las mismas palabras.
+
+    Args:
+        text (str): Texto escrito por el usuario
+
+    Returns:
+        List[str]: Palabras en el orden en que aparecen
+    """
+    return _TERM_PATTERN.findall(text)
+
+
+def build_match_query(text: str) -> Optional[str]:
+    """
+    Convierte el texto de búsqueda en una expresión MATCH de FTS5.
+    Cada palabra se cita (para que la sintaxis de FTS5 del usuario no se interprete)
+    y se busca por prefijo: "tare" encuentra "tarea" y "tareas".
+
+    Args:
+        text (str): Texto escrito por el usuario
+
+    Returns:
+        Optional[str]: Expresión MATCH, o None si no hay palabras que buscar
+    """
+    terms = search_terms(text)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def strip_markers(text: Optional[str]) -> Optional[str]:
+    """
+    Quita del texto los marcadores de resaltado, para que no se confundan con los de snippet().
+
+    Args:
+        text (Optional[str]): Texto de una tarea
+
+    Returns:
+        Optional[str]: El mismo texto sin HIGHLIGHT_START ni HIGHLIGHT_END
+    """
+    return text.translate(_STRIP_MARKERS) if text is not None else None
+
+
+def highlight(snippet: Optional[str]) -> Optional[str]:
+    """
+    Escapa un fragmento de snippet() y marca las coincidencias con <mark>. Un marcador que no
+    abre o cierra un par se descarta: el resultado siempre tiene las etiquetas equilibradas.
+
+    Args:
+        snippet (Optional[str]): Fragmento devuelto por snippet() con los marcadores de control
+
+    Returns:
+        Optional[str]: HTML seguro para insertar en la página
+    """
+    if snippet is None:
+        return None
+    parts: List[str] = []
+    marked = False
+    for piece in _MARKER_PATTERN.split(snippet):
+        if piece == HIGHLIGHT_START:
+            if not marked:
+                parts.append('<mark>')
+                marked = True
+        elif piece == HIGHLIGHT_END:
+            if marked:
+                parts.append('</mark>')
+                marked = False
+        else:
+            parts.append(str(escape(piece)))
+    if marked:
+        parts.append('</mark>')
+    return ''.join(parts)
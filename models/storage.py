@@ -0,0 +1,90 @@
+# algoRitmo.py - Ajustes de almacenamiento SQLite para despliegues con varios workers
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo traduce la configuración a PRAGMAs de SQLite (WAL, busy_timeout,
+# synchronous, cache_size, mmap_size) y define el reintento con backoff ante SQLITE_BUSY.
+# Documentación PRAGMA: https://www.sqlite.org/pragma.html
+# Documentación WAL: https://www.sqlite.org/wal.html
+#
+# Referencias:
+# - https://www.sqlite.org/rescode.html#busy
+# - https://docs.python.org/3/library/sqlite3.html#sqlite3.OperationalError
+#
+import random
+import sqlite3
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Mapping, TypeVar, Union
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# Códigos de error de SQLite que indican contención de bloqueos
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+# Valores por defecto usados cuando la configuración no define la clave
+DEFAULT_JOURNAL_MODE = 'WAL'
+DEFAULT_BUSY_TIMEOUT = 5000
+DEFAULT_SYNCHRONOUS = 'NORMAL'
+DEFAULT_CACHE_SIZE = -16000
+DEFAULT_MMAP_SIZE = 134217728
+
+
+def connection_pragmas(config: Mapping[str, Any]) -> Dict[str, Union[str, int]]:
+    """
+    Obtiene los PRAGMAs que deben aplicarse a cada conexión nueva.
+
+    Args:
+        config (Mapping): Configuración de la aplicación
+
+    Returns:
+        Dict[str, Union[str, int]]: Nombre del PRAGMA y su valor
+    """
+    return {
+        'busy_timeout': int(config.get('SQLITE_BUSY_TIMEOUT', DEFAULT_BUSY_TIMEOUT)),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', DEFAULT_SYNCHRONOUS),
+        'cache_size': int(config.get('SQLITE_CACHE_SIZE', DEFAULT_CACHE_SIZE)),
+        'mmap_size': int(config.get('SQLITE_MMAP_SIZE', DEFAULT_MMAP_SIZE)),
+    }
+
+
+def is_busy_error(error: sqlite3.Error) -> bool:
+    """
+    Indica si el error se debe a que otra conexión tiene el bloqueo de la base de datos.
+
+    Args:
+        error (sqlite3.Error): Error lanzado por sqlite3
+
+    Returns:
+        bool: True si es SQLITE_BUSY o SQLITE_LOCKED
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    # sqlite_errorcode existe desde Python 3.11; antes solo queda el mensaje
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_busy(method: F) -> F:
+    """
+    Decorador para métodos de Database que reintenta la operación con backoff
+    exponencial (con jitter) cuando SQLite responde SQLITE_BUSY.
+
+    Usa los atributos `busy_retries` y `busy_backoff` de la instancia.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as error:
+                if not is_busy_error(error) or attempt >= self.busy_retries:
+                    raise
+                delay = self.busy_backoff * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+                attempt += 1
+    return wrapper  # type: ignore[return-value]
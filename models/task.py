@@ -1,14 +1,29 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Dict, Any
 
+def now_iso() -> str:
+    """
+    Obtiene la fecha y hora actual en el formato en que se guardan las fechas de las tareas.
+    
+    Returns:
+        str: Fecha ISO 8601 con microsegundos, por ejemplo '2024-05-01T10:30:00.000000'
+    """
+    return datetime.now().isoformat(timespec='microseconds')
+
 class Task:
     """
     Clase que representa una tarea en el sistema de todo list.
     Implementa el patrón Model del MVC.
+    Usa __slots__ para no reservar un __dict__ por instancia.
     """
     
+    __slots__ = ('id', 'title', 'description', 'priority', 'due_date', 'completed',
+                 'created_at', 'updated_at', 'recurrence')
+    
     def __init__(self, title: str, description: str = "", priority: str = "medium", 
-                 due_date: Optional[str] = None, completed: bool = False, id: Optional[int] = None):
+                 due_date: Optional[str] = None, completed: bool = False, id: Optional[int] = None,
+                 created_at: Optional[str] = None, updated_at: Optional[str] = None,
+                 recurrence: Optional[str] = None):
         """
         Inicializa una nueva tarea.
         
@@ -19,6 +34,9 @@ class Task:
             due_date (Optional[str]): Fecha de vencimiento en formato YYYY-MM-DD
             completed (bool): Estado de completado de la tarea
             id (Optional[int]): ID único de la tarea
+            created_at (Optional[str]): Fecha de creación en ISO 8601 (ahora si no se indica)
+            updated_at (Optional[str]): Fecha de modificación (igual a created_at si no se indica)
+            recurrence (Optional[str]): Regla de repetición canónica (ver models/recurrence.py)
         """
         self.id = id
         self.title = title
@@ -26,8 +44,13 @@ class Task:
         self.priority = priority
         self.due_date = due_date
         self.completed = completed
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        # Las fechas se guardan y se envían como texto ISO 8601 ya formateado; solo se
+        # consulta el reloj para tareas nuevas, no al hidratar desde la base de datos
+        if created_at is None:
+            created_at = now_iso()
+        self.created_at = created_at
+        self.updated_at = updated_at if updated_at is not None else created_at
+        self.recurrence = recurrence
     
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -43,24 +66,25 @@ class Task:
             'priority': self.priority,
             'due_date': self.due_date,
             'completed': self.completed,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'recurrence': self.recurrence
         }
     
     def mark_completed(self) -> None:
         """Marca la tarea como completada"""
         self.completed = True
-        self.updated_at = datetime.now()
+        self.updated_at = now_iso()
     
     def mark_incomplete(self) -> None:
         """Marca la tarea como incompleta"""
         self.completed = False
-        self.updated_at = datetime.now()
+        self.updated_at = now_iso()
     
     def toggle_completed(self) -> None:
         """Cambia el estado de completado de la tarea"""
         self.completed = not self.completed
-        self.updated_at = datetime.now()
+        self.updated_at = now_iso()
     
     def is_overdue(self) -> bool:
         """
@@ -73,8 +97,8 @@ class Task:
             return False
         
         try:
-            due_date = datetime.strptime(self.due_date, '%Y-%m-%d')
-            return due_date.date() < datetime.now().date()
+            # date.fromisoformat es mucho más barato que strptime para 'YYYY-MM-DD'
+            return date.fromisoformat(self.due_date) < date.today()
         except ValueError:
             return False
     
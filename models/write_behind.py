@@ -0,0 +1,318 @@
+# algoRitmo.py - Cola write-behind para cambios parciales de tareas
+# Proyecto: algoRitmo.py
+# Autor: JuanFuent.es
+# Descripción: Este archivo define WriteBehindQueue, una capa sobre Database (o CachedDatabase)
+# que junta los toggles y cambios parciales que llegan en ráfaga y los escribe juntos: los cambios
+# sobre una misma tarea se combinan en uno solo y todo el lote se confirma en una transacción.
+# Las escrituras directas sobre tareas con cambios en cola (update_task, delete_task, patch_tasks,
+# delete_tasks, archive_tasks) escriben antes ese lote, así nunca las pisa un cambio anterior.
+# El resto de métodos se delegan sin cambios, igual que en CachedDatabase.
+# Documentación concurrent.futures: https://docs.python.org/3/library/concurrent.futures.html#future-objects
+#
+# Garantías de durabilidad según el modo:
+# - durable=True ('sync'): la petición espera a que su lote se confirme. Lo que la API responde
+#   ya está en SQLite; solo se agrupan las peticiones que coinciden en la misma ventana.
+# - durable=False ('async'): la petición responde en cuanto su cambio está en la cola, con el
+#   estado que tendrá la tarea. Si el proceso muere sin cerrar (SIGKILL, corte de luz) se pierden
+#   como mucho los cambios de la última ventana (flush_interval); al cerrar normalmente se vacía
+#   la cola (close, registrado con atexit). Otros workers ven el cambio cuando se confirma.
+# benchmarks/engines.py (check_write_behind) comprueba ambas garantías y el orden de las escrituras.
+#
+# Referencias:
+# - https://www.sqlite.org/lang_returning.html
+# - https://en.wikipedia.org/wiki/Cache_(computing)#Writing_policies
+#
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from .repository import PATCHABLE_FIELDS, WRITE_METHODS, TaskUpdate
+from .task import Task, now_iso
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_MODES = ('off', 'sync', 'async')
+
+
+class PendingUpdate:
+    """Cambios en cola sobre una tarea, ya combinados, y quienes esperan su resultado."""
+
+    __slots__ = ('fields', 'toggle', 'updated_at', 'futures', 'base', 'predicted')
+
+    def __init__(self, base: Optional[Task] = None) -> None:
+        self.fields: Dict[str, Any] = {}
+        self.toggle = False
+        self.updated_at = now_iso()
+        self.futures: List[Future] = []
+        # Solo con durable=False: la tarea antes de los cambios en cola y cómo quedará después
+        self.base = base
+        self.predicted: Optional[Task] = None
+
+    def merge(self, fields: Mapping[str, Any], toggle: bool) -> None:
+        """
+        Agrega un cambio posterior: sus campos reemplazan a los anteriores y un toggle
+        invierte el 'completed' ya asignado o se cancela con otro toggle en cola.
+
+        Args:
+            fields (Mapping[str, Any]): Campos a asignar
+            toggle (bool): Si después se invierte 'completed'
+        """
+        for field in PATCHABLE_FIELDS:
+            if field in fields:
+                self.fields[field] = fields[field]
+        if 'completed' in fields:
+            self.toggle = False
+        if toggle:
+            if 'completed' in self.fields:
+                self.fields['completed'] = not self.fields['completed']
+            else:
+                self.toggle = not self.toggle
+        self.updated_at = now_iso()
+        if self.base is not None:
+            self.predicted = self.apply_to(Task(**self.base.to_dict()))
+
+    def apply_to(self, task: Task) -> Task:
+        """Aplica los cambios en cola a una copia leída de la base de datos"""
+        for field, value in self.fields.items():
+            setattr(task, field, value)
+        if self.toggle:
+            task.completed = not task.completed
+        task.updated_at = self.updated_at
+        return task
+
+
+class WriteBehindQueue:
+    """
+    Agrupa toggle_task y patch_task en lotes que se escriben cada `flush_interval` segundos
+    (o antes, si el lote llega a `max_batch` tareas) con Database.apply_task_updates.
+    El hilo que escribe se crea con el primer cambio, así es seguro crearla antes de un fork.
+    """
+
+    def __init__(self, database: Any, flush_interval: float = 0.05, max_batch: int = 500,
+                 durable: bool = True):
+        """
+        Inicializa la cola.
+
+        Args:
+            database (Any): Database o CachedDatabase donde se escriben los lotes
+            flush_interval (float): Segundos que se esperan para juntar cambios
+            max_batch (int): Tareas distintas que fuerzan a escribir sin esperar
+            durable (bool): Responder solo cuando el cambio está confirmado
+        """
+        self.database = database
+        # Estas escrituras ya se agrupan aquí: AsyncDatabase no las pasa por su hilo escritor
+        self.serialized_writes = (getattr(database, 'serialized_writes', WRITE_METHODS)
+                                  - {'toggle_task', 'patch_task'})
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.durable = durable
+        self._pending: Dict[int, PendingUpdate] = {}
+        # Estado previsto de las tareas del lote que se está escribiendo (solo con durable=False)
+        self._inflight: Dict[int, Task] = {}
+        # Lotes terminados: si cambia mientras se lee una tarea, la lectura puede estar vieja
+        self._flush_seq = 0
+        self._first_pending_at = 0.0
+        # _lock protege la cola y solo se toma por instantes; _order_lock se mantiene mientras
+        # se escribe un lote o una escritura directa, así se escriben en el orden en que llegan.
+        # Siempre se toma _order_lock antes que _lock
+        self._lock = threading.Lock()
+        self._order_lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+        self.submitted = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Solo se llama para atributos que WriteBehindQueue no define
+        return getattr(self.database, name)
+
+    def submit(self, task_id: int, fields: Optional[Mapping[str, Any]] = None,
+               toggle: bool = False) -> 'Future[Optional[Task]]':
+        """
+        Pone en cola un cambio parcial.
+
+        Args:
+            task_id (int): ID de la tarea
+            fields (Optional[Mapping[str, Any]]): Campos a asignar (de PATCHABLE_FIELDS)
+            toggle (bool): Si después se invierte 'completed'
+
+        Returns:
+            Future[Optional[Task]]: Con durable=True se resuelve al confirmar el lote con la
+            tarea guardada; si no, ya viene resuelto con el estado que tendrá la tarea
+            (None si no existe)
+        """
+        future: 'Future[Optional[Task]]' = Future()
+        if self.durable:
+            with self._lock:
+                pending = self._enqueue(task_id, None)
+                pending.merge(fields or {}, toggle)
+                pending.futures.append(future)
+            return future
+
+        while True:
+            # La tarea se lee sin bloquear la cola; si ya tiene cambios en cola o en el lote que
+            # se escribe, se parte de su estado previsto y no hace falta leerla
+            with self._lock:
+                self._check_open()
+                known = task_id in self._pending or task_id in self._inflight
+                seen = self._flush_seq
+            task = None if known else self.database.get_task_by_id(task_id)
+            with self._lock:
+                pending = self._pending.get(task_id)
+                base = pending.predicted if pending is not None else self._inflight.get(task_id)
+                if base is None:
+                    if known or self._flush_seq != seen:
+                        # Un lote escribió la tarea entre la lectura y ahora: se vuelve a leer
+                        continue
+                    base = task
+                if base is None:
+                    future.set_result(None)
+                    return future
+                pending = self._enqueue(task_id, base)
+                pending.merge(fields or {}, toggle)
+                future.set_result(Task(**pending.predicted.to_dict()))
+                return future
+
+    def toggle_task(self, task_id: int) -> Optional[Task]:
+        """Invierte el estado de completado a través de la cola (ver Database.toggle_task)"""
+        return self.submit(task_id, toggle=True).result()
+
+    def patch_task(self, task_id: int, fields: Mapping[str, Any]) -> Optional[Task]:
+        """Modifica los campos indicados a través de la cola (ver Database.patch_task)"""
+        return self.submit(task_id, fields).result()
+
+    # Escrituras directas: si alguna de sus tareas tiene cambios en cola, primero se escribe el lote
+
+    def update_task(self, task: Task) -> bool:
+        return self._write_in_order([task.id], 'update_task', task)
+
+    def delete_task(self, task_id: int) -> bool:
+        return self._write_in_order([task_id], 'delete_task', task_id)
+
+    def patch_tasks(self, changes: List[Dict[str, Any]]) -> List[Optional[Task]]:
+        return self._write_in_order([change['id'] for change in changes], 'patch_tasks', changes)
+
+    def delete_tasks(self, task_ids: List[int]) -> List[bool]:
+        return self._write_in_order(task_ids, 'delete_tasks', task_ids)
+
+    def archive_tasks(self, before: str, limit: int = 1000) -> int:
+        return self._write_in_order(None, 'archive_tasks', before, limit)
+
+    def flush(self) -> int:
+        """
+        Escribe ya todos los cambios en cola en una sola transacción.
+
+        Returns:
+            int: Tareas escritas
+        """
+        with self._order_lock:
+            return self._write_batch()
+
+    def close(self) -> None:
+        """Deja de aceptar cambios, escribe los pendientes y detiene el hilo"""
+        with self._lock:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Cambios recibidos, tareas escritas, lotes confirmados y cambios que fallaron"""
+        return {'submitted': self.submitted, 'written': self.written,
+                'flushes': self.flushes, 'failed': self.failed}
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError('La cola write-behind está cerrada')
+
+    def _enqueue(self, task_id: int, base: Optional[Task]) -> PendingUpdate:
+        # Con self._lock tomado: devuelve la entrada de la tarea y despierta al hilo si hace falta
+        self._check_open()
+        self._ensure_worker()
+        self.submitted += 1
+        pending = self._pending.get(task_id)
+        if pending is None:
+            pending = self._pending[task_id] = PendingUpdate(base)
+            if len(self._pending) == 1:
+                self._first_pending_at = time.monotonic()
+        if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+            self._condition.notify()
+        return pending
+
+    def _write_batch(self) -> int:
+        # Con self._order_lock tomado: la cola solo se bloquea para tomar el lote, no mientras
+        # se escribe, así las peticiones siguen encolando durante el commit y sus reintentos
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            if not self.durable:
+                self._inflight = {task_id: pending.predicted for task_id, pending in batch.items()}
+        updates = [TaskUpdate(task_id, pending.fields, pending.toggle, pending.updated_at)
+                   for task_id, pending in batch.items()]
+        try:
+            results = self.database.apply_task_updates(updates)
+        except Exception as error:
+            with self._lock:
+                self.failed += len(batch)
+                self._inflight = {}
+                self._flush_seq += 1
+            if not self.durable:
+                # Nadie espera el resultado: solo queda dejar constancia
+                logger.exception('No se pudieron escribir %d cambios en cola', len(batch))
+            for pending in batch.values():
+                for future in pending.futures:
+                    future.set_exception(error)
+            return 0
+        with self._lock:
+            self.flushes += 1
+            self.written += len(batch)
+            self._inflight = {}
+            self._flush_seq += 1
+        for pending, task in zip(batch.values(), results):
+            for future in pending.futures:
+                future.set_result(task)
+        return len(batch)
+
+    def _write_in_order(self, task_ids: Optional[Iterable[int]], method: str, *args: Any) -> Any:
+        # Una escritura directa no puede quedar antes que un cambio anterior aún en cola: se
+        # escribe ese lote primero y la escritura se hace sin soltar _order_lock (None: todas)
+        with self._order_lock:
+            with self._lock:
+                queued = (bool(self._pending) if task_ids is None
+                          else any(task_id in self._pending for task_id in task_ids))
+            if queued:
+                self._write_batch()
+            return getattr(self.database, method)(*args)
+
+    def _ensure_worker(self) -> None:
+        # Tras un fork el hilo del proceso padre no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                deadline = self._first_pending_at + self.flush_interval
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+            self.flush()
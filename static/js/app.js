@@ -7,18 +7,452 @@
 let currentTaskId = null;
 let isEditing = false;
 
+// Orden de /api/tasks por defecto: created_at descendente y, en empates, id descendente
+function compareTasks(a, b) {
+    if (a.created_at !== b.created_at) return a.created_at < b.created_at ? 1 : -1;
+    return b.id - a.id;
+}
+
+// Fecha y hora local en el formato de las tareas del servidor (ISO 8601 con microsegundos)
+function localIsoNow() {
+    const now = new Date();
+    const local = new Date(now.getTime() - now.getTimezoneOffset() * 60000);
+    return local.toISOString().slice(0, 23) + '000';
+}
+
+const EMPTY_SET = new Set();
+
+// Índices en memoria de todas las tareas conocidas (las de las páginas cargadas, los cambios
+// recibidos y la copia de IndexedDB): por id, por estado, por prioridad y por vencimiento.
+// Con ellos un filtro parte del conjunto más pequeño en lugar de recorrer toda la lista.
+class TaskIndex {
+    constructor() {
+        this.clear();
+    }
+
+    clear() {
+        this.byId = new Map();
+        this.byStatus = { pending: new Set(), completed: new Set() };
+        this.byPriority = new Map();
+        this.byDueDate = new Map();
+    }
+
+    get size() {
+        return this.byId.size;
+    }
+
+    get(id) {
+        return this.byId.get(Number(id));
+    }
+
+    has(id) {
+        return this.byId.has(Number(id));
+    }
+
+    values() {
+        return this.byId.values();
+    }
+
+    // Agregar o reemplazar una tarea; devuelve la versión anterior, si había
+    upsert(task) {
+        const previous = this.byId.get(task.id);
+        if (previous) {
+            this.unindex(previous);
+        }
+        this.byId.set(task.id, task);
+        this.byStatus[task.completed ? 'completed' : 'pending'].add(task.id);
+        this.addTo(this.byPriority, task.priority, task.id);
+        this.addTo(this.byDueDate, task.due_date || '', task.id);
+        return previous;
+    }
+
+    // Quitar una tarea; devuelve la que estaba, si había
+    remove(id) {
+        const task = this.byId.get(Number(id));
+        if (task) {
+            this.byId.delete(task.id);
+            this.unindex(task);
+        }
+        return task;
+    }
+
+    // Tareas que cumplen los filtros (los mismos parámetros que /api/tasks), en el orden de la lista
+    query(filters, limit = Infinity) {
+        const sets = [];
+        if (filters.status) sets.push(this.byStatus[filters.status] || EMPTY_SET);
+        if (filters.priority) sets.push(this.byPriority.get(filters.priority) || EMPTY_SET);
+        if (filters.due_date) sets.push(this.byDueDate.get(filters.due_date) || EMPTY_SET);
+
+        let tasks;
+        if (sets.length === 0) {
+            tasks = Array.from(this.byId.values());
+        } else {
+            sets.sort((a, b) => a.size - b.size);
+            const [smallest, ...others] = sets;
+            tasks = [];
+            for (const id of smallest) {
+                if (others.every(set => set.has(id))) {
+                    tasks.push(this.byId.get(id));
+                }
+            }
+        }
+        tasks.sort(compareTasks);
+        return tasks.length > limit ? tasks.slice(0, limit) : tasks;
+    }
+
+    addTo(map, key, id) {
+        let set = map.get(key);
+        if (!set) {
+            set = new Set();
+            map.set(key, set);
+        }
+        set.add(id);
+    }
+
+    unindex(task) {
+        this.byStatus[task.completed ? 'completed' : 'pending'].delete(task.id);
+        this.byPriority.get(task.priority)?.delete(task.id);
+        this.byDueDate.get(task.due_date || '')?.delete(task.id);
+    }
+}
+
+// Copia persistente de las tareas en IndexedDB, junto con el token de /api/tasks/changes hasta
+// el que está al día. Las escrituras se juntan y se guardan en una sola transacción por tanda.
+// Sin IndexedDB (navegación privada, pruebas sin navegador) todo sigue funcionando en memoria.
+class TaskCache {
+    constructor(name = 'algoritmo', delay = 200) {
+        this.name = name;
+        this.delay = delay;
+        this.opening = null;
+        this.timer = null;
+        this.puts = new Map();
+        this.deletes = new Set();
+        this.cleared = false;
+        this.token = undefined;
+    }
+
+    // Abrir (y crear la primera vez) la base; resuelve null si no está disponible
+    open() {
+        if (!this.opening) {
+            this.opening = new Promise(resolve => {
+                let request;
+                try {
+                    request = window.indexedDB.open(this.name, 1);
+                } catch (error) {
+                    resolve(null);
+                    return;
+                }
+                request.onupgradeneeded = () => {
+                    request.result.createObjectStore('tasks', { keyPath: 'id' });
+                    request.result.createObjectStore('meta');
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => resolve(null);
+                request.onblocked = () => resolve(null);
+            });
+        }
+        return this.opening;
+    }
+
+    // Leer todas las tareas guardadas y su token (null si la copia no tiene uno válido)
+    async load() {
+        const db = await this.open();
+        if (!db) return { tasks: [], token: null };
+
+        return new Promise(resolve => {
+            const transaction = db.transaction(['tasks', 'meta'], 'readonly');
+            const tasks = transaction.objectStore('tasks').getAll();
+            const token = transaction.objectStore('meta').get('syncToken');
+            transaction.oncomplete = () => resolve({ tasks: tasks.result, token: token.result ?? null });
+            transaction.onerror = () => resolve({ tasks: [], token: null });
+        });
+    }
+
+    // Las tareas optimistas (id negativo) y los resultados de búsqueda no se guardan
+    put(tasks) {
+        tasks.forEach(task => {
+            if (task.id < 0 || task.title_snippet !== undefined) return;
+            this.deletes.delete(task.id);
+            this.puts.set(task.id, task);
+        });
+        this.schedule();
+    }
+
+    delete(ids) {
+        ids.forEach(id => {
+            this.puts.delete(id);
+            this.deletes.add(id);
+        });
+        this.schedule();
+    }
+
+    setToken(token) {
+        this.token = token;
+        this.schedule();
+    }
+
+    // Vaciar la copia (lo pendiente de guardar se descarta también)
+    clear() {
+        this.puts.clear();
+        this.deletes.clear();
+        this.cleared = true;
+        this.token = null;
+        this.schedule();
+    }
+
+    schedule() {
+        if (this.timer === null) {
+            this.timer = setTimeout(() => this.flush(), this.delay);
+        }
+    }
+
+    // Guardar lo pendiente en una transacción
+    async flush() {
+        clearTimeout(this.timer);
+        this.timer = null;
+        const { puts, deletes, cleared, token } = this;
+        this.puts = new Map();
+        this.deletes = new Set();
+        this.cleared = false;
+        this.token = undefined;
+
+        const db = await this.open();
+        if (!db) return;
+        const transaction = db.transaction(['tasks', 'meta'], 'readwrite');
+        const store = transaction.objectStore('tasks');
+        if (cleared) {
+            store.clear();
+        }
+        deletes.forEach(id => store.delete(id));
+        puts.forEach(task => store.put(task));
+        if (token !== undefined) {
+            transaction.objectStore('meta').put(token, 'syncToken');
+        }
+    }
+}
+
 // Clase principal de la aplicación
 class TaskManager {
     constructor() {
         this.tasks = [];
         this.currentFilter = 'all';
+        this.nextCursor = null;
+        this.pageSize = 50;
+        // Token de /api/tasks/changes para pedir solo lo que cambió
+        this.syncToken = null;
+        // Texto de búsqueda activo (vacío = listado normal)
+        this.searchQuery = '';
+        this.searchTimer = null;
+        // Respuestas previas por URL para peticiones condicionales (If-None-Match)
+        this.responseCache = new Map();
+        this.responseCacheSize = 50;
+        // Cambios en vivo (/api/tasks/stream) y render pendiente para agruparlos por cuadro
+        this.eventSource = null;
+        this.streamEnabled = true;
+        this.renderPending = false;
+        // Filtros de la lista cargada (los de getActiveFilters() al pedirla)
+        this.activeFilters = {};
+        // Todas las tareas conocidas, indexadas, y su copia en IndexedDB. cacheToken es el
+        // token hasta el que la copia está al día (null: todavía no tiene uno válido)
+        this.index = new TaskIndex();
+        this.cache = new TaskCache();
+        this.cacheToken = null;
+        this.cacheState = 'loading';
+        this.restoredIds = new Set();
+        // Filtros de la carga en curso, para mostrar mientras tanto lo que hay en la copia
+        this.pendingLoad = null;
+        // Cambios optimistas en curso por id de tarea y último estado confirmado por el servidor
+        this.pendingMutations = new Map();
+        this.nextTempId = -1;
+        // Tarjetas dibujadas por id de tarea, con la firma de lo que muestran
+        this.cards = new Map();
         this.init();
     }
 
     init() {
         this.setupEventListeners();
-        this.loadTasks();
-        this.updateStatistics();
+        // La primera página y las estadísticas ya vienen en el HTML: solo se piden si faltan
+        if (!this.hydrate()) {
+            this.loadTasks();
+            this.updateStatistics();
+        }
+        this.restoreCache();
+        this.connectStream();
+        // Lo que quede sin guardar al salir de la página
+        window.addEventListener('pagehide', () => this.cache.flush());
+    }
+
+    // Cargar la copia de IndexedDB en el índice (lo recibido del servidor en esta visita manda)
+    // y ponerla al día con /api/tasks/changes desde su token. Mientras la primera página no
+    // llegue, se muestra lo guardado: así la lista aparece aunque no haya conexión.
+    async restoreCache() {
+        const stored = await this.cache.load();
+        if (stored.token === null) {
+            this.anchorCache();
+            return;
+        }
+
+        stored.tasks.forEach(task => {
+            if (!this.index.has(task.id)) {
+                this.index.upsert(task);
+                this.restoredIds.add(task.id);
+            }
+        });
+        if (this.pendingLoad) {
+            this.showCachedPage(this.pendingLoad);
+        }
+        await this.reconcileCache(stored.token);
+    }
+
+    // Aplicar los cambios ocurridos desde `token` a la copia (y a la lista, si corresponde)
+    async reconcileCache(token) {
+        try {
+            let hasMore = true;
+            while (hasMore) {
+                const response = await fetch(
+                    `/api/tasks/changes?since=${encodeURIComponent(token)}`,
+                    { cache: 'no-store' }
+                );
+
+                // Los cambios ya no están en el registro: lo restaurado no se puede poner al día
+                if (response.status === 410) {
+                    this.restoredIds.forEach(id => this.removeTask(id, { persist: false }));
+                    this.restoredIds.clear();
+                    this.renderTasks();
+                    this.anchorCache();
+                    return;
+                }
+                if (!response.ok) {
+                    throw new Error('Error al sincronizar la copia local');
+                }
+
+                const delta = await response.json();
+                this.applyChanges(delta);
+                token = delta.next_token;
+                hasMore = delta.has_more;
+            }
+            this.restoredIds.clear();
+            this.cacheToken = token;
+            this.cache.setToken(token);
+            this.cacheState = 'synced';
+            this.renderTasks();
+        } catch (error) {
+            // Sin conexión: se vuelve a intentar con la próxima carga de la lista
+            this.cacheState = 'offline';
+            this.offlineToken = token;
+        }
+    }
+
+    // Empezar una copia nueva a partir de la lista cargada: sus tareas están al día hasta su
+    // token. Las de otras páginas anteriores podrían no estarlo, así que no se guardan.
+    // Si la lista todavía no llegó (o es una búsqueda) se hace con la próxima página.
+    anchorCache() {
+        if (this.syncToken === null || this.syncToken === undefined || this.searchQuery
+                || this.pendingLoad) {
+            this.cacheState = 'unanchored';
+            return;
+        }
+        this.cache.clear();
+        this.cache.put(this.tasks);
+        this.cacheToken = this.syncToken;
+        this.cache.setToken(this.syncToken);
+        this.cacheState = 'synced';
+    }
+
+    // El token de la copia solo avanza con cambios contiguos a él: así todo lo guardado sigue
+    // al día hasta ese punto (una página recién cargada no lo garantiza para las demás)
+    advanceCacheToken(from, to) {
+        if (this.cacheToken === null || from === null || from === undefined) return;
+        if (Number(from) > Number(this.cacheToken) || Number(to) <= Number(this.cacheToken)) return;
+        this.cacheToken = to;
+        this.cache.setToken(to);
+    }
+
+    // Escuchar los cambios de otras pestañas y usuarios con Server-Sent Events. EventSource
+    // reconecta solo y envía Last-Event-ID, así el servidor reenvía lo que se perdió. Si el
+    // servidor tiene el stream desactivado responde 204 y EventSource deja de intentarlo.
+    connectStream() {
+        if (!window.EventSource || !this.streamEnabled || this.eventSource) return;
+
+        // Se empieza desde el token de la lista ya cargada para no perder cambios intermedios
+        const params = new URLSearchParams();
+        if (this.syncToken !== null && this.syncToken !== undefined) {
+            params.set('last_event_id', this.syncToken);
+        }
+        const query = params.toString();
+        this.eventSource = new EventSource(`/api/tasks/stream${query ? '?' + query : ''}`);
+
+        ['created', 'updated', 'deleted'].forEach(type => {
+            this.eventSource.addEventListener(type, (event) => this.handleStreamEvent(type, event));
+        });
+        // Los cambios perdidos ya no están en el registro del servidor: recargar todo
+        this.eventSource.addEventListener('reset', (event) => {
+            this.syncToken = event.lastEventId;
+            this.loadTasks();
+        });
+    }
+
+    // Aplicar un evento del stream sobre this.tasks
+    handleStreamEvent(type, event) {
+        // Los resultados de búsqueda dependen del ranking: se recargan al salir de la búsqueda
+        if (this.searchQuery) return;
+
+        const change = JSON.parse(event.data);
+        if (type === 'deleted') {
+            this.applyServerDelete(change.id);
+        } else {
+            this.applyServerTask(change.task);
+        }
+        this.advanceCacheToken(this.syncToken, event.lastEventId);
+        this.syncToken = event.lastEventId;
+        this.scheduleRender();
+    }
+
+    // Renderizar una sola vez por cuadro aunque lleguen muchos eventos seguidos
+    scheduleRender() {
+        if (this.renderPending) return;
+        this.renderPending = true;
+        requestAnimationFrame(() => {
+            this.renderPending = false;
+            this.renderTasks();
+            this.updateStatistics();
+        });
+    }
+
+    // Tomar los datos que el servidor incrustó en la página (#initialData). Las tareas ya
+    // están dibujadas, así que no se vuelve a renderizar; solo se preparan el estado local
+    // y las respuestas guardadas para revalidarlas después con If-None-Match.
+    hydrate() {
+        const element = document.getElementById('initialData');
+        if (!element) return false;
+
+        // El navegador pudo restaurar filtros de una visita anterior: esos datos no aplican
+        const filters = this.getActiveFilters();
+        if (filters === null || Object.keys(filters).length > 0) return false;
+        this.activeFilters = filters;
+
+        let data;
+        try {
+            data = JSON.parse(element.textContent);
+        } catch (error) {
+            return false;
+        }
+
+        this.pageSize = data.page_size;
+        this.tasks = data.tasks.slice();
+        this.nextCursor = data.next_cursor;
+        this.syncToken = data.sync_token;
+        this.streamEnabled = data.stream !== false;
+        this.tasks.forEach(task => this.index.upsert(task));
+        this.cache.put(this.tasks);
+        this.adoptRenderedCards();
+        this.rememberResponse(this.tasksPageUrl({}, null), data.etags.list, {
+            tasks: data.tasks,
+            next_cursor: data.next_cursor,
+            sync_token: data.sync_token
+        });
+        this.rememberResponse('/api/tasks/stats', data.etags.stats, data.stats);
+        return true;
     }
 
     // Configurar event listeners
@@ -37,6 +471,7 @@ class TaskManager {
 
         // Botones de acción
         document.getElementById('refreshBtn')?.addEventListener('click', () => this.loadTasks());
+        document.getElementById('loadMoreBtn')?.addEventListener('click', () => this.loadMoreTasks());
         document.getElementById('filterBtn')?.addEventListener('click', () => this.toggleFilterSection());
 
         // Filtros
@@ -44,6 +479,7 @@ class TaskManager {
         document.getElementById('statusFilter')?.addEventListener('change', () => this.applyFilters());
         document.getElementById('dateFilter')?.addEventListener('change', () => this.applyFilters());
         document.getElementById('clearFilters')?.addEventListener('click', () => this.clearFilters());
+        document.getElementById('searchInput')?.addEventListener('input', (e) => this.handleSearchInput(e));
 
         // Preview de prioridad
         document.getElementById('taskPriority')?.addEventListener('change', () => this.updatePriorityPreview());
@@ -77,26 +513,280 @@ class TaskManager {
         }
     }
 
-    // Cargar tareas desde el servidor
+    // Cargar la primera página de tareas desde el servidor
     async loadTasks() {
+        const filters = this.getActiveFilters();
+        this.activeFilters = filters;
         try {
             this.showLoading(true);
-            const response = await fetch('/api/tasks');
-            
-            if (!response.ok) {
-                throw new Error('Error al cargar las tareas');
+
+            if (filters === null) {
+                // Los filtros se contradicen (p. ej. "Pendientes" + estado "Completadas")
+                this.pendingLoad = null;
+                this.tasks = [];
+                this.nextCursor = null;
+            } else {
+                // Mientras llega la respuesta se muestra lo que ya se conoce con estos filtros
+                this.pendingLoad = filters;
+                this.showCachedPage(filters);
+                const page = await this.fetchTasksPage(filters, null);
+                if (this.activeFilters !== filters) return;
+                this.pendingLoad = null;
+                this.tasks = page.tasks.slice();
+                this.nextCursor = page.next_cursor;
+                this.syncToken = page.sync_token;
+                this.rememberTasks(page.tasks);
             }
 
-            this.tasks = await response.json();
             this.renderTasks();
             this.updateStatistics();
         } catch (error) {
-            this.showError('Error al cargar las tareas: ' + error.message);
+            if (this.activeFilters !== filters) return;
+            this.pendingLoad = null;
+            if (this.index.size > 0 && !this.searchQuery) {
+                this.showError('Sin conexión con el servidor: se muestran las tareas guardadas');
+            } else {
+                this.showError('Error al cargar las tareas: ' + error.message);
+            }
         } finally {
             this.showLoading(false);
         }
     }
 
+    // Mostrar la primera página con lo que hay en el índice (aún sin el cursor del servidor)
+    showCachedPage(filters) {
+        if (this.searchQuery || this.index.size === 0) return;
+        this.tasks = this.index.query(filters, this.pageSize);
+        this.nextCursor = null;
+        this.renderTasks();
+    }
+
+    // Indexar y guardar las tareas de una página recién recibida (no las de una búsqueda)
+    rememberTasks(tasks) {
+        if (this.searchQuery) return;
+        tasks.forEach(task => {
+            this.index.upsert(task);
+            this.restoredIds.delete(task.id);
+        });
+        this.cache.put(tasks);
+        if (this.cacheState === 'unanchored') {
+            this.anchorCache();
+        } else if (this.cacheState === 'offline') {
+            this.cacheState = 'loading';
+            this.reconcileCache(this.offlineToken);
+        }
+    }
+
+    // Cargar la siguiente página usando el cursor de la anterior
+    async loadMoreTasks() {
+        const filters = this.getActiveFilters();
+        if (!this.nextCursor || filters === null) return;
+
+        try {
+            const page = await this.fetchTasksPage(filters, this.nextCursor);
+            this.tasks = this.tasks.concat(page.tasks);
+            this.nextCursor = page.next_cursor;
+            this.rememberTasks(page.tasks);
+            this.renderTasks();
+            this.updateStatistics();
+        } catch (error) {
+            this.showError('Error al cargar las tareas: ' + error.message);
+        }
+    }
+
+    // Aplicar solo los cambios ocurridos desde el último token, sin recargar la lista
+    async syncChanges() {
+        // Los resultados de búsqueda dependen del ranking del servidor: se vuelven a pedir
+        if (this.searchQuery || this.syncToken === null || this.syncToken === undefined) {
+            return this.loadTasks();
+        }
+
+        try {
+            let hasMore = true;
+            while (hasMore) {
+                const response = await fetch(
+                    `/api/tasks/changes?since=${encodeURIComponent(this.syncToken)}`,
+                    { cache: 'no-store' }
+                );
+
+                // El token ya no está en el registro de cambios: recargar todo
+                if (response.status === 410) {
+                    return this.loadTasks();
+                }
+                if (!response.ok) {
+                    throw new Error('Error al sincronizar las tareas');
+                }
+
+                const delta = await response.json();
+                this.applyChanges(delta);
+                this.advanceCacheToken(this.syncToken, delta.next_token);
+                this.syncToken = delta.next_token;
+                hasMore = delta.has_more;
+            }
+
+            this.renderTasks();
+            this.updateStatistics();
+        } catch (error) {
+            this.showError('Error al sincronizar las tareas: ' + error.message);
+        }
+    }
+
+    // Aplicar un delta del servidor sobre el índice, la copia local y this.tasks
+    applyChanges(delta) {
+        delta.deleted.forEach(id => this.applyServerDelete(id));
+        delta.changes.forEach(task => this.applyServerTask(task));
+    }
+
+    // Estado de una tarea según el servidor. Si hay un cambio optimista en curso sobre ella
+    // solo se anota: se aplica cuando termine, para no deshacer lo que el usuario ve
+    applyServerTask(task) {
+        this.restoredIds.delete(task.id);
+        const pending = this.pendingMutations.get(task.id);
+        if (pending) {
+            pending.confirmed = task;
+        } else {
+            this.upsertTask(task);
+        }
+    }
+
+    applyServerDelete(id) {
+        this.restoredIds.delete(id);
+        const pending = this.pendingMutations.get(id);
+        if (pending) {
+            pending.confirmed = null;
+        } else {
+            this.removeTask(id);
+        }
+    }
+
+    // Posición de una tarea en this.tasks (o donde iría) por búsqueda binaria: la lista está
+    // ordenada por created_at descendente y luego id, y created_at no cambia al editar.
+    // Los resultados de búsqueda van por relevancia: ahí se recorre la lista.
+    findTaskPosition(task) {
+        if (this.searchQuery) {
+            const position = this.tasks.findIndex(t => t.id === task.id);
+            return position === -1 ? this.tasks.length : position;
+        }
+        let low = 0;
+        let high = this.tasks.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (compareTasks(this.tasks[middle], task) < 0) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    // Insertar o reemplazar una tarea en el índice, la copia local y la lista, respetando
+    // filtros y orden
+    upsertTask(task, { persist = true } = {}) {
+        this.index.upsert(task);
+        if (persist) {
+            this.cache.put([task]);
+        }
+
+        const position = this.findTaskPosition(task);
+        const present = this.tasks[position]?.id === task.id;
+        const matches = this.matchesActiveFilters(task);
+
+        if (present) {
+            if (matches) {
+                this.tasks[position] = task;
+            } else {
+                this.tasks.splice(position, 1);
+            }
+            return;
+        }
+        if (!matches || this.searchQuery) return;
+
+        // Solo se agrega al final si no quedan páginas sin cargar antes de ella
+        if (position < this.tasks.length || !this.nextCursor) {
+            this.tasks.splice(position, 0, task);
+        }
+    }
+
+    // Quitar una tarea del índice, de la copia local y de la lista
+    removeTask(id, { persist = true } = {}) {
+        const task = this.index.remove(id);
+        if (persist) {
+            this.cache.delete([Number(id)]);
+        }
+        if (!task) {
+            this.tasks = this.tasks.filter(t => t.id !== Number(id));
+            return;
+        }
+        const position = this.findTaskPosition(task);
+        if (this.tasks[position]?.id === task.id) {
+            this.tasks.splice(position, 1);
+        }
+    }
+
+    // Buscar con un pequeño retraso para no pedir una página por cada tecla
+    handleSearchInput(event) {
+        clearTimeout(this.searchTimer);
+        this.searchTimer = setTimeout(() => {
+            this.searchQuery = event.target.value.trim();
+            this.loadTasks();
+        }, 300);
+    }
+
+    // Pedir una página de tareas al servidor
+    async fetchTasksPage(filters, cursor) {
+        if (this.searchQuery) {
+            const params = new URLSearchParams({ q: this.searchQuery, limit: this.pageSize });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            return this.fetchJsonConditional(`/api/tasks/search?${params.toString()}`);
+        }
+
+        return this.fetchJsonConditional(this.tasksPageUrl(filters, cursor));
+    }
+
+    // URL de una página del listado (también es la clave de responseCache)
+    tasksPageUrl(filters, cursor) {
+        const params = new URLSearchParams(filters);
+        params.set('limit', this.pageSize);
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        return `/api/tasks?${params.toString()}`;
+    }
+
+    // GET con ETag: si el servidor responde 304 se reutiliza la respuesta guardada
+    async fetchJsonConditional(url) {
+        const cached = this.responseCache.get(url);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        const response = await fetch(url, { headers, cache: 'no-store' });
+
+        if (response.status === 304 && cached) {
+            return cached.data;
+        }
+        if (!response.ok) {
+            throw new Error('Error al cargar las tareas');
+        }
+
+        const data = await response.json();
+        const etag = response.headers.get('ETag');
+        if (etag) {
+            this.rememberResponse(url, etag, data);
+        }
+        return data;
+    }
+
+    // Guardar una respuesta con su ETag, descartando la más antigua si se supera el tamaño
+    rememberResponse(url, etag, data) {
+        this.responseCache.delete(url);
+        this.responseCache.set(url, { etag, data });
+        if (this.responseCache.size > this.responseCacheSize) {
+            // Map conserva el orden de inserción: la primera clave es la más antigua
+            this.responseCache.delete(this.responseCache.keys().next().value);
+        }
+    }
+
     // Renderizar tareas en la interfaz
     renderTasks() {
         const container = document.getElementById('tasksContainer');
@@ -105,8 +795,13 @@ class TaskManager {
 
         if (!container) return;
 
-        // Filtrar tareas según el filtro actual
-        let filteredTasks = this.getFilteredTasks();
+        // El servidor ya devuelve las tareas filtradas
+        const filteredTasks = this.tasks;
+        const today = this.today();
+        const loadMoreBtn = document.getElementById('loadMoreBtn');
+        if (loadMoreBtn) {
+            loadMoreBtn.style.display = this.nextCursor ? 'block' : 'none';
+        }
 
         // Actualizar contador
         if (taskCount) {
@@ -116,6 +811,7 @@ class TaskManager {
         // Mostrar estado vacío si no hay tareas
         if (filteredTasks.length === 0) {
             container.innerHTML = '';
+            this.cards.clear();
             if (emptyState) {
                 emptyState.style.display = 'block';
             }
@@ -127,16 +823,65 @@ class TaskManager {
             emptyState.style.display = 'none';
         }
 
-        // Renderizar tareas
-        container.innerHTML = '';
+        // Renderizar por clave: cada tarea conserva su tarjeta mientras no cambie lo que muestra,
+        // y solo se mueven las que quedaron fuera de lugar. `cursor` es el primer nodo aún no
+        // revisado; todo lo que quede desde él al terminar ya no está en la lista.
+        const wanted = new Set();
+        let cursor = container.firstElementChild;
         filteredTasks.forEach(task => {
-            const taskElement = this.createTaskElement(task);
-            container.appendChild(taskElement);
+            const signature = this.cardSignature(task, today);
+            let card = this.cards.get(task.id);
+            if (!card || card.signature !== signature) {
+                if (card) {
+                    if (card.element === cursor) {
+                        cursor = cursor.nextElementSibling;
+                    }
+                    card.element.remove();
+                }
+                card = { element: this.createTaskElement(task, today), signature };
+                this.cards.set(task.id, card);
+            }
+            wanted.add(task.id);
+            if (card.element === cursor) {
+                cursor = cursor.nextElementSibling;
+            } else {
+                container.insertBefore(card.element, cursor);
+            }
+        });
+        while (cursor) {
+            const next = cursor.nextElementSibling;
+            cursor.remove();
+            cursor = next;
+        }
+        if (this.cards.size > wanted.size) {
+            this.cards.forEach((card, id) => {
+                if (!wanted.has(id)) this.cards.delete(id);
+            });
+        }
+    }
+
+    // Lo que muestra la tarjeta de una tarea: si no cambia, la tarjeta se reutiliza
+    cardSignature(task, today) {
+        return [task.title, task.title_snippet, task.description, task.priority, task.due_date,
+                task.recurrence, task.completed, this.isTaskOverdue(task, today)].join('\u0000');
+    }
+
+    // Tomar como propias las tarjetas que el servidor dibujó (partials/task_list.html), así el
+    // primer renderTasks() no las vuelve a crear
+    adoptRenderedCards() {
+        const container = document.getElementById('tasksContainer');
+        if (!container) return;
+        const today = this.today();
+        container.querySelectorAll('.task-item[data-task-id]').forEach(element => {
+            const task = this.index.get(element.dataset.taskId);
+            if (task) {
+                this.cards.set(task.id, { element, signature: this.cardSignature(task, today) });
+            }
         });
     }
 
     // Crear elemento HTML para una tarea
-    createTaskElement(task) {
+    createTaskElement(task, today = this.today()) {
         const template = document.getElementById('taskTemplate');
         if (!template) return document.createElement('div');
 
@@ -152,7 +897,8 @@ class TaskManager {
         }
 
         // Verificar si está vencida
-        if (this.isTaskOverdue(task)) {
+        const overdue = this.isTaskOverdue(task, today);
+        if (overdue) {
             taskItem.classList.add('overdue');
         }
 
@@ -161,9 +907,13 @@ class TaskManager {
         checkbox.checked = task.completed;
         checkbox.dataset.taskId = task.id;
 
-        // Configurar título
+        // Configurar título (en búsquedas llega como HTML escapado con <mark> en las coincidencias)
         const title = taskItem.querySelector('.task-title');
-        title.textContent = task.title;
+        if (task.title_snippet) {
+            title.innerHTML = task.title_snippet;
+        } else {
+            title.textContent = task.title;
+        }
 
         // Configurar descripción
         const description = taskItem.querySelector('.task-description');
@@ -182,51 +932,59 @@ class TaskManager {
             dueDate.style.display = 'none';
         }
 
+        // Configurar badge de repetición
+        if (task.recurrence) {
+            const recurrenceBadge = taskItem.querySelector('.task-recurrence-badge');
+            recurrenceBadge.innerHTML = '<i class="bi bi-arrow-repeat me-1"></i>';
+            recurrenceBadge.append(this.getRecurrenceText(task.recurrence));
+            recurrenceBadge.style.display = 'inline';
+        }
+
         // Configurar badge de vencida
         const overdueBadge = taskItem.querySelector('.task-overdue-badge');
-        if (this.isTaskOverdue(task)) {
+        if (overdue) {
             overdueBadge.style.display = 'inline';
         }
 
         return taskItem;
     }
 
-    // Obtener tareas filtradas
-    getFilteredTasks() {
-        let filtered = [...this.tasks];
-
-        // Aplicar filtro de estado
-        switch (this.currentFilter) {
-            case 'pending':
-                filtered = filtered.filter(task => !task.completed);
-                break;
-            case 'completed':
-                filtered = filtered.filter(task => task.completed);
-                break;
-        }
-
-        // Aplicar filtros adicionales
-        const priorityFilter = document.getElementById('priorityFilter')?.value;
+    // Obtener los filtros activos como parámetros de /api/tasks
+    // Devuelve null si la navegación y el filtro de estado se contradicen
+    getActiveFilters() {
+        const filters = {};
+        const navStatus = this.currentFilter !== 'all' ? this.currentFilter : '';
         const statusFilter = document.getElementById('statusFilter')?.value;
+        const priorityFilter = document.getElementById('priorityFilter')?.value;
         const dateFilter = document.getElementById('dateFilter')?.value;
 
-        if (priorityFilter) {
-            filtered = filtered.filter(task => task.priority === priorityFilter);
+        if (navStatus && statusFilter && navStatus !== statusFilter) {
+            return null;
         }
 
-        if (statusFilter) {
-            if (statusFilter === 'pending') {
-                filtered = filtered.filter(task => !task.completed);
-            } else if (statusFilter === 'completed') {
-                filtered = filtered.filter(task => task.completed);
-            }
+        const status = statusFilter || navStatus;
+        if (status) {
+            filters.status = status;
+        }
+        if (priorityFilter) {
+            filters.priority = priorityFilter;
         }
-
         if (dateFilter) {
-            filtered = filtered.filter(task => task.due_date === dateFilter);
+            filters.due_date = dateFilter;
         }
 
-        return filtered;
+        return filters;
+    }
+
+    // Verificar si una tarea sigue cumpliendo los filtros de la lista cargada tras un cambio
+    matchesActiveFilters(task) {
+        const filters = this.activeFilters;
+        if (filters === null) return false;
+        if (filters.status === 'pending' && task.completed) return false;
+        if (filters.status === 'completed' && !task.completed) return false;
+        if (filters.priority && task.priority !== filters.priority) return false;
+        if (filters.due_date && task.due_date !== filters.due_date) return false;
+        return true;
     }
 
     // Filtrar tareas
@@ -238,12 +996,12 @@ class TaskManager {
         document.querySelectorAll('.nav-link').forEach(link => link.classList.remove('active'));
         event?.target.classList.add('active');
         
-        this.renderTasks();
+        this.loadTasks();
     }
 
     // Aplicar filtros adicionales
     applyFilters() {
-        this.renderTasks();
+        this.loadTasks();
     }
 
     // Limpiar filtros
@@ -251,7 +1009,7 @@ class TaskManager {
         document.getElementById('priorityFilter').value = '';
         document.getElementById('statusFilter').value = '';
         document.getElementById('dateFilter').value = '';
-        this.renderTasks();
+        this.loadTasks();
     }
 
     // Mostrar/ocultar sección de filtros
@@ -287,13 +1045,15 @@ class TaskManager {
             document.getElementById('taskDescription').value = task.description || '';
             document.getElementById('taskPriority').value = task.priority;
             document.getElementById('taskDueDate').value = task.due_date || '';
+            this.setRecurrenceOption(task.recurrence);
         }
 
         this.updatePriorityPreview();
         modal.show();
     }
 
-    // Manejar envío del formulario
+    // Manejar envío del formulario. El cambio se ve al momento y se corrige con la respuesta
+    // del servidor, o se deshace si falla
     async handleTaskSubmit(event) {
         event.preventDefault();
 
@@ -302,76 +1062,151 @@ class TaskManager {
             title: formData.get('title'),
             description: formData.get('description'),
             priority: formData.get('priority'),
-            due_date: formData.get('due_date') || null
+            due_date: formData.get('due_date') || null,
+            recurrence: formData.get('recurrence') || null
         };
+        const editing = isEditing;
+        const taskId = currentTaskId;
 
-        try {
-            this.showLoading(true);
-            
-            const url = isEditing ? `/api/tasks/${currentTaskId}` : '/api/tasks';
-            const method = isEditing ? 'PUT' : 'POST';
-
-            const response = await fetch(url, {
-                method: method,
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(taskData)
-            });
+        // Cerrar modal
+        const modal = bootstrap.Modal.getInstance(document.getElementById('taskModal'));
+        modal.hide();
 
-            if (!response.ok) {
-                throw new Error('Error al guardar la tarea');
+        try {
+            if (editing) {
+                const task = this.index.get(taskId);
+                if (!task) {
+                    throw new Error('la tarea ya no existe');
+                }
+                const saved = await this.mutateTask(taskId, { ...task, ...taskData },
+                    () => this.sendTask(`/api/tasks/${taskId}`, 'PUT', taskData, 'Error al guardar la tarea'));
+                if (!saved) {
+                    throw new Error('la tarea ya no existe');
+                }
+            } else {
+                await this.createTask(taskData);
             }
 
-            const result = await response.json();
-            
-            // Cerrar modal
-            const modal = bootstrap.Modal.getInstance(document.getElementById('taskModal'));
-            modal.hide();
-
-            // Recargar tareas
-            await this.loadTasks();
-
             // Mostrar mensaje de éxito
-            this.showSuccess(isEditing ? 'Tarea actualizada exitosamente' : 'Tarea creada exitosamente');
+            this.showSuccess(editing ? 'Tarea actualizada exitosamente' : 'Tarea creada exitosamente');
+            this.syncWithoutStream();
 
         } catch (error) {
             this.showError('Error al guardar la tarea: ' + error.message);
+        }
+    }
+
+    // Crear una tarea: aparece al momento con un id provisional (negativo), que se cambia por
+    // la tarea que devuelve el servidor
+    async createTask(taskData) {
+        const now = localIsoNow();
+        const provisional = { ...taskData, id: this.nextTempId--, completed: false, created_at: now, updated_at: now };
+        this.upsertTask(provisional, { persist: false });
+        this.renderTasks();
+
+        let created = null;
+        try {
+            created = await this.sendTask('/api/tasks', 'POST', taskData, 'Error al guardar la tarea');
         } finally {
-            this.showLoading(false);
+            this.removeTask(provisional.id, { persist: false });
+            if (created) {
+                this.applyServerTask(created);
+            }
+            this.renderTasks();
+            this.updateStatistics();
+        }
+        return created;
+    }
+
+    // Aplicar un cambio al momento (`optimistic`, o null si la tarea se elimina) y confirmarlo
+    // con `request`, que devuelve la tarea según el servidor (null si ya no existe). Con varias
+    // peticiones en curso sobre la misma tarea se aplica el resultado al terminar la última;
+    // si alguna falla, la tarea queda en el último estado confirmado por el servidor.
+    async mutateTask(taskId, optimistic, request) {
+        const id = Number(taskId);
+        let pending = this.pendingMutations.get(id);
+        if (!pending) {
+            pending = { count: 0, confirmed: this.index.get(id) || null };
+            this.pendingMutations.set(id, pending);
+        }
+        pending.count += 1;
+        if (optimistic) {
+            this.upsertTask(optimistic, { persist: false });
+        } else {
+            this.removeTask(id, { persist: false });
+        }
+        this.renderTasks();
+
+        try {
+            pending.confirmed = await request();
+        } finally {
+            pending.count -= 1;
+            if (pending.count === 0) {
+                this.pendingMutations.delete(id);
+                if (pending.confirmed) {
+                    this.upsertTask(pending.confirmed);
+                } else {
+                    this.removeTask(id);
+                }
+                this.renderTasks();
+                this.updateStatistics();
+            }
+        }
+        return pending.confirmed;
+    }
+
+    // Enviar una petición de escritura y devolver la tarea de la respuesta (null si no existe)
+    async sendTask(url, method, body, errorMessage) {
+        const options = { method };
+        if (body) {
+            options.headers = { 'Content-Type': 'application/json' };
+            options.body = JSON.stringify(body);
+        }
+        const response = await fetch(url, options);
+
+        if (response.status === 404) {
+            return null;
+        }
+        if (!response.ok) {
+            throw new Error(errorMessage);
+        }
+        return response.json();
+    }
+
+    // Sin cambios en vivo, traer también lo que cambiaron otros desde la última sincronización
+    syncWithoutStream() {
+        if (!this.eventSource || this.eventSource.readyState === EventSource.CLOSED) {
+            this.syncChanges();
         }
     }
 
     // Editar tarea
     editTask(taskId) {
-        const task = this.tasks.find(t => t.id == taskId);
-        if (task) {
+        const task = this.index.get(taskId);
+        if (task && task.id > 0) {
             this.openTaskModal(task);
         }
     }
 
     // Cambiar estado de completado
     async toggleTaskComplete(taskId) {
-        try {
-            const response = await fetch(`/api/tasks/${taskId}/toggle`, {
-                method: 'PUT'
-            });
-
-            if (!response.ok) {
-                throw new Error('Error al cambiar el estado de la tarea');
+        const task = this.index.get(taskId);
+        if (!task || task.id < 0) {
+            // La tarea todavía no existe en el servidor: se deja la casilla como estaba
+            const card = this.cards.get(Number(taskId));
+            if (card) {
+                card.element.querySelector('.task-checkbox').checked = !!task?.completed;
             }
+            return;
+        }
 
-            const updatedTask = await response.json();
-            
-            // Actualizar tarea en la lista local
-            const index = this.tasks.findIndex(t => t.id == taskId);
-            if (index !== -1) {
-                this.tasks[index] = updatedTask;
+        try {
+            const updated = await this.mutateTask(task.id, { ...task, completed: !task.completed },
+                () => this.sendTask(`/api/tasks/${task.id}/toggle`, 'PUT', null,
+                                    'Error al cambiar el estado de la tarea'));
+            if (!updated) {
+                throw new Error('la tarea ya no existe');
             }
-
-            this.renderTasks();
-            this.updateStatistics();
-
         } catch (error) {
             this.showError('Error al cambiar el estado: ' + error.message);
         }
@@ -379,8 +1214,8 @@ class TaskManager {
 
     // Eliminar tarea
     deleteTask(taskId) {
-        const task = this.tasks.find(t => t.id == taskId);
-        if (task) {
+        const task = this.index.get(taskId);
+        if (task && task.id > 0) {
             document.getElementById('deleteTaskTitle').textContent = task.title;
             currentTaskId = taskId;
             
@@ -389,43 +1224,44 @@ class TaskManager {
         }
     }
 
-    // Confirmar eliminación
+    // Confirmar eliminación: la tarea desaparece al momento y vuelve si el servidor falla
     async confirmDeleteTask() {
-        try {
-            const response = await fetch(`/api/tasks/${currentTaskId}`, {
-                method: 'DELETE'
-            });
+        const taskId = currentTaskId;
 
-            if (!response.ok) {
-                throw new Error('Error al eliminar la tarea');
-            }
+        // Cerrar modal
+        const modal = bootstrap.Modal.getInstance(document.getElementById('deleteModal'));
+        modal.hide();
 
-            // Cerrar modal
-            const modal = bootstrap.Modal.getInstance(document.getElementById('deleteModal'));
-            modal.hide();
-
-            // Recargar tareas
-            await this.loadTasks();
+        try {
+            await this.mutateTask(taskId, null, async () => {
+                await this.sendTask(`/api/tasks/${taskId}`, 'DELETE', null, 'Error al eliminar la tarea');
+                return null;
+            });
 
             // Mostrar mensaje de éxito
             this.showSuccess('Tarea eliminada exitosamente');
+            this.syncWithoutStream();
 
         } catch (error) {
             this.showError('Error al eliminar la tarea: ' + error.message);
         }
     }
 
-    // Actualizar estadísticas
-    updateStatistics() {
-        const total = this.tasks.length;
-        const completed = this.tasks.filter(t => t.completed).length;
-        const pending = total - completed;
-        const overdue = this.tasks.filter(t => this.isTaskOverdue(t)).length;
+    // Actualizar estadísticas: el servidor cuenta sobre toda la tabla, no solo sobre
+    // las páginas cargadas, y responde 304 mientras nada haya cambiado
+    async updateStatistics() {
+        let stats;
+        try {
+            stats = await this.fetchJsonConditional('/api/tasks/stats');
+        } catch (error) {
+            console.error('Error al cargar las estadísticas:', error);
+            return;
+        }
 
-        document.getElementById('totalTasks').textContent = total;
-        document.getElementById('pendingTasks').textContent = pending;
-        document.getElementById('completedTasks').textContent = completed;
-        document.getElementById('overdueTasks').textContent = overdue;
+        document.getElementById('totalTasks').textContent = stats.total;
+        document.getElementById('pendingTasks').textContent = stats.pending;
+        document.getElementById('completedTasks').textContent = stats.completed;
+        document.getElementById('overdueTasks').textContent = stats.overdue;
     }
 
     // Actualizar preview de prioridad
@@ -449,17 +1285,45 @@ class TaskManager {
     }
 
     // Utilidades
-    isTaskOverdue(task) {
+    isTaskOverdue(task, today = this.today()) {
         if (!task.due_date || task.completed) return false;
-        const today = new Date().toISOString().split('T')[0];
         return task.due_date < today;
     }
 
+    today() {
+        return new Date().toISOString().split('T')[0];
+    }
+
     getPriorityText(priority) {
         const texts = { low: 'Baja', medium: 'Media', high: 'Alta' };
         return texts[priority] || priority;
     }
 
+    // Texto de una regla canónica ('FREQ=WEEKLY;INTERVAL=2' -> 'Cada 2 semanas')
+    getRecurrenceText(rule) {
+        const units = {
+            DAILY: ['día', 'días'],
+            WEEKLY: ['semana', 'semanas'],
+            MONTHLY: ['mes', 'meses'],
+            YEARLY: ['año', 'años']
+        };
+        const parts = Object.fromEntries(rule.split(';').map(part => part.split('=')));
+        const unit = units[parts.FREQ];
+        if (!unit) return rule;
+        const interval = parseInt(parts.INTERVAL || '1', 10);
+        return interval === 1 ? `Cada ${unit[0]}` : `Cada ${interval} ${unit[1]}`;
+    }
+
+    // Selecciona la regla de la tarea; las creadas por la API con INTERVAL no están en la lista
+    setRecurrenceOption(rule) {
+        const select = document.getElementById('taskRecurrence');
+        if (!select) return;
+        if (rule && !Array.from(select.options).some(option => option.value === rule)) {
+            select.add(new Option(this.getRecurrenceText(rule), rule));
+        }
+        select.value = rule || '';
+    }
+
     getPriorityBadgeClass(priority) {
         const classes = {
             low: 'bg-success',